@@ -1,26 +1,125 @@
-from flask import Flask
+from flask import Flask, current_app, request, g, appcontext_pushed
 from werkzeug.exceptions import HTTPException
 from flask_jwt_extended import JWTManager
 from sqlalchemy import create_engine
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.orm import sessionmaker, scoped_session
-from dotenv import load_dotenv
 from typing import Optional, Dict, Any
+import json
+import logging
 import os
 
-load_dotenv()
+from .utils.db_pool import engine_options, connect_timeout_args, CheckoutTracker
+from .utils.sqlite_profile import SqliteProfile, applies_to as sqlite_applies_to
+from .utils.blueprints import BlueprintSpec, LazyBlueprints
 
 db_engine = None
 SessionLocal = None
 jwt = JWTManager()
+_env_loaded = False
+
+# Service blueprints: (name, module, attribute, url_prefix); with LAZY_BLUEPRINTS they are imported
+# before the first request (or on load_all()) instead of by create_app
+BLUEPRINTS = (
+    BlueprintSpec('iam', '.routes.iam', 'iam_bp', '/iam'),
+    BlueprintSpec('inventory', '.routes.inventory', 'inv_bp', '/inventory'),
+    BlueprintSpec('sales', '.routes.sales', 'sales_bp', '/sales'),
+    BlueprintSpec('print', '.routes.print', 'print_bp', '/print'),
+    BlueprintSpec('accounting', '.routes.accounting', 'acc_bp', '/accounting'),
+    BlueprintSpec('catalog', '.routes.catalog', 'cat_bp', '/catalog'),
+    BlueprintSpec('purchase_orders', '.routes.purchase_orders', 'po_bp', '/po'),
+    BlueprintSpec('repairs', '.routes.repairs', 'rpr_bp', '/repairs'),
+    BlueprintSpec('reports', '.routes.reports', 'rpt_bp', '/reports'),
+    BlueprintSpec('vendors', '.routes.vendors', 'vendors_bp', '/po'),  # vendors under /po namespace (purchase related)
+)
+
+
+def _load_env_once() -> None:
+    # .env is read on the first create_app rather than at import time (importing app stays side-effect free)
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+
+def _branch_regions(raw: str) -> Dict[str, Any]:
+    # REPORTS_BRANCH_REGIONS: {"region": [branch_id, ...]}; a typo should name the variable, not surface as a bare JSONDecodeError
+    try:
+        regions = json.loads(raw or '{}')
+    except ValueError as e:
+        raise ValueError(f'REPORTS_BRANCH_REGIONS is not valid JSON ({e})') from None
+    if not isinstance(regions, dict) or not all(
+            isinstance(members, list) and all(isinstance(b, int) and not isinstance(b, bool) for b in members)
+            for members in regions.values()):
+        raise ValueError('REPORTS_BRANCH_REGIONS must be a JSON object mapping region -> list of branch ids')
+    return regions
 
 
 def create_app(config: Optional[Dict[str, Any]] = None):
     global db_engine, SessionLocal
+    _load_env_once()
     app = Flask(__name__)
 
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret')
     app.config['DATABASE_URL'] = os.getenv('DATABASE_URL', 'sqlite:///dev.db')
+    # Connection pool (ignored for in-memory SQLite, which shares one static connection)
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', '5'))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+    app.config['DB_POOL_TIMEOUT'] = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+    app.config['DB_POOL_PRE_PING'] = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    app.config['DB_LEAK_DETECTION'] = os.getenv('DB_LEAK_DETECTION', 'true').lower() == 'true'
+    # File-backed SQLite connection profile (WAL etc.), in-process writer queue and periodic maintenance
+    app.config['SQLITE_PROFILE'] = os.getenv('SQLITE_PROFILE', 'true').lower() == 'true'
+    app.config['SQLITE_SYNCHRONOUS'] = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    app.config['SQLITE_CACHE_SIZE_KB'] = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
+    app.config['SQLITE_MMAP_SIZE'] = int(os.getenv('SQLITE_MMAP_SIZE', '268435456'))
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    app.config['SQLITE_WRITE_LOCK'] = os.getenv('SQLITE_WRITE_LOCK', 'false').lower() == 'true'
+    app.config['SQLITE_MAINTENANCE_SECONDS'] = float(os.getenv('SQLITE_MAINTENANCE_SECONDS', '300'))
+    # Read replicas for GET/HEAD traffic (comma-separated URLs; empty = primary only)
+    app.config['DATABASE_REPLICA_URLS'] = os.getenv('DATABASE_REPLICA_URLS', '')
+    app.config['DB_REPLICA_STRATEGY'] = os.getenv('DB_REPLICA_STRATEGY', 'round_robin')
+    app.config['DB_REPLICA_MAX_LAG_SECONDS'] = float(os.getenv('DB_REPLICA_MAX_LAG_SECONDS', '5'))
+    app.config['DB_REPLICA_CHECK_SECONDS'] = float(os.getenv('DB_REPLICA_CHECK_SECONDS', '5'))
+    app.config['DB_REPLICA_CONNECT_TIMEOUT'] = float(os.getenv('DB_REPLICA_CONNECT_TIMEOUT', '2'))
+    app.config['DB_READ_YOUR_WRITES_SECONDS'] = float(os.getenv('DB_READ_YOUR_WRITES_SECONDS', '10'))
+    # Per-request SQL count / DB time and phase timers as Server-Timing header + log fields
+    app.config['REQUEST_TIMING'] = os.getenv('REQUEST_TIMING', 'false').lower() == 'true'
+    app.config['REQUEST_TIMING_HEADER'] = os.getenv('REQUEST_TIMING_HEADER', 'true').lower() == 'true'
+    # Slow statement log (GET /iam/diagnostics/slow-queries) with background EXPLAIN capture, opt-in
+    app.config['SLOW_QUERY_LOG'] = os.getenv('SLOW_QUERY_LOG', 'false').lower() == 'true'
+    app.config['SLOW_QUERY_THRESHOLD_MS'] = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', '200'))
+    app.config['SLOW_QUERY_MAX_ENTRIES'] = int(os.getenv('SLOW_QUERY_MAX_ENTRIES', '200'))
+    app.config['SLOW_QUERY_EXPLAIN'] = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+    # GET /metrics (Prometheus text format), opt-in; requires a static bearer token for scrapers
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN', '')
+    # Response compression (gzip; brotli / zstd when installed) for compressible bodies above a size floor
+    app.config['COMPRESS_ENABLED'] = os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true'
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', '1024'))
+    app.config['COMPRESS_MIMETYPES'] = os.getenv(
+        'COMPRESS_MIMETYPES', 'application/json,application/problem+json,text/plain,text/csv,text/html')
+    app.config['COMPRESS_CACHE_MAX_BYTES'] = int(os.getenv('COMPRESS_CACHE_MAX_BYTES', str(8 * 1024 * 1024)))
+    # Defer blueprint imports until the first request (tests / CLI scripts); BLUEPRINTS_PRELOAD names (or *)
+    # are still registered by create_app. Servers keep the default eager registration.
+    app.config['LAZY_BLUEPRINTS'] = os.getenv('LAZY_BLUEPRINTS', 'false').lower() == 'true'
+    app.config['BLUEPRINTS_PRELOAD'] = os.getenv('BLUEPRINTS_PRELOAD', '')
+    app.config['JWT_BLOCKLIST_REFRESH_SECONDS'] = float(os.getenv('JWT_BLOCKLIST_REFRESH_SECONDS', '5'))
+    app.config['JWT_BLOCKLIST_BLOOM_CAPACITY'] = int(os.getenv('JWT_BLOCKLIST_BLOOM_CAPACITY', '10000'))
+    # Incremental refreshes can miss a row committed late; rebuild the mirror from the table this often
+    app.config['JWT_BLOCKLIST_FULL_RELOAD_SECONDS'] = float(os.getenv('JWT_BLOCKLIST_FULL_RELOAD_SECONDS', '300'))
+    app.config['REPORTS_METRICS_READ_MODEL'] = os.getenv('REPORTS_METRICS_READ_MODEL', 'true').lower() == 'true'
+    # Leaderboard aggregates maintained by flush hooks; off: /reports/top aggregates the source tables
+    app.config['REPORTS_TOP_AGGREGATES'] = os.getenv('REPORTS_TOP_AGGREGATES', 'true').lower() == 'true'
+    app.config['REPORTS_CACHE_TTL_SECONDS'] = float(os.getenv('REPORTS_CACHE_TTL_SECONDS', '30'))
+    app.config['REPORTS_CACHE_STALE_SECONDS'] = float(os.getenv('REPORTS_CACHE_STALE_SECONDS', '300'))
+    app.config['REPORTS_CACHE_MAX_ENTRIES'] = int(os.getenv('REPORTS_CACHE_MAX_ENTRIES', '256'))
+    app.config['REPORTS_PARALLEL_WORKERS'] = int(os.getenv('REPORTS_PARALLEL_WORKERS', '4'))
+    app.config['REPORTS_QUERY_TIMEOUT_SECONDS'] = float(os.getenv('REPORTS_QUERY_TIMEOUT_SECONDS', '10'))
+    # Optional region -> branch ids hierarchy for /reports/metrics?group_by=region, e.g. {"north": [1, 2]}
+    app.config['REPORTS_BRANCH_REGIONS'] = _branch_regions(os.getenv('REPORTS_BRANCH_REGIONS', '{}'))
 
     if config:
         # allow tests or callers to override default config values
@@ -38,32 +137,192 @@ def create_app(config: Optional[Dict[str, Any]] = None):
             poolclass=StaticPool,
         )
     else:
-        db_engine = create_engine(db_url, echo=False, future=True)
-    SessionLocal = scoped_session(sessionmaker(bind=db_engine, expire_on_commit=False, autoflush=False))
+        db_engine = create_engine(db_url, echo=False, future=True, **engine_options(app.config))
+    sqlite_profile = None
+    if app.config['SQLITE_PROFILE'] and sqlite_applies_to(db_engine):
+        sqlite_profile = SqliteProfile.from_config(app.config)
+        sqlite_profile.install(db_engine)
+        sqlite_profile.start()
+    app.extensions['sqlite_profile'] = sqlite_profile
+    replica_urls = [u.strip() for u in str(app.config['DATABASE_REPLICA_URLS'] or '').split(',') if u.strip()]
+    router = None
+    if replica_urls:
+        from .services.db_router import ReplicaRouter, RoutingSession
+        router = ReplicaRouter(
+            db_engine,
+            [create_engine(u, echo=False, future=True, **engine_options(app.config),
+                           connect_args=connect_timeout_args(u, app.config['DB_REPLICA_CONNECT_TIMEOUT']))
+             for u in replica_urls],
+            strategy=app.config['DB_REPLICA_STRATEGY'],
+            max_lag_seconds=app.config['DB_REPLICA_MAX_LAG_SECONDS'],
+            check_seconds=app.config['DB_REPLICA_CHECK_SECONDS'],
+            read_your_writes_seconds=app.config['DB_READ_YOUR_WRITES_SECONDS'],
+        )
+        router.start()
+        SessionLocal = scoped_session(sessionmaker(class_=RoutingSession, router=router, expire_on_commit=False,
+                                                   autoflush=False))
+    else:
+        SessionLocal = scoped_session(sessionmaker(bind=db_engine, expire_on_commit=False, autoflush=False))
+    app.extensions['db_router'] = router
+    registry = SessionLocal
+    checkouts = app.extensions['db_checkouts'] = CheckoutTracker()
+    # A StaticPool shares its one connection between sessions, so it cannot leak (or be tracked)
+    leak_detection = app.config['DB_LEAK_DETECTION'] and not isinstance(db_engine.pool, StaticPool)
+    if leak_detection:
+        checkouts.install(db_engine)
+        for replica in (router.replicas if router else ()):
+            checkouts.install(replica.engine)
+
+    def _note_session_owner(sender, **extra):
+        # A session (and connections) opened before this context was pushed belong to the enclosing scope
+        g._db_session_preexisting = registry.registry.has()
+        g._db_session_in_tx_at_push = g._db_session_preexisting and registry().in_transaction()
+        g._db_checkouts_at_push = len(checkouts.held_by_current_thread())
+    appcontext_pushed.connect(_note_session_owner, app, weak=False)
+
+    @app.before_request
+    def _note_request_label():  # type: ignore
+        g._db_request_label = f'{request.method} {request.path}'
+
+    if app.config['COMPRESS_ENABLED']:
+        # Registered first so it runs after every other after_request hook (they run in reverse order)
+        from .utils.compression import ResponseCompressor
+        ResponseCompressor.from_config(app.config).install(app)
+
+    slow_queries = None
+    if app.config['SLOW_QUERY_LOG']:
+        from .services.slow_queries import SlowQueryRecorder
+        slow_queries = SlowQueryRecorder(threshold_ms=app.config['SLOW_QUERY_THRESHOLD_MS'],
+                                         max_entries=app.config['SLOW_QUERY_MAX_ENTRIES'],
+                                         explain=app.config['SLOW_QUERY_EXPLAIN'])
+        for engine in [db_engine] + [r.engine for r in (router.replicas if router else ())]:
+            slow_queries.install(engine)
+    app.extensions['slow_queries'] = slow_queries
+
+    if app.config['METRICS_ENABLED']:
+        if not app.config['METRICS_TOKEN']:
+            # Route names, traffic and pool sizes are not for anonymous callers
+            raise ValueError('METRICS_ENABLED requires METRICS_TOKEN (bearer token the scraper sends)')
+        from .services.runtime_metrics import install_metrics_endpoint
+        install_metrics_endpoint(app, {'primary': db_engine,
+                                       **{r.name: r.engine for r in (router.replicas if router else ())}})
+
+    if app.config['REQUEST_TIMING']:
+        from .utils import request_timing
+        for engine in [db_engine] + [r.engine for r in (router.replicas if router else ())]:
+            request_timing.install_engine_timing(engine)
+        request_timing.install_session_timing()
+        timing_log = logging.getLogger('app.request_timing')
+
+        @app.before_request
+        def _start_timing():  # type: ignore
+            request_timing.start_request()
+
+        @app.after_request
+        def _emit_timing(response):  # type: ignore
+            timings = request_timing.current()
+            if timings is None:
+                return response
+            total_ms = timings.total_ms()
+            if app.config['REQUEST_TIMING_HEADER']:
+                response.headers['Server-Timing'] = timings.server_timing(total_ms)
+            fields = timings.log_fields(total_ms)
+            timing_log.info('%s %s %s %.1fms db=%d/%.1fms', request.method, request.path, response.status_code,
+                            total_ms, fields['db_queries'], fields['db_ms'],
+                            extra={'method': request.method, 'path': request.path,
+                                   'status': response.status_code, **fields})
+            return response
+
+    if router is not None:
+        from .services.db_router import LAST_WRITE_COOKIE, LAST_WRITE_HEADER, session_wrote
+
+        @app.before_request
+        def _route_reads():  # type: ignore
+            # Read-only requests without a recent write of their own may read from a replica
+            if not router.wants_primary(request.method, request.cookies, request.headers):
+                replica = router.pick()
+                if replica is not None:
+                    registry().info['read_engine'] = replica.engine
+                    g._db_route = replica.name
+
+        @app.after_request
+        def _note_writes(response):  # type: ignore
+            # Only requests that actually wrote pin the client to the primary (not e.g. a login)
+            wrote = registry.registry.has() and session_wrote(registry())
+            if wrote and response.status_code < 400:
+                written = str(router.note_write())
+                response.headers[LAST_WRITE_HEADER] = written
+                response.set_cookie(LAST_WRITE_COOKIE, written, max_age=int(router.read_your_writes_seconds) + 1,
+                                    httponly=True, samesite='Lax')
+            response.headers['X-DB-Route'] = g.get('_db_route', 'primary')
+            return response
+
+    @app.teardown_appcontext
+    def _release_db_session(exc):  # type: ignore
+        # Return the session this context opened (and its connection) to the pool; drop its identity map
+        expected = g.get('_db_checkouts_at_push', 0)
+        if registry.registry.has():
+            registry().info.pop('read_engine', None)
+        if registry.registry.has() and g.get('_db_session_preexisting', False):
+            # The enclosing scope's session may have begun a transaction during this context; not a leak
+            expected += 1 if registry().in_transaction() and not g.get('_db_session_in_tx_at_push') else 0
+        elif registry.registry.has():
+            session = registry()
+            if app.config['DB_LEAK_DETECTION'] and (session.new or session.dirty or session.deleted):
+                app.logger.warning('db session: discarding uncommitted changes at teardown (%s)',
+                                   g.get('_db_request_label', 'app context'))
+            registry.remove()
+        if leak_detection:
+            held = checkouts.held_by_current_thread()
+            if len(held) > expected:
+                app.logger.warning('db pool: %d connection(s) still checked out after teardown (%s), oldest held %.1fs',
+                                   len(held) - expected, g.get('_db_request_label', 'app context'), held[0])
+                if not expected:
+                    checkouts.forget_current_thread()
 
     jwt.init_app(app)
 
-    # Register blueprints (placeholder)
-    from .routes.iam import iam_bp  # type: ignore  # remains valid after monorepo restructuring
-    from .routes.inventory import inv_bp  # inventory service
-    from .routes.sales import sales_bp  # sales service
-    from .routes.print import print_bp  # print service
-    from .routes.accounting import acc_bp  # accounting service
-    from .routes.catalog import cat_bp  # catalog service
-    from .routes.purchase_orders import po_bp  # purchase orders service
-    from .routes.repairs import rpr_bp  # repairs service
-    from .routes.reports import rpt_bp  # reports service
-    from .routes.vendors import vendors_bp  # vendors service
-    app.register_blueprint(iam_bp, url_prefix='/iam')
-    app.register_blueprint(inv_bp, url_prefix='/inventory')
-    app.register_blueprint(sales_bp, url_prefix='/sales')
-    app.register_blueprint(print_bp, url_prefix='/print')
-    app.register_blueprint(acc_bp, url_prefix='/accounting')
-    app.register_blueprint(cat_bp, url_prefix='/catalog')
-    app.register_blueprint(po_bp, url_prefix='/po')
-    app.register_blueprint(rpr_bp, url_prefix='/repairs')
-    app.register_blueprint(rpt_bp, url_prefix='/reports')
-    app.register_blueprint(vendors_bp, url_prefix='/po')  # vendors under /po namespace (purchase related)
+    # Token revocation: in-process mirror of token_revocations consulted on every JWT check
+    from .services.token_blocklist import TokenBlocklist, issued_at_claims, token_lifetime_seconds
+    app.extensions['token_blocklist'] = TokenBlocklist(
+        refresh_seconds=app.config['JWT_BLOCKLIST_REFRESH_SECONDS'],
+        capacity=app.config['JWT_BLOCKLIST_BLOOM_CAPACITY'],
+        full_reload_seconds=app.config['JWT_BLOCKLIST_FULL_RELOAD_SECONDS'],
+        engine=db_engine,  # refreshes read the primary, outside the request's session
+        token_lifetime_seconds=token_lifetime_seconds(app.config),
+    )
+    # Millisecond issue time, merged into every token's claims, for revoke-all cutoffs
+    jwt.additional_claims_loader(issued_at_claims)
+
+    @jwt.token_in_blocklist_loader
+    def _token_revoked(jwt_header, jwt_payload):  # type: ignore
+        return current_app.extensions['token_blocklist'].is_revoked(jwt_payload)
+
+    # Reports read model: keep metrics_status_counts in step with ORM writes
+    if app.config['REPORTS_METRICS_READ_MODEL']:
+        from .services.report_metrics import install_metrics_hooks
+        from .services.customer_sketches import install_sketch_hooks
+        install_metrics_hooks()
+        install_sketch_hooks()
+    # Leaderboards: keep report_top_aggregates in step with ORM writes
+    if app.config['REPORTS_TOP_AGGREGATES']:
+        from .services.report_top import install_top_hooks
+        install_top_hooks()
+
+    # Report computations: TTL + stale-while-revalidate cache with single-flight
+    from .services.report_cache import ReportCache
+    app.extensions['report_cache'] = ReportCache(
+        ttl_seconds=app.config['REPORTS_CACHE_TTL_SECONDS'],
+        stale_seconds=app.config['REPORTS_CACHE_STALE_SECONDS'],
+        max_entries=app.config['REPORTS_CACHE_MAX_ENTRIES'],
+    )
+
+    blueprints = LazyBlueprints(app, BLUEPRINTS, package=__name__)
+    blueprints.install()
+    if app.config['LAZY_BLUEPRINTS']:
+        blueprints.preload(str(app.config['BLUEPRINTS_PRELOAD'] or '').split(','))
+    else:
+        blueprints.load_all()
 
     @app.route('/healthz')
     def health():
@@ -91,12 +350,11 @@ def create_app(config: Optional[Dict[str, Any]] = None):
             }
         }, 500
 
-    # OpenAPI spec route (minimal)
-    from .openapi import build_openapi_spec
-
+    # OpenAPI spec route: built and compressed once, then served by ETag / Accept-Encoding
     @app.route('/openapi.json')
     def openapi_spec():
-        return build_openapi_spec()
+        from .openapi import precomputed_spec  # builder imported on first request
+        return precomputed_spec().respond()
 
     @app.route('/docs')
     def docs_index():
@@ -32,6 +32,7 @@ from typing import Any, Callable, Iterable, Optional, Dict
 
 from app.services.audit import add_audit
 from app import get_db
+from app.utils.request_timing import timed
 
 
 def _extract_payload(rv: Any):
@@ -98,13 +99,14 @@ def audit_log(
                         if meta is None:
                             meta = {}
                         meta['changes'] = changes
-                add_audit(action, entity, entity_id, meta)
-                if commit:
-                    try:
-                        get_db().commit()
-                    except Exception:
-                        # Do not raise – audit must not interfere with main response
-                        pass
+                with timed('audit'):
+                    add_audit(action, entity, entity_id, meta)
+                    if commit:
+                        try:
+                            get_db().commit()
+                        except Exception:
+                            # Do not raise – audit must not interfere with main response
+                            pass
                 return rv
             except Exception:
                 # Fail closed: do not block main response if audit decorator internal logic fails
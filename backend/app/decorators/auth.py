@@ -2,15 +2,19 @@ from functools import wraps
 from flask import abort
 from flask_jwt_extended import verify_jwt_in_request
 from app.services.policy import has_permissions
+from app.utils.request_timing import timed
 
 
 def require_permissions(*codes: str):
     def outer(fn):
         @wraps(fn)
         def wrapper(*args, **kwargs):
-            verify_jwt_in_request()
-            if not has_permissions(*codes):
+            with timed('auth'):
+                verify_jwt_in_request()
+                allowed = has_permissions(*codes)
+            if not allowed:
                 abort(403, description='Missing permission')
             return fn(*args, **kwargs)
+        wrapper.required_permissions = codes
         return wrapper
     return outer
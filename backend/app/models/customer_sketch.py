@@ -0,0 +1,17 @@
+from __future__ import annotations
+from datetime import date
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, Date, DateTime, LargeBinary, func
+
+from .authz import Base
+
+
+class CustomerSketch(Base):
+    """HyperLogLog registers of customer names seen per branch and UTC day (orders + repair tickets)."""
+    __tablename__ = 'customer_sketches'
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    registers: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+__all__ = ["CustomerSketch"]
@@ -0,0 +1,40 @@
+from __future__ import annotations
+from datetime import date
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Date, DateTime, BigInteger, Index, func
+
+from .authz import Base
+
+
+class MetricsEvent(Base):
+    """Journal of status entries not yet folded into `metrics_daily_rollups`.
+
+    kind: 'created' (row inserted in `status`) or 'transitioned' (row moved into `status`).
+    """
+    __tablename__ = 'metrics_events'
+    KIND_CREATED = 'created'
+    KIND_TRANSITIONED = 'transitioned'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts: Mapped[str] = mapped_column(DateTime(timezone=True), nullable=False, index=True)
+    domain: Mapped[str] = mapped_column(String(64), nullable=False)
+    branch_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(32), nullable=False)
+    kind: Mapped[str] = mapped_column(String(16), nullable=False)
+    amount_cents: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, 'sqlite'), nullable=False, default=0)
+
+
+class MetricsDailyRollup(Base):
+    """Per UTC day, branch, domain and status: entries into the status and their amounts."""
+    __tablename__ = 'metrics_daily_rollups'
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    domain: Mapped[str] = mapped_column(String(64), primary_key=True)
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    created: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    transitioned: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sum_cents: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, 'sqlite'), nullable=False, default=0)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index('ix_metrics_daily_rollups_domain_day', 'domain', 'day'),)
+
+__all__ = ["MetricsEvent", "MetricsDailyRollup"]
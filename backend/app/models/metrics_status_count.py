@@ -0,0 +1,22 @@
+from __future__ import annotations
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, BigInteger, func
+
+from .authz import Base
+
+
+class MetricsStatusCount(Base):
+    """Read model behind /reports/metrics: one row per (domain, branch_id, status).
+
+    Maintained by `app.services.report_metrics` from ORM flushes; `scripts/rebuild_metrics.py`
+    recomputes it from the source tables.
+    """
+    __tablename__ = 'metrics_status_counts'
+    domain: Mapped[str] = mapped_column(String(64), primary_key=True)
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sum_cents: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, 'sqlite'), nullable=False, default=0)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+__all__ = ["MetricsStatusCount"]
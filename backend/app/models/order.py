@@ -1,6 +1,7 @@
 from __future__ import annotations
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, String, ForeignKey, DateTime, text
+from datetime import date
+from sqlalchemy import Integer, String, ForeignKey, Date, DateTime, text
 from typing import Optional
 
 from .authz import Base
@@ -28,3 +29,5 @@ class Order(Base):
     status: Mapped[str] = mapped_column(String(32), nullable=False, default=STATUS_NEW)
     created_by: Mapped[int] = mapped_column(ForeignKey('users.id'), nullable=False)
     updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=text('CURRENT_TIMESTAMP'), server_onupdate=text('CURRENT_TIMESTAMP'))
+    # UTC day customer_name was last added to customer_sketches (set by its flush hook)
+    customer_seen_on: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
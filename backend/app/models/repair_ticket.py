@@ -1,7 +1,8 @@
 from __future__ import annotations
+from datetime import date
 from typing import Optional
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import Integer, String, DateTime, func
+from sqlalchemy import Integer, String, Date, DateTime, func
 from app.models.authz import Base
 
 class RepairTicket(Base):
@@ -22,6 +23,8 @@ class RepairTicket(Base):
     created_by: Mapped[int] = mapped_column(Integer, nullable=False)
     assigned_user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
     updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # UTC day customer_name was last added to customer_sketches (set by its flush hook)
+    customer_seen_on: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
 
 # Status flow: NEW -> IN_PROGRESS -> COMPLETED -> CLOSED (CANCELLED as alternative terminal)
 # MANAGE permission controls state transitions beyond creation.
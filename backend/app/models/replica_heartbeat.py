@@ -0,0 +1,14 @@
+from __future__ import annotations
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, DateTime
+
+from .authz import Base
+
+
+class ReplicaHeartbeat(Base):
+    """Single row (id=1) stamped on the primary after writes; its replicated copy measures replica lag."""
+    __tablename__ = 'replica_heartbeat'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    ts: Mapped[str] = mapped_column(DateTime(timezone=True), nullable=False)
+
+__all__ = ["ReplicaHeartbeat"]
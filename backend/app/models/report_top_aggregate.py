@@ -0,0 +1,25 @@
+from __future__ import annotations
+from datetime import date
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Date, DateTime, BigInteger, Index, func
+
+from .authz import Base
+
+
+class ReportTopAggregate(Base):
+    """Per month, branch and dimension key (customer name, vendor name, product id): count and cents.
+
+    Feeds /reports/top; maintained by `app.services.report_top` from ORM flushes.
+    """
+    __tablename__ = 'report_top_aggregates'
+    dimension: Mapped[str] = mapped_column(String(16), primary_key=True)
+    period: Mapped[date] = mapped_column(Date, primary_key=True)  # first day of the UTC month
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(String(150), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    sum_cents: Mapped[int] = mapped_column(BigInteger().with_variant(Integer, 'sqlite'), nullable=False, default=0)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index('ix_report_top_aggregates_dim_period_branch', 'dimension', 'period', 'branch_id'),)
+
+__all__ = ["ReportTopAggregate"]
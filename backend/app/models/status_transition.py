@@ -0,0 +1,41 @@
+from __future__ import annotations
+from datetime import date
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, Date, DateTime, Float, LargeBinary, Index, func
+
+from .authz import Base
+
+
+class StatusTransition(Base):
+    """Append-only lifecycle history: one row per creation (from_status NULL) or status change.
+
+    duration_seconds: time spent in from_status (since the entity's previous row); NULL when unknown.
+    """
+    __tablename__ = 'status_transitions'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(64), nullable=False)
+    entity_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    branch_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    from_status: Mapped[Optional[str]] = mapped_column(String(32), nullable=True)
+    to_status: Mapped[str] = mapped_column(String(32), nullable=False)
+    ts: Mapped[str] = mapped_column(DateTime(timezone=True), nullable=False)
+    duration_seconds: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+
+    __table_args__ = (Index('ix_status_transitions_entity_id_ts', 'entity', 'entity_id', 'ts'),)
+
+
+class StatusDurationSketch(Base):
+    """Per UTC day (of leaving), domain, branch and status: quantile sketch of time spent in the status."""
+    __tablename__ = 'status_duration_sketches'
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    domain: Mapped[str] = mapped_column(String(64), primary_key=True)
+    branch_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    status: Mapped[str] = mapped_column(String(32), primary_key=True)
+    sketch: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    updated_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index('ix_status_duration_sketches_domain_day', 'domain', 'day'),)
+
+__all__ = ["StatusTransition", "StatusDurationSketch"]
@@ -0,0 +1,24 @@
+from __future__ import annotations
+from typing import Optional
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, String, DateTime, func
+
+from .authz import Base
+
+
+class TokenRevocation(Base):
+    """Persisted JWT revocation entry.
+
+    Two shapes share the table:
+      - jti set: that single token is revoked until `expires_at`.
+      - jti NULL: every token of `user_id` issued at or before `revoked_at` is revoked.
+    """
+    __tablename__ = 'token_revocations'
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    jti: Mapped[Optional[str]] = mapped_column(String(64), nullable=True, unique=True)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True, index=True)
+    revoked_by: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    revoked_at: Mapped[str] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    expires_at: Mapped[Optional[str]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+__all__ = ["TokenRevocation"]
@@ -1,8 +1,29 @@
 """Public import for the OpenAPI builder.
 
 Keeps a stable import path while the implementation lives in
-`openapi_builder.py`.
+`openapi_builder.py`. `precomputed_spec()` serializes the spec once per process
+(canonical JSON, gzip / brotli variants, content-hash ETag) for `GET /openapi.json`.
 """
+import hashlib
+import json
+from functools import lru_cache
+
 from .openapi_builder import build_openapi_spec  # noqa: F401
 
-__all__ = ["build_openapi_spec"]
+
+def canonical_spec_bytes(spec=None) -> bytes:
+    """Sorted-key, compact JSON; its sha256 is the snapshot hash in tests/openapi_spec_hash.txt."""
+    return json.dumps(build_openapi_spec() if spec is None else spec, sort_keys=True, separators=(',', ':')).encode()
+
+
+def spec_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+@lru_cache(maxsize=1)
+def precomputed_spec():
+    from .utils.compression import Precompressed
+    return Precompressed(canonical_spec_bytes(), 'application/json')
+
+
+__all__ = ["build_openapi_spec", "canonical_spec_bytes", "spec_hash", "precomputed_spec"]
@@ -4,10 +4,12 @@ from flask_jwt_extended import get_jwt, get_jwt_identity
 from sqlalchemy import select, func
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, http_date
+from app.serializers import tx_json
 from app.utils.sorting import apply_multi_sort
 from app.services.policy import assert_branch_access
 from app.models.accounting_transaction import AccountingTransaction
+from app.services.status_history import record_created, record_transition
 from app.utils.validation import validate_status
 from app.utils.fsm import TransitionValidator
 from app import get_db
@@ -21,15 +23,6 @@ TX_FSM = TransitionValidator({
     AccountingTransaction.STATUS_REJECTED: set(),
 })
 
-def _tx_json(tx: AccountingTransaction):
-    return {
-        'id': tx.id,
-        'branch_id': tx.branch_id,
-        'description': tx.description,
-        'amount_cents': tx.amount_cents,
-        'status': tx.status
-    }
-
 @acc_bp.get('/transactions')
 @require_permissions('ACC.READ')
 def list_transactions():
@@ -52,7 +45,7 @@ def list_transactions():
     q = apply_multi_sort(q, sort_expr, allowed, AccountingTransaction.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_tx_json(r) for r in rows]
+    rows_json = [tx_json(r) for r in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -79,7 +72,7 @@ def head_transactions():
     q = apply_multi_sort(q, sort_expr, allowed, AccountingTransaction.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_tx_json(r) for r in rows]
+    rows_json = [tx_json(r) for r in rows]
     latest_ts = rows[0].updated_at if rows else None
     if not rows:
         latest_ts = session.query(func.max(AccountingTransaction.updated_at)).scalar()
@@ -110,8 +103,9 @@ def create_transaction():
     user_id = int(get_jwt_identity())
     tx = AccountingTransaction(description=description, branch_id=int(branch_id), amount_cents=amount_cents, created_by=user_id)
     session.add(tx)
+    record_created(session, tx, user_id)
     session.commit()
-    return _tx_json(tx), 201
+    return tx_json(tx), 201
 
 def _prefetch_tx(tx_id: int):
     session = get_db()
@@ -127,9 +121,10 @@ def approve_transaction(tx_id: int):
         abort(404)
     assert_branch_access(tx.branch_id)
     TX_FSM.assert_can_transition(tx.status, AccountingTransaction.STATUS_APPROVED)
+    record_transition(session, tx, AccountingTransaction.STATUS_APPROVED, int(get_jwt_identity()))
     tx.status = validate_status(AccountingTransaction.STATUS_APPROVED, AccountingTransaction.ALL_STATUSES)
     session.commit()
-    return _tx_json(tx)
+    return tx_json(tx)
 
 @acc_bp.post('/transactions/<int:tx_id>/pay')
 @require_permissions('ACC.PAY')
@@ -141,9 +136,10 @@ def pay_transaction(tx_id: int):
         abort(404)
     assert_branch_access(tx.branch_id)
     TX_FSM.assert_can_transition(tx.status, AccountingTransaction.STATUS_PAID)
+    record_transition(session, tx, AccountingTransaction.STATUS_PAID, int(get_jwt_identity()))
     tx.status = validate_status(AccountingTransaction.STATUS_PAID, AccountingTransaction.ALL_STATUSES)
     session.commit()
-    return _tx_json(tx)
+    return tx_json(tx)
 
 @acc_bp.post('/transactions/<int:tx_id>/reject')
 @require_permissions('ACC.APPROVE')
@@ -155,9 +151,10 @@ def reject_transaction(tx_id: int):
         abort(404)
     assert_branch_access(tx.branch_id)
     TX_FSM.assert_can_transition(tx.status, AccountingTransaction.STATUS_REJECTED)
+    record_transition(session, tx, AccountingTransaction.STATUS_REJECTED, int(get_jwt_identity()))
     tx.status = validate_status(AccountingTransaction.STATUS_REJECTED, AccountingTransaction.ALL_STATUSES)
     session.commit()
-    return _tx_json(tx)
+    return tx_json(tx)
 
 @acc_bp.route('/transactions/<int:tx_id>', methods=['GET','HEAD'])
 @require_permissions('ACC.READ')
@@ -174,12 +171,12 @@ def get_transaction(tx_id: int):
         cond.set_data(b'')
         return cond
     from flask import make_response, jsonify, request as _req
-    body = _tx_json(tx)
+    body = tx_json(tx)
     resp = make_response(jsonify(body))
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
@@ -4,7 +4,7 @@ from flask_jwt_extended import get_jwt, get_jwt_identity
 from sqlalchemy import select, func
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, http_date
 from app.services.policy import assert_branch_access
 from app.models.catalog_item import CatalogItem
 from app.utils.validation import validate_status
@@ -236,7 +236,7 @@ def get_item(item_id: int):
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
@@ -1,18 +1,27 @@
-from flask import Blueprint, request, abort
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import Blueprint, request, abort, current_app
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from app.models.authz import User, Role, Permission, RolePermission, UserRole, Group, GroupRole, UserGroup
 from app.models.audit import AuditLog
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import selectinload
 from app import get_db
-from app.services.policy import compute_effective_permissions, assert_not_removing_last_owner, compute_branch_ids
+from app.services.policy import compute_effective_permissions, assert_not_removing_last_owner, assert_owner_remains, compute_branch_ids, OWNER_ROLE_NAME
 from app.config.pagination import normalize_pagination
 from app.utils.listing import handle_conditional, make_cached_list_response, compute_etag
 from app.services.audit import add_audit  # legacy direct calls (will be phased out as decorator adopted)
 from app.decorators.audit import audit_log
 from app.decorators.auth import require_permissions
+from app.services.token_blocklist import get_token_blocklist
+from app.services.slow_queries import SORT_KEYS as SLOW_QUERY_SORT_KEYS
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set, Tuple, List
 
 iam_bp = Blueprint('iam', __name__)
 
+# Eager-load chains for list/HEAD serializers (one SELECT ... IN per hop instead of a lazy load per row)
+_ROLE_PERMISSIONS_LOAD = selectinload(Role.permissions).selectinload(RolePermission.permission)
+_GROUP_ROLES_LOAD = selectinload(Group.roles).selectinload(GroupRole.role)
+
 @iam_bp.get('/permissions')
 @require_permissions('ADMIN.ROLE.MANAGE')
 def list_permissions():
@@ -72,7 +81,7 @@ def head_permissions():
 @require_permissions('ADMIN.ROLE.MANAGE')
 def list_roles():
     session = get_db()
-    q = session.query(Role)
+    q = session.query(Role).options(_ROLE_PERMISSIONS_LOAD)
     # Basic pagination
     try:
         limit, offset = normalize_pagination(request.args.get('limit'), request.args.get('offset'))
@@ -103,7 +112,7 @@ def list_roles():
 @require_permissions('ADMIN.ROLE.MANAGE')
 def head_roles():
     session = get_db()
-    q = session.query(Role)
+    q = session.query(Role).options(_ROLE_PERMISSIONS_LOAD)
     try:
         limit, offset = normalize_pagination(request.args.get('limit'), request.args.get('offset'))
     except ValueError as e:
@@ -141,13 +150,35 @@ def create_role():
     return {'id': role.id, 'name': role.name}, 201
 
 
+def _sync_assignments(session, model, owner_col: str, target_col: str, owner_id: int, desired_ids: Set[int]) -> Tuple[List[int], List[int]]:
+    """Bring association rows for owner_id in line with desired_ids using set difference.
+
+    Issues at most one bulk DELETE (removed ids) and one multi-row INSERT (added ids); unchanged
+    rows are left untouched. Returns sorted (added, removed) target ids.
+    """
+    owner = getattr(model, owner_col)
+    target = getattr(model, target_col)
+    current = set(session.execute(select(target).where(owner==owner_id)).scalars())
+    added = sorted(desired_ids - current)
+    removed = sorted(current - desired_ids)
+    if removed:
+        session.execute(delete(model).where(owner==owner_id, target.in_(removed)))
+    if added:
+        session.execute(insert(model).values([{owner_col: owner_id, target_col: tid} for tid in added]))
+    return added, removed
+
+
 @iam_bp.put('/roles/<int:role_id>/permissions')
 @require_permissions('ADMIN.ROLE.MANAGE')
 @audit_log(
     'ROLE.PERM.REPLACE',
     entity='Role',
     entity_id_key='id',
-    meta_builder=lambda data, rv, a, kw: {'count': len(data.get('permissions', []))},
+    meta_builder=lambda data, rv, a, kw: {
+        'count': len(data.get('permissions', [])),
+        'added': data.get('added', []),
+        'removed': data.get('removed', []),
+    },
 )
 def replace_role_permissions(role_id: int):
     session = get_db()
@@ -156,23 +187,44 @@ def replace_role_permissions(role_id: int):
         abort(404)
     data = request.json or {}
     codes = data.get('permissions') or []
-    # Map codes → Permission objects
-    perms = session.execute(select(Permission).where(Permission.code.in_(codes))).scalars().all()
-    found_codes = {p.code for p in perms}
-    missing = set(codes) - found_codes
+    # Map codes → Permission ids (plus reverse map for audit of removed ids)
+    perm_ids = dict(session.execute(select(Permission.code, Permission.id).where(Permission.code.in_(codes))).all())
+    missing = set(codes) - set(perm_ids)
     if missing:
         abort(400, description=f'Unknown permission codes: {sorted(missing)}')
-    # Clear existing
-    session.execute(delete(RolePermission).where(RolePermission.role_id==role.id))
-    for p in perms:
-        session.add(RolePermission(role_id=role.id, permission_id=p.id))
+    added_ids, removed_ids = _sync_assignments(session, RolePermission, 'role_id', 'permission_id', role.id, set(perm_ids.values()))
+    code_by_id = {pid: code for code, pid in perm_ids.items()}
+    if removed_ids:
+        code_by_id.update({pid: code for pid, code in session.execute(select(Permission.id, Permission.code).where(Permission.id.in_(removed_ids))).all()})
+    session.commit()
+    return {
+        'id': role.id,
+        'permissions': codes,
+        'added': sorted(code_by_id[i] for i in added_ids),
+        'removed': sorted(code_by_id[i] for i in removed_ids),
+    }
+
+
+@iam_bp.delete('/roles/<int:role_id>')
+@require_permissions('ADMIN.ROLE.MANAGE')
+@audit_log('ROLE.DELETE', entity='Role', entity_id_key='id', meta_keys=['name'])
+def delete_role(role_id: int):
+    session = get_db()
+    role = session.execute(select(Role).where(Role.id==role_id)).scalar_one_or_none()
+    if not role:
+        abort(404)
+    if role.is_system:
+        abort(400, description='system role cannot be deleted')
+    assert_owner_remains(session, exclude_role_id=role.id)
+    name = role.name
+    session.delete(role)
     session.commit()
-    return {'id': role.id, 'permissions': codes}
+    return {'id': role_id, 'name': name, 'status': 'deleted'}
 
 
 @iam_bp.put('/users/<int:user_id>/roles')
 @require_permissions('ADMIN.USER.MANAGE')
-@audit_log('USER.ROLES.SET', entity='User', entity_id_key='user_id', meta_keys=['role_ids'])
+@audit_log('USER.ROLES.SET', entity='User', entity_id_key='user_id', meta_keys=['role_ids', 'added', 'removed'])
 def set_user_roles(user_id: int):
     session = get_db()
     user = session.execute(select(User).where(User.id==user_id)).scalar_one_or_none()
@@ -187,12 +239,9 @@ def set_user_roles(user_id: int):
     if missing:
         abort(400, description=f'Unknown role ids: {sorted(missing)}')
     assert_not_removing_last_owner(user.id, role_ids)
-    # Replace direct assignments
-    session.execute(delete(UserRole).where(UserRole.user_id==user.id))
-    for rid in role_ids:
-        session.add(UserRole(user_id=user.id, role_id=rid))
+    added, removed = _sync_assignments(session, UserRole, 'user_id', 'role_id', user.id, role_ids)
     session.commit()
-    return {'user_id': user.id, 'role_ids': sorted(role_ids)}
+    return {'user_id': user.id, 'role_ids': sorted(role_ids), 'added': added, 'removed': removed}
 
 
 @iam_bp.post('/auth/login')
@@ -242,13 +291,71 @@ def me():
     }
 
 
+# --- Token Revocation ---
+
+def _jwt_exp(claims) -> Optional[datetime]:
+    exp = claims.get('exp')
+    return datetime.fromtimestamp(exp, tz=timezone.utc) if exp else None
+
+
+def _access_token_horizon() -> Optional[datetime]:
+    lifetime = current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(minutes=15))
+    if lifetime is False or lifetime is None:
+        return None  # tokens never expire: neither may the revocation
+    if not isinstance(lifetime, timedelta):
+        lifetime = timedelta(seconds=int(lifetime))
+    return datetime.now(timezone.utc) + lifetime
+
+
+@iam_bp.post('/auth/logout')
+@jwt_required()
+@audit_log('TOKEN.REVOKE', entity='User', entity_id_key='user_id', meta_keys=['scope'])
+def logout():
+    claims = get_jwt()
+    user_id = int(get_jwt_identity())
+    get_token_blocklist().revoke_token(claims['jti'], user_id=user_id, expires_at=_jwt_exp(claims), revoked_by=user_id)
+    return {'user_id': user_id, 'scope': 'token', 'status': 'revoked'}
+
+
+@iam_bp.post('/tokens/revoke')
+@require_permissions('ADMIN.USER.MANAGE')
+@audit_log('TOKEN.REVOKE', entity='User', entity_id_key='user_id', meta_keys=['scope', 'jti'])
+def revoke_token():
+    data = request.json or {}
+    jti = data.get('jti')
+    if not jti or not isinstance(jti, str):
+        abort(400, description='jti required')
+    user_id = data.get('user_id')
+    if user_id is not None and not isinstance(user_id, int):
+        abort(400, description='user_id must be int')
+    exp = data.get('exp')
+    if exp is not None and (not isinstance(exp, int) or isinstance(exp, bool)):
+        abort(400, description='exp must be int (epoch seconds)')
+    # Without the token's own exp, keep the entry for the longest an access token can live
+    expires_at = _jwt_exp({'exp': exp}) if exp is not None else _access_token_horizon()
+    get_token_blocklist().revoke_token(jti, user_id=user_id, expires_at=expires_at, revoked_by=int(get_jwt_identity()))
+    return {'user_id': user_id, 'jti': jti, 'scope': 'token', 'status': 'revoked'}
+
+
+@iam_bp.post('/users/<int:user_id>/tokens/revoke')
+@require_permissions('ADMIN.USER.MANAGE')
+@audit_log('TOKEN.REVOKE_ALL', entity='User', entity_id_key='user_id', meta_keys=['scope'])
+def revoke_user_tokens(user_id: int):
+    session = get_db()
+    user = session.execute(select(User).where(User.id==user_id)).scalar_one_or_none()
+    if not user:
+        abort(404)
+    get_token_blocklist().revoke_user(user.id, revoked_by=int(get_jwt_identity()))
+    return {'user_id': user.id, 'scope': 'user', 'status': 'revoked'}
+
+
 # --- Group Management ---
 
 @iam_bp.get('/groups')
 @require_permissions('ADMIN.GROUP.MANAGE')
 def list_groups():
     session = get_db()
-    q = session.query(Group)
+    q = session.query(Group).options(_GROUP_ROLES_LOAD)
     try:
         limit, offset = normalize_pagination(request.args.get('limit'), request.args.get('offset'))
     except ValueError as e:
@@ -282,7 +389,7 @@ def list_groups():
 @require_permissions('ADMIN.GROUP.MANAGE')
 def head_groups():
     session = get_db()
-    q = session.query(Group)
+    q = session.query(Group).options(_GROUP_ROLES_LOAD)
     try:
         limit, offset = normalize_pagination(request.args.get('limit'), request.args.get('offset'))
     except ValueError as e:
@@ -380,6 +487,7 @@ def delete_group(group_id: int):
     grp = session.execute(select(Group).where(Group.id==group_id)).scalar_one_or_none()
     if not grp:
         abort(404)
+    assert_owner_remains(session, exclude_group_id=grp.id)
     session.delete(grp)
     add_audit('GROUP.DELETE', 'Group', group_id, {'name': grp.name})
     session.commit()
@@ -388,7 +496,7 @@ def delete_group(group_id: int):
 
 @iam_bp.put('/groups/<int:group_id>/roles')
 @require_permissions('ADMIN.GROUP.MANAGE')
-@audit_log('GROUP.ROLES.SET', entity='Group', entity_id_key='group_id', meta_keys=['role_ids'])
+@audit_log('GROUP.ROLES.SET', entity='Group', entity_id_key='group_id', meta_keys=['role_ids', 'added', 'removed'])
 def set_group_roles(group_id: int):
     session = get_db()
     grp = session.execute(select(Group).where(Group.id==group_id)).scalar_one_or_none()
@@ -401,17 +509,16 @@ def set_group_roles(group_id: int):
     missing = role_ids - existing_ids
     if missing:
         abort(400, description=f'Unknown role ids: {sorted(missing)}')
-    # Replace
-    session.execute(delete(GroupRole).where(GroupRole.group_id==grp.id))
-    for rid in role_ids:
-        session.add(GroupRole(group_id=grp.id, role_id=rid))
+    if not any(r.name == OWNER_ROLE_NAME for r in roles):
+        assert_owner_remains(session, exclude_group_id=grp.id)
+    added, removed = _sync_assignments(session, GroupRole, 'group_id', 'role_id', grp.id, role_ids)
     session.commit()
-    return {'group_id': grp.id, 'role_ids': sorted(role_ids)}
+    return {'group_id': grp.id, 'role_ids': sorted(role_ids), 'added': added, 'removed': removed}
 
 
 @iam_bp.put('/users/<int:user_id>/groups')
 @require_permissions('ADMIN.USER.MANAGE')
-@audit_log('USER.GROUPS.SET', entity='User', entity_id_key='user_id', meta_keys=['group_ids'])
+@audit_log('USER.GROUPS.SET', entity='User', entity_id_key='user_id', meta_keys=['group_ids', 'added', 'removed'])
 def set_user_groups(user_id: int):
     session = get_db()
     user = session.execute(select(User).where(User.id==user_id)).scalar_one_or_none()
@@ -424,12 +531,10 @@ def set_user_groups(user_id: int):
     missing = group_ids - existing_ids
     if missing:
         abort(400, description=f'Unknown group ids: {sorted(missing)}')
-    # Replace assignments
-    session.execute(delete(UserGroup).where(UserGroup.user_id==user.id))
-    for gid in group_ids:
-        session.add(UserGroup(user_id=user.id, group_id=gid))
+    assert_owner_remains(session, membership_override=(user.id, group_ids))
+    added, removed = _sync_assignments(session, UserGroup, 'user_id', 'group_id', user.id, group_ids)
     session.commit()
-    return {'user_id': user.id, 'group_ids': sorted(group_ids)}
+    return {'user_id': user.id, 'group_ids': sorted(group_ids), 'added': added, 'removed': removed}
 
 
 # --- Audit Log Listing ---
@@ -526,3 +631,27 @@ def head_audit_logs():
         return cond
     resp.set_data(b'')
     return resp
+
+
+# --- Diagnostics ---
+@iam_bp.get('/diagnostics/slow-queries')
+@require_permissions('ADMIN.SETTINGS.MANAGE')
+def list_slow_queries():
+    """Top slow statements recorded by this process (normalized SQL, timings, routes, plans)."""
+    recorder = current_app.extensions.get('slow_queries')
+    sort = request.args.get('sort', 'total_ms')
+    if sort not in SLOW_QUERY_SORT_KEYS:
+        abort(400, description=f"sort must be one of {', '.join(SLOW_QUERY_SORT_KEYS)}")
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        abort(400, description='limit must be int')
+    limit = max(1, min(limit, 200))
+    if recorder is None:
+        return {'enabled': False, 'threshold_ms': None, 'recorded': 0, 'data': []}
+    return {
+        'enabled': True,
+        'threshold_ms': recorder.threshold_ms,
+        'recorded': len(recorder),
+        'data': recorder.top(sort, limit),
+    }
@@ -8,7 +8,7 @@ from app.models.authz import Permission, Role, RolePermission, UserRole, User, G
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
 from app.services.policy import filter_query_by_branches, assert_branch_access
-from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, http_date
 from app.utils.filters import apply_filters
 
 inv_bp = Blueprint('inventory', __name__)
@@ -115,7 +115,7 @@ def get_product(product_id: int):
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
@@ -4,11 +4,13 @@ from flask_jwt_extended import get_jwt, get_jwt_identity
 from sqlalchemy import select
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, http_date
+from app.serializers import job_json
 from app.utils.sorting import apply_multi_sort
 from app.services.policy import assert_branch_access
 from app import get_db
 from app.models.print_job import PrintJob
+from app.services.status_history import record_created, record_transition
 from app.utils.validation import validate_status
 from app.utils.fsm import TransitionValidator
 
@@ -38,7 +40,7 @@ def list_jobs():
     q = apply_multi_sort(q, sort_expr, allowed, PrintJob.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_job_json(j) for j in rows]
+    rows_json = [job_json(j) for j in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -64,7 +66,7 @@ def head_jobs():
     q = apply_multi_sort(q, sort_expr, allowed, PrintJob.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_job_json(j) for j in rows]
+    rows_json = [job_json(j) for j in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -88,8 +90,9 @@ def create_job():
     user_id = int(get_jwt_identity())
     job = PrintJob(branch_id=int(branch_id), product_id=product_id, created_by=user_id)
     session.add(job)
+    record_created(session, job, user_id)
     session.commit()
-    return _job_json(job), 201
+    return job_json(job), 201
 
 @print_bp.post('/jobs/<int:job_id>/start')
 @require_permissions('PRINT.START')
@@ -101,10 +104,11 @@ def start_job(job_id: int):
         abort(404)
     assert_branch_access(j.branch_id)
     PRINT_FSM.assert_can_transition(j.status, PrintJob.STATUS_STARTED)
+    record_transition(session, j, PrintJob.STATUS_STARTED, int(get_jwt_identity()))
     j.status = validate_status(PrintJob.STATUS_STARTED, PrintJob.ALL_STATUSES)
     j.assigned_user_id = int(get_jwt_identity())
     session.commit()
-    return _job_json(j)
+    return job_json(j)
 
 @print_bp.post('/jobs/<int:job_id>/complete')
 @require_permissions('PRINT.COMPLETE')
@@ -116,9 +120,10 @@ def complete_job(job_id: int):
         abort(404)
     assert_branch_access(j.branch_id)
     PRINT_FSM.assert_can_transition(j.status, PrintJob.STATUS_COMPLETED)
+    record_transition(session, j, PrintJob.STATUS_COMPLETED, int(get_jwt_identity()))
     j.status = validate_status(PrintJob.STATUS_COMPLETED, PrintJob.ALL_STATUSES)
     session.commit()
-    return _job_json(j)
+    return job_json(j)
 
 @print_bp.route('/jobs/<int:job_id>', methods=['GET','HEAD'])
 @require_permissions('PRINT.READ')
@@ -135,26 +140,17 @@ def get_job(job_id: int):
         cond.set_data(b'')
         return cond
     from flask import make_response, jsonify, request as _req
-    body = _job_json(j)
+    body = job_json(j)
     resp = make_response(jsonify(body))
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
     return resp
 
-def _job_json(j: PrintJob):
-    return {
-        'id': j.id,
-        'branch_id': j.branch_id,
-        'product_id': j.product_id,
-        'status': j.status,
-        'assigned_user_id': j.assigned_user_id
-    }
-
 def _prefetch_job(job_id: int):
     from sqlalchemy import select
     session = get_db()
@@ -6,10 +6,12 @@ from app import get_db
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
 from app.services.policy import assert_branch_access
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, http_date
+from app.serializers import po_json
 from app.utils.sorting import apply_multi_sort
 from app.utils.filters import apply_filters
 from app.models.purchase_order import PurchaseOrder
+from app.services.status_history import record_created, record_transition
 from app.utils.validation import validate_status
 from app.utils.fsm import TransitionValidator
 from sqlalchemy import func
@@ -49,7 +51,7 @@ def list_purchase_orders():
     q = apply_multi_sort(q, sort_expr, allowed, PurchaseOrder.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_po_json(r) for r in rows]
+    rows_json = [po_json(r) for r in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -83,7 +85,7 @@ def head_purchase_orders():
     q = apply_multi_sort(q, sort_expr, allowed, PurchaseOrder.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_po_json(r) for r in rows]
+    rows_json = [po_json(r) for r in rows]
     if rows:
         latest_ts = rows[0].updated_at
     else:
@@ -117,8 +119,9 @@ def create_purchase_order():
     user_id = int(get_jwt_identity())
     po = PurchaseOrder(vendor_name=vendor_name, branch_id=int(branch_id), total_cents=total_cents, created_by=user_id)
     session.add(po)
+    record_created(session, po, user_id)
     session.commit()
-    return _po_json(po), 201
+    return po_json(po), 201
 
 
 @po_bp.post('/purchase-orders/<int:po_id>/receive')
@@ -138,9 +141,10 @@ def receive_purchase_order(po_id: int):
         abort(404)
     assert_branch_access(po.branch_id)
     PO_FSM.assert_can_transition(po.status, PurchaseOrder.STATUS_RECEIVED)
+    record_transition(session, po, PurchaseOrder.STATUS_RECEIVED, int(get_jwt_identity()))
     po.status = validate_status(PurchaseOrder.STATUS_RECEIVED, PurchaseOrder.ALL_STATUSES)
     session.commit()
-    return _po_json(po)
+    return po_json(po)
 
 
 @po_bp.post('/purchase-orders/<int:po_id>/close')
@@ -160,9 +164,10 @@ def close_purchase_order(po_id: int):
         abort(404)
     assert_branch_access(po.branch_id)
     PO_FSM.assert_can_transition(po.status, PurchaseOrder.STATUS_CLOSED)
+    record_transition(session, po, PurchaseOrder.STATUS_CLOSED, int(get_jwt_identity()))
     po.status = validate_status(PurchaseOrder.STATUS_CLOSED, PurchaseOrder.ALL_STATUSES)
     session.commit()
-    return _po_json(po)
+    return po_json(po)
 
 @po_bp.route('/purchase-orders/<int:po_id>', methods=['GET','HEAD'])
 @require_permissions('PO.READ')
@@ -179,28 +184,18 @@ def get_purchase_order(po_id: int):
         cond.set_data(b'')
         return cond
     from flask import make_response, jsonify, request as _req
-    body = _po_json(po)
+    body = po_json(po)
     resp = make_response(jsonify(body))
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
     return resp
 
 
-def _po_json(po: PurchaseOrder):
-    return {
-        'id': po.id,
-        'branch_id': po.branch_id,
-        'vendor_name': po.vendor_name,
-        'total_cents': po.total_cents,
-        'status': po.status
-    }
-
-
 def _prefetch_po(po_id: int):
     from sqlalchemy import select
     session = get_db()
@@ -4,11 +4,13 @@ from flask_jwt_extended import get_jwt, get_jwt_identity
 from sqlalchemy import select
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, canonicalize_timestamp, http_date
+from app.serializers import ticket_json
 from app.utils.sorting import apply_multi_sort
 from app.services.policy import assert_branch_access
 from app import get_db
 from app.models.repair_ticket import RepairTicket
+from app.services.status_history import record_created, record_transition
 from app.utils.validation import validate_status
 from app.utils.fsm import TransitionValidator
 
@@ -48,7 +50,7 @@ def list_tickets():
     q = apply_multi_sort(q, sort_expr, allowed, RepairTicket.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_ticket_json(t) for t in rows]
+    rows_json = [ticket_json(t) for t in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -75,7 +77,7 @@ def head_tickets():
     q = apply_multi_sort(q, sort_expr, allowed, RepairTicket.id)
     paged_q, total, limit, offset = apply_pagination(q)
     rows = paged_q.all()
-    rows_json = [_ticket_json(t) for t in rows]
+    rows_json = [ticket_json(t) for t in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -102,8 +104,9 @@ def create_ticket():
     user_id = int(get_jwt_identity())
     t = RepairTicket(customer_name=customer_name, device_type=device_type, issue_summary=issue_summary, branch_id=int(branch_id), created_by=user_id)
     session.add(t)
+    record_created(session, t, user_id)
     session.commit()
-    return _ticket_json(t), 201
+    return ticket_json(t), 201
 
 
 @rpr_bp.post('/tickets/<int:ticket_id>/start')
@@ -116,10 +119,11 @@ def start_ticket(ticket_id: int):
         abort(404)
     assert_branch_access(t.branch_id)
     REPAIRS_FSM.assert_can_transition(t.status, RepairTicket.STATUS_IN_PROGRESS)
+    record_transition(session, t, RepairTicket.STATUS_IN_PROGRESS, int(get_jwt_identity()))
     t.status = validate_status(RepairTicket.STATUS_IN_PROGRESS, RepairTicket.ALL_STATUSES)
     t.assigned_user_id = int(get_jwt_identity())
     session.commit()
-    return _ticket_json(t)
+    return ticket_json(t)
 
 
 @rpr_bp.post('/tickets/<int:ticket_id>/complete')
@@ -132,9 +136,10 @@ def complete_ticket(ticket_id: int):
         abort(404)
     assert_branch_access(t.branch_id)
     REPAIRS_FSM.assert_can_transition(t.status, RepairTicket.STATUS_COMPLETED)
+    record_transition(session, t, RepairTicket.STATUS_COMPLETED, int(get_jwt_identity()))
     t.status = validate_status(RepairTicket.STATUS_COMPLETED, RepairTicket.ALL_STATUSES)
     session.commit()
-    return _ticket_json(t)
+    return ticket_json(t)
 
 
 @rpr_bp.post('/tickets/<int:ticket_id>/close')
@@ -147,9 +152,10 @@ def close_ticket(ticket_id: int):
         abort(404)
     assert_branch_access(t.branch_id)
     REPAIRS_FSM.assert_can_transition(t.status, RepairTicket.STATUS_CLOSED)
+    record_transition(session, t, RepairTicket.STATUS_CLOSED, int(get_jwt_identity()))
     t.status = validate_status(RepairTicket.STATUS_CLOSED, RepairTicket.ALL_STATUSES)
     session.commit()
-    return _ticket_json(t)
+    return ticket_json(t)
 
 
 @rpr_bp.post('/tickets/<int:ticket_id>/cancel')
@@ -162,9 +168,10 @@ def cancel_ticket(ticket_id: int):
         abort(404)
     assert_branch_access(t.branch_id)
     REPAIRS_FSM.assert_can_transition(t.status, RepairTicket.STATUS_CANCELLED)
+    record_transition(session, t, RepairTicket.STATUS_CANCELLED, int(get_jwt_identity()))
     t.status = validate_status(RepairTicket.STATUS_CANCELLED, RepairTicket.ALL_STATUSES)
     session.commit()
-    return _ticket_json(t)
+    return ticket_json(t)
 
 @rpr_bp.route('/tickets/<int:ticket_id>', methods=['GET','HEAD'])
 @require_permissions('RPR.READ')
@@ -181,30 +188,18 @@ def get_ticket(ticket_id: int):
         cond.set_data(b'')
         return cond
     from flask import make_response, jsonify, request as _req
-    body = _ticket_json(t)
+    body = ticket_json(t)
     resp = make_response(jsonify(body))
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
     return resp
 
 
-def _ticket_json(t: RepairTicket):
-    return {
-        'id': t.id,
-        'branch_id': t.branch_id,
-        'customer_name': t.customer_name,
-        'device_type': t.device_type,
-        'issue_summary': t.issue_summary,
-        'status': t.status,
-        'assigned_user_id': t.assigned_user_id
-    }
-
-
 def _prefetch_ticket(ticket_id: int):
     from sqlalchemy import select
     session = get_db()
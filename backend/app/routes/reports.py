@@ -1,17 +1,32 @@
 from __future__ import annotations
-from flask import Blueprint, request
-from sqlalchemy import func, select, and_
+import hashlib
+import json
+from flask import Blueprint, request, current_app, abort, make_response
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import func, select, union_all, literal, cast, null, case, Integer, String, DateTime
 from flask_jwt_extended import get_jwt
 from app.decorators.auth import require_permissions
-from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination
+from app.services.policy import has_permissions
+from app.utils.listing import make_cached_list_response, handle_conditional, apply_pagination, compute_etag, build_list_payload, canonicalize_timestamp, http_date
+from app.utils.timebuckets import BUCKETS, BUCKET_STEP, truncate_expr, floor_bucket, parse_bucket_value, bucket_count, bucket_range
 from app import get_db
+from app.models.metrics_status_count import MetricsStatusCount
+from app.models.metrics_rollup import MetricsEvent, MetricsDailyRollup
+from app.services.report_metrics import REPORT_DOMAINS, FINANCIAL_DOMAINS, data_version
+from app.services.report_cache import get_report_cache
+from app.services.parallel_query import execute_fanout, QueryTimeout
+from app.services.report_top import TOP_DIMENSIONS, month_start
+from app.models.report_top_aggregate import ReportTopAggregate
+from app.models.product import Product
 from app.models.order import Order
 from app.models.print_job import PrintJob
 from app.models.purchase_order import PurchaseOrder
 from app.models.repair_ticket import RepairTicket
 from app.models.accounting_transaction import AccountingTransaction
-from app.models.catalog_item import CatalogItem
-from app.models.vendor import Vendor
+from app.serializers import order_json, job_json, po_json, ticket_json, tx_json
+from app.services.customer_sketches import distinct_customers
+from app.models.status_transition import StatusDurationSketch
+from app.utils.quantiles import QuantileSketch
 
 rpt_bp = Blueprint('reports', __name__)
 
@@ -26,82 +41,315 @@ def _parse_date(value: str):
             continue
     return None
 
-def _gather_metrics(branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+def _domain_filters(model, branch_ids, start_date=None, end_date=None):
+    conds = []
+    if branch_ids:
+        conds.append(model.branch_id.in_(branch_ids))
+    if start_date:
+        conds.append(model.updated_at >= start_date)
+    if end_date:
+        conds.append(model.updated_at <= end_date)
+    return conds
+
+
+def _domain_metric_parts(model, domain, sum_attr, branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+    """Two UNION members for one domain (scanning its source table):
+      - grouped row per (branch, status): count (+ sum when financial) under branch/date filters
+      - watermark row (status NULL): unfiltered max(updated_at), used for cache validators
+    """
+    if include_financial and sum_attr is not None:
+        sum_col = func.coalesce(func.sum(getattr(model, sum_attr)), 0)
+    else:
+        sum_col = cast(null(), Integer)
+    return [
+        select(
+            literal(domain).label('domain'),
+            model.branch_id.label('branch_id'),
+            model.status.label('status'),
+            func.count(model.id).label('count'),
+            sum_col.label('sum_cents'),
+            cast(null(), DateTime(timezone=True)).label('latest'),
+        )
+        .where(*_domain_filters(model, branch_ids, start_date, end_date))
+        .group_by(model.branch_id, model.status),
+        select(
+            literal(domain).label('domain'),
+            cast(null(), Integer).label('branch_id'),
+            cast(null(), String).label('status'),
+            literal(0).label('count'),
+            cast(null(), Integer).label('sum_cents'),
+            func.max(model.updated_at).label('latest'),
+        ),
+    ]
+
+
+def _metrics_statement(branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+    """Compile every domain aggregate (scanning the source tables) into one UNION ALL statement."""
+    parts = []
+    for model, domain, sum_attr in REPORT_DOMAINS:
+        parts.extend(_domain_metric_parts(model, domain, sum_attr, branch_ids, include_financial, start_date, end_date))
+    return union_all(*parts)
+
+
+def _source_metric_rows(branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+    """Rows of the source-table scan: one statement serially, or one statement per domain
+    fanned out over the report thread pool (REPORTS_PARALLEL_WORKERS > 1, never on SQLite)."""
     session = get_db()
+    engine = session.get_bind()
+    workers = current_app.config.get('REPORTS_PARALLEL_WORKERS', 0)
+    if workers <= 1 or engine.dialect.name == 'sqlite':
+        return session.execute(_metrics_statement(branch_ids, include_financial, start_date, end_date)).all()
+    statements = [
+        union_all(*_domain_metric_parts(model, domain, sum_attr, branch_ids, include_financial, start_date, end_date))
+        for model, domain, sum_attr in REPORT_DOMAINS
+    ]
+    try:
+        results = execute_fanout(engine, statements, max_workers=workers,
+                                 timeout=current_app.config.get('REPORTS_QUERY_TIMEOUT_SECONDS') or None)
+    except QueryTimeout as e:
+        abort(504, description=str(e))
+    # Input order == REPORT_DOMAINS order; callers sort rows afterwards
+    return [row for rows in results for row in rows]
+
+
+def _read_model_statement(branch_ids, include_financial: bool = False):
+    """Same row shape as `_metrics_statement`, served from the metrics_status_counts read model."""
+    m = MetricsStatusCount
+    conds = [m.branch_id.in_(branch_ids)] if branch_ids else []
+    sum_col = m.sum_cents if include_financial else cast(null(), Integer)
+    rows = select(
+        m.domain.label('domain'),
+        m.branch_id.label('branch_id'),
+        m.status.label('status'),
+        m.count.label('count'),
+        sum_col.label('sum_cents'),
+        cast(null(), DateTime(timezone=True)).label('latest'),
+    ).where(m.count > 0, *conds)
+    watermark = select(
+        literal('').label('domain'),
+        cast(null(), Integer).label('branch_id'),
+        cast(null(), String).label('status'),
+        literal(0).label('count'),
+        cast(null(), Integer).label('sum_cents'),
+        func.max(m.updated_at).label('latest'),
+    )
+    return union_all(rows, watermark)
+
+
+def _day_window(start_date=None, end_date=None):
+    """Whole UTC days covered by the (inclusive) date window."""
+    start_day = start_date.date() if start_date else None
+    end_day = end_date.date() if end_date else None
+    return start_day, end_day
+
+
+def _rollup_statement(branch_ids, start_date=None, end_date=None):
+    """Entries per (domain, branch, status) in the window: folded daily rollups plus the unfolded journal tail.
+
+    Rows: (domain, branch_id, status, created, transitioned, sum_cents, latest); watermark rows carry status NULL.
+    """
+    from datetime import datetime, time, timedelta, timezone
+    start_day, end_day = _day_window(start_date, end_date)
+    r, e = MetricsDailyRollup, MetricsEvent
+    r_conds = [r.branch_id.in_(branch_ids)] if branch_ids else []
+    e_conds = [e.branch_id.in_(branch_ids)] if branch_ids else []
+    if start_day:
+        r_conds.append(r.day >= start_day)
+        e_conds.append(e.ts >= datetime.combine(start_day, time.min, tzinfo=timezone.utc))
+    if end_day:
+        r_conds.append(r.day <= end_day)
+        e_conds.append(e.ts < datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=timezone.utc))
+    null_ts = cast(null(), DateTime(timezone=True))
+    folded = (
+        select(r.domain, r.branch_id, r.status, func.sum(r.created), func.sum(r.transitioned), func.sum(r.sum_cents), null_ts)
+        .where(*r_conds).group_by(r.domain, r.branch_id, r.status)
+    )
+    created = func.sum(case((e.kind==MetricsEvent.KIND_CREATED, 1), else_=0))
+    tail = (
+        select(e.domain, e.branch_id, e.status, created, func.count(e.id) - created, func.sum(e.amount_cents), null_ts)
+        .where(*e_conds).group_by(e.domain, e.branch_id, e.status)
+    )
+    zero = literal(0)
+    null_int, null_str = cast(null(), Integer), cast(null(), String)
+    return union_all(
+        folded,
+        tail,
+        select(literal(''), null_int, null_str, zero, zero, zero, func.max(r.updated_at)),
+        select(literal(''), null_int, null_str, zero, zero, zero, func.max(e.ts)),
+    )
+
+
+def _gather_windowed_metrics(branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+    totals = {}
+    latest_ts = None
+    for domain, branch_id, status, created, transitioned, sum_cents, latest in get_db().execute(
+        _rollup_statement(branch_ids, start_date, end_date)
+    ).all():
+        if status is None:
+            if latest is not None and (latest_ts is None or latest > latest_ts):
+                latest_ts = latest
+            continue
+        t = totals.setdefault((domain, branch_id, status), [0, 0, 0])
+        t[0] += int(created or 0)
+        t[1] += int(transitioned or 0)
+        t[2] += int(sum_cents or 0)
+    metrics = []
+    for (domain, branch_id, status), (created, transitioned, sum_cents) in sorted(totals.items()):
+        if not created and not transitioned:
+            continue
+        row = {"domain": domain, "branch_id": branch_id, "status": status, "count": created + transitioned,
+               "created": created, "transitioned": transitioned}
+        if include_financial and domain in FINANCIAL_DOMAINS:
+            row["sum_cents"] = sum_cents
+        metrics.append(row)
+    return metrics, latest_ts
+
+
+GROUP_BY_MODES = ('branch', 'region')
+_SUMMED = ('count', 'created', 'transitioned', 'sum_cents')
+
+
+def _parse_group_by(args=None):
+    group_by = (request.args if args is None else args).get('group_by') or None
+    if group_by is not None and group_by not in GROUP_BY_MODES:
+        abort(400, description=f"group_by must be one of {', '.join(GROUP_BY_MODES)}")
+    if group_by == 'region' and not current_app.config.get('REPORTS_BRANCH_REGIONS'):
+        abort(400, description='group_by=region requires REPORTS_BRANCH_REGIONS')
+    return group_by
+
+
+def _group_metrics(rows, group_by=None):
+    """Roll per-branch rows up to totals, regions, or keep them per branch (no re-query)."""
+    if group_by == 'branch':
+        return rows
+    region_of = {}
+    if group_by == 'region':
+        for region, members in (current_app.config.get('REPORTS_BRANCH_REGIONS') or {}).items():
+            for bid in members:
+                region_of[int(bid)] = region
+    acc = {}
+    for r in rows:
+        if group_by == 'region':
+            region = region_of.get(r['branch_id'])
+            key = (r['domain'], region or '', r['status'])
+            head = {"domain": r['domain'], "region": region, "status": r['status']}
+        else:
+            key = (r['domain'], '', r['status'])
+            head = {"domain": r['domain'], "status": r['status']}
+        out = acc.get(key)
+        if out is None:
+            out = acc[key] = {**head, **{f: 0 for f in _SUMMED if f in r}}
+        for f in _SUMMED:
+            if f in r:
+                out[f] += r[f]
+    return [acc[k] for k in sorted(acc)]
+
+
+def _gather_metrics(branch_ids, include_financial: bool = False, start_date=None, end_date=None, group_by=None):
+    """Cached per-branch aggregates (identical concurrent requests share one computation),
+    grouped as requested. Every group_by mode reuses the same cached entry."""
+    key = ('metrics', tuple(sorted(branch_ids)), include_financial, start_date, end_date)
+    rows, latest_ts = get_report_cache().get_or_compute(
+        key,
+        lambda: _compute_metrics(branch_ids, include_financial, start_date, end_date),
+        version=data_version(),
+    )
+    return _group_metrics(rows, group_by), latest_ts
+
+
+def _compute_metrics(branch_ids, include_financial: bool = False, start_date=None, end_date=None):
+    """Per-(domain, branch, status) rows plus the newest change timestamp."""
+    session = get_db()
+    use_read_model = current_app.config.get('REPORTS_METRICS_READ_MODEL')
+    if use_read_model and (start_date or end_date):
+        return _gather_windowed_metrics(branch_ids, include_financial, start_date, end_date)
+    if use_read_model:
+        result_rows = session.execute(_read_model_statement(branch_ids, include_financial)).all()
+    else:
+        result_rows = _source_metric_rows(branch_ids, include_financial, start_date, end_date)
     metrics = []
-    # Helper to run grouped count when statuses exist
-    def status_counts(model, domain_name, sum_field=None):
-        # Base grouped query (counts)
-        q = session.query(model.status, func.count(model.id))
-        if branch_ids:
-            q = q.filter(model.branch_id.in_(branch_ids))
-        if start_date or end_date:
-            dt_filters = []
-            if start_date:
-                dt_filters.append(model.updated_at >= start_date)
-            if end_date:
-                dt_filters.append(model.updated_at <= end_date)
-            if dt_filters:
-                q = q.filter(and_(*dt_filters))
-        q = q.group_by(model.status)
-        counts = {status: int(count) for status, count in q.all()}
-        sums = {}
-        if include_financial and sum_field is not None:
-            q2 = session.query(model.status, func.coalesce(func.sum(sum_field), 0))
-            if branch_ids:
-                q2 = q2.filter(model.branch_id.in_(branch_ids))
-            if start_date or end_date:
-                dt_filters2 = []
-                if start_date:
-                    dt_filters2.append(model.updated_at >= start_date)
-                if end_date:
-                    dt_filters2.append(model.updated_at <= end_date)
-                if dt_filters2:
-                    q2 = q2.filter(and_(*dt_filters2))
-            q2 = q2.group_by(model.status)
-            sums = {status: int(total) for status, total in q2.all()}
-        for status, count in counts.items():
-            row = {"domain": domain_name, "status": status, "count": count}
-            if include_financial and sum_field is not None:
-                row["sum_cents"] = sums.get(status, 0)
-            metrics.append(row)
-
-    status_counts(Order, 'Order', Order.total_cents)
-    status_counts(PrintJob, 'PrintJob')
-    status_counts(PurchaseOrder, 'PurchaseOrder', PurchaseOrder.total_cents)
-    status_counts(RepairTicket, 'RepairTicket')
-    status_counts(AccountingTransaction, 'AccountingTransaction', AccountingTransaction.amount_cents)
-    status_counts(CatalogItem, 'CatalogItem')
-    status_counts(Vendor, 'Vendor')
-    # Deterministic ordering
-    metrics.sort(key=lambda m: (m['domain'], m.get('status') or ''))
-    # Compute latest updated_at across involved models for caching headers
-    latest_candidates = []
-    for model in (Order, PrintJob, PurchaseOrder, RepairTicket, AccountingTransaction, CatalogItem, Vendor):
-        subq = session.execute(select(func.max(model.updated_at))).scalar_one_or_none()
-        if subq is not None:
-            latest_candidates.append(subq)
     latest_ts = None
-    if latest_candidates:
-        latest_ts = max([c for c in latest_candidates if c is not None])
+    for domain, branch_id, status, count, sum_cents, latest in result_rows:
+        if status is None:
+            if latest is not None and (latest_ts is None or latest > latest_ts):
+                latest_ts = latest
+            continue
+        row = {"domain": domain, "branch_id": branch_id, "status": status, "count": int(count)}
+        if include_financial and domain in FINANCIAL_DOMAINS:
+            row["sum_cents"] = int(sum_cents or 0)
+        metrics.append(row)
+    # Deterministic ordering
+    metrics.sort(key=lambda m: (m['domain'], m['branch_id'], m.get('status') or ''))
     return metrics, latest_ts
 
 
-@rpt_bp.get('/metrics')
-@require_permissions('RPT.READ')
-def list_metrics():
+DISTINCT_MODES = ('approx', 'exact')
+DEFAULT_WINDOW_DAYS = 30
+
+
+def _recent_day_window(start_date=None, end_date=None):
+    """Inclusive UTC day window; open ends default to today and DEFAULT_WINDOW_DAYS back."""
+    from datetime import datetime, timedelta, timezone
+    start_day, end_day = _day_window(start_date, end_date)
+    end_day = end_day or datetime.now(timezone.utc).date()
+    start_day = start_day or end_day - timedelta(days=DEFAULT_WINDOW_DAYS - 1)
+    if start_day > end_day:
+        abort(400, description='start_date must not be after end_date')
+    return start_day, end_day
+
+
+def _parse_distinct(args=None):
+    mode = (request.args if args is None else args).get('distinct')
+    if mode is None:
+        return None
+    if mode not in DISTINCT_MODES:
+        abort(400, description=f"distinct must be one of {', '.join(DISTINCT_MODES)}")
+    return mode
+
+
+def _gather_distinct(branch_ids, mode: str, start_date=None, end_date=None):
+    """Distinct customers in the day window (default: the last 30 UTC days), cached like metrics."""
+    start_day, end_day = _recent_day_window(start_date, end_date)
+    key = ('distinct', tuple(sorted(branch_ids)), mode, start_day, end_day)
+    return get_report_cache().get_or_compute(
+        key,
+        lambda: distinct_customers(get_db(), branch_ids, start_day, end_day, exact=mode == 'exact'),
+        version=data_version(),
+    )
+
+
+def _metrics_response():
+    """Shared GET/HEAD body for /metrics: (response, etag, latest_ts)."""
     claims = get_jwt()
     branch_ids = claims.get('branch_ids') or []
     include_financial = request.args.get('include_financial') == 'true'
     start_date = _parse_date(request.args.get('start_date'))
     end_date = _parse_date(request.args.get('end_date'))
-    metrics, latest_ts = _gather_metrics(branch_ids, include_financial, start_date, end_date)
+    distinct_mode = _parse_distinct()
+    metrics, latest_ts = _gather_metrics(branch_ids, include_financial, start_date, end_date, _parse_group_by())
     # Apply simple pagination over metric rows
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
     total = len(metrics)
     sliced = metrics[offset:offset+limit]
+    if not distinct_mode:
+        resp, etag = make_cached_list_response(sliced, total, limit, offset, latest_ts)
+        return resp, etag, latest_ts
+    distinct = dict(_gather_distinct(branch_ids, distinct_mode, start_date, end_date))
+    sketch_ts = distinct.pop('latest')
+    if sketch_ts is not None and (latest_ts is None or sketch_ts > latest_ts):
+        latest_ts = sketch_ts
     resp, etag = make_cached_list_response(sliced, total, limit, offset, latest_ts)
+    etag = compute_etag([etag], distinct['value'], limit, offset, f"{distinct_mode}|{distinct['start']}|{distinct['end']}")
+    resp.headers['ETag'] = etag
+    resp.set_data(current_app.json.dumps({**build_list_payload(sliced, total, limit, offset), 'distinct_customers': distinct}))
+    return resp, etag, latest_ts
+
+
+@rpt_bp.get('/metrics')
+@require_permissions('RPT.READ')
+def list_metrics():
+    resp, etag, latest_ts = _metrics_response()
     cond = handle_conditional(etag, latest_ts)
     if cond:
         return cond
@@ -110,17 +358,7 @@ def list_metrics():
 @rpt_bp.route('/metrics', methods=['HEAD'])
 @require_permissions('RPT.READ')
 def head_metrics():
-    claims = get_jwt()
-    branch_ids = claims.get('branch_ids') or []
-    include_financial = request.args.get('include_financial') == 'true'
-    start_date = _parse_date(request.args.get('start_date'))
-    end_date = _parse_date(request.args.get('end_date'))
-    metrics, latest_ts = _gather_metrics(branch_ids, include_financial, start_date, end_date)
-    limit = int(request.args.get('limit', 50))
-    offset = int(request.args.get('offset', 0))
-    total = len(metrics)
-    sliced = metrics[offset:offset+limit]
-    resp, etag = make_cached_list_response(sliced, total, limit, offset, latest_ts)
+    resp, etag, latest_ts = _metrics_response()
     cond = handle_conditional(etag, latest_ts)
     if cond:
         cond.set_data(b'')
@@ -129,6 +367,14 @@ def head_metrics():
     return resp
 
 
+def _pivot_items(metrics):
+    """Sorted (domain, {status: count}) pairs."""
+    pivot = {}
+    for m in metrics:
+        pivot.setdefault(m['domain'], {})[m['status']] = m['count']
+    return sorted(pivot.items())
+
+
 @rpt_bp.get('/metrics/pivot')
 @require_permissions('RPT.READ')
 def list_metrics_pivot():
@@ -139,12 +385,9 @@ def list_metrics_pivot():
     start_date = _parse_date(request.args.get('start_date'))
     end_date = _parse_date(request.args.get('end_date'))
     metrics, latest_ts = _gather_metrics(branch_ids, include_financial, start_date, end_date)
-    pivot = {}
-    for m in metrics:
-        pivot.setdefault(m['domain'], {})[m['status']] = m['count']
     # Flatten into deterministic list for pagination though pivot is nested
     # We still apply limit/offset on the domain keys for consistency
-    domain_items = sorted(pivot.items())
+    domain_items = _pivot_items(metrics)
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
     total = len(domain_items)
@@ -168,10 +411,7 @@ def head_metrics_pivot():
     start_date = _parse_date(request.args.get('start_date'))
     end_date = _parse_date(request.args.get('end_date'))
     metrics, latest_ts = _gather_metrics(branch_ids, include_financial, start_date, end_date)
-    pivot = {}
-    for m in metrics:
-        pivot.setdefault(m['domain'], {})[m['status']] = m['count']
-    domain_items = sorted(pivot.items())
+    domain_items = _pivot_items(metrics)
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
     total = len(domain_items)
@@ -185,3 +425,495 @@ def head_metrics_pivot():
         return cond
     resp.set_data(b'')
     return resp
+
+
+# Default window per bucket when start_date is omitted, and an upper bound on dense array length
+TIMESERIES_DEFAULT_SPAN = {'hour': 48, 'day': 30, 'week': 12}
+TIMESERIES_MAX_BUCKETS = 2000
+
+
+def _timeseries_window(bucket: str):
+    from datetime import datetime, timedelta, timezone
+    raw_end = request.args.get('end_date')
+    end = _parse_date(raw_end) if raw_end else datetime.now(timezone.utc)
+    if raw_end and end is None:
+        abort(400, description='end_date invalid')
+    if raw_end and 'T' not in raw_end:
+        # Date-only end is inclusive of the whole day
+        end = end + timedelta(days=1) - timedelta(microseconds=1)
+    raw_start = request.args.get('start_date')
+    if raw_start:
+        start = _parse_date(raw_start)
+        if start is None:
+            abort(400, description='start_date invalid')
+    else:
+        start = end - BUCKET_STEP[bucket] * (TIMESERIES_DEFAULT_SPAN[bucket] - 1)
+    if floor_bucket(start, bucket) > floor_bucket(end, bucket):
+        abort(400, description='start_date must not be after end_date')
+    return start, end
+
+
+@rpt_bp.route('/metrics/timeseries', methods=['GET', 'HEAD'])
+@require_permissions('RPT.READ')
+def metrics_timeseries():
+    """Dense per-branch counts (and sums when financial) per time bucket of `updated_at`.
+
+    data: [{domain, bucket, buckets: [iso...], series: [{branch_id, counts: [...], sum_cents?: [...]}]}]
+    Pagination applies to the series (branches).
+    """
+    domains = {domain: (model, sum_attr) for model, domain, sum_attr in REPORT_DOMAINS}
+    domain = request.args.get('domain')
+    if domain not in domains:
+        abort(400, description=f"domain must be one of {', '.join(sorted(domains))}")
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in BUCKETS:
+        abort(400, description=f"bucket must be one of {', '.join(BUCKETS)}")
+    model, sum_attr = domains[domain]
+    include_financial = request.args.get('include_financial') == 'true' and sum_attr is not None
+    start, end = _timeseries_window(bucket)
+    # Size the window arithmetically first; a wide window must not materialize its buckets
+    if bucket_count(start, end, bucket) > TIMESERIES_MAX_BUCKETS:
+        abort(400, description=f'window spans more than {TIMESERIES_MAX_BUCKETS} buckets')
+    buckets = bucket_range(start, end, bucket)
+    branch_ids = get_jwt().get('branch_ids') or []
+
+    session = get_db()
+    trunc = truncate_expr(model.updated_at, bucket, session.get_bind().dialect.name).label('bucket')
+    cols = [trunc, model.branch_id, func.count(model.id), func.max(model.updated_at)]
+    if include_financial:
+        cols.append(func.coalesce(func.sum(getattr(model, sum_attr)), 0))
+    conds = [model.updated_at >= buckets[0], model.updated_at < buckets[-1] + BUCKET_STEP[bucket]]
+    if branch_ids:
+        conds.append(model.branch_id.in_(branch_ids))
+    stmt = select(*cols).where(*conds).group_by(trunc, model.branch_id)
+
+    index = {b: i for i, b in enumerate(buckets)}
+    series = {bid: {'counts': [0] * len(buckets), 'sum_cents': [0] * len(buckets)} for bid in branch_ids}
+    latest_ts = None
+    for row in session.execute(stmt).all():
+        slot = index.get(parse_bucket_value(row[0]))
+        if slot is None:
+            continue
+        entry = series.setdefault(row[1], {'counts': [0] * len(buckets), 'sum_cents': [0] * len(buckets)})
+        entry['counts'][slot] = int(row[2])
+        if include_financial:
+            entry['sum_cents'][slot] = int(row[4] or 0)
+        if row[3] is not None and (latest_ts is None or row[3] > latest_ts):
+            latest_ts = row[3]
+
+    items = []
+    for bid in sorted(series):
+        item = {'branch_id': bid, 'counts': series[bid]['counts']}
+        if include_financial:
+            item['sum_cents'] = series[bid]['sum_cents']
+        items.append(item)
+    limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
+    total = len(items)
+    rows_json = [{
+        'domain': domain,
+        'bucket': bucket,
+        'buckets': [b.isoformat().replace('+00:00', 'Z') for b in buckets],
+        'series': items[offset:offset+limit],
+    }]
+    resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
+    cond = handle_conditional(etag, latest_ts)
+    if cond:
+        if request.method == 'HEAD':
+            cond.set_data(b'')
+        return cond
+    if request.method == 'HEAD':
+        resp.set_data(b'')
+    return resp
+
+
+TOP_MAX_N = 100
+
+
+def _parse_top(args):
+    """Validated (dimension, spec, metric, n, start_period, end_period) from request-style args."""
+    from datetime import datetime, timezone
+    dimension = args.get('dimension')
+    spec = TOP_DIMENSIONS.get(dimension)
+    if spec is None:
+        abort(400, description=f"dimension must be one of {', '.join(sorted(TOP_DIMENSIONS))}")
+    metric = args.get('metric') or spec.metrics[0]
+    if metric not in spec.metrics:
+        abort(400, description=f"metric for {dimension} must be one of {', '.join(spec.metrics)}")
+    try:
+        n = int(args.get('n', 10))
+    except (TypeError, ValueError):
+        abort(400, description='n must be int')
+    if not 1 <= n <= TOP_MAX_N:
+        abort(400, description=f'n must be between 1 and {TOP_MAX_N}')
+    now = datetime.now(timezone.utc)
+    start = _parse_date(args.get('start_date')) or now
+    end = _parse_date(args.get('end_date')) or now
+    start_period, end_period = month_start(start), month_start(end)
+    if start_period > end_period:
+        abort(400, description='start_date must not be after end_date')
+    return dimension, spec, metric, n, start_period, end_period
+
+
+def _top_aggregate_statement(dimension, metric, n, start_period, end_period, branch_ids):
+    t = ReportTopAggregate
+    conds = [t.dimension==dimension, t.period >= start_period, t.period <= end_period]
+    if branch_ids:
+        conds.append(t.branch_id.in_(branch_ids))
+    # Rows are net bookings (a month can reverse an earlier one), so a range's sum is clamped at zero
+    count_col, booked = func.sum(t.count).label('count'), func.sum(t.sum_cents)
+    sum_col = case((booked < 0, 0), else_=booked).label('sum_cents')
+    latest = select(func.max(t.updated_at)).where(*conds).scalar_subquery()
+    return (
+        select(t.key, count_col, sum_col, latest.label('latest'))
+        .where(*conds)
+        .group_by(t.key)
+        .having(func.sum(t.count) > 0)
+        .order_by((sum_col if metric == 'sum_cents' else count_col).desc(), t.key.asc())
+        .limit(n)
+    )
+
+
+def _top_live_statement(spec, metric, n, start_period, end_period, branch_ids):
+    """Same row shape as `_top_aggregate_statement`, scanning the source table by `updated_at` month."""
+    from datetime import datetime, time, timezone
+    model = spec.model
+    # First instant after the end month (December rolls into January)
+    after_end = datetime(end_period.year + end_period.month // 12, end_period.month % 12 + 1, 1, tzinfo=timezone.utc)
+    key_col = getattr(model, spec.key_attr)
+    conds = [key_col.is_not(None), model.updated_at >= datetime.combine(start_period, time.min, tzinfo=timezone.utc),
+             model.updated_at < after_end]
+    if spec.excluded_statuses:
+        conds.append(model.status.not_in(spec.excluded_statuses))
+    if branch_ids:
+        conds.append(model.branch_id.in_(branch_ids))
+    key = cast(key_col, String).label('key')
+    count_col = func.count().label('count')
+    sum_col = func.sum(getattr(model, spec.amount_attr) if spec.amount_attr else literal(0)).label('sum_cents')
+    latest = select(func.max(model.updated_at)).where(*conds).scalar_subquery()
+    return (
+        select(key, count_col, sum_col, latest.label('latest'))
+        .where(*conds)
+        .group_by(key)
+        .order_by((sum_col if metric == 'sum_cents' else count_col).desc(), key.asc())
+        .limit(n)
+    )
+
+
+def _top_rows(dimension, spec, metric, n, start_period, end_period, branch_ids):
+    """Ranked leaderboard rows plus the newest change timestamp.
+
+    Served from report_top_aggregates, or from the source table when REPORTS_TOP_AGGREGATES is off
+    (the hooks that keep the aggregates current are not installed then).
+    """
+    if current_app.config.get('REPORTS_TOP_AGGREGATES', True):
+        stmt = _top_aggregate_statement(dimension, metric, n, start_period, end_period, branch_ids)
+    else:
+        stmt = _top_live_statement(spec, metric, n, start_period, end_period, branch_ids)
+    ranked = get_db().execute(stmt).all()
+    labels = {}
+    if dimension == 'product' and ranked:
+        ids = [int(r.key) for r in ranked if r.key.isdigit()]
+        labels = {str(pid): name for pid, name in get_db().execute(select(Product.id, Product.name).where(Product.id.in_(ids))).all()}
+    rows = []
+    for rank, r in enumerate(ranked, start=1):
+        row = {'rank': rank, 'key': r.key, 'count': int(r.count)}
+        if spec.amount_attr:
+            row['sum_cents'] = int(r.sum_cents or 0)
+        if dimension == 'product':
+            row['label'] = labels.get(r.key)
+        rows.append(row)
+    return rows, (ranked[0].latest if ranked else None)
+
+
+@rpt_bp.route('/top', methods=['GET', 'HEAD'])
+@require_permissions('RPT.READ')
+def top_leaderboard():
+    """Top-N keys for a dimension over whole UTC months (default: the current month).
+
+    Reads only report_top_aggregates: months x branches x keys rows via the (dimension, period, branch) index
+    (REPORTS_TOP_AGGREGATES=false: aggregates the source table instead).
+    """
+    dimension, spec, metric, n, start_period, end_period = _parse_top(request.args)
+    rows, latest_ts = _top_rows(dimension, spec, metric, n, start_period, end_period, get_jwt().get('branch_ids') or [])
+    resp, etag = make_cached_list_response(rows, len(rows), n, 0, latest_ts)
+    cond = handle_conditional(etag, latest_ts)
+    if cond:
+        if request.method == 'HEAD':
+            cond.set_data(b'')
+        return cond
+    if request.method == 'HEAD':
+        resp.set_data(b'')
+    return resp
+
+
+DURATION_DOMAINS = ('AccountingTransaction', 'Order', 'PrintJob', 'PurchaseOrder', 'RepairTicket')
+DURATION_QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99))
+
+
+def _parse_durations(args):
+    """Validated (domain or None, group_by, start_day, end_day) from request-style args."""
+    domain = args.get('domain') or None
+    if domain is not None and domain not in DURATION_DOMAINS:
+        abort(400, description=f"domain must be one of {', '.join(DURATION_DOMAINS)}")
+    start_day, end_day = _recent_day_window(_parse_date(args.get('start_date')), _parse_date(args.get('end_date')))
+    return domain, _parse_group_by(args), start_day, end_day
+
+
+def _duration_sketch_rows(branch_ids, start_day, end_day, domain=None):
+    """(domain, branch_id, status, sketch bytes, updated_at) rows of the window."""
+    d = StatusDurationSketch
+    conds = [d.day >= start_day, d.day <= end_day]
+    if domain:
+        conds.append(d.domain==domain)
+    if branch_ids:
+        conds.append(d.branch_id.in_(branch_ids))
+    return get_db().execute(select(d.domain, d.branch_id, d.status, d.sketch, d.updated_at).where(*conds)).all()
+
+
+def _duration_rows(sketch_rows, group_by=None, domain=None):
+    """Merge sketch rows per (domain[, branch|region], status) into percentile rows plus the newest change."""
+    region_of = {}
+    if group_by == 'region':
+        for region, members in (current_app.config.get('REPORTS_BRANCH_REGIONS') or {}).items():
+            for bid in members:
+                region_of[int(bid)] = region
+    merged = {}
+    latest_ts = None
+    for row_domain, branch_id, status, raw, updated_at in sketch_rows:
+        if domain and row_domain != domain:
+            continue
+        if group_by == 'branch':
+            key = (row_domain, ('branch_id', branch_id), status)
+        elif group_by == 'region':
+            key = (row_domain, ('region', region_of.get(branch_id)), status)
+        else:
+            key = (row_domain, None, status)
+        sketch = QuantileSketch.from_bytes(raw)
+        if key in merged:
+            merged[key].merge(sketch)
+        else:
+            merged[key] = sketch
+        if updated_at is not None and (latest_ts is None or updated_at > latest_ts):
+            latest_ts = updated_at
+    rows = []
+    for key in sorted(merged, key=lambda k: (k[0], str(k[1]), k[2])):
+        row_domain, group, status = key
+        sketch = merged[key]
+        row = {'domain': row_domain, 'status': status, 'count': sketch.count}
+        if group is not None:
+            row[group[0]] = group[1]
+        for label, q in DURATION_QUANTILES:
+            row[f'{label}_seconds'] = round(sketch.quantile(q), 3)
+        rows.append(row)
+    return rows, latest_ts
+
+
+@rpt_bp.route('/durations', methods=['GET', 'HEAD'])
+@require_permissions('RPT.READ')
+def status_durations():
+    """Time-in-state percentiles (seconds) per domain and status left, merged from daily sketches.
+
+    Reads only status_duration_sketches (days x branches x statuses rows); raw transitions are never sorted.
+    """
+    domain, group_by, start_day, end_day = _parse_durations(request.args)
+    sketch_rows = _duration_sketch_rows(get_jwt().get('branch_ids') or [], start_day, end_day, domain)
+    rows, latest_ts = _duration_rows(sketch_rows, group_by)
+    limit = int(request.args.get('limit', 50))
+    offset = int(request.args.get('offset', 0))
+    resp, etag = make_cached_list_response(rows[offset:offset+limit], len(rows), limit, offset, latest_ts)
+    cond = handle_conditional(etag, latest_ts)
+    if cond:
+        if request.method == 'HEAD':
+            cond.set_data(b'')
+        return cond
+    if request.method == 'HEAD':
+        resp.set_data(b'')
+    return resp
+
+
+DASHBOARD_MAX_WIDGETS = 25
+DASHBOARD_LIST_MAX = 100
+DASHBOARD_WIDGET_TYPES = ('metrics', 'pivot', 'distinct_customers', 'top', 'durations', 'list')
+
+
+def _dashboard_list_sources():
+    """List widget domains: (model, read permission, row serializer)."""
+    return {
+        'Order': (Order, 'SALES.READ', order_json),
+        'PrintJob': (PrintJob, 'PRINT.READ', job_json),
+        'PurchaseOrder': (PurchaseOrder, 'PO.READ', po_json),
+        'RepairTicket': (RepairTicket, 'RPR.READ', ticket_json),
+        'AccountingTransaction': (AccountingTransaction, 'ACC.READ', tx_json),
+    }
+
+
+def _bounded_int(value, default: int, low: int, high: int, name: str) -> int:
+    try:
+        out = int(default if value is None else value)
+    except (TypeError, ValueError):
+        abort(400, description=f'{name} must be int')
+    if not low <= out <= high:
+        abort(400, description=f'{name} must be between {low} and {high}')
+    return out
+
+
+def _dashboard_widget_specs():
+    """Widget specs from the JSON body (POST) or the `widgets` query parameter (GET/HEAD, JSON array)."""
+    if request.method == 'POST':
+        payload = request.get_json(silent=True)
+        specs = payload.get('widgets') if isinstance(payload, dict) else None
+    else:
+        raw = request.args.get('widgets')
+        try:
+            specs = json.loads(raw) if raw else None
+        except ValueError:
+            abort(400, description='widgets must be a JSON array')
+    if not isinstance(specs, list) or not specs:
+        abort(400, description='widgets must be a non-empty list')
+    if len(specs) > DASHBOARD_MAX_WIDGETS:
+        abort(400, description=f'at most {DASHBOARD_MAX_WIDGETS} widgets per request')
+    return specs
+
+
+def _plan_widget(spec, branch_ids, list_sources):
+    """(scan key, scan thunk, render(scan result) -> (data, latest_ts)) for one widget spec.
+
+    Widgets with equal scan keys share one execution; render derives the widget's view of it.
+    """
+    kind = spec.get('type')
+    if kind not in DASHBOARD_WIDGET_TYPES:
+        abort(400, description=f"type must be one of {', '.join(DASHBOARD_WIDGET_TYPES)}")
+    if kind in ('metrics', 'pivot'):
+        start_date, end_date = _parse_date(spec.get('start_date')), _parse_date(spec.get('end_date'))
+        financial = spec.get('include_financial') in (True, 'true')
+        group_by = _parse_group_by(spec) if kind == 'metrics' else None
+
+        def render(result):
+            rows, latest_ts = result
+            grouped = _group_metrics(rows, group_by)
+            if not financial:
+                grouped = [{k: v for k, v in r.items() if k != 'sum_cents'} for r in grouped]
+            if kind == 'pivot':
+                return [{'pivot': dict(_pivot_items(grouped))}], latest_ts
+            return grouped, latest_ts
+        # One per-branch scan per window; financial rows are a superset (see _plan_dashboard)
+        key = ('metrics', start_date, end_date)
+        return key, lambda fin: _gather_metrics(branch_ids, fin, start_date, end_date, 'branch'), render, financial
+    if kind == 'distinct_customers':
+        mode = _parse_distinct({'distinct': spec.get('mode', 'approx')})
+        start_date, end_date = _parse_date(spec.get('start_date')), _parse_date(spec.get('end_date'))
+
+        def render(result):
+            out = dict(result)
+            return out, out.pop('latest')
+        key = ('distinct', mode, *_recent_day_window(start_date, end_date))
+        return key, lambda: _gather_distinct(branch_ids, mode, start_date, end_date), render, None
+    if kind == 'top':
+        dimension, top_spec, metric, n, start_period, end_period = _parse_top(spec)
+
+        def render(result):
+            rows, latest_ts = result
+            return rows[:n], latest_ts
+        # The top-n ranking is a prefix of the top-max(n) ranking: run once with the largest n
+        key = ('top', dimension, metric, start_period, end_period)
+        return key, lambda top_n: _top_rows(dimension, top_spec, metric, top_n, start_period, end_period, branch_ids), render, n
+    if kind == 'durations':
+        domain, group_by, start_day, end_day = _parse_durations(spec)
+        key = ('durations', start_day, end_day)
+        return key, lambda: _duration_sketch_rows(branch_ids, start_day, end_day), \
+            lambda sketch_rows: _duration_rows(sketch_rows, group_by, domain), None
+    # list
+    domain = spec.get('domain')
+    if domain not in list_sources:
+        abort(400, description=f"domain must be one of {', '.join(sorted(list_sources))}")
+    model, perm, to_json = list_sources[domain]
+    if not has_permissions(perm):
+        abort(403, description='Missing permission')
+    status = spec.get('status') or None
+    if status is not None and status not in model.ALL_STATUSES:
+        abort(400, description='status invalid')
+    limit = _bounded_int(spec.get('limit'), 10, 1, DASHBOARD_LIST_MAX, 'limit')
+
+    def scan(list_limit):
+        q = select(model)
+        if branch_ids:
+            q = q.where(model.branch_id.in_(branch_ids))
+        if status:
+            q = q.where(model.status==status)
+        return get_db().execute(q.order_by(model.updated_at.desc(), model.id.desc()).limit(list_limit)).scalars().all()
+
+    def render(objs):
+        objs = objs[:limit]
+        return [to_json(o) for o in objs], (objs[0].updated_at if objs else None)
+    # Newest-first rows: a shorter list is a prefix of the longest one
+    return ('list', domain, status), scan, render, limit
+
+
+def _plan_dashboard(specs, branch_ids):
+    """Validate all widgets, then run each distinct scan once. Returns (widget results, scan count, latest_ts)."""
+    list_sources = _dashboard_list_sources()
+    planned, seen_ids = [], set()
+    scans = {}  # key -> [thunk, widened argument]
+    for index, spec in enumerate(specs):
+        if not isinstance(spec, dict):
+            abort(400, description=f'widget {index}: spec must be an object')
+        wid = str(spec.get('id', index))
+        if wid in seen_ids:
+            abort(400, description=f'widget {wid}: duplicate id')
+        seen_ids.add(wid)
+        try:
+            key, thunk, render, arg = _plan_widget(spec, branch_ids, list_sources)
+        except HTTPException as e:
+            abort(e.code, description=f'widget {wid}: {e.description}')
+        entry = scans.setdefault(key, [thunk, arg])
+        # Widen the shared scan to cover every widget: financial columns, largest n / limit
+        if isinstance(arg, bool):
+            entry[1] = entry[1] or arg
+        elif isinstance(arg, int):
+            entry[1] = max(entry[1], arg)
+        planned.append((wid, spec['type'], key, render))
+    results = {key: (thunk() if arg is None else thunk(arg)) for key, (thunk, arg) in scans.items()}
+    widgets, latest_ts = [], None
+    for wid, kind, key, render in planned:
+        data, latest = render(results[key])
+        if latest is not None and (latest_ts is None or latest > latest_ts):
+            latest_ts = latest
+        widgets.append({'id': wid, 'type': kind, 'data': data})
+    return widgets, len(scans), latest_ts
+
+
+@rpt_bp.route('/dashboard', methods=['GET', 'HEAD', 'POST'])
+@require_permissions('RPT.READ')
+def dashboard():
+    """Evaluate several report widgets in one request with one ETag.
+
+    Widgets: [{"id", "type": metrics|pivot|distinct_customers|top|durations|list, ...that endpoint's params}],
+    as a POST body `{"widgets": [...]}` or a `widgets` JSON query parameter on GET/HEAD.
+    """
+    specs = _dashboard_widget_specs()
+    widgets, scan_count, latest_ts = _plan_dashboard(specs, get_jwt().get('branch_ids') or [])
+    body = {'widgets': widgets, 'scans': scan_count}
+    encoded = current_app.json.dumps(body, sort_keys=True)
+    etag = hashlib.sha256(encoded.encode()).hexdigest()[:32]
+    if request.method in ('GET', 'HEAD'):
+        cond = handle_conditional(etag, latest_ts)
+        if cond:
+            if request.method == 'HEAD':
+                cond.set_data(b'')
+            return cond
+    resp = make_response(body)
+    resp.headers['ETag'] = etag
+    if latest_ts is not None:
+        latest_c = canonicalize_timestamp(latest_ts)
+        resp.headers['Last-Modified'] = http_date(latest_c)
+        resp.headers['X-Last-Modified-ISO'] = latest_c.isoformat().replace('+00:00', 'Z')
+    if request.method == 'HEAD':
+        resp.set_data(b'')
+    return resp
+
+
+@rpt_bp.get('/cache/stats')
+@require_permissions('RPT.READ')
+def report_cache_stats():
+    return get_report_cache().stats()
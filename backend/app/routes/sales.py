@@ -4,14 +4,17 @@ from flask_jwt_extended import get_jwt, get_jwt_identity
 from sqlalchemy import select
 from app import get_db
 from app.models.order import Order
+from app.services.status_history import record_created, record_transition
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
 from app.services.policy import assert_branch_access
-from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, http_date
+from app.serializers import order_json
 from app.utils.filters import apply_filters
 from app.utils.fsm import TransitionValidator
 from app.utils.validation import validate_status
 from app.utils.sorting import apply_multi_sort
+from app.utils.request_timing import timed
 
 sales_bp = Blueprint('sales', __name__)
 
@@ -55,8 +58,10 @@ def list_orders():
     }
     q = apply_multi_sort(q, sort_expr, allowed, Order.id)
     paged_q, total, limit, offset = apply_pagination(q)
-    rows = paged_q.all()
-    rows_json = [_order_json(o) for o in rows]
+    with timed('fetch'):
+        rows = paged_q.all()
+    with timed('serialize'):
+        rows_json = [order_json(o) for o in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -91,8 +96,10 @@ def head_orders():
     }
     q = apply_multi_sort(q, sort_expr, allowed, Order.id)
     paged_q, total, limit, offset = apply_pagination(q)
-    rows = paged_q.all()
-    rows_json = [_order_json(o) for o in rows]
+    with timed('fetch'):
+        rows = paged_q.all()
+    with timed('serialize'):
+        rows_json = [order_json(o) for o in rows]
     latest_ts = rows[0].updated_at if rows else None
     resp, etag = make_cached_list_response(rows_json, total, limit, offset, latest_ts)
     cond = handle_conditional(etag, latest_ts)
@@ -122,8 +129,9 @@ def create_order():
     user_id = int(get_jwt_identity())
     o = Order(customer_name=customer_name, branch_id=int(branch_id), total_cents=total_cents, created_by=user_id)
     session.add(o)
+    record_created(session, o, user_id)
     session.commit()
-    return _order_json(o), 201
+    return order_json(o), 201
 
 
 @sales_bp.put('/orders/<int:order_id>')
@@ -153,7 +161,7 @@ def update_order(order_id: int):
         except Exception:
             abort(400, description='total_cents must be int')
     session.commit()
-    return _order_json(o)
+    return order_json(o)
 
 
 @sales_bp.route('/orders/<int:order_id>', methods=['GET','HEAD'])
@@ -171,12 +179,12 @@ def get_order(order_id: int):
         cond.set_data(b'')
         return cond
     from flask import make_response, jsonify, request as _req
-    body = _order_json(o)
+    body = order_json(o)
     resp = make_response(jsonify(body))
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
@@ -197,6 +205,7 @@ def _transition(order_id: int, target_status: str, action: str, required_perm: s
         ORDER_FSM.assert_can_transition(o.status, target_status)
     except Exception:
         abort(400, description=f'Invalid transition {o.status} -> {target_status}')
+    record_transition(session, o, target_status, int(get_jwt_identity()))
     o.status = target_status
     session.commit()
     return o
@@ -211,7 +220,7 @@ def _transition_audit_meta(order_id: int):
 @audit_log('ORDER.APPROVE', entity='Order', entity_id_key='id', diff_keys=['status'], pre_fetch=lambda a, kw: _prefetch_order(kw.get('order_id')), meta_keys=['status'])
 def approve_order(order_id: int):
     o = _transition(order_id, Order.STATUS_APPROVED, 'ORDER.APPROVE', 'SALES.APPROVE')
-    return _order_json(o)
+    return order_json(o)
 
 
 @sales_bp.post('/orders/<int:order_id>/fulfill')
@@ -219,7 +228,7 @@ def approve_order(order_id: int):
 @audit_log('ORDER.FULFILL', entity='Order', entity_id_key='id', diff_keys=['status'], pre_fetch=lambda a, kw: _prefetch_order(kw.get('order_id')), meta_keys=['status'])
 def fulfill_order(order_id: int):
     o = _transition(order_id, Order.STATUS_FULFILLED, 'ORDER.FULFILL', 'SALES.FULFILL')
-    return _order_json(o)
+    return order_json(o)
 
 
 @sales_bp.post('/orders/<int:order_id>/complete')
@@ -227,7 +236,7 @@ def fulfill_order(order_id: int):
 @audit_log('ORDER.COMPLETE', entity='Order', entity_id_key='id', diff_keys=['status'], pre_fetch=lambda a, kw: _prefetch_order(kw.get('order_id')), meta_keys=['status'])
 def complete_order(order_id: int):
     o = _transition(order_id, Order.STATUS_COMPLETED, 'ORDER.COMPLETE', 'SALES.COMPLETE')
-    return _order_json(o)
+    return order_json(o)
 
 
 @sales_bp.post('/orders/<int:order_id>/cancel')
@@ -235,17 +244,7 @@ def complete_order(order_id: int):
 @audit_log('ORDER.CANCEL', entity='Order', entity_id_key='id', diff_keys=['status'], pre_fetch=lambda a, kw: _prefetch_order(kw.get('order_id')), meta_keys=['status'])
 def cancel_order(order_id: int):
     o = _transition(order_id, Order.STATUS_CANCELLED, 'ORDER.CANCEL', 'SALES.CANCEL')
-    return _order_json(o)
-
-
-def _order_json(o: Order):
-    return {
-        'id': o.id,
-        'branch_id': o.branch_id,
-        'customer_name': o.customer_name,
-        'total_cents': o.total_cents,
-        'status': o.status
-    }
+    return order_json(o)
 
 
 def _prefetch_order(order_id: int):
@@ -7,7 +7,7 @@ from app.models.vendor import Vendor
 from app.decorators.auth import require_permissions
 from app.decorators.audit import audit_log
 from app.services.policy import assert_branch_access
-from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, _http_date
+from app.utils.listing import apply_pagination, handle_conditional, make_cached_list_response, compute_etag, canonicalize_timestamp, http_date
 from app.utils.filters import apply_filters
 from app.utils.validation import validate_status
 from app.utils.sorting import apply_multi_sort
@@ -126,7 +126,7 @@ def get_vendor(vendor_id: int):
     resp.headers['ETag'] = etag
     if latest_ts:
         lt = canonicalize_timestamp(latest_ts)
-        resp.headers['Last-Modified'] = _http_date(lt)
+        resp.headers['Last-Modified'] = http_date(lt)
         resp.headers['X-Last-Modified-ISO'] = lt.isoformat().replace('+00:00','Z')
     if _req.method == 'HEAD':
         resp.set_data(b'')
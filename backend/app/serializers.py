@@ -0,0 +1,66 @@
+from __future__ import annotations
+"""JSON bodies of the lifecycle entities.
+
+Shared by each entity's own blueprint and by the reports dashboard list widgets, so both render
+rows identically without one blueprint importing another.
+"""
+from app.models.accounting_transaction import AccountingTransaction
+from app.models.order import Order
+from app.models.print_job import PrintJob
+from app.models.purchase_order import PurchaseOrder
+from app.models.repair_ticket import RepairTicket
+
+
+def order_json(o: Order):
+    return {
+        'id': o.id,
+        'branch_id': o.branch_id,
+        'customer_name': o.customer_name,
+        'total_cents': o.total_cents,
+        'status': o.status
+    }
+
+
+def job_json(j: PrintJob):
+    return {
+        'id': j.id,
+        'branch_id': j.branch_id,
+        'product_id': j.product_id,
+        'status': j.status,
+        'assigned_user_id': j.assigned_user_id
+    }
+
+
+def po_json(po: PurchaseOrder):
+    return {
+        'id': po.id,
+        'branch_id': po.branch_id,
+        'vendor_name': po.vendor_name,
+        'total_cents': po.total_cents,
+        'status': po.status
+    }
+
+
+def ticket_json(t: RepairTicket):
+    return {
+        'id': t.id,
+        'branch_id': t.branch_id,
+        'customer_name': t.customer_name,
+        'device_type': t.device_type,
+        'issue_summary': t.issue_summary,
+        'status': t.status,
+        'assigned_user_id': t.assigned_user_id
+    }
+
+
+def tx_json(tx: AccountingTransaction):
+    return {
+        'id': tx.id,
+        'branch_id': tx.branch_id,
+        'description': tx.description,
+        'amount_cents': tx.amount_cents,
+        'status': tx.status
+    }
+
+
+__all__ = ['order_json', 'job_json', 'po_json', 'ticket_json', 'tx_json']
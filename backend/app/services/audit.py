@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional
 from flask_jwt_extended import get_jwt_identity, get_jwt
 from app import get_db
 from app.models.audit import AuditLog
+from app.services.runtime_metrics import count_audit
 
 
 def add_audit(action: str, entity: Optional[str] = None, entity_id: Optional[str] = None, meta: Optional[Dict[str, Any]] = None):
@@ -35,5 +36,6 @@ def add_audit(action: str, entity: Optional[str] = None, entity_id: Optional[str
         meta=meta or {},
     )
     session.add(log)
+    count_audit(action)
     # No commit here; caller's transaction boundary controls durability.
     return log
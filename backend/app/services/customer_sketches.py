@@ -0,0 +1,134 @@
+from __future__ import annotations
+"""Distinct-customer counts per branch and day via mergeable HyperLogLog sketches.
+
+A `before_flush` hook stamps every inserted (or renamed / moved) Order and RepairTicket with
+`customer_seen_on` (UTC day of the write); an `after_flush` hook adds its customer name to the
+sketch of (branch_id, customer_seen_on). A report window merges the day x branch sketches it
+covers; `exact=True` answers with COUNT(DISTINCT) over the source rows whose `customer_seen_on`
+falls in the window (for audits), so both modes count the same population - except that a
+sketch keeps names that were renamed away. Names are compared trimmed and lower-cased in both.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, Set, Tuple
+
+from sqlalchemy import event, func, select, union_all, update, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import instance_state
+
+from app.models.order import Order
+from app.models.repair_ticket import RepairTicket
+from app.models.customer_sketch import CustomerSketch
+from app.services.report_metrics import mark_data_changed
+from app.utils.hll import HyperLogLog, DEFAULT_PRECISION
+from app.utils.upsert import insert_missing
+
+log = logging.getLogger(__name__)
+
+CUSTOMER_MODELS = (Order, RepairTicket)
+
+
+def normalize_customer(name: str) -> str:
+    return name.strip().lower()
+
+
+def _recorded(session: Session):
+    """Inserted rows plus rows whose customer name or branch changed in this flush."""
+    for obj in session.new:
+        if isinstance(obj, CUSTOMER_MODELS) and obj.customer_name and obj.branch_id is not None:
+            yield obj
+    for obj in session.dirty:
+        if not isinstance(obj, CUSTOMER_MODELS) or not obj.customer_name:
+            continue
+        state = instance_state(obj)
+        if state.attrs['customer_name'].history.has_changes() or state.attrs['branch_id'].history.has_changes():
+            yield obj
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    today = datetime.now(timezone.utc).date()
+    for obj in _recorded(session):
+        obj.customer_seen_on = today
+
+
+def _collect(session: Session) -> Dict[Tuple[int, date], Set[str]]:
+    today = datetime.now(timezone.utc).date()
+    names: Dict[Tuple[int, date], Set[str]] = defaultdict(set)
+    for obj in _recorded(session):
+        names[(int(obj.branch_id), obj.customer_seen_on or today)].add(normalize_customer(obj.customer_name))
+    return names
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    names = _collect(session)
+    if not names:
+        return
+    mark_data_changed(session)
+    conn = session.connection()
+    table = CustomerSketch.__table__
+    # Create missing (branch, day) rows first so the locking read below always has a row to lock
+    empty = HyperLogLog(DEFAULT_PRECISION).to_bytes()
+    insert_missing(conn, table, ('branch_id', 'day'),
+                   [{'branch_id': b, 'day': d, 'registers': empty} for b, d in sorted(names)])
+    stmt = select(table.c.branch_id, table.c.day, table.c.registers).where(
+        tuple_(table.c.branch_id, table.c.day).in_(list(names))
+    )
+    if conn.dialect.name == 'postgresql':
+        # Read-modify-write: serialize concurrent writers on the same (branch, day) row
+        stmt = stmt.with_for_update()
+    existing = {(b, d): r for b, d, r in conn.execute(stmt).all()}
+    for key, key_names in names.items():
+        sketch = HyperLogLog.from_bytes(existing[key])
+        changed = [sketch.add(n) for n in key_names]
+        if any(changed):
+            conn.execute(update(table).where(table.c.branch_id==key[0], table.c.day==key[1])
+                         .values(registers=sketch.to_bytes(), updated_at=func.now()))
+
+
+def install_sketch_hooks() -> None:
+    """Register the sketch maintenance hooks on every Session (idempotent)."""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+
+
+def distinct_customers(session: Session, branch_ids: Iterable[int], start_day: date, end_day: date,
+                       exact: bool = False) -> Dict[str, Any]:
+    """Distinct customers over [start_day, end_day] (UTC, inclusive) in `branch_ids` (empty = all)."""
+    branch_ids = list(branch_ids or [])
+    result: Dict[str, Any] = {
+        'start': start_day.isoformat(),
+        'end': end_day.isoformat(),
+        'mode': 'exact' if exact else 'approx',
+    }
+    if exact:
+        parts = []
+        for model in CUSTOMER_MODELS:
+            conds = [model.customer_seen_on >= start_day, model.customer_seen_on <= end_day]
+            if branch_ids:
+                conds.append(model.branch_id.in_(branch_ids))
+            parts.append(select(func.lower(func.trim(model.customer_name)).label('name')).where(*conds))
+        names = union_all(*parts).subquery()
+        result['value'] = int(session.execute(select(func.count(func.distinct(names.c.name)))).scalar_one())
+        result['relative_error'] = 0.0
+        result['latest'] = None
+        return result
+    c = CustomerSketch
+    conds = [c.day >= start_day, c.day <= end_day]
+    if branch_ids:
+        conds.append(c.branch_id.in_(branch_ids))
+    merged = HyperLogLog(DEFAULT_PRECISION)
+    latest = None
+    for registers, updated_at in session.execute(select(c.registers, c.updated_at).where(*conds)).all():
+        merged.merge(HyperLogLog.from_bytes(registers))
+        if updated_at is not None and (latest is None or updated_at > latest):
+            latest = updated_at
+    result['value'] = len(merged)
+    result['relative_error'] = round(merged.relative_error, 4)
+    result['latest'] = latest
+    return result
+
+
+__all__ = ['normalize_customer', 'install_sketch_hooks', 'distinct_customers']
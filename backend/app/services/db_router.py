@@ -0,0 +1,231 @@
+from __future__ import annotations
+"""Read-replica routing for GET/HEAD traffic.
+
+With DATABASE_REPLICA_URLS set, request sessions are `RoutingSession`s: a read-only request
+(GET/HEAD without a recent write) is pinned to one replica picked by `ReplicaRouter.pick`, while
+flushes, DML statements and every other request use the primary.
+
+Freshness:
+  - Read-your-writes: responses to successful writes carry the write time in the `db_last_write`
+    cookie and the `X-Last-Write` header (epoch ms). A request echoing either within
+    DB_READ_YOUR_WRITES_SECONDS reads from the primary.
+    Only requests whose session actually flushed or executed DML count as writes.
+  - Lag: writes stamp `replica_heartbeat` on the primary (at most once per second). A background
+    thread probes every DB_REPLICA_CHECK_SECONDS, comparing each replica's replicated stamp with the
+    primary's; replicas more than DB_REPLICA_MAX_LAG_SECONDS behind, or failing the probe, are
+    skipped until the next probe. Replicas count as unusable until their first probe. With no
+    usable replica, reads fall back to the primary. Requests never wait on a probe.
+
+Strategies: `round_robin` cycles through usable replicas; `least_latency` picks the lowest
+moving average of probe round-trip time.
+"""
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event, select, update, insert
+from sqlalchemy.orm import Session
+
+from app.models.replica_heartbeat import ReplicaHeartbeat
+
+log = logging.getLogger(__name__)
+
+STRATEGIES = ('round_robin', 'least_latency')
+LAST_WRITE_COOKIE = 'db_last_write'
+LAST_WRITE_HEADER = 'X-Last-Write'
+HEARTBEAT_MIN_INTERVAL = 1.0
+_LATENCY_ALPHA = 0.3
+# Session.info keys: the current flush's UOWTransaction / this session wrote to the primary
+_FLUSH_KEY = 'db_router_flush'
+WROTE_KEY = 'db_router_wrote'
+
+
+def _aware(ts):
+    if ts is None:
+        return None
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts
+
+
+class _Replica:
+    __slots__ = ('name', 'engine', 'latency_ms', 'lag_seconds', 'healthy', 'error')
+
+    def __init__(self, name: str, engine):
+        self.name = name
+        self.engine = engine
+        self.latency_ms: Optional[float] = None
+        self.lag_seconds: Optional[float] = None
+        self.healthy = False  # unknown until the first probe
+        self.error: Optional[str] = None
+
+
+class ReplicaRouter:
+    def __init__(self, primary, replicas: List[Any], strategy: str = 'round_robin', max_lag_seconds: float = 5.0,
+                 check_seconds: float = 5.0, read_your_writes_seconds: float = 10.0):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"strategy must be one of {', '.join(STRATEGIES)}")
+        self.primary = primary
+        self.replicas = [_Replica(f'replica-{i}', engine) for i, engine in enumerate(replicas)]
+        self.strategy = strategy
+        self.max_lag_seconds = max_lag_seconds
+        self.check_seconds = check_seconds
+        self.read_your_writes_seconds = read_your_writes_seconds
+        self._lock = threading.Lock()
+        self._rr = itertools.count()
+        self._last_beat = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # -- health ------------------------------------------------------------------------------------
+    def _heartbeat(self, engine):
+        with engine.connect() as conn:
+            return _aware(conn.execute(select(ReplicaHeartbeat.ts).where(ReplicaHeartbeat.id==1)).scalar())
+
+    def probe(self) -> None:
+        """Measure lag and latency of every replica now."""
+        try:
+            primary_ts = self._heartbeat(self.primary)
+        except Exception as e:  # primary trouble: leave replica state as is, writes will surface it
+            log.warning('replica probe: primary heartbeat unavailable: %s', e)
+            return
+        for r in self.replicas:
+            started = time.perf_counter()
+            try:
+                replica_ts = self._heartbeat(r.engine)
+            except Exception as e:
+                r.healthy, r.error, r.lag_seconds = False, str(e), None
+                log.warning('replica probe: %s unavailable: %s', r.name, e)
+                continue
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            r.latency_ms = elapsed_ms if r.latency_ms is None else (
+                _LATENCY_ALPHA * elapsed_ms + (1 - _LATENCY_ALPHA) * r.latency_ms)
+            if primary_ts is None:
+                lag = 0.0
+            elif replica_ts is None:
+                lag = None  # has not replicated the first heartbeat yet
+            else:
+                lag = max((primary_ts - replica_ts).total_seconds(), 0.0)
+            r.lag_seconds = lag
+            r.error = None
+            r.healthy = lag is not None and lag <= self.max_lag_seconds
+            if not r.healthy:
+                log.info('replica probe: %s skipped (lag %s s)', r.name, 'unknown' if lag is None else f'{lag:.1f}')
+
+    def start(self) -> None:
+        """Probe now and then every `check_seconds` on a daemon thread (idempotent; 0 = only explicit probe())."""
+        with self._lock:
+            if self._thread is not None or self.check_seconds <= 0:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='replica-probe', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.probe()
+            except Exception:  # pragma: no cover - probe() handles engine errors itself
+                log.exception('replica probe failed')
+            if self._stop.wait(self.check_seconds):
+                return
+
+    # -- routing -----------------------------------------------------------------------------------
+    def pick(self) -> Optional[_Replica]:
+        """A usable replica for a read-only request, or None (use the primary)."""
+        usable = [r for r in self.replicas if r.healthy]
+        if not usable:
+            return None
+        if self.strategy == 'least_latency':
+            return min(usable, key=lambda r: (r.latency_ms if r.latency_ms is not None else float('inf'), r.name))
+        return usable[next(self._rr) % len(usable)]
+
+    def wants_primary(self, method: str, cookies, headers) -> bool:
+        if method not in ('GET', 'HEAD'):
+            return True
+        raw = headers.get(LAST_WRITE_HEADER) or cookies.get(LAST_WRITE_COOKIE)
+        if not raw:
+            return False
+        try:
+            last_write = int(raw) / 1000.0
+        except ValueError:
+            return False
+        return time.time() - last_write < self.read_your_writes_seconds
+
+    def note_write(self) -> int:
+        """Stamp the primary heartbeat (throttled); returns the write time in epoch ms for the client."""
+        now = time.time()
+        if now - self._last_beat >= HEARTBEAT_MIN_INTERVAL:
+            self._last_beat = now
+            ts = datetime.fromtimestamp(now, timezone.utc)
+            try:
+                with self.primary.begin() as conn:
+                    t = ReplicaHeartbeat.__table__
+                    if not conn.execute(update(t).where(t.c.id==1).values(ts=ts)).rowcount:
+                        conn.execute(insert(t).values(id=1, ts=ts))
+            except Exception as e:
+                log.warning('replica heartbeat not written: %s', e)
+        return int(now * 1000)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{'name': r.name, 'healthy': r.healthy, 'lag_seconds': r.lag_seconds,
+                 'latency_ms': None if r.latency_ms is None else round(r.latency_ms, 2), 'error': r.error}
+                for r in self.replicas]
+
+
+class RoutingSession(Session):
+    """Session that reads from `info['read_engine']` (set per request) and writes to the primary."""
+
+    def __init__(self, router: ReplicaRouter, **kw):
+        kw.pop('bind', None)
+        super().__init__(bind=router.primary, **kw)
+        self.router = router
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if clause is not None and getattr(clause, 'is_dml', False):
+            self.info[WROTE_KEY] = True
+            return self.router.primary
+        read_engine = self.info.get('read_engine')
+        if read_engine is None or _in_flush(self):
+            return self.router.primary
+        return read_engine
+
+
+def _in_flush(session: Session) -> bool:
+    # The flush's subtransaction is only begun (and active) while it executes, so a flush that found
+    # nothing to do after before_flush leaves no lasting mark
+    transaction = getattr(session.info.get(_FLUSH_KEY), 'transaction', None)
+    return transaction is not None and transaction.is_active
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def _flush_started(session, flush_context, instances):
+    session.info[_FLUSH_KEY] = flush_context
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush_postexec')
+def _flush_finished(session, flush_context):
+    session.info.pop(_FLUSH_KEY, None)
+
+
+def session_wrote(session: Session) -> bool:
+    """Whether this routing session flushed or executed DML (and so wrote to the primary)."""
+    return bool(session.info.get(WROTE_KEY))
+
+
+__all__ = ['ReplicaRouter', 'RoutingSession', 'STRATEGIES', 'LAST_WRITE_COOKIE', 'LAST_WRITE_HEADER', 'session_wrote']
@@ -0,0 +1,100 @@
+from __future__ import annotations
+"""Fan independent read statements out over a bounded thread pool.
+
+Each statement runs in its own short-lived Session (its own pooled connection) and results are
+returned in input order, so callers merge deterministically regardless of completion order.
+SQLite serializes on one file / one shared in-memory connection, so it always runs serially.
+
+The pool is process-wide: created on first use, sized by that caller's `max_workers` (the reports
+pass REPORTS_PARALLEL_WORKERS) and never replaced or shut down, so a fan-out can never find its
+executor shut down under it.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+log = logging.getLogger(__name__)
+
+
+class QueryTimeout(Exception):
+    """Raised when a fanned-out statement does not finish within the per-query timeout."""
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Recheck interval while some statements are still queued behind other fan-outs
+_QUEUED_POLL_SECONDS = 0.05
+
+
+def _get_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-query')
+    return _executor
+
+
+def _run_one(engine, statement, timeout: Optional[float], started: Dict[int, float], index: int) -> List[Any]:
+    started[index] = time.monotonic()
+    with Session(bind=engine) as session:
+        if timeout and engine.dialect.name == 'postgresql':
+            # Let the server abandon the statement too, not just the waiting request
+            session.execute(text(f'SET LOCAL statement_timeout = {int(timeout * 1000)}'))
+        return session.execute(statement).all()
+
+
+def execute_fanout(engine, statements: Sequence[Any], max_workers: int = 4, timeout: Optional[float] = None,
+                   serial: Optional[bool] = None, session: Optional[Session] = None) -> List[List[Any]]:
+    """Execute `statements` and return their rows in input order.
+
+    serial: None -> serial on SQLite or when max_workers <= 1; True/False forces the mode.
+    session: used for the serial path (defaults to a fresh Session on `engine`).
+    Raises QueryTimeout when any statement runs longer than `timeout` seconds (parallel mode; time
+    spent queued for a worker does not count).
+    """
+    if serial is None:
+        serial = engine.dialect.name == 'sqlite' or max_workers <= 1 or len(statements) <= 1
+    if serial:
+        if session is not None:
+            return [session.execute(stmt).all() for stmt in statements]
+        with Session(bind=engine) as own:
+            return [own.execute(stmt).all() for stmt in statements]
+    executor = _get_executor(max_workers)
+    started: Dict[int, float] = {}
+    futures = [executor.submit(_run_one, engine, stmt, timeout, started, i) for i, stmt in enumerate(statements)]
+    index = {f: i for i, f in enumerate(futures)}
+    pending = set(futures)
+    while pending:
+        wait_for = None
+        if timeout:
+            # Each statement gets `timeout` from when a worker picks it up, not from submission
+            now = time.monotonic()
+            deadlines = [started[index[f]] + timeout for f in pending if index[f] in started]
+            wait_for = max(0.0, min(deadlines) - now) if deadlines else None
+            if len(deadlines) < len(pending):
+                wait_for = _QUEUED_POLL_SECONDS if wait_for is None else min(wait_for, _QUEUED_POLL_SECONDS)
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+        failed = [f for f in done if f.exception() is not None]
+        if failed:
+            for f in pending:
+                f.cancel()
+            raise failed[0].exception()
+        if not timeout:
+            continue
+        now = time.monotonic()
+        overdue = [f for f in pending if index[f] in started and now - started[index[f]] >= timeout]
+        if overdue:
+            for f in pending:
+                f.cancel()
+            log.warning('report fan-out: %d of %d statements exceeded %.1fs', len(overdue), len(futures), timeout)
+            raise QueryTimeout(f'{len(overdue)} report queries exceeded {timeout}s')
+    return [f.result() for f in futures]
+
+
+__all__ = ['QueryTimeout', 'execute_fanout']
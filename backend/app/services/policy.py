@@ -1,7 +1,7 @@
 from __future__ import annotations
-from typing import Iterable, Set
+from typing import Iterable, Set, Optional, Tuple
 from flask_jwt_extended import get_jwt
-from sqlalchemy import select
+from sqlalchemy import select, union, func, distinct, or_
 from app.models.authz import User, UserRole, RolePermission, GroupRole, UserGroup, Permission, Role, Group
 from app.constants.permissions import ROLE_PRESETS
 from app import get_db
@@ -79,43 +79,79 @@ def filter_query_by_branches(query, model_branch_column, branch_ids):
     return query
 
 
-def count_owner_users(session=None) -> int:
-    """Return number of distinct users who possess the Owner role via direct or group assignment."""
-    close_after = False
-    if session is None:
-        session = get_db()
-        close_after = True
-    owner_role = session.execute(select(Role).where(Role.name=='Owner')).scalar_one_or_none()
-    if not owner_role:
-        return 0
-    # Direct user_roles
-    direct_user_ids = [ur.user_id for ur in session.execute(select(UserRole).where(UserRole.role_id==owner_role.id)).scalars()]
-    # Group-based
-    group_ids_with_owner = [gr.group_id for gr in session.execute(select(GroupRole).where(GroupRole.role_id==owner_role.id)).scalars()]
-    group_user_ids = []
-    if group_ids_with_owner:
-        group_user_ids = [ug.user_id for ug in session.execute(select(UserGroup).where(UserGroup.group_id.in_(group_ids_with_owner))).scalars()]
-    total_users = set(direct_user_ids + group_user_ids)
-    if close_after:
-        session.close()
-    return len(total_users)
+OWNER_ROLE_NAME = 'Owner'
+
+
+def _owner_holders(
+    exclude_direct_user_id: Optional[int] = None,
+    exclude_group_id: Optional[int] = None,
+    exclude_role_id: Optional[int] = None,
+    membership_override: Optional[Tuple[int, Iterable[int]]] = None,
+):
+    """Subquery of user ids holding Owner directly or via a group, with hypothetical removals applied.
+
+    exclude_direct_user_id: ignore that user's direct Owner assignment (user role replacement).
+    exclude_group_id: ignore every Owner grant flowing through that group (group roles change / delete).
+    exclude_role_id: ignore assignments of that role (role deletion).
+    membership_override: (user_id, kept_group_ids) – user's memberships outside kept_group_ids ignored.
+    """
+    owner_role_id = select(Role.id).where(Role.name==OWNER_ROLE_NAME).scalar_subquery()
+    direct = select(UserRole.user_id.label('user_id')).where(UserRole.role_id==owner_role_id)
+    via_group = (
+        select(UserGroup.user_id.label('user_id'))
+        .join(GroupRole, GroupRole.group_id==UserGroup.group_id)
+        .where(GroupRole.role_id==owner_role_id)
+    )
+    if exclude_direct_user_id is not None:
+        direct = direct.where(UserRole.user_id!=exclude_direct_user_id)
+    if exclude_group_id is not None:
+        via_group = via_group.where(UserGroup.group_id!=exclude_group_id)
+    if exclude_role_id is not None:
+        direct = direct.where(UserRole.role_id!=exclude_role_id)
+        via_group = via_group.where(GroupRole.role_id!=exclude_role_id)
+    if membership_override is not None:
+        uid, kept = membership_override
+        kept = list(kept)
+        cond = UserGroup.user_id!=uid
+        via_group = via_group.where(or_(cond, UserGroup.group_id.in_(kept)) if kept else cond)
+    return union(direct, via_group).subquery()
+
+
+def _owner_count(**exclusions):
+    holders = _owner_holders(**exclusions)
+    return select(func.count(distinct(holders.c.user_id))).scalar_subquery()
+
+
+def count_owner_users(session=None, **exclusions) -> int:
+    """Return number of distinct users who possess the Owner role via direct or group assignment.
+
+    Single `COUNT(DISTINCT user_id)` over the UNION of direct and group grants; keyword
+    exclusions (see `_owner_holders`) count owners as they would be after a pending change.
+    """
+    session = session or get_db()
+    return int(session.execute(select(_owner_count(**exclusions))).scalar_one())
+
+
+def assert_owner_remains(session=None, **exclusions):
+    """Abort 400 if applying `exclusions` would take the Owner count from >=1 to 0 (one round trip)."""
+    session = session or get_db()
+    current, remaining = session.execute(select(_owner_count(), _owner_count(**exclusions))).one()
+    if current and not remaining:
+        from flask import abort
+        abort(400, description='Cannot remove last Owner role')
 
 
 def assert_not_removing_last_owner(target_user_id: int, new_direct_role_ids: set[int]):
     """Ensure that after applying new_direct_role_ids for target_user_id we still have at least one Owner overall."""
     session = get_db()
-    owner_role = session.execute(select(Role).where(Role.name=='Owner')).scalar_one_or_none()
-    if not owner_role:
-        return
-    owner_id = owner_role.id
-    # If target user will still have owner role, safe.
-    if owner_id in new_direct_role_ids:
+    owner_role_id = select(Role.id).where(Role.name==OWNER_ROLE_NAME).scalar_subquery()
+    owner_id, current, remaining = session.execute(
+        select(owner_role_id, _owner_count(), _owner_count(exclude_direct_user_id=target_user_id))
+    ).one()
+    # No Owner role, or target keeps it directly: nothing to guard
+    if owner_id is None or owner_id in new_direct_role_ids:
         return
-    # Count existing owners excluding this user if currently owner.
-    current_owner_count = count_owner_users(session)
-    # Determine if target user currently had owner role
-    had_owner = session.execute(select(UserRole).where(UserRole.user_id==target_user_id, UserRole.role_id==owner_id)).scalar_one_or_none() is not None
-    if had_owner and current_owner_count <= 1:
+    if current and not remaining:
         from flask import abort
         abort(400, description='Cannot remove last Owner role')
 
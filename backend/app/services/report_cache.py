@@ -0,0 +1,176 @@
+from __future__ import annotations
+"""In-process TTL cache with stale-while-revalidate and single-flight for report computations.
+
+Lookup outcomes (each has a counter in `stats()`):
+  - hit: entry younger than `ttl_seconds` and computed from the current data version.
+  - stale: entry past `ttl_seconds` but within `stale_seconds`, computed from the current data
+    version -> the old value is served immediately. The first such request also starts a
+    recomputation on the cache's background pool (counted in `revalidations`); the entry is
+    replaced when it finishes. An entry from an older version is never served: that request waits
+    for the recomputation.
+  - miss: this request computes the value (first request for a key, an expired or outdated entry).
+  - coalesced: an identical computation was in flight; this request waited for its result.
+
+Background recomputations run inside an app context of the app that served the request (no
+request context: computations must not read `request`). A failed one is logged and counted in
+`errors`; the stale entry keeps being served until it expires.
+
+`version` is supplied by the caller (see `report_metrics.data_version()`): commits in this process
+that wrote report data bump it, so the next reader recomputes and a writer sees its own write. Writes from other
+processes are bounded by the TTL.
+"""
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from flask import current_app, has_app_context
+
+log = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ('value', 'at', 'version')
+
+    def __init__(self, value, at: float, version: int):
+        self.value = value
+        self.at = at
+        self.version = version
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class ReportCache:
+    def __init__(self, ttl_seconds: float = 30.0, stale_seconds: float = 300.0, max_entries: int = 256,
+                 wait_timeout: float = 30.0, revalidate_workers: int = 2):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._counters = {'hits': 0, 'misses': 0, 'stale': 0, 'coalesced': 0, 'revalidations': 0, 'errors': 0}
+        self._executor = ThreadPoolExecutor(max_workers=max(1, revalidate_workers), thread_name_prefix='report-revalidate')
+        # Stops the workers when the cache (i.e. its app) is discarded, or at interpreter exit
+        weakref.finalize(self, self._executor.shutdown, wait=False)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any], version: int = 0) -> Any:
+        if not self.enabled:
+            return compute()
+        with self._lock:
+            now = time.monotonic()
+            entry = self._entries.get(key)
+            fresh = entry is not None and entry.version == version and now - entry.at < self.ttl_seconds
+            if fresh:
+                self._counters['hits'] += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            servable = (entry is not None and entry.version == version
+                        and now - entry.at < self.ttl_seconds + self.stale_seconds)
+            flight = self._inflight.get(key)
+            if servable:
+                self._counters['stale'] += 1
+                if flight is not None:
+                    return entry.value
+                flight = self._inflight[key] = _Flight()
+                self._counters['revalidations'] += 1
+                leader = False
+            elif flight is not None:
+                self._counters['coalesced'] += 1
+                leader = False
+            else:
+                flight = self._inflight[key] = _Flight()
+                self._counters['misses'] += 1
+                leader = True
+        if servable:
+            try:
+                self._executor.submit(self._revalidate, key, flight, _detached(compute), version)
+            except RuntimeError:  # pool shut down (interpreter exit): the stale value will do
+                self._finish(key, flight, error=RuntimeError('revalidation pool shut down'))
+            return entry.value
+        if not leader:
+            if flight.done.wait(self.wait_timeout):
+                if flight.error is not None:
+                    raise flight.error
+                return flight.value
+            # Leader is stuck; compute independently rather than block the request further
+            return compute()
+        try:
+            value = compute()
+        except BaseException as e:
+            self._finish(key, flight, error=e)
+            raise
+        self._finish(key, flight, value=value, version=version)
+        return value
+
+    def _revalidate(self, key: Hashable, flight: _Flight, compute: Callable[[], Any], version: int) -> None:
+        try:
+            value = compute()
+        except Exception as e:
+            log.warning('report cache: background recompute of %r failed; serving the stale entry', key, exc_info=True)
+            self._finish(key, flight, error=e)
+            return
+        self._finish(key, flight, value=value, version=version)
+
+    def _finish(self, key: Hashable, flight: _Flight, value: Any = None, version: int = 0,
+                error: Optional[BaseException] = None) -> None:
+        """Store a computed value (or count the error), retire the flight and wake its waiters."""
+        flight.value, flight.error = value, error
+        with self._lock:
+            if error is not None:
+                self._counters['errors'] += 1
+            else:
+                self._entries[key] = _Entry(value, time.monotonic(), version)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            self._inflight.pop(key, None)
+        flight.done.set()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._counters,
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'ttl_seconds': self.ttl_seconds,
+                'stale_seconds': self.stale_seconds,
+            }
+
+
+def _detached(compute: Callable[[], Any]) -> Callable[[], Any]:
+    """`compute` runnable off the request thread: inside an app context of the current app."""
+    if not has_app_context():
+        return compute
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            return compute()
+    return run
+
+
+def get_report_cache() -> ReportCache:
+    return current_app.extensions['report_cache']
+
+
+__all__ = ['ReportCache', 'get_report_cache']
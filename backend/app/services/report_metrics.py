@@ -0,0 +1,467 @@
+from __future__ import annotations
+"""Incrementally maintained `metrics_status_counts` read model.
+
+/reports/metrics answers "how many rows (and cents) per domain/status in my branches". Instead of
+rescanning every lifecycle table per request, counts are kept per (domain, branch_id, status):
+
+  - ORM flushes: an `after_flush` hook diffs inserted / deleted rows and changes to
+    branch_id, status or the amount column, then upserts the deltas in the same transaction.
+    Values the session never loaded (expired objects) are read by a `before_flush` hook while
+    the database still holds them.
+  - Bulk ORM statements (`session.execute(update(Order)...)`, `Query.delete()`): a `do_orm_execute`
+    hook notes the (branch_id, status) keys of the matched rows before the statement and their
+    keys afterwards, then recomputes just those keys. Only statements without a WHERE clause
+    (or inserts whose keys cannot be read from the parameters) recompute the whole domain. Rows
+    whose status the statement changed, and inserted parameter rows, are upserted into today's
+    daily rollups like flushed ones.
+  - Anything else (raw SQL, other writers): `verify_status_counts` / `scripts/rebuild_metrics.py`
+    detect and repair drift.
+
+Date-windowed reports use `metrics_daily_rollups` (per day/domain/branch/status entry counts). The
+same flush hook upserts each insert or status change into today's row, in the write's transaction,
+so nothing has to run on a schedule for windows to be current. `metrics_events` rows journaled by
+earlier versions are still summed by readers; `fold_metric_events` (`scripts/rollup_metrics.py`)
+folds them into the daily rows.
+"""
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, insert, delete, literal, tuple_, union_all
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import instance_state
+
+from app.models.order import Order
+from app.models.print_job import PrintJob
+from app.models.purchase_order import PurchaseOrder
+from app.models.repair_ticket import RepairTicket
+from app.models.accounting_transaction import AccountingTransaction
+from app.models.catalog_item import CatalogItem
+from app.models.vendor import Vendor
+from app.models.metrics_status_count import MetricsStatusCount
+from app.models.metrics_rollup import MetricsEvent, MetricsDailyRollup
+from app.utils.upsert import upsert_add
+
+log = logging.getLogger(__name__)
+
+# Report domains: (model, domain label, financial amount attribute or None)
+REPORT_DOMAINS = (
+    (Order, 'Order', 'total_cents'),
+    (PrintJob, 'PrintJob', None),
+    (PurchaseOrder, 'PurchaseOrder', 'total_cents'),
+    (RepairTicket, 'RepairTicket', None),
+    (AccountingTransaction, 'AccountingTransaction', 'amount_cents'),
+    (CatalogItem, 'CatalogItem', None),
+    (Vendor, 'Vendor', None),
+)
+FINANCIAL_DOMAINS = frozenset(domain for _, domain, sum_attr in REPORT_DOMAINS if sum_attr)
+_BY_MODEL = {model: (domain, sum_attr) for model, domain, sum_attr in REPORT_DOMAINS}
+
+Key = Tuple[str, int, str]
+_UNKNOWN = object()
+
+# Bumped when a transaction that wrote to a report domain commits; report caches compare against it
+_data_version = 0
+_version_lock = threading.Lock()
+_DIRTY_KEY = '_report_data_changed'
+_PRIOR_KEY = '_report_metrics_prior'
+# Bound parameters per IN list when recomputing keys / re-reading matched rows
+_IN_CHUNK = 500
+
+
+def data_version() -> int:
+    return _data_version
+
+
+def bump_data_version() -> None:
+    global _data_version
+    with _version_lock:
+        _data_version += 1
+
+
+def mark_data_changed(session: Session) -> None:
+    """Bump the data version when `session` commits (not at flush: readers must not cache pre-commit data
+    under the new version); a rollback discards the mark."""
+    if not event.contains(Session, 'after_commit', _bump_on_commit):
+        with _version_lock:
+            if not event.contains(Session, 'after_commit', _bump_on_commit):
+                event.listen(Session, 'after_commit', _bump_on_commit)
+                event.listen(Session, 'after_rollback', _discard_on_rollback)
+    session.info[_DIRTY_KEY] = True
+
+
+def _bump_on_commit(session: Session) -> None:
+    if session.info.pop(_DIRTY_KEY, False):
+        bump_data_version()
+
+
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+
+
+def _values(obj, sum_attr: Optional[str], committed: bool, prior=None):
+    """(branch_id, status, amount) as currently set, or as last loaded from the database.
+
+    committed=True falls back to `prior` ((model, id) -> values read by `_before_flush`) for
+    attributes the session never loaded; a row missing there did not exist (None).
+    """
+    state = instance_state(obj)
+    out = []
+    for attr in ('branch_id', 'status', sum_attr):
+        if attr is None:
+            out.append(0)
+            continue
+        if not committed:
+            out.append(getattr(obj, attr))
+            continue
+        hist = state.attrs[attr].history
+        if hist.deleted:
+            out.append(hist.deleted[0])
+        elif hist.unchanged:
+            out.append(hist.unchanged[0])
+        elif prior is None:
+            # Attribute was never loaded (expired before modification): old value unknown
+            return _UNKNOWN
+        else:
+            return prior.get((type(obj), state.identity[0]) if state.identity else None)
+    branch_id, status, amount = out
+    return branch_id, status, int(amount or 0)
+
+
+def _tracked_change(obj, sum_attr: Optional[str]) -> bool:
+    state = instance_state(obj)
+    tracked = ('branch_id', 'status', sum_attr) if sum_attr else ('branch_id', 'status')
+    return any(state.attrs[a].history.has_changes() for a in tracked)
+
+
+def _collect_deltas(session: Session):
+    deltas: Dict[Key, List[int]] = defaultdict(lambda: [0, 0])
+    events: List[Dict[str, Any]] = []
+    prior = session.info.get(_PRIOR_KEY, {})
+    now = datetime.now(timezone.utc)
+
+    def bump(domain, values, sign):
+        if values is None:
+            return
+        branch_id, status, amount = values
+        if branch_id is None or status is None:
+            return
+        d = deltas[(domain, int(branch_id), status)]
+        d[0] += sign
+        d[1] += sign * amount
+
+    def journal(domain, values, kind):
+        branch_id, status, amount = values
+        if branch_id is not None and status is not None:
+            events.append({'ts': now, 'domain': domain, 'branch_id': int(branch_id), 'status': status,
+                           'kind': kind, 'amount_cents': amount})
+
+    for obj in session.new:
+        spec = _BY_MODEL.get(type(obj))
+        if spec:
+            current = _values(obj, spec[1], committed=False)
+            bump(spec[0], current, 1)
+            journal(spec[0], current, MetricsEvent.KIND_CREATED)
+    for obj in session.deleted:
+        spec = _BY_MODEL.get(type(obj))
+        if spec:
+            bump(spec[0], _values(obj, spec[1], committed=True, prior=prior), -1)
+    for obj in session.dirty:
+        spec = _BY_MODEL.get(type(obj))
+        if not spec or not _tracked_change(obj, spec[1]):
+            continue
+        current = _values(obj, spec[1], committed=False)
+        if instance_state(obj).attrs['status'].history.has_changes():
+            journal(spec[0], current, MetricsEvent.KIND_TRANSITIONED)
+        bump(spec[0], _values(obj, spec[1], committed=True, prior=prior), -1)
+        bump(spec[0], current, 1)
+    rows = [
+        {'domain': k[0], 'branch_id': k[1], 'status': k[2], 'count': c, 'sum_cents': s}
+        for k, (c, s) in deltas.items()
+        if c or s
+    ]
+    return rows, events
+
+
+def _upsert_deltas(conn, rows: List[Dict[str, Any]]) -> None:
+    upsert_add(conn, MetricsStatusCount.__table__, ('domain', 'branch_id', 'status'), rows, ('count', 'sum_cents'))
+
+
+def _source_statement(models=None, keys=None):
+    """Exact (domain, branch_id, status, count, sum_cents) aggregated from the source tables.
+
+    keys: restrict to these (branch_id, status) pairs.
+    """
+    parts = []
+    for model, domain, sum_attr in REPORT_DOMAINS:
+        if models is not None and model not in models:
+            continue
+        sum_col = func.coalesce(func.sum(getattr(model, sum_attr)), 0) if sum_attr else literal(0)
+        stmt = select(
+            literal(domain).label('domain'),
+            model.branch_id.label('branch_id'),
+            model.status.label('status'),
+            func.count(model.id).label('count'),
+            sum_col.label('sum_cents'),
+        )
+        if keys is not None:
+            stmt = stmt.where(tuple_(model.branch_id, model.status).in_(keys))
+        parts.append(stmt.group_by(model.branch_id, model.status))
+    return union_all(*parts)
+
+
+def _replace_rows(conn, model, keys=None) -> None:
+    domain = _BY_MODEL[model][0]
+    table = MetricsStatusCount.__table__
+    conds = [table.c.domain==domain]
+    if keys is not None:
+        conds.append(tuple_(table.c.branch_id, table.c.status).in_(keys))
+    conn.execute(delete(table).where(*conds))
+    src = _source_statement([model], keys).subquery()
+    conn.execute(insert(table).from_select(
+        ['domain', 'branch_id', 'status', 'count', 'sum_cents'],
+        select(src.c.domain, src.c.branch_id, src.c.status, src.c.count, src.c.sum_cents),
+    ))
+
+
+def rebuild_domain(conn, model) -> None:
+    """Replace one domain's rows with a fresh aggregate of its source table."""
+    _replace_rows(conn, model)
+
+
+def recompute_keys(conn, model, keys) -> None:
+    """Replace one domain's rows for the given (branch_id, status) keys with a fresh aggregate of just those."""
+    keys = sorted({(int(b), st) for b, st in keys if b is not None and st is not None})
+    for i in range(0, len(keys), _IN_CHUNK):
+        _replace_rows(conn, model, keys[i:i + _IN_CHUNK])
+
+
+def verify_status_counts(session: Session, repair: bool = False) -> List[Dict[str, Any]]:
+    """Compare the read model with the source tables; optionally rebuild drifted domains.
+
+    Returns one entry per drifted key: {domain, branch_id, status, expected, actual} where
+    expected/actual are (count, sum_cents) pairs.
+    """
+    expected = {(d, int(b), s): (int(c), int(sc or 0)) for d, b, s, c, sc in session.execute(_source_statement()).all()}
+    m = MetricsStatusCount
+    actual = {
+        (d, int(b), s): (int(c), int(sc or 0))
+        for d, b, s, c, sc in session.execute(select(m.domain, m.branch_id, m.status, m.count, m.sum_cents)).all()
+        if c or sc
+    }
+    drift = []
+    for key in sorted(set(expected) | set(actual)):
+        exp, act = expected.get(key, (0, 0)), actual.get(key, (0, 0))
+        if exp != act:
+            drift.append({'domain': key[0], 'branch_id': key[1], 'status': key[2], 'expected': exp, 'actual': act})
+    if repair and drift:
+        drifted = {d['domain'] for d in drift}
+        conn = session.connection()
+        for model, domain, _ in REPORT_DOMAINS:
+            if domain in drifted:
+                rebuild_domain(conn, model)
+        session.commit()
+    return drift
+
+
+def _as_utc(ts) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _daily_rows(entries) -> List[Dict[str, Any]]:
+    """Rollup upsert rows from (ts, domain, branch_id, status, kind, amount_cents) entries."""
+    agg: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0, 0])
+    for ts, domain, branch_id, status, kind, amount in entries:
+        a = agg[(_as_utc(ts).date(), domain, branch_id, status)]
+        a[0 if kind == MetricsEvent.KIND_CREATED else 1] += 1
+        a[2] += int(amount or 0)
+    return [
+        {'day': k[0], 'domain': k[1], 'branch_id': k[2], 'status': k[3], 'created': c, 'transitioned': t, 'sum_cents': sc}
+        for k, (c, t, sc) in agg.items()
+    ]
+
+
+def _upsert_rollups(conn, rows: List[Dict[str, Any]]) -> None:
+    upsert_add(conn, MetricsDailyRollup.__table__, ('day', 'domain', 'branch_id', 'status'), rows,
+               ('created', 'transitioned', 'sum_cents'))
+
+
+def fold_metric_events(session: Session, batch_size: int = 5000) -> int:
+    """Fold journaled events into `metrics_daily_rollups`; returns the number of events folded.
+
+    Each batch (oldest first) is upserted and deleted in one transaction, so a reader sees an
+    event either in the journal or in the rollups, never both.
+    """
+    ev = MetricsEvent.__table__
+    folded = 0
+    while True:
+        batch = session.execute(
+            select(ev.c.id, ev.c.ts, ev.c.domain, ev.c.branch_id, ev.c.status, ev.c.kind, ev.c.amount_cents)
+            .order_by(ev.c.id).limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        conn = session.connection()
+        _upsert_rollups(conn, _daily_rows(row[1:] for row in batch))
+        conn.execute(delete(ev).where(ev.c.id <= batch[-1][0]))
+        session.commit()
+        folded += len(batch)
+        if len(batch) < batch_size:
+            break
+    return folded
+
+
+# --- session hooks ---
+def _before_flush(session: Session, flush_context, instances) -> None:
+    """Read the stored (branch_id, status, amount) of rows about to change whose old values the session
+    never loaded, while the database still holds them."""
+    wanted: Dict[Any, List[Any]] = defaultdict(list)
+    for obj in list(session.deleted) + list(session.dirty):
+        spec = _BY_MODEL.get(type(obj))
+        if not spec or (obj not in session.deleted and not _tracked_change(obj, spec[1])):
+            continue
+        state = instance_state(obj)
+        if state.identity and _values(obj, spec[1], committed=True) is _UNKNOWN:
+            wanted[type(obj)].append(state.identity[0])
+    if not wanted:
+        return
+    prior = session.info.setdefault(_PRIOR_KEY, {})
+    for model, ids in wanted.items():
+        sum_attr = _BY_MODEL[model][1]
+        amount = getattr(model, sum_attr) if sum_attr else literal(0)
+        for i in range(0, len(ids), _IN_CHUNK):
+            for pk, branch_id, status, cents in session.execute(
+                select(model.id, model.branch_id, model.status, amount).where(model.id.in_(ids[i:i + _IN_CHUNK]))
+            ).all():
+                prior[(model, pk)] = (branch_id, status, int(cents or 0))
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    rows, events = _collect_deltas(session)
+    session.info.pop(_PRIOR_KEY, None)
+    if not rows and not events:
+        return
+    mark_data_changed(session)
+    conn = session.connection()
+    _upsert_deltas(conn, rows)
+    _upsert_rollups(conn, _daily_rows(
+        (e['ts'], e['domain'], e['branch_id'], e['status'], e['kind'], e['amount_cents']) for e in events
+    ))
+
+
+def _insert_keys(orm_execute_state, model):
+    """(branch_id, status) keys of a bulk INSERT's parameter rows, or None when they cannot be read."""
+    params = orm_execute_state.parameters
+    if not params:
+        return None  # values() / from_select(): rows are not visible here
+    default = model.__table__.c.status.default
+    default_status = default.arg if default is not None and default.is_scalar else None
+    keys = set()
+    for row in (params if isinstance(params, list) else [params]):
+        status = row.get('status', default_status)
+        if row.get('branch_id') is None or status is None:
+            return None
+        keys.add((row['branch_id'], status))
+    return keys
+
+
+def _insert_entries(orm_execute_state, model, domain: str, sum_attr: Optional[str], now: datetime):
+    """Rollup `created` entries for a bulk INSERT's parameter rows (none when they cannot be read)."""
+    params = orm_execute_state.parameters
+    if not params:
+        return []
+    default = model.__table__.c.status.default
+    default_status = default.arg if default is not None and default.is_scalar else None
+    entries = []
+    for row in (params if isinstance(params, list) else [params]):
+        status = row.get('status', default_status)
+        if row.get('branch_id') is not None and status is not None:
+            amount = int(row.get(sum_attr) or 0) if sum_attr else 0
+            entries.append((now, domain, int(row['branch_id']), status, MetricsEvent.KIND_CREATED, amount))
+    return entries
+
+
+def _amount(model, sum_attr: Optional[str]):
+    return func.coalesce(getattr(model, sum_attr), 0) if sum_attr else literal(0)
+
+
+def _matched(orm_execute_state, model, sum_attr: Optional[str], whereclause):
+    """(id, branch_id, status, amount) of rows matched by a bulk UPDATE / DELETE, read where the statement runs."""
+    session = orm_execute_state.session
+    # Bound like the statement itself, so a session routing reads elsewhere still reads the primary
+    bind_arguments = {'mapper': orm_execute_state.bind_mapper, 'clause': orm_execute_state.statement}
+    stmt = select(model.id, model.branch_id, model.status, _amount(model, sum_attr))
+    if whereclause is not None:
+        stmt = stmt.where(whereclause)
+    return session.execute(stmt, bind_arguments=bind_arguments).all()
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    if model not in _BY_MODEL:
+        return None
+    domain, sum_attr = _BY_MODEL[model]
+    session = orm_execute_state.session
+    now = datetime.now(timezone.utc)
+    whereclause = None if orm_execute_state.is_insert else orm_execute_state.statement.whereclause
+    keys = matched = None
+    entries: List[tuple] = []
+    if orm_execute_state.is_insert:
+        keys = _insert_keys(orm_execute_state, model)
+        entries = _insert_entries(orm_execute_state, model, domain, sum_attr, now)
+    elif orm_execute_state.is_update or whereclause is not None:
+        # Updates are read even without a WHERE: status changes become rollup `transitioned` entries
+        matched = _matched(orm_execute_state, model, sum_attr, whereclause)
+        if whereclause is not None:
+            keys = {(row[1], row[2]) for row in matched}
+    result = orm_execute_state.invoke_statement()
+    conn = session.connection(bind_arguments={'mapper': mapper, 'clause': orm_execute_state.statement})
+    if orm_execute_state.is_update:
+        before = {row[0]: row[2] for row in matched}
+        ids = list(before)
+        for i in range(0, len(ids), _IN_CHUNK):
+            for pk, branch_id, status, amount in conn.execute(
+                select(model.id, model.branch_id, model.status, _amount(model, sum_attr))
+                .where(model.id.in_(ids[i:i + _IN_CHUNK]))
+            ).all():
+                if keys is not None:
+                    keys.add((branch_id, status))
+                if status != before[pk] and branch_id is not None and status is not None:
+                    entries.append((now, domain, int(branch_id), status, MetricsEvent.KIND_TRANSITIONED, int(amount or 0)))
+    if keys is None:
+        rebuild_domain(conn, model)
+    else:
+        recompute_keys(conn, model, keys)
+    _upsert_rollups(conn, _daily_rows(entries))
+    mark_data_changed(session)
+    return result
+
+
+def install_metrics_hooks() -> None:
+    """Register the read-model maintenance hooks on every Session (idempotent)."""
+    if not event.contains(Session, 'before_flush', _before_flush):
+        event.listen(Session, 'before_flush', _before_flush)
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+    if not event.contains(Session, 'do_orm_execute', _do_orm_execute):
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+
+
+def uninstall_metrics_hooks() -> None:
+    if event.contains(Session, 'before_flush', _before_flush):
+        event.remove(Session, 'before_flush', _before_flush)
+    if event.contains(Session, 'after_flush', _after_flush):
+        event.remove(Session, 'after_flush', _after_flush)
+    if event.contains(Session, 'do_orm_execute', _do_orm_execute):
+        event.remove(Session, 'do_orm_execute', _do_orm_execute)
+
+
+__all__ = [
+    'REPORT_DOMAINS', 'FINANCIAL_DOMAINS', 'data_version', 'bump_data_version', 'mark_data_changed', 'rebuild_domain', 'recompute_keys', 'verify_status_counts', 'fold_metric_events',
+    'install_metrics_hooks', 'uninstall_metrics_hooks',
+]
@@ -0,0 +1,277 @@
+from __future__ import annotations
+"""Incrementally maintained leaderboard aggregates behind /reports/top.
+
+`report_top_aggregates` holds one row per (dimension, month, branch, key). An `after_flush` hook
+books each write in the UTC month it happens:
+  - insert: +1 and +amount for the key,
+  - change of key, amount or status: the old contribution is reversed and the new one added,
+  - delete, or entering an excluded status (cancelled orders): the contribution is reversed.
+Reversals land in the month of the change, so a month's figures are "net booked that month"
+(a single month can net below zero when it reverses an earlier month's booking; readers clamp
+the totals of the selected range at zero).
+
+Bulk ORM statements (`session.execute(update(Order)...)`, `Query.delete()`) are seen by a
+`do_orm_execute` hook: it notes the (branch, key) pairs of the matched rows before the statement
+and afterwards, then books, in the current month, the difference between each pair's all-time
+total in the source table and its all-time booked total. `verify_top_aggregates` (and
+`scripts/rebuild_top.py`) runs the same comparison over every pair for raw SQL and other writers.
+"""
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import event, func, literal, select, tuple_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import instance_state
+
+from app.models.order import Order
+from app.models.print_job import PrintJob
+from app.models.purchase_order import PurchaseOrder
+from app.models.report_top_aggregate import ReportTopAggregate
+from app.utils.upsert import upsert_add
+
+log = logging.getLogger(__name__)
+
+
+class TopDimension(NamedTuple):
+    model: Any
+    key_attr: str
+    amount_attr: Optional[str]
+    excluded_statuses: Tuple[str, ...]
+    metrics: Tuple[str, ...]  # first entry is the default ranking metric
+
+
+TOP_DIMENSIONS: Dict[str, TopDimension] = {
+    'customer': TopDimension(Order, 'customer_name', 'total_cents', (Order.STATUS_CANCELLED,), ('sum_cents', 'count')),
+    'vendor': TopDimension(PurchaseOrder, 'vendor_name', 'total_cents', (), ('sum_cents', 'count')),
+    'product': TopDimension(PrintJob, 'product_id', None, (), ('count',)),
+}
+_BY_MODEL = {spec.model: (name, spec) for name, spec in TOP_DIMENSIONS.items()}
+_UNKNOWN = object()
+# Bound parameters per IN list when comparing keys / re-reading matched rows
+_IN_CHUNK = 500
+
+
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _contribution(spec: TopDimension, values):
+    """(key, amount) counted for these values, or None when the row does not count."""
+    key, amount, status = values
+    if key is None or status in spec.excluded_statuses:
+        return None
+    return str(key), int(amount or 0)
+
+
+def _current(obj, spec: TopDimension):
+    return (getattr(obj, spec.key_attr), getattr(obj, spec.amount_attr) if spec.amount_attr else 0, obj.status)
+
+
+def _committed(obj, spec: TopDimension):
+    state = instance_state(obj)
+    out = []
+    for attr in (spec.key_attr, spec.amount_attr, 'status'):
+        if attr is None:
+            out.append(0)
+            continue
+        hist = state.attrs[attr].history
+        if hist.deleted:
+            out.append(hist.deleted[0])
+        elif hist.unchanged:
+            out.append(hist.unchanged[0])
+        elif not hist.added and attr not in state.dict and state.key is not None:
+            # Never loaded in this session and not modified: the stored value is the committed one
+            out.append(getattr(obj, attr))
+        else:
+            return _UNKNOWN
+    return tuple(out)
+
+
+def _old_branch(obj):
+    hist = instance_state(obj).attrs['branch_id'].history
+    return (hist.deleted or hist.unchanged or [obj.branch_id])[0]
+
+
+def _changed(obj, spec: TopDimension) -> bool:
+    state = instance_state(obj)
+    attrs = [a for a in (spec.key_attr, spec.amount_attr, 'status', 'branch_id') if a]
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+def _collect(session: Session) -> List[Dict[str, Any]]:
+    period = month_start(datetime.now(timezone.utc))
+    deltas: Dict[tuple, List[int]] = defaultdict(lambda: [0, 0])
+
+    def book(name, branch_id, contrib, sign):
+        if contrib is None or branch_id is None:
+            return
+        d = deltas[(name, int(branch_id), contrib[0])]
+        d[0] += sign
+        d[1] += sign * contrib[1]
+
+    for obj in session.new:
+        hit = _BY_MODEL.get(type(obj))
+        if hit:
+            name, spec = hit
+            book(name, obj.branch_id, _contribution(spec, _current(obj, spec)), 1)
+    for obj in session.deleted:
+        hit = _BY_MODEL.get(type(obj))
+        if hit:
+            name, spec = hit
+            old = _committed(obj, spec)
+            if old is _UNKNOWN:
+                log.warning('report_top: unloaded attributes on deleted %s; leaderboard not adjusted', name)
+                continue
+            book(name, _old_branch(obj), _contribution(spec, old), -1)
+    for obj in session.dirty:
+        hit = _BY_MODEL.get(type(obj))
+        if not hit or not _changed(obj, hit[1]):
+            continue
+        name, spec = hit
+        old = _committed(obj, spec)
+        if old is _UNKNOWN:
+            log.warning('report_top: unloaded attributes on %s; leaderboard not adjusted', name)
+            continue
+        book(name, _old_branch(obj), _contribution(spec, old), -1)
+        book(name, obj.branch_id, _contribution(spec, _current(obj, spec)), 1)
+    return [
+        {'dimension': name, 'period': period, 'branch_id': branch_id, 'key': key, 'count': c, 'sum_cents': s}
+        for (name, branch_id, key), (c, s) in deltas.items()
+        if c or s
+    ]
+
+
+def _upsert(conn, rows: List[Dict[str, Any]]) -> None:
+    upsert_add(conn, ReportTopAggregate.__table__, ('dimension', 'period', 'branch_id', 'key'), rows, ('count', 'sum_cents'))
+
+
+def _source_totals(conn, spec: TopDimension, keys=None) -> Dict[tuple, Tuple[int, int]]:
+    """All-time (count, sum_cents) of counted source rows per (branch_id, key); keys: (branch_id, raw key) pairs."""
+    model = spec.model
+    key_col = getattr(model, spec.key_attr)
+    amount = func.coalesce(func.sum(getattr(model, spec.amount_attr)), 0) if spec.amount_attr else literal(0)
+    stmt = select(model.branch_id, key_col, func.count(), amount).where(key_col.is_not(None), model.branch_id.is_not(None))
+    if spec.excluded_statuses:
+        stmt = stmt.where(model.status.not_in(spec.excluded_statuses))
+    out = {}
+    for chunk in _chunks(keys):
+        part = stmt if chunk is None else stmt.where(tuple_(model.branch_id, key_col).in_(chunk))
+        for branch_id, key, c, sc in conn.execute(part.group_by(model.branch_id, key_col)).all():
+            out[(int(branch_id), str(key))] = (int(c), int(sc or 0))
+    return out
+
+
+def _booked_totals(conn, name: str, keys=None) -> Dict[tuple, Tuple[int, int]]:
+    """All-time booked (count, sum_cents) per (branch_id, key) across every month."""
+    t = ReportTopAggregate
+    stmt = select(t.branch_id, t.key, func.sum(t.count), func.sum(t.sum_cents)).where(t.dimension==name)
+    out = {}
+    for chunk in _chunks(keys):
+        part = stmt if chunk is None else stmt.where(tuple_(t.branch_id, t.key).in_([(b, str(k)) for b, k in chunk]))
+        for branch_id, key, c, sc in conn.execute(part.group_by(t.branch_id, t.key)).all():
+            out[(int(branch_id), key)] = (int(c or 0), int(sc or 0))
+    return out
+
+
+def _chunks(keys):
+    if keys is None:
+        yield None
+        return
+    keys = sorted({(int(b), k) for b, k in keys if b is not None and k is not None}, key=lambda bk: (bk[0], str(bk[1])))
+    for i in range(0, len(keys), _IN_CHUNK):
+        yield keys[i:i + _IN_CHUNK]
+
+
+def _reconcile(conn, name: str, keys=None, repair: bool = True) -> List[Dict[str, Any]]:
+    """Compare booked and source totals per (branch_id, key); with repair, book the difference this month."""
+    if keys is not None and not keys:
+        return []
+    expected = _source_totals(conn, TOP_DIMENSIONS[name], keys)
+    actual = _booked_totals(conn, name, keys)
+    drift = []
+    for branch_id, key in sorted(set(expected) | set(actual)):
+        exp, act = expected.get((branch_id, key), (0, 0)), actual.get((branch_id, key), (0, 0))
+        if exp != act:
+            drift.append({'dimension': name, 'branch_id': branch_id, 'key': key, 'expected': exp, 'actual': act})
+    if repair and drift:
+        period = month_start(datetime.now(timezone.utc))
+        _upsert(conn, [{'dimension': name, 'period': period, 'branch_id': d['branch_id'], 'key': d['key'],
+                        'count': d['expected'][0] - d['actual'][0], 'sum_cents': d['expected'][1] - d['actual'][1]}
+                       for d in drift])
+    return drift
+
+
+def verify_top_aggregates(session: Session, repair: bool = False) -> List[Dict[str, Any]]:
+    """Compare each (dimension, branch, key)'s all-time booked totals with the source tables.
+
+    Returns one entry per drifted key: {dimension, branch_id, key, expected, actual} where
+    expected/actual are (count, sum_cents) pairs. With repair, the differences are booked in the
+    current month and committed.
+    """
+    conn = session.connection()
+    drift = [d for name in TOP_DIMENSIONS for d in _reconcile(conn, name, repair=repair)]
+    if repair and drift:
+        session.commit()
+    return drift
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    rows = _collect(session)
+    if rows:
+        _upsert(session.connection(), rows)
+
+
+def _statement_keys(orm_execute_state, spec: TopDimension):
+    """(branch_id, key) pairs of a bulk INSERT's parameter rows, or None when they cannot be read."""
+    params = orm_execute_state.parameters
+    if not params:
+        return None
+    keys = set()
+    for row in (params if isinstance(params, list) else [params]):
+        if 'branch_id' not in row or spec.key_attr not in row:
+            return None
+        keys.add((row['branch_id'], row[spec.key_attr]))
+    return keys
+
+
+def _do_orm_execute(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    hit = _BY_MODEL.get(mapper.class_ if mapper is not None else None)
+    if hit is None:
+        return None
+    name, spec = hit
+    model = spec.model
+    key_col = getattr(model, spec.key_attr)
+    session = orm_execute_state.session
+    # Bound like the statement itself, so a session routing reads elsewhere still reads the primary
+    bind_arguments = {'mapper': mapper, 'clause': orm_execute_state.statement}
+    keys = ids = None
+    if orm_execute_state.is_insert:
+        keys = _statement_keys(orm_execute_state, spec)
+    elif orm_execute_state.statement.whereclause is not None:
+        matched = session.execute(select(model.id, model.branch_id, key_col).where(orm_execute_state.statement.whereclause),
+                                  bind_arguments=bind_arguments).all()
+        ids = [row[0] for row in matched]
+        keys = {(row[1], row[2]) for row in matched}
+    result = orm_execute_state.invoke_statement()
+    conn = session.connection(bind_arguments=bind_arguments)
+    if keys is not None and orm_execute_state.is_update:
+        for i in range(0, len(ids), _IN_CHUNK):
+            keys.update(conn.execute(select(model.branch_id, key_col).where(model.id.in_(ids[i:i + _IN_CHUNK]))).all())
+    _reconcile(conn, name, keys)
+    return result
+
+
+def install_top_hooks() -> None:
+    """Register the leaderboard maintenance hooks on every Session (idempotent)."""
+    if not event.contains(Session, 'after_flush', _after_flush):
+        event.listen(Session, 'after_flush', _after_flush)
+    if not event.contains(Session, 'do_orm_execute', _do_orm_execute):
+        event.listen(Session, 'do_orm_execute', _do_orm_execute)
+
+
+__all__ = ['TOP_DIMENSIONS', 'TopDimension', 'month_start', 'install_top_hooks', 'verify_top_aggregates']
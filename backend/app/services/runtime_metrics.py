@@ -0,0 +1,91 @@
+from __future__ import annotations
+"""Process runtime metrics exposed at GET /metrics (Prometheus text format).
+
+Series:
+  - http_request_duration_seconds{blueprint,route,method}: latency histogram per URL rule
+    (`route` is the rule pattern, e.g. /sales/orders/<int:order_id>; unmatched paths -> "unmatched").
+  - http_requests_total{blueprint,route,method,status}: responses by status code.
+  - db_pool_size / db_pool_checked_out / db_pool_checked_in / db_pool_overflow{engine}: read from
+    each engine's QueuePool at scrape time (primary and replicas; in-memory StaticPool has none).
+  - audit_writes_total{action}: audit entries added (`add_audit`), counted before commit.
+  - fsm_transitions_total{entity,from_status,to_status}: lifecycle transitions recorded by
+    `status_history` (creation counts with from_status="").
+
+Counters live in `app.utils.prom` per-thread shards, so recording is a dict update on the calling
+thread; only the scrape merges.
+"""
+import hmac
+import time
+from typing import Dict, List
+
+from flask import Flask, Response, abort, g, request
+
+from app.utils.prom import CONTENT_TYPE, GaugeFamily, Registry
+
+_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+REGISTRY = Registry()
+HTTP_DURATION = REGISTRY.histogram('http_request_duration_seconds', 'Request latency by blueprint and route',
+                                   ('blueprint', 'route', 'method'))
+HTTP_REQUESTS = REGISTRY.counter('http_requests_total', 'Responses by blueprint, route and status code',
+                                 ('blueprint', 'route', 'method', 'status'))
+AUDIT_WRITES = REGISTRY.counter('audit_writes_total', 'Audit log entries added', ('action',))
+FSM_TRANSITIONS = REGISTRY.counter('fsm_transitions_total', 'Lifecycle status transitions recorded',
+                                   ('entity', 'from_status', 'to_status'))
+
+
+def count_audit(action: str) -> None:
+    AUDIT_WRITES.inc((action,))
+
+
+def count_transition(entity: str, from_status, to_status) -> None:
+    FSM_TRANSITIONS.inc((entity, from_status or '', to_status))
+
+
+def _pool_gauges(engines: Dict[str, object]) -> List[GaugeFamily]:
+    samples = {'size': [], 'checked_out': [], 'checked_in': [], 'overflow': []}
+    for name, engine in engines.items():
+        pool = engine.pool
+        if not hasattr(pool, 'checkedout'):
+            continue
+        samples['size'].append(((name,), pool.size()))
+        samples['checked_out'].append(((name,), pool.checkedout()))
+        samples['checked_in'].append(((name,), pool.checkedin()))
+        # QueuePool.overflow() starts at -pool_size; only connections beyond pool_size count here
+        samples['overflow'].append(((name,), max(pool.overflow(), 0)))
+    helps = {
+        'size': 'Configured pool size',
+        'checked_out': 'Connections currently checked out',
+        'checked_in': 'Idle connections in the pool',
+        'overflow': 'Open connections beyond pool_size',
+    }
+    return [GaugeFamily(f'db_pool_{key}', helps[key], ('engine',), samples[key]) for key in samples]
+
+
+def install_metrics_endpoint(app: Flask, engines: Dict[str, object]) -> None:
+    """Time every request and serve GET /metrics (bearer METRICS_TOKEN required)."""
+
+    @app.before_request
+    def _metrics_start():  # type: ignore
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _metrics_observe(response):  # type: ignore
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            method = request.method if request.method in _METHODS else 'OTHER'
+            labels = (request.blueprint or '', rule, method)
+            HTTP_DURATION.observe(labels, time.perf_counter() - started)
+            HTTP_REQUESTS.inc(labels + (str(response.status_code),))
+        return response
+
+    @app.route('/metrics')
+    def metrics():  # type: ignore
+        token = app.config['METRICS_TOKEN']
+        if not token or not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            abort(401, description='Metrics token required')
+        return Response(REGISTRY.render(_pool_gauges(engines)), mimetype=None, content_type=CONTENT_TYPE)
+
+
+__all__ = ['REGISTRY', 'count_audit', 'count_transition', 'install_metrics_endpoint']
@@ -0,0 +1,231 @@
+from __future__ import annotations
+"""Slow statement recorder with captured query plans.
+
+Statements running at least SLOW_QUERY_THRESHOLD_MS are:
+  - normalized (literals and bound parameters -> ?, IN lists -> (?...), whitespace collapsed) and
+    aggregated per normalized text: count, total / max time, originating routes, parameter
+    shapes (types only; values are never stored),
+  - logged on the `app.slow_query` logger with those fields as `extra`,
+  - explained once per normalized statement (`EXPLAIN QUERY PLAN` on SQLite, `EXPLAIN` elsewhere,
+    never ANALYZE) on a background thread with the original parameters, so the request does not
+    wait for it. A StaticPool engine (in-memory SQLite) has one shared connection, so its plan is
+    queued on that connection and taken when the connection is checked back in, after the
+    statement's rows have been consumed, rather than while its cursor is still open.
+At most `max_entries` statements are kept; the one with the least total time is dropped first.
+`GET /iam/diagnostics/slow-queries` lists the top offenders.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from flask import has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+
+log = logging.getLogger('app.slow_query')
+
+SORT_KEYS = ('total_ms', 'max_ms', 'count')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT')
+_MAX_SHAPES = 5
+_MAX_ROUTES = 10
+_PENDING_PLANS = '_slow_query_pending_plans'
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PARAM = re.compile(r'\?|%\(\w+\)s|%s|(?<!:):\w+|\$\d+')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+_local = threading.local()
+
+
+def normalize_sql(statement: str) -> str:
+    sql = _STRING.sub('?', statement)
+    sql = _PARAM.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _SPACE.sub(' ', sql).strip()
+    return _IN_LIST.sub('(?...)', sql)
+
+
+def param_shape(parameters, executemany: bool = False) -> str:
+    if executemany and parameters:
+        return f'{param_shape(parameters[0])} x{len(parameters)}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+    return '()'
+
+
+def _route() -> str:
+    if not has_request_context():
+        return 'background'
+    rule = request.url_rule.rule if request.url_rule is not None else request.path
+    return f'{request.method} {rule}'
+
+
+def format_plan(dialect_name: str, rows) -> List[str]:
+    if dialect_name != 'sqlite':
+        return [str(r[0]) for r in rows]
+    # EXPLAIN QUERY PLAN rows: (id, parent, notused, detail) -> indented tree
+    depth: Dict[int, int] = {0: -1}
+    lines = []
+    for node_id, parent, _unused, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + str(detail))
+    return lines
+
+
+class SlowQueryRecorder:
+    def __init__(self, threshold_ms: float = 200.0, max_entries: int = 200, explain: bool = True):
+        self.threshold_ms = threshold_ms
+        self.max_entries = max_entries
+        self.explain = explain
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if explain:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+            # Stops the worker when the recorder (i.e. its app) is discarded, or at interpreter exit
+            self._finalizer = weakref.finalize(self, self._executor.shutdown, wait=False)
+
+    def install(self, engine) -> None:
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        if isinstance(engine.pool, StaticPool):
+            event.listen(engine, 'checkin', self._run_pending_plans)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        started = getattr(context, '_slow_query_started', None)
+        if started is None or getattr(_local, 'explaining', False):
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= self.threshold_ms:
+            self.record(conn, cursor, statement, parameters, executemany, elapsed_ms)
+
+    def record(self, conn, cursor, statement: str, parameters, executemany: bool, elapsed_ms: float) -> None:
+        sql = normalize_sql(statement)
+        query_id = hashlib.sha1(sql.encode()).hexdigest()[:16]
+        route = _route()
+        shape = param_shape(parameters, executemany)
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._entries.get(query_id)
+            if entry is None:
+                if len(self._entries) >= self.max_entries:
+                    del self._entries[min(self._entries, key=lambda k: self._entries[k]['total_ms'])]
+                entry = self._entries[query_id] = {
+                    'id': query_id, 'sql': sql, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'first_seen': now, 'last_seen': now, 'routes': {}, 'param_shapes': [],
+                    'plan': None, 'plan_error': None, 'plan_captured_at': None, '_plan_pending': False,
+                }
+            entry['count'] += 1
+            entry['total_ms'] += elapsed_ms
+            entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+            entry['last_seen'] = now
+            if route in entry['routes'] or len(entry['routes']) < _MAX_ROUTES:
+                entry['routes'][route] = entry['routes'].get(route, 0) + 1
+            if shape not in entry['param_shapes'] and len(entry['param_shapes']) < _MAX_SHAPES:
+                entry['param_shapes'].append(shape)
+            want_plan = (self.explain and not entry['_plan_pending'] and entry['plan'] is None
+                         and statement.lstrip()[:6].upper().startswith(_EXPLAINABLE))
+            if want_plan:
+                entry['_plan_pending'] = True
+        log.warning('slow query %.1fms (%s) %s', elapsed_ms, route, sql,
+                    extra={'query_id': query_id, 'sql': sql, 'duration_ms': round(elapsed_ms, 2),
+                           'route': route, 'param_shape': shape})
+        if not want_plan:
+            return
+        params = parameters[0] if executemany and parameters else parameters
+        engine = conn.engine
+        if isinstance(engine.pool, StaticPool):
+            # The shared connection may still be mid-statement (rows not fetched yet): run at checkin
+            conn.info.setdefault(_PENDING_PLANS, []).append((query_id, engine.dialect.name, statement, params))
+        else:
+            try:
+                self._executor.submit(self._capture_plan, query_id, engine.dialect.name, statement, params, engine=engine)
+            except RuntimeError:  # closed: leave the plan for a later occurrence
+                with self._lock:
+                    entry['_plan_pending'] = False
+
+    def _run_pending_plans(self, dbapi_connection, connection_record) -> None:
+        for query_id, dialect_name, statement, params in connection_record.info.pop(_PENDING_PLANS, ()):
+            self._capture_plan(query_id, dialect_name, statement, params, dbapi_connection=dbapi_connection)
+
+    def _capture_plan(self, query_id: str, dialect_name: str, statement: str, params, engine=None,
+                      dbapi_connection=None) -> None:
+        prefix = 'EXPLAIN QUERY PLAN ' if dialect_name == 'sqlite' else 'EXPLAIN '
+        plan, error = None, None
+        _local.explaining = True
+        try:
+            if dbapi_connection is not None:
+                cur = dbapi_connection.cursor()
+                try:
+                    cur.execute(prefix + statement, params or ())
+                    rows = cur.fetchall()
+                finally:
+                    cur.close()
+            else:
+                with engine.connect() as conn:
+                    rows = conn.exec_driver_sql(prefix + statement, params or ()).all()
+            plan = format_plan(dialect_name, rows)
+        except Exception as e:
+            error = str(e)
+        finally:
+            _local.explaining = False
+        with self._lock:
+            entry = self._entries.get(query_id)
+            if entry is None:
+                return
+            entry.update(plan=plan, plan_error=error, plan_captured_at=datetime.now(timezone.utc), _plan_pending=False)
+        if plan:
+            log.info('slow query plan %s:\n%s', query_id, '\n'.join(plan), extra={'query_id': query_id, 'plan': plan})
+
+    def wait_for_plans(self, timeout: float = 5.0) -> None:
+        """Block until queued EXPLAINs have run (tests, shutdown)."""
+        if self._executor is not None:
+            self._executor.submit(lambda: None).result(timeout)
+
+    def close(self) -> None:
+        """Finish queued EXPLAINs and stop the worker thread."""
+        if self._executor is not None:
+            self._finalizer.detach()
+            self._executor.shutdown(wait=True)
+
+    def top(self, sort: str = 'total_ms', limit: int = 20) -> List[Dict[str, Any]]:
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of {', '.join(SORT_KEYS)}")
+        with self._lock:
+            entries = sorted(self._entries.values(), key=lambda e: e[sort], reverse=True)[:limit]
+            return [self._public(e) for e in entries]
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        out = {k: v for k, v in entry.items() if not k.startswith('_')}
+        out['total_ms'] = round(out['total_ms'], 2)
+        out['max_ms'] = round(out['max_ms'], 2)
+        out['avg_ms'] = round(entry['total_ms'] / entry['count'], 2)
+        out['routes'] = dict(sorted(entry['routes'].items(), key=lambda kv: -kv[1]))
+        out['param_shapes'] = list(entry['param_shapes'])
+        for key in ('first_seen', 'last_seen', 'plan_captured_at'):
+            out[key] = out[key].isoformat().replace('+00:00', 'Z') if out[key] else None
+        return out
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+__all__ = ['SlowQueryRecorder', 'format_plan', 'normalize_sql', 'param_shape', 'SORT_KEYS']
@@ -0,0 +1,81 @@
+from __future__ import annotations
+"""Lifecycle transition history and time-in-state sketches.
+
+Transition handlers call `record_created` after adding an entity and `record_transition` before
+assigning its new status. Each call appends a `status_transitions` row; a status change also
+measures the time spent in the status being left (since the entity's previous row, found via the
+(entity, entity_id, ts) index) and adds it to the `status_duration_sketches` row of
+(UTC day, domain, branch, status). /reports/durations merges those sketches, so percentiles never
+sort raw history rows. Status changes made outside the handlers are not recorded.
+"""
+from datetime import date, datetime, timezone
+from typing import Any, Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.models.status_transition import StatusTransition, StatusDurationSketch
+from app.services.report_metrics import mark_data_changed
+from app.services.runtime_metrics import count_transition
+from app.utils.quantiles import QuantileSketch
+from app.utils.upsert import insert_missing
+
+
+def _aware(ts: datetime) -> datetime:
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+def _entity(obj: Any) -> str:
+    return type(obj).__name__
+
+
+def _book_duration(session: Session, domain: str, branch_id: int, status: str, day: date, seconds: float) -> None:
+    conn = session.connection()
+    table = StatusDurationSketch.__table__
+    # Create the row if missing so the locking read below always has a row to lock
+    insert_missing(conn, table, ('day', 'domain', 'branch_id', 'status'),
+                   [{'day': day, 'domain': domain, 'branch_id': branch_id, 'status': status,
+                     'sketch': QuantileSketch().to_bytes()}])
+    key = (table.c.day==day, table.c.domain==domain, table.c.branch_id==branch_id, table.c.status==status)
+    stmt = select(table.c.sketch).where(*key)
+    if conn.dialect.name == 'postgresql':
+        # Read-modify-write: serialize concurrent writers on the same sketch row
+        stmt = stmt.with_for_update()
+    sketch = QuantileSketch.from_bytes(conn.execute(stmt).scalar_one())
+    sketch.add(seconds)
+    conn.execute(update(table).where(*key).values(sketch=sketch.to_bytes(), updated_at=func.now()))
+
+
+def record_created(session: Session, obj: Any, user_id: Optional[int] = None,
+                   at: Optional[datetime] = None) -> StatusTransition:
+    """Record entry of a newly added entity into its initial status (flushes to obtain id / defaults)."""
+    if obj.id is None or obj.status is None:
+        session.flush()
+    row = StatusTransition(entity=_entity(obj), entity_id=obj.id, branch_id=obj.branch_id, from_status=None,
+                           to_status=obj.status, ts=_aware(at or datetime.now(timezone.utc)), user_id=user_id)
+    session.add(row)
+    count_transition(row.entity, None, row.to_status)
+    return row
+
+
+def record_transition(session: Session, obj: Any, to_status: str, user_id: Optional[int] = None,
+                      at: Optional[datetime] = None) -> StatusTransition:
+    """Record obj moving from its current status to `to_status`; call before assigning the status."""
+    now = _aware(at or datetime.now(timezone.utc))
+    entity = _entity(obj)
+    t = StatusTransition
+    if any(isinstance(o, StatusTransition) for o in session.new):
+        session.flush()  # sessions do not autoflush; the entry row may still be pending
+    entered = session.execute(select(func.max(t.ts)).where(t.entity==entity, t.entity_id==obj.id)).scalar()
+    duration = max((now - _aware(entered)).total_seconds(), 0.0) if entered is not None else None
+    row = StatusTransition(entity=entity, entity_id=obj.id, branch_id=obj.branch_id, from_status=obj.status,
+                           to_status=to_status, ts=now, duration_seconds=duration, user_id=user_id)
+    session.add(row)
+    count_transition(entity, row.from_status, to_status)
+    if duration is not None:
+        _book_duration(session, entity, obj.branch_id, obj.status, now.date(), duration)
+        mark_data_changed(session)
+    return row
+
+
+__all__ = ['record_created', 'record_transition']
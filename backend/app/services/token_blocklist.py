@@ -0,0 +1,237 @@
+from __future__ import annotations
+"""JWT revocation checks backed by the `token_revocations` table.
+
+Every authenticated request asks "is this token revoked?", so the answer must not cost a
+database round trip. The table is mirrored in process:
+
+  - a Bloom filter over revoked jtis rejects the common case (token not revoked) without
+    touching the exact set,
+  - an exact dict of jti -> expiry confirms Bloom hits (no false positives leak through),
+  - a dict of user_id -> cutoff epoch covers "revoke all tokens for user". Tokens carry an
+    `iat_ms` claim (see `issued_at_claims`) so a token issued in the same second after a
+    revoke-all is not caught by the cutoff; tokens without it fall back to whole-second `iat`.
+
+The mirror is refreshed incrementally at most once every `JWT_BLOCKLIST_REFRESH_SECONDS`.
+Rows are pulled by `revoked_at` (not by id: Postgres ids become visible out of order when
+transactions commit out of order) from a watermark minus `overlap_seconds`; re-applying a row
+is idempotent. Every `JWT_BLOCKLIST_FULL_RELOAD_SECONDS` the mirror is rebuilt from the table,
+which also catches a row committed later than the overlap window allows. Revocations issued by
+this process apply immediately; other workers observe one within one refresh interval.
+
+The request that finds the snapshot stale runs the refresh; concurrent requests keep answering
+from the current snapshot rather than queueing to repeat it. The rows are read on a connection of
+the primary engine, never through the request's session (which may read a replica, and whose
+transaction a failed read must not disturb). A revoke-all row stops mattering once every token
+it could cover has expired: cutoffs older than the longest token lifetime are dropped and not
+reloaded.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from flask import current_app
+from sqlalchemy import and_, or_, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import StaticPool
+
+from app import get_db
+from app.models.token_revocation import TokenRevocation
+from app.utils.bloom import BloomFilter
+
+log = logging.getLogger(__name__)
+
+NO_EXPIRY = float('inf')
+ISSUED_AT_MS_CLAIM = 'iat_ms'
+
+
+def _epoch(dt: Optional[datetime]) -> float:
+    if dt is None:
+        return NO_EXPIRY
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def issued_at_claims(identity) -> Dict[str, int]:
+    """Additional claims for every issued token: issue time with millisecond resolution."""
+    return {ISSUED_AT_MS_CLAIM: int(time.time() * 1000)}
+
+
+def token_lifetime_seconds(config) -> Optional[float]:
+    """Longest access / refresh token lifetime in seconds, or None when some tokens never expire."""
+    longest = 0.0
+    for key in ('JWT_ACCESS_TOKEN_EXPIRES', 'JWT_REFRESH_TOKEN_EXPIRES'):
+        lifetime = config.get(key)
+        if lifetime is False or lifetime is None:
+            return None
+        longest = max(longest, lifetime.total_seconds() if isinstance(lifetime, timedelta) else float(lifetime))
+    return longest
+
+
+def _issued_by(payload: Dict[str, Any], cutoff: float) -> bool:
+    iat_ms = payload.get(ISSUED_AT_MS_CLAIM)
+    if isinstance(iat_ms, (int, float)):
+        return iat_ms <= cutoff * 1000
+    # Legacy token: iat has whole-second resolution, so the cutoff second itself is ambiguous
+    return int(payload.get('iat', 0)) <= int(cutoff)
+
+
+class TokenBlocklist:
+    def __init__(self, refresh_seconds: float = 5.0, capacity: int = 10000, error_rate: float = 0.001,
+                 full_reload_seconds: float = 300.0, overlap_seconds: float = 60.0, engine=None,
+                 token_lifetime_seconds: Optional[float] = None):
+        self.engine = engine
+        self.token_lifetime_seconds = token_lifetime_seconds
+        self.refresh_seconds = refresh_seconds
+        self.full_reload_seconds = full_reload_seconds
+        self.overlap_seconds = overlap_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter.for_capacity(capacity, error_rate)
+        self._jtis: Dict[str, float] = {}
+        self._user_cutoffs: Dict[int, float] = {}
+        self._watermark: Optional[datetime] = None
+        self._last_refresh: Optional[float] = None
+        self._last_full_reload: Optional[float] = None
+
+    # --- hot path ---
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        if self._stale():
+            self.refresh(force=False)
+        jti = payload.get('jti')
+        if jti and jti in self._bloom and jti in self._jtis:
+            return True
+        if self._user_cutoffs:
+            try:
+                user_id = int(payload.get('sub'))  # type: ignore[arg-type]
+            except (TypeError, ValueError):
+                return False
+            cutoff = self._user_cutoffs.get(user_id)
+            if cutoff is not None and _issued_by(payload, cutoff):
+                return True
+        return False
+
+    def _stale(self) -> bool:
+        return self._last_refresh is None or time.monotonic() - self._last_refresh >= self.refresh_seconds
+
+    # --- mirror maintenance ---
+    def refresh(self, force: bool = True) -> int:
+        """Pull revocation rows since the watermark (or all, when a full reload is due).
+
+        force=False (request path): skipped when another thread is already refreshing a snapshot
+        that exists, or when the snapshot turned fresh while waiting. Returns number of rows applied.
+        """
+        # Only the very first load makes a request wait for another thread's refresh
+        if not self._lock.acquire(blocking=force or self._last_refresh is None):
+            return 0
+        try:
+            if not force and not self._stale():
+                return 0  # refreshed by the thread we waited for
+            now = time.monotonic()
+            self._last_refresh = now
+            full = self._last_full_reload is None or now - self._last_full_reload >= self.full_reload_seconds
+            t = TokenRevocation.__table__
+            stmt = select(t.c.jti, t.c.user_id, t.c.expires_at, t.c.revoked_at)
+            if full:
+                wall = datetime.now(timezone.utc)
+                user_rows = t.c.jti.is_(None)
+                if self.token_lifetime_seconds is not None:
+                    user_rows = and_(user_rows, t.c.revoked_at >= wall - timedelta(seconds=self.token_lifetime_seconds))
+                stmt = stmt.where(or_(user_rows, and_(t.c.jti.is_not(None),
+                                                      or_(t.c.expires_at.is_(None), t.c.expires_at > wall))))
+            elif self._watermark is not None:
+                stmt = stmt.where(t.c.revoked_at >= self._watermark - timedelta(seconds=self.overlap_seconds))
+            try:
+                rows = self._read(stmt.order_by(t.c.revoked_at.asc()))
+            except SQLAlchemyError:
+                log.warning('token blocklist refresh failed; keeping previous snapshot', exc_info=True)
+                return 0
+            if full:
+                self._jtis = {}
+                self._user_cutoffs = {}
+                self._last_full_reload = now
+            for row in rows:
+                self._apply(row)
+                revoked_at = row.revoked_at
+                if revoked_at is not None and revoked_at.tzinfo is None:
+                    revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+                if revoked_at is not None and (self._watermark is None or revoked_at > self._watermark):
+                    self._watermark = revoked_at
+            if full or len(self._jtis) > self.capacity:
+                self._compact()
+            return len(rows)
+        finally:
+            self._lock.release()
+
+    def _read(self, stmt):
+        engine = self.engine
+        if engine is None or isinstance(engine.pool, StaticPool):
+            # In-memory SQLite shares one connection: a second checkout would roll back the request's
+            # transaction when returned, so read through the session (there are no replicas here)
+            return get_db().execute(stmt).all()
+        with engine.connect() as conn:
+            return conn.execute(stmt).all()
+
+    def _apply(self, row) -> None:
+        if row.jti:
+            if row.jti not in self._jtis:
+                self._bloom.add(row.jti)
+            self._jtis[row.jti] = _epoch(row.expires_at)
+        elif row.user_id is not None:
+            cutoff = _epoch(row.revoked_at)
+            if cutoff > self._user_cutoffs.get(row.user_id, 0):
+                self._user_cutoffs[row.user_id] = cutoff
+
+    def _compact(self) -> None:
+        """Drop expired jtis and outlived revoke-all cutoffs; rebuild the Bloom filter for the survivors."""
+        now = time.time()
+        self._jtis = {j: exp for j, exp in self._jtis.items() if exp > now}
+        if self.token_lifetime_seconds is not None:
+            # Every token issued before such a cutoff has expired by now
+            horizon = now - self.token_lifetime_seconds
+            self._user_cutoffs = {u: c for u, c in self._user_cutoffs.items() if c >= horizon}
+        self.capacity = max(self.capacity, len(self._jtis) * 2)
+        bloom = BloomFilter.for_capacity(self.capacity, self.error_rate)
+        bloom.update(self._jtis.keys())
+        self._bloom = bloom
+
+    # --- writes ---
+    def revoke_token(self, jti: str, user_id: Optional[int] = None, expires_at: Optional[datetime] = None, revoked_by: int = 0):
+        session = get_db()
+        row = session.execute(select(TokenRevocation).where(TokenRevocation.jti==jti)).scalar_one_or_none()
+        if row is None:
+            row = TokenRevocation(jti=jti, user_id=user_id, expires_at=expires_at, revoked_by=revoked_by,
+                                  revoked_at=datetime.now(timezone.utc))
+            session.add(row)
+            session.commit()
+        with self._lock:
+            self._apply(row)
+        return row
+
+    def revoke_user(self, user_id: int, revoked_by: int = 0):
+        session = get_db()
+        row = TokenRevocation(jti=None, user_id=user_id, revoked_by=revoked_by, revoked_at=datetime.now(timezone.utc))
+        session.add(row)
+        session.commit()
+        with self._lock:
+            self._apply(row)
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'jtis': len(self._jtis),
+            'users': len(self._user_cutoffs),
+            'bloom_bits': self._bloom.size_bits,
+            'bloom_hashes': self._bloom.hash_count,
+            'watermark': self._watermark.isoformat() if self._watermark else None,
+        }
+
+
+def get_token_blocklist() -> TokenBlocklist:
+    return current_app.extensions['token_blocklist']
+
+
+__all__ = ['ISSUED_AT_MS_CLAIM', 'TokenBlocklist', 'get_token_blocklist', 'issued_at_claims', 'token_lifetime_seconds']
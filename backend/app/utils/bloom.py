@@ -0,0 +1,60 @@
+from __future__ import annotations
+"""Minimal Bloom filter used as an in-process negative cache.
+
+A Bloom filter answers "definitely absent" or "possibly present" in O(k) time with a fixed
+bit budget. Callers pair it with an exact structure and only consult the exact structure
+when the filter reports a possible hit.
+
+Usage:
+    from app.utils.bloom import BloomFilter
+    bf = BloomFilter.for_capacity(10_000, error_rate=0.001)
+    bf.add('abc')
+    'abc' in bf  # True
+"""
+import hashlib
+import math
+from typing import Iterable, Iterator
+
+
+class BloomFilter:
+    def __init__(self, size_bits: int, hash_count: int):
+        if size_bits <= 0 or hash_count <= 0:
+            raise ValueError('size_bits and hash_count must be positive')
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.count = 0
+        self._bits = bytearray((size_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float = 0.001) -> 'BloomFilter':
+        """Size a filter for `capacity` items at the requested false positive rate."""
+        capacity = max(1, int(capacity))
+        if not 0 < error_rate < 1:
+            raise ValueError('error_rate must be between 0 and 1')
+        size_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        hash_count = max(1, int(round(size_bits / capacity * math.log(2))))
+        return cls(size_bits, hash_count)
+
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing (Kirsch–Mitzenmacher): two 64-bit halves of one digest yield k indexes
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size_bits
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+__all__ = ['BloomFilter']
@@ -0,0 +1,82 @@
+from __future__ import annotations
+"""Deferred blueprint registration.
+
+Each blueprint is described by (name, module, attribute, url_prefix). By default create_app
+imports and registers all of them. With LAZY_BLUEPRINTS (tests, CLI scripts) the route modules,
+and the model graphs they import, are left alone until they are needed:
+
+  - `load_all()` registers whatever is still pending; code that walks `app.url_map` or needs
+    every model mapped calls it,
+  - names in BLUEPRINTS_PRELOAD (or `*`) are registered by create_app,
+  - otherwise the first request registers everything before Flask dispatches it.
+
+The URL map therefore never changes once the app has handled a request: Flask refuses setup
+after the first request, and werkzeug's matcher is not safe to mutate while other threads match.
+A script that never serves a request never imports the routes.
+"""
+import importlib
+import threading
+from typing import Iterable, List, NamedTuple, Optional
+
+from flask import Flask
+
+
+class BlueprintSpec(NamedTuple):
+    name: str
+    module: str
+    attribute: str
+    url_prefix: str
+
+
+class LazyBlueprints:
+    """Registers the described blueprints on demand, at the latest before the first request."""
+
+    def __init__(self, app: Flask, specs: Iterable[BlueprintSpec], package: Optional[str] = None):
+        self.app = app
+        self.package = package
+        self._pending: List[BlueprintSpec] = list(specs)
+        self._loaded: List[str] = []
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> List[str]:
+        return list(self._loaded)
+
+    @property
+    def pending(self) -> List[str]:
+        return [spec.name for spec in self._pending]
+
+    def install(self) -> None:
+        self.app.extensions['blueprints'] = self
+        wsgi_app = self.app.wsgi_app
+
+        def deferred_wsgi_app(environ, start_response):
+            if self._pending:
+                self.load_all()
+            return wsgi_app(environ, start_response)
+
+        self.app.wsgi_app = deferred_wsgi_app  # type: ignore[method-assign]
+
+    def preload(self, names: Iterable[str]) -> None:
+        wanted = {n.strip() for n in names if n.strip()}
+        self._load([s for s in self._pending if '*' in wanted or s.name in wanted])
+
+    def load_all(self) -> None:
+        self._load(list(self._pending))
+
+    def _load(self, specs: List[BlueprintSpec]) -> None:
+        if not specs:
+            return
+        # Concurrent first requests wait here until every blueprint is registered
+        with self._lock:
+            for spec in specs:
+                if spec not in self._pending:
+                    continue  # registered by a concurrent request
+                blueprint = getattr(importlib.import_module(spec.module, self.package), spec.attribute)
+                self.app.register_blueprint(blueprint, url_prefix=spec.url_prefix)
+                self._loaded.append(spec.name)
+                # Rebound (not mutated): the unlocked check in the WSGI wrapper sees it empty only when done
+                self._pending = [s for s in self._pending if s != spec]
+
+
+__all__ = ['BlueprintSpec', 'LazyBlueprints']
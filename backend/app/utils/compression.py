@@ -0,0 +1,295 @@
+from __future__ import annotations
+"""Content-encoding negotiation, precompressed bodies and the response compression middleware.
+
+gzip is always available; brotli (`br`) and zstd are used when the optional `brotli` /
+`zstandard` packages are installed.
+
+`Precompressed` holds an immutable body, its compressed variants (built once) and a content-hash
+ETag, and answers GET / HEAD with the negotiated variant or 304 Not Modified:
+
+  - the identity ETag is the sha256 of the body; a compressed variant carries `"<hash>-<encoding>"`
+    so caches never confuse encodings, and If-None-Match accepts any variant of the current hash,
+  - `Vary: Accept-Encoding` is always set.
+
+`ResponseCompressor` (installed by create_app when COMPRESS_ENABLED) compresses every other
+response after the view ran, using the same ETag suffix convention:
+
+  - only compressible mimetypes (COMPRESS_MIMETYPES) of at least COMPRESS_MIN_SIZE bytes; responses
+    that already carry Content-Encoding, negotiate encodings themselves (`Vary: Accept-Encoding`),
+    send `Cache-Control: no-transform` or pass a file through are left alone,
+  - buffered bodies are compressed once per (content digest, encoding) and kept in a bounded
+    `VariantCache`, so repeated pages (cached reports, unchanged lists) are served without recompressing,
+  - streamed (generator) bodies are compressed chunk by chunk without buffering the whole export,
+  - a 304 echoes the variant ETag the client revalidated with.
+"""
+import gzip
+import hashlib
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from flask import Flask, Response, request
+
+try:  # optional dependency
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    brotli = None
+
+try:  # optional dependency
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+# Server preference when the client weights encodings equally
+PREFERRED = tuple(enc for enc, present in (('br', brotli), ('zstd', zstandard), ('gzip', True)) if present)
+
+# Per-request (dynamic) compression favours speed; Precompressed bodies use the maximum levels
+DYNAMIC_LEVELS = {'gzip': 6, 'br': 5, 'zstd': 3}
+
+DEFAULT_MIMETYPES = ('application/json', 'application/problem+json', 'text/plain', 'text/csv', 'text/html')
+
+
+def available_encodings() -> tuple:
+    return PREFERRED
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == 'gzip':
+        # mtime=0 keeps the output (and anything hashed from it) deterministic
+        return gzip.compress(body, compresslevel=9 if level is None else level, mtime=0)
+    if encoding == 'br' and brotli is not None:
+        return brotli.compress(body, quality=11 if level is None else level)
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=19 if level is None else level).compress(body)
+    raise ValueError(f'Unsupported encoding {encoding}')
+
+
+class StreamCompressor:
+    """Incremental compressor: feed chunks with `compress`, end the stream with `finish`."""
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        level = DYNAMIC_LEVELS.get(encoding, 6) if level is None else level
+        if encoding == 'gzip':
+            # wbits 31 = gzip container (header mtime 0, CRC trailer)
+            obj = zlib.compressobj(level, zlib.DEFLATED, 31)
+            self._compress, self._finish = obj.compress, obj.flush
+        elif encoding == 'br' and brotli is not None:
+            obj = brotli.Compressor(quality=level)
+            self._compress, self._finish = obj.process, obj.finish
+        elif encoding == 'zstd' and zstandard is not None:
+            obj = zstandard.ZstdCompressor(level=level).compressobj()
+            self._compress, self._finish = obj.compress, obj.flush
+        else:
+            raise ValueError(f'Unsupported encoding {encoding}')
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compress(chunk)
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def strip_encoding(tag: str) -> str:
+    """The representation ETag a variant ETag (`<tag>-<encoding>`) was derived from."""
+    for enc in ('gzip', 'br', 'zstd'):
+        if tag.endswith(f'-{enc}'):
+            return tag[:-len(enc) - 1]
+    return tag
+
+
+def negotiate(accept_encoding: Optional[str], available: Iterable[str]) -> Optional[str]:
+    """Pick the best available coding from an Accept-Encoding header; None means identity."""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for enc in available:
+        q = weights.get(enc, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+class Precompressed:
+    """Immutable body + precompressed variants + content-hash ETag."""
+
+    def __init__(self, body: bytes, mimetype: str, encodings: Optional[Iterable[str]] = None,
+                 cache_control: str = 'no-cache'):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()
+        self.cache_control = cache_control
+        self.variants: Dict[str, bytes] = {}
+        for enc in (available_encodings() if encodings is None else encodings):
+            data = compress(body, enc)
+            if len(data) < len(body):
+                self.variants[enc] = data
+
+    def variant_etag(self, encoding: Optional[str]) -> str:
+        return self.etag if encoding is None else f'{self.etag}-{encoding}'
+
+    def not_modified(self) -> bool:
+        inm = request.if_none_match
+        if not inm:
+            return False
+        return inm.star_tag or any(inm.contains_weak(self.variant_etag(enc)) for enc in (None, *self.variants))
+
+    def respond(self) -> Response:
+        encoding = negotiate(request.headers.get('Accept-Encoding'), [e for e in PREFERRED if e in self.variants])
+        if self.not_modified():
+            resp = Response(status=304)
+        else:
+            resp = Response(self.variants[encoding] if encoding else self.body, mimetype=self.mimetype)
+            if encoding:
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(self.variant_etag(encoding))
+        resp.headers['Vary'] = 'Accept-Encoding'
+        resp.headers['Cache-Control'] = self.cache_control
+        return resp
+
+
+class VariantCache:
+    """Bounded LRU of compressed bodies keyed by (content digest, encoding)."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Tuple[bytes, str], bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get_or_compress(self, body: bytes, encoding: str, level: int) -> bytes:
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return data
+            self._counters['misses'] += 1
+        data = compress(body, encoding, level)
+        if len(data) * 4 > self.max_bytes:
+            return data  # would crowd out everything else
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = data
+                self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._counters['evictions'] += 1
+        return data
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self._counters, 'entries': len(self._entries), 'bytes': self._size,
+                    'max_bytes': self.max_bytes}
+
+
+def _stream(chunks: Iterable[bytes], compressor: StreamCompressor) -> Iterator[bytes]:
+    # Yield whatever the compressor emits; no per-chunk flush, which would cost ratio on row-sized chunks
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+class ResponseCompressor:
+    """after_request hook compressing eligible responses with the negotiated encoding."""
+
+    def __init__(self, min_size: int = 1024, mimetypes: Iterable[str] = DEFAULT_MIMETYPES,
+                 cache_max_bytes: int = 8 * 1024 * 1024, encodings: Optional[Iterable[str]] = None):
+        self.min_size = min_size
+        self.mimetypes = frozenset(m.strip().lower() for m in mimetypes if m.strip())
+        self.encodings = tuple(available_encodings() if encodings is None else encodings)
+        self.cache = VariantCache(cache_max_bytes)
+
+    @classmethod
+    def from_config(cls, config) -> 'ResponseCompressor':
+        return cls(min_size=config['COMPRESS_MIN_SIZE'],
+                   mimetypes=str(config['COMPRESS_MIMETYPES']).split(','),
+                   cache_max_bytes=config['COMPRESS_CACHE_MAX_BYTES'])
+
+    def install(self, app: Flask) -> None:
+        app.extensions['compression'] = self
+        app.after_request(self)
+
+    def _eligible(self, response: Response) -> bool:
+        if response.mimetype not in self.mimetypes or response.direct_passthrough:
+            return False
+        if 'Content-Encoding' in response.headers or 'accept-encoding' in response.vary:
+            return False
+        return 'no-transform' not in response.cache_control
+
+    def __call__(self, response: Response) -> Response:
+        if response.status_code == 304:
+            self._revalidated(response)
+            return response
+        if not self._eligible(response):
+            return response
+        # Whether compressed or not, the representation depends on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+        if response.status_code < 200 or response.status_code in (204, 206):
+            return response
+        encoding = negotiate(request.headers.get('Accept-Encoding'), self.encodings)
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            if response.content_length is not None and response.content_length < self.min_size:
+                return response
+            response.response = _stream(response.iter_encoded(), StreamCompressor(encoding))
+            response.headers.pop('Content-Length', None)
+        else:
+            body = response.get_data()
+            if len(body) < self.min_size:
+                return response
+            data = self.cache.get_or_compress(body, encoding, DYNAMIC_LEVELS[encoding])
+            if len(data) >= len(body):
+                return response
+            response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        tag, weak = response.get_etag()
+        if tag:
+            response.set_etag(f'{tag}-{encoding}', weak)
+        return response
+
+    def _revalidated(self, response: Response) -> None:
+        # A 304 must carry the ETag of the variant the client holds, not the identity one
+        tag, weak = response.get_etag()
+        inm = request.if_none_match
+        if not tag or not inm:
+            return
+        for candidate in inm.as_set(include_weak=True):
+            if candidate != tag and strip_encoding(candidate) == tag:
+                response.set_etag(candidate, weak)
+                response.vary.add('Accept-Encoding')
+                return
+
+
+__all__ = ['Precompressed', 'ResponseCompressor', 'StreamCompressor', 'VariantCache', 'negotiate', 'compress',
+           'strip_encoding', 'available_encodings', 'PREFERRED']
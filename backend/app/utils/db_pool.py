@@ -0,0 +1,90 @@
+from __future__ import annotations
+"""Connection pool settings and checkout tracking for request-scoped sessions.
+
+`engine_options` maps the DB_POOL_* config keys onto `create_engine` arguments (QueuePool:
+pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping). `CheckoutTracker` listens to
+pool checkout / checkin events and remembers which thread holds each connection, so request
+teardown can report connections a handler opened but never returned.
+
+Usage:
+    from app.utils.db_pool import engine_options, CheckoutTracker
+    engine = create_engine(url, **engine_options(app.config))
+    tracker = CheckoutTracker(); tracker.install(engine)
+    ...
+    leaked = tracker.held_by_current_thread()
+"""
+import threading
+import time
+from typing import Any, Dict, List, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_options(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """create_engine keyword arguments for a pooled (non in-memory) database."""
+    return {
+        'pool_size': int(config['DB_POOL_SIZE']),
+        'max_overflow': int(config['DB_MAX_OVERFLOW']),
+        'pool_timeout': float(config['DB_POOL_TIMEOUT']),
+        'pool_recycle': int(config['DB_POOL_RECYCLE']),
+        'pool_pre_ping': bool(config['DB_POOL_PRE_PING']),
+    }
+
+
+def connect_timeout_args(url: str, seconds: float) -> Dict[str, Any]:
+    """DBAPI `connect_args` bounding how long opening a connection may block, per driver (SQLite opens local files: none)."""
+    backend = make_url(url).get_backend_name()
+    if backend in ('postgresql', 'mysql', 'mariadb'):
+        return {'connect_timeout': max(1, int(round(seconds)))}
+    return {}
+
+
+class CheckoutTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # thread ident -> {id(connection record): [open checkouts, first checkout monotonic time]}
+        self._held: Dict[int, Dict[int, list]] = {}
+
+    def install(self, engine) -> None:
+        event.listen(engine.pool, 'checkout', self._on_checkout)
+        event.listen(engine.pool, 'checkin', self._on_checkin)
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        ident = threading.get_ident()
+        connection_record.info.setdefault('checkout_threads', []).append(ident)
+        with self._lock:
+            entry = self._held.setdefault(ident, {}).setdefault(id(connection_record), [0, time.monotonic()])
+            entry[0] += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        if connection_record is None:
+            return
+        threads = connection_record.info.get('checkout_threads') or []
+        if not threads:
+            return
+        ident = threads.pop()
+        with self._lock:
+            held = self._held.get(ident)
+            entry = held.get(id(connection_record)) if held else None
+            if entry is not None:
+                entry[0] -= 1
+                if entry[0] <= 0:
+                    del held[id(connection_record)]
+                if not held:
+                    self._held.pop(ident, None)
+
+    def held_by_current_thread(self) -> List[float]:
+        """Seconds each connection checked out by this thread has been held (oldest first)."""
+        now = time.monotonic()
+        with self._lock:
+            held = self._held.get(threading.get_ident(), {})
+            return sorted((now - at for count, at in held.values() for _ in range(count)), reverse=True)
+
+    def forget_current_thread(self) -> None:
+        """Drop this thread's entries once reported, so a leak is logged once, not on every request."""
+        with self._lock:
+            self._held.pop(threading.get_ident(), None)
+
+
+__all__ = ['engine_options', 'CheckoutTracker']
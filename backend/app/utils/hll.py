@@ -0,0 +1,79 @@
+from __future__ import annotations
+"""HyperLogLog distinct-count sketch.
+
+A sketch of precision p keeps m = 2**p one-byte registers. Adding an item is O(1); merging two
+sketches is a register-wise max, so per-day / per-branch sketches combine into any window
+without rescanning. The estimate's relative standard error is ~1.04 / sqrt(m)
+(p=12: m=4096 registers, 4 KiB, ~1.6%; roughly 95% of estimates fall within 2x that).
+
+Usage:
+    from app.utils.hll import HyperLogLog
+    h = HyperLogLog()
+    h.add('alice'); h.add('bob')
+    len(h)  # ~2
+"""
+import hashlib
+import math
+from typing import Iterable, Optional
+
+DEFAULT_PRECISION = 12
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = DEFAULT_PRECISION, registers: Optional[bytes] = None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.m = 1 << precision
+        if registers is not None and len(registers) != self.m:
+            raise ValueError('register length does not match precision')
+        self._registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'HyperLogLog':
+        return cls(int(math.log2(len(data))), bytes(data))
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._registers)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, item: str) -> bool:
+        """Add an item; returns True when a register changed (the sketch must be persisted)."""
+        x = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), 'big')
+        idx = x >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        w = x & ((1 << rest_bits) - 1)
+        rank = rest_bits - w.bit_length() + 1
+        if rank > self._registers[idx]:
+            self._registers[idx] = rank
+            return True
+        return False
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        if other.precision != self.precision:
+            raise ValueError('cannot merge sketches of different precision')
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def __len__(self) -> int:
+        return int(round(self.estimate()))
+
+    def estimate(self) -> float:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction: linear counting on empty registers
+            return m * math.log(m / zeros)
+        return raw
+
+
+__all__ = ['HyperLogLog', 'DEFAULT_PRECISION']
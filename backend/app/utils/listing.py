@@ -3,6 +3,8 @@ from typing import Callable, Dict, Any, Tuple, Iterable, Optional
 from flask import request, abort, make_response
 from sqlalchemy.orm import Query
 from app.config.pagination import normalize_pagination
+from app.utils.request_timing import timed
+from app.utils.compression import strip_encoding
 import hashlib
 from datetime import datetime, timezone, timedelta
 from email.utils import parsedate_to_datetime, format_datetime
@@ -20,7 +22,9 @@ def apply_pagination(q: Query) -> Tuple[Query, int, int, int]:
         limit, offset = normalize_pagination(request.args.get('limit'), request.args.get('offset'))
     except ValueError as e:
         abort(400, description=str(e))
-    total = q.count()
+    with timed('count'):
+        # ORDER BY does not change the count; left in, the wrapped SELECT sorts every row
+        total = q.order_by(None).count()
     return q.offset(offset).limit(limit), total, limit, offset
 
 def compute_etag(ids: Iterable[int], total: int, limit: int, offset: int, latest_ts: Optional[str] = '') -> str:
@@ -38,7 +42,7 @@ def build_list_payload(rows: list, total: int, limit: int, offset: int):
         }
     }
 
-def _http_date(dt: datetime) -> str:
+def http_date(dt: datetime) -> str:
     """Return RFC1123 HTTP-date string in GMT."""
     try:
         return format_datetime(dt, usegmt=True)  # Python 3.11+ ensures RFC1123
@@ -51,10 +55,11 @@ def make_cached_list_response(rows: list, total: int, limit: int, offset: int, l
     latest_iso = latest_ts_c.isoformat().replace('+00:00','Z') if latest_ts_c else (latest_ts or '')
     # Keep ETag seed stable using ISO canonical form
     etag = compute_etag(ids, total, limit, offset, latest_iso)
-    resp = make_response(build_list_payload(rows, total, limit, offset))
+    with timed('serialize'):
+        resp = make_response(build_list_payload(rows, total, limit, offset))
     resp.headers['ETag'] = etag
     if latest_ts_c:
-        resp.headers['Last-Modified'] = _http_date(latest_ts_c)
+        resp.headers['Last-Modified'] = http_date(latest_ts_c)
         # Provide original canonical ISO in secondary header for clients that prefer it
         resp.headers['X-Last-Modified-ISO'] = latest_iso
     return resp, etag
@@ -85,13 +90,14 @@ def handle_conditional(etag_value: str, latest_ts: Optional[datetime]):
     Precedence: If-None-Match over If-Modified-Since (per RFC 9110 semantics).
     Returns a 304 response object if conditions satisfied, else None.
     """
-    inm = request.headers.get('If-None-Match')
-    if inm and inm.strip('"') == etag_value:
+    inm = request.if_none_match
+    # Compressed variants carry `<etag>-<encoding>`; any variant of the current ETag revalidates
+    if inm and any(strip_encoding(tag) == etag_value for tag in inm.as_set(include_weak=True)):
         resp = make_response('', 304)
         resp.headers['ETag'] = etag_value
         if latest_ts:
             latest_c = canonicalize_timestamp(latest_ts)
-            resp.headers['Last-Modified'] = _http_date(latest_c)
+            resp.headers['Last-Modified'] = http_date(latest_c)
             resp.headers['X-Last-Modified-ISO'] = latest_c.isoformat().replace('+00:00','Z')
         return resp
     # Only evaluate If-Modified-Since if If-None-Match was not a match / absent
@@ -104,7 +110,7 @@ def handle_conditional(etag_value: str, latest_ts: Optional[datetime]):
             if latest_c <= ims_c + TIMESTAMP_TOLERANCE:
                 resp = make_response('', 304)
                 resp.headers['ETag'] = etag_value
-                resp.headers['Last-Modified'] = _http_date(latest_c)
+                resp.headers['Last-Modified'] = http_date(latest_c)
                 resp.headers['X-Last-Modified-ISO'] = latest_c.isoformat().replace('+00:00','Z')
                 return resp
     return None
\ No newline at end of file
@@ -0,0 +1,189 @@
+from __future__ import annotations
+"""Dependency-free counters / histograms rendered in the Prometheus text format (0.0.4).
+
+Writes never take a lock: each thread accumulates into its own shard (a plain dict reached through
+`threading.local`), and a scrape sums the shards. A shard is registered once per thread and metric;
+when the thread exits, its totals are folded into a "retired" shard so thread-per-request servers
+do not grow the shard list. Label values are passed positionally as a tuple matching `labelnames`.
+
+Usage:
+    from app.utils.prom import Registry
+    registry = Registry()
+    requests = registry.counter('http_requests_total', 'Responses by status', ('status',))
+    requests.inc(('200',))
+    text = registry.render()
+"""
+import bisect
+import threading
+import weakref
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence, extra: str = '') -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _fmt(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ThreadOwner:
+    __slots__ = ('__weakref__',)
+
+
+class _Sharded:
+    kind = ''
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: Dict[int, dict] = {}
+        self._retired: dict = {}
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard: dict = {}
+            owner = _ThreadOwner()
+            self._local.shard, self._local.owner = shard, owner
+            with self._lock:
+                self._shards[id(shard)] = shard
+            # threading.local drops `owner` when the thread ends
+            weakref.finalize(owner, self._retire, shard)
+            return shard
+
+    def _retire(self, shard: dict) -> None:
+        with self._lock:
+            if self._shards.pop(id(shard), None) is not None:
+                self._merge(self._retired, list(shard.items()))
+
+    def _merge(self, into: dict, items) -> None:
+        raise NotImplementedError
+
+    def collect(self) -> dict:
+        """Label tuple -> merged value over every thread."""
+        with self._lock:
+            shards = list(self._shards.values())
+            merged: dict = {}
+            self._merge(merged, list(self._retired.items()))
+        for shard in shards:
+            self._merge(merged, list(shard.items()))
+        return merged
+
+
+class Counter(_Sharded):
+    kind = 'counter'
+
+    def inc(self, labels: Labels = (), amount: float = 1) -> None:
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def _merge(self, into: dict, items) -> None:
+        for labels, value in items:
+            into[labels] = into.get(labels, 0) + value
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_label_str(self.labelnames, labels)} {_fmt(value)}'
+                for labels, value in sorted(self.collect().items())]
+
+
+class Histogram(_Sharded):
+    kind = 'histogram'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Labels, value: float) -> None:
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # per-bucket (not cumulative) counts, then +Inf, then the sum
+            entry = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def _merge(self, into: dict, items) -> None:
+        for labels, entry in items:
+            acc = into.get(labels)
+            if acc is None:
+                into[labels] = list(entry)
+            else:
+                for i, v in enumerate(entry):
+                    acc[i] += v
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, entry in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = 'le="%s"' % _fmt(bound)
+                lines.append(f'{self.name}_bucket{_label_str(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_label_str(self.labelnames, labels)} {_fmt(entry[-1])}')
+            lines.append(f'{self.name}_count{_label_str(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+class GaugeFamily:
+    """Gauge values computed at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 samples: Iterable[Tuple[Labels, float]] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.samples = list(samples)
+
+    def render(self) -> List[str]:
+        return [f'{self.name}{_label_str(self.labelnames, labels)} {_fmt(value)}' for labels, value in self.samples]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing  # registering the same name again (module reload) returns the live series
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self, extra: Optional[Iterable[GaugeFamily]] = None) -> str:
+        out = []
+        for metric in list(self._metrics.values()) + list(extra or ()):
+            out.append(f'# HELP {metric.name} {metric.help}')
+            out.append(f'# TYPE {metric.name} {metric.kind}')
+            out.extend(metric.render())
+        return '\n'.join(out) + '\n'
+
+
+__all__ = ['Registry', 'Counter', 'Histogram', 'GaugeFamily', 'CONTENT_TYPE', 'DEFAULT_BUCKETS']
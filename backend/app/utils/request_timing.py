@@ -0,0 +1,178 @@
+from __future__ import annotations
+"""Per-request SQL instrumentation and phase timers (Server-Timing + structured log).
+
+With REQUEST_TIMING on, create_app installs engine / Session listeners and request hooks, and each
+request collects:
+  - db: statements executed and cumulative cursor time, over every engine (primary and replicas),
+  - phases from `timed(name)` blocks: auth, count, fetch, serialize, commit (flush + COMMIT),
+    audit, ... Repeated phases add up; each also records the statements run inside it. Phases may
+    nest (audit includes its own commit), so they do not sum to the total.
+  - total: before_request -> after_request.
+They leave as a `Server-Timing` header (REQUEST_TIMING_HEADER) and one log record per request on
+the `app.request_timing` logger, with the figures as `extra` fields.
+
+Off (the default), no listeners are installed and `timed()` returns a shared no-op context
+manager without touching the request context. Statements run on worker threads (report fan-out)
+are not attributed to the request.
+
+Usage:
+    from app.utils.request_timing import timed
+    with timed('fetch'):
+        rows = q.all()
+"""
+import contextlib
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_enabled = False
+_NOOP = contextlib.nullcontext()
+_SESSION_STARTS = 'request_timing_commit_starts'
+
+
+class RequestTimings:
+    __slots__ = ('started', 'db_count', 'db_seconds', 'phases', 'order')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_seconds = 0.0
+        self.phases: Dict[str, List[float]] = {}  # name -> [seconds, statements]
+        self.order: List[str] = []
+
+    def add_phase(self, name: str, seconds: float, statements: int) -> None:
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = [seconds, statements]
+            self.order.append(name)
+        else:
+            entry[0] += seconds
+            entry[1] += statements
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = [f'db;dur={self.db_seconds * 1000:.1f};desc="{self.db_count} queries"']
+        for name in self.order:
+            seconds, statements = self.phases[name]
+            parts.append(f'{name};dur={seconds * 1000:.1f};desc="{statements} sql"')
+        parts.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(parts)
+
+    def log_fields(self, total_ms: float) -> Dict[str, object]:
+        return {
+            'duration_ms': round(total_ms, 2),
+            'db_queries': self.db_count,
+            'db_ms': round(self.db_seconds * 1000, 2),
+            'phases_ms': {name: round(self.phases[name][0] * 1000, 2) for name in self.order},
+        }
+
+
+class _Phase:
+    __slots__ = ('timings', 'name', 'started', 'db_count')
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.db_count = self.timings.db_count
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timings.add_phase(self.name, time.perf_counter() - self.started, self.timings.db_count - self.db_count)
+        return False
+
+
+def current() -> Optional[RequestTimings]:
+    if not _enabled or not has_app_context():
+        return None
+    return g.get('_request_timings')
+
+
+def timed(name: str):
+    """Context manager adding the block's duration to phase `name` of the current request."""
+    timings = current()
+    return _NOOP if timings is None else _Phase(timings, name)
+
+
+def start_request() -> RequestTimings:
+    timings = g._request_timings = RequestTimings()
+    return timings
+
+
+# -- listeners -------------------------------------------------------------------------------------
+_local = threading.local()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stack = getattr(_local, 'starts', None)
+    if stack is None:
+        stack = _local.starts = []
+    stack.append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stack = getattr(_local, 'starts', None)
+    if not stack:
+        return
+    started = stack.pop()
+    timings = current()
+    if timings is not None:
+        timings.db_count += 1
+        timings.db_seconds += time.perf_counter() - started
+
+
+def _handle_error(exception_context) -> None:
+    stack = getattr(_local, 'starts', None)
+    if stack:
+        stack.pop()
+
+
+def _before_commit(session) -> None:
+    timings = current()
+    if timings is not None:
+        session.info.setdefault(_SESSION_STARTS, []).append((time.perf_counter(), timings.db_count))
+
+
+def _after_commit(session) -> None:
+    starts = session.info.get(_SESSION_STARTS)
+    if not starts:
+        return
+    started, db_count = starts.pop()
+    timings = current()
+    if timings is not None:
+        timings.add_phase('commit', time.perf_counter() - started, timings.db_count - db_count)
+
+
+def _after_rollback(session) -> None:
+    # A failed commit never reaches after_commit
+    session.info.pop(_SESSION_STARTS, None)
+
+
+def install_engine_timing(engine) -> None:
+    """Count and time statements on `engine` (idempotent)."""
+    global _enabled
+    _enabled = True
+    for name, fn in (('before_cursor_execute', _before_cursor_execute),
+                     ('after_cursor_execute', _after_cursor_execute),
+                     ('handle_error', _handle_error)):
+        if not event.contains(engine, name, fn):
+            event.listen(engine, name, fn)
+
+
+def install_session_timing() -> None:
+    """Time Session.commit (flush included) as the `commit` phase (idempotent)."""
+    for name, fn in (('before_commit', _before_commit), ('after_commit', _after_commit),
+                     ('after_rollback', _after_rollback)):
+        if not event.contains(Session, name, fn):
+            event.listen(Session, name, fn)
+
+
+__all__ = ['RequestTimings', 'timed', 'current', 'start_request', 'install_engine_timing', 'install_session_timing']
@@ -0,0 +1,250 @@
+from __future__ import annotations
+"""Connection profile, writer serialization and maintenance for file-backed SQLite.
+
+Applied to every new DBAPI connection (`connect` event):
+  - journal_mode=WAL: readers no longer block the writer (or vice versa); commits append to the
+    -wal file instead of rewriting pages in the main file.
+  - synchronous=NORMAL: fsync at checkpoints, not every commit. Safe with WAL (a power loss can
+    drop the last commits, never corrupt the database).
+  - cache_size / mmap_size: larger page cache per connection and memory-mapped reads.
+  - busy_timeout: how long a connection waits on another process's lock before "database is locked".
+  - temp_store=MEMORY: sorts and temp b-trees stay off disk.
+
+SQLite allows one writer at a time. With `write_lock` (SQLITE_WRITE_LOCK, off by default) threads
+of this process take `SqliteProfile.write_lock` (a FIFO `WriterQueue`) before their first write
+statement, so concurrent writers queue instead of sleeping in SQLite's busy handler. The `commit` /
+`rollback` engine events run the DBAPI COMMIT / ROLLBACK themselves and release the lock right
+after it (SQLAlchemy's own call that follows is then a no-op); a connection returned to the pool
+mid-transaction releases it on checkin. A writer that waits longer than busy_timeout for the lock
+fails with "database is locked", as it would have in SQLite's busy handler.
+pysqlite only opens a transaction right before the first DML statement, so the writer never holds
+an older read snapshot when it gets the lock. Other processes are still covered by busy_timeout.
+
+`start()` runs `PRAGMA optimize` and a truncating WAL checkpoint every `maintenance_seconds` on a
+background thread (never on a request); `maintain()` runs them now.
+
+Usage:
+    from app.utils.sqlite_profile import SqliteProfile
+    profile = SqliteProfile.from_config(app.config); profile.install(engine)
+"""
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Mapping, Optional
+
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+log = logging.getLogger(__name__)
+
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+_WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+_HOLDS_LOCK = 'sqlite_write_lock_held'
+
+
+def applies_to(engine) -> bool:
+    """File-backed SQLite only (in-memory databases share one connection and have no journal)."""
+    return engine.dialect.name == 'sqlite' and engine.url.database not in (None, '', ':memory:')
+
+
+class WriterQueue:
+    """FIFO lock: waiters are served in arrival order, and any thread may release it."""
+
+    def __init__(self):
+        self._mutex = threading.Lock()
+        self._held = False
+        self._waiters: Deque[threading.Event] = deque()
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        with self._mutex:
+            if not self._held and not self._waiters:
+                self._held = True
+                return True
+            if not blocking:
+                return False
+            turn = threading.Event()
+            self._waiters.append(turn)
+        if turn.wait(timeout):
+            return True
+        with self._mutex:
+            if turn.is_set():  # handed over while timing out
+                return True
+            self._waiters.remove(turn)
+            return False
+
+    def release(self) -> None:
+        with self._mutex:
+            if self._waiters:
+                self._waiters.popleft().set()  # hand over directly; stays held
+            elif self._held:
+                self._held = False
+            else:
+                raise RuntimeError('release of unheld writer queue')
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class SqliteProfile:
+    def __init__(self, synchronous: str = 'NORMAL', cache_size_kb: int = 65536, mmap_size: int = 268435456,
+                 busy_timeout_ms: int = 5000, write_lock: bool = False, maintenance_seconds: float = 300.0):
+        if synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of {', '.join(SYNCHRONOUS_MODES)}")
+        self.synchronous = synchronous.upper()
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.serialize_writes = write_lock
+        self.maintenance_seconds = maintenance_seconds
+        self.write_lock = WriterQueue()
+        self._engine = None
+        self._maintenance_lock = threading.Lock()
+        self._next_maintenance = time.monotonic() + maintenance_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._counters = {'write_locks': 0, 'write_lock_waits': 0, 'write_lock_timeouts': 0, 'maintenance_runs': 0}
+        self._last_checkpoint: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> 'SqliteProfile':
+        return cls(
+            synchronous=str(config['SQLITE_SYNCHRONOUS']),
+            cache_size_kb=int(config['SQLITE_CACHE_SIZE_KB']),
+            mmap_size=int(config['SQLITE_MMAP_SIZE']),
+            busy_timeout_ms=int(config['SQLITE_BUSY_TIMEOUT_MS']),
+            write_lock=bool(config['SQLITE_WRITE_LOCK']),
+            maintenance_seconds=float(config['SQLITE_MAINTENANCE_SECONDS']),
+        )
+
+    def install(self, engine) -> None:
+        self._engine = engine
+        event.listen(engine, 'connect', self._on_connect)
+        if self.serialize_writes:
+            event.listen(engine, 'before_cursor_execute', self._before_execute)
+            event.listen(engine, 'commit', self._commit)
+            event.listen(engine, 'rollback', self._rollback)
+            event.listen(engine.pool, 'checkin', self._on_checkin)
+
+    # -- connection profile ------------------------------------------------------------------------
+    def _on_connect(self, dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+            cursor.execute('PRAGMA journal_mode = WAL')
+            cursor.execute(f'PRAGMA synchronous = {self.synchronous}')
+            cursor.execute(f'PRAGMA cache_size = {-int(self.cache_size_kb)}')
+            cursor.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+            cursor.execute('PRAGMA temp_store = MEMORY')
+        finally:
+            cursor.close()
+
+    # -- writer serialization ----------------------------------------------------------------------
+    def _acquire(self, info, statement, parameters) -> None:
+        if info.get(_HOLDS_LOCK):
+            return
+        if not self.write_lock.acquire(blocking=False):
+            self._counters['write_lock_waits'] += 1
+            if not self.write_lock.acquire(timeout=self.busy_timeout_ms / 1000.0):
+                # Same outcome as SQLite's busy handler running out; writing anyway would only sleep there
+                self._counters['write_lock_timeouts'] += 1
+                raise OperationalError(statement, parameters, sqlite3.OperationalError('database is locked'))
+        self._counters['write_locks'] += 1
+        info[_HOLDS_LOCK] = True
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if statement.lstrip()[:7].upper().startswith(_WRITE_PREFIXES):
+            self._acquire(conn.info, statement, parameters)
+
+    def _release_info(self, info) -> None:
+        if info.pop(_HOLDS_LOCK, False):
+            self.write_lock.release()
+
+    def _end_transaction(self, conn, finish) -> None:
+        # Fired just before SQLAlchemy's COMMIT / ROLLBACK. Run it here so the lock goes to the next
+        # writer the moment it has finished; on failure keep the lock and let SQLAlchemy's own call
+        # raise (a failed COMMIT is followed by a rollback, which releases it)
+        if not conn.info.get(_HOLDS_LOCK):
+            return
+        try:
+            finish(conn.connection.dbapi_connection)
+        except sqlite3.Error:
+            return
+        self._release_info(conn.info)
+
+    def _commit(self, conn) -> None:
+        self._end_transaction(conn, lambda dbapi_connection: dbapi_connection.commit())
+
+    def _rollback(self, conn) -> None:
+        self._end_transaction(conn, lambda dbapi_connection: dbapi_connection.rollback())
+
+    def _on_checkin(self, dbapi_connection, connection_record) -> None:
+        if connection_record is not None:
+            self._release_info(connection_record.info)
+
+    # -- maintenance -------------------------------------------------------------------------------
+    def maintain(self) -> Optional[Dict[str, int]]:
+        """PRAGMA optimize plus a truncating WAL checkpoint; returns the checkpoint result.
+
+        Skipped (None) when this process's writers keep the writer lock busy for busy_timeout;
+        SQLite's automatic passive checkpoints still run meanwhile.
+        """
+        locked = self.serialize_writes and self.write_lock.acquire(timeout=self.busy_timeout_ms / 1000.0)
+        if self.serialize_writes and not locked:
+            log.info('sqlite maintenance: writer lock busy; skipped')
+            return None
+        try:
+            with self._engine.connect() as conn:
+                conn.exec_driver_sql('PRAGMA optimize')
+                busy, wal_pages, checkpointed = conn.exec_driver_sql('PRAGMA wal_checkpoint(TRUNCATE)').one()
+        finally:
+            if locked:
+                self.write_lock.release()
+        self._counters['maintenance_runs'] += 1
+        self._last_checkpoint = {'busy': busy, 'wal_pages': wal_pages, 'checkpointed': checkpointed}
+        if busy:
+            log.info('sqlite maintenance: checkpoint blocked by readers (%s of %s pages)', checkpointed, wal_pages)
+        return self._last_checkpoint
+
+    def maybe_maintain(self) -> bool:
+        """Run `maintain()` when the interval has elapsed; one caller at a time, others return at once."""
+        if self.maintenance_seconds <= 0 or time.monotonic() < self._next_maintenance:
+            return False
+        if not self._maintenance_lock.acquire(blocking=False):
+            return False
+        try:
+            self._next_maintenance = time.monotonic() + self.maintenance_seconds
+            return self.maintain() is not None
+        except Exception as e:
+            log.warning('sqlite maintenance failed: %s', e)
+            return False
+        finally:
+            self._maintenance_lock.release()
+
+    def start(self) -> None:
+        """Run maintenance on a daemon thread every `maintenance_seconds` (no-op when <= 0)."""
+        if self.maintenance_seconds <= 0 or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sqlite-maintenance', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(max(0.0, self._next_maintenance - time.monotonic())):
+            self.maybe_maintain()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._counters, 'write_lock_waiting': self.write_lock.waiting, 'last_checkpoint': self._last_checkpoint,
+                'synchronous': self.synchronous, 'busy_timeout_ms': self.busy_timeout_ms,
+                'write_lock': self.serialize_writes}
+
+
+__all__ = ['SqliteProfile', 'WriterQueue', 'applies_to', 'SYNCHRONOUS_MODES']
@@ -0,0 +1,78 @@
+from __future__ import annotations
+"""Time bucketing for time-series reports.
+
+SQL side: `truncate_expr` floors a timestamp column to the bucket start in the database
+(SQLite `strftime`, Postgres `date_trunc` of the UTC wall-clock time, so the session TimeZone
+does not shift bucket boundaries). Python side: `floor_bucket` / `bucket_range`
+produce the same bucket starts so results can be zero-filled into dense arrays.
+Weeks start on Monday (ISO), matching Postgres `date_trunc('week', ...)`.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import func
+
+BUCKETS = ('hour', 'day', 'week')
+BUCKET_STEP = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+    'week': timedelta(weeks=1),
+}
+_SQLITE_FMT = '%Y-%m-%d %H:00:00'
+_SQLITE_DAY_FMT = '%Y-%m-%d 00:00:00'
+
+
+def truncate_expr(column, bucket: str, dialect_name: str):
+    """SQL expression flooring `column` to the start of its bucket."""
+    if bucket not in BUCKETS:
+        raise ValueError(f'unsupported bucket {bucket}')
+    if dialect_name == 'sqlite':
+        if bucket == 'hour':
+            return func.strftime(_SQLITE_FMT, column)
+        if bucket == 'day':
+            return func.strftime(_SQLITE_DAY_FMT, column)
+        # 'weekday 0' advances to Sunday (same day if already Sunday); -6 days lands on Monday
+        return func.strftime(_SQLITE_DAY_FMT, column, 'weekday 0', '-6 days')
+    # date_trunc on a timestamptz truncates in the session TimeZone; timezone('UTC', ...) makes it UTC
+    return func.date_trunc(bucket, func.timezone('UTC', column))
+
+
+def floor_bucket(dt: datetime, bucket: str) -> datetime:
+    """Python equivalent of `truncate_expr` (result is UTC aware)."""
+    dt = dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+    if bucket == 'hour':
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == 'day':
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+def parse_bucket_value(value) -> Optional[datetime]:
+    """Normalize a truncated value returned by the database (string on SQLite) to UTC datetime."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S')
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def bucket_count(start: datetime, end: datetime, bucket: str) -> int:
+    """Number of buckets `bucket_range(start, end, bucket)` would return, without building them."""
+    span = floor_bucket(end, bucket) - floor_bucket(start, bucket)
+    return max(0, span // BUCKET_STEP[bucket] + 1)
+
+
+def bucket_range(start: datetime, end: datetime, bucket: str) -> List[datetime]:
+    """Bucket starts covering [start, end] inclusive."""
+    step = BUCKET_STEP[bucket]
+    cur, last = floor_bucket(start, bucket), floor_bucket(end, bucket)
+    out = []
+    while cur <= last:
+        out.append(cur)
+        cur += step
+    return out
+
+
+__all__ = ['BUCKETS', 'BUCKET_STEP', 'truncate_expr', 'floor_bucket', 'parse_bucket_value', 'bucket_count',
+           'bucket_range']
@@ -0,0 +1,61 @@
+from __future__ import annotations
+"""Upserts used by the incrementally maintained report tables."""
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import exists, func, insert, select, update
+
+
+def _dialect_insert(dialect: str):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    return dialect_insert
+
+
+def upsert_add(conn, table, keys: Iterable[str], rows: List[Dict[str, Any]], add_cols: Iterable[str]) -> None:
+    """Insert rows, or add `add_cols` onto the existing row with the same `keys` (and touch updated_at).
+
+    SQLite / Postgres use a single INSERT .. ON CONFLICT DO UPDATE; other dialects fall back to
+    UPDATE then INSERT per row. Rows must be unique per key within one call.
+    """
+    if not rows:
+        return
+    keys, add_cols = tuple(keys), tuple(add_cols)
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = _dialect_insert(dialect)(table).values(rows)
+        set_ = {c: table.c[c] + stmt.excluded[c] for c in add_cols}
+        set_['updated_at'] = func.now()
+        conn.execute(stmt.on_conflict_do_update(index_elements=[table.c[k] for k in keys], set_=set_))
+        return
+    for row in rows:
+        values = {c: table.c[c] + row[c] for c in add_cols}
+        values['updated_at'] = func.now()
+        res = conn.execute(update(table).where(*[table.c[k]==row[k] for k in keys]).values(**values))
+        if res.rowcount == 0:
+            conn.execute(insert(table).values(**row))
+
+
+def insert_missing(conn, table, keys: Iterable[str], rows: List[Dict[str, Any]]) -> None:
+    """Insert the rows whose `keys` do not exist yet and leave existing rows untouched.
+
+    For read-modify-write rows that cannot be merged in SQL (sketches): insert an empty row first,
+    then SELECT .. FOR UPDATE it, so concurrent first writers of a key queue on the row lock
+    instead of both inserting. SQLite / Postgres use INSERT .. ON CONFLICT DO NOTHING; other
+    dialects check then insert per row.
+    """
+    if not rows:
+        return
+    keys = tuple(keys)
+    dialect = conn.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        stmt = _dialect_insert(dialect)(table).values(rows)
+        conn.execute(stmt.on_conflict_do_nothing(index_elements=[table.c[k] for k in keys]))
+        return
+    for row in rows:
+        if not conn.execute(select(exists().where(*[table.c[k]==row[k] for k in keys]))).scalar():
+            conn.execute(insert(table).values(**row))
+
+
+__all__ = ['insert_missing', 'upsert_add']
@@ -0,0 +1,37 @@
+"""add token_revocations table
+
+Revision ID: 0005_token_revocations
+Revises: 0004_permission_updated_at
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0005_token_revocations'
+down_revision = '0004_permission_updated_at'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if not insp.has_table('token_revocations'):
+        op.create_table('token_revocations',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('jti', sa.String(length=64), nullable=True, unique=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('revoked_by', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+            sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True)
+        )
+        op.create_index('ix_token_revocations_user_id', 'token_revocations', ['user_id'])
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('token_revocations'):
+        try:
+            op.drop_index('ix_token_revocations_user_id', table_name='token_revocations')
+        except Exception:
+            pass
+        op.drop_table('token_revocations')
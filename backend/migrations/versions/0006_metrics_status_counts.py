@@ -0,0 +1,55 @@
+"""add metrics_status_counts read model
+
+Revision ID: 0006_metrics_status_counts
+Revises: 0005_token_revocations
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0006_metrics_status_counts'
+down_revision = '0005_token_revocations'
+branch_labels = None
+depends_on = None
+
+# (source table, domain label, amount column or None)
+SOURCES = (
+    ('orders', 'Order', 'total_cents'),
+    ('print_jobs', 'PrintJob', None),
+    ('purchase_orders', 'PurchaseOrder', 'total_cents'),
+    ('repair_tickets', 'RepairTicket', None),
+    ('accounting_transactions', 'AccountingTransaction', 'amount_cents'),
+    ('catalog_items', 'CatalogItem', None),
+    ('vendors', 'Vendor', None),
+)
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if not insp.has_table('metrics_status_counts'):
+        op.create_table('metrics_status_counts',
+            sa.Column('domain', sa.String(length=64), primary_key=True),
+            sa.Column('branch_id', sa.Integer(), primary_key=True),
+            sa.Column('status', sa.String(length=32), primary_key=True),
+            sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('sum_cents', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+        )
+    # Backfill from the source tables that exist in this database
+    for table, domain, amount in SOURCES:
+        if not insp.has_table(table):
+            continue
+        sum_expr = f'COALESCE(SUM({amount}), 0)' if amount else '0'
+        op.execute(sa.text(
+            f"DELETE FROM metrics_status_counts WHERE domain = '{domain}'"
+        ))
+        op.execute(sa.text(
+            f"INSERT INTO metrics_status_counts (domain, branch_id, status, count, sum_cents) "
+            f"SELECT '{domain}', branch_id, status, COUNT(id), {sum_expr} FROM {table} GROUP BY branch_id, status"
+        ))
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('metrics_status_counts'):
+        op.drop_table('metrics_status_counts')
@@ -0,0 +1,71 @@
+"""add metrics_daily_rollups and metrics_events journal
+
+Revision ID: 0007_metrics_daily_rollups
+Revises: 0006_metrics_status_counts
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0007_metrics_daily_rollups'
+down_revision = '0006_metrics_status_counts'
+branch_labels = None
+depends_on = None
+
+# (source table, domain label, amount column or None)
+SOURCES = (
+    ('orders', 'Order', 'total_cents'),
+    ('print_jobs', 'PrintJob', None),
+    ('purchase_orders', 'PurchaseOrder', 'total_cents'),
+    ('repair_tickets', 'RepairTicket', None),
+    ('accounting_transactions', 'AccountingTransaction', 'amount_cents'),
+    ('catalog_items', 'CatalogItem', None),
+    ('vendors', 'Vendor', None),
+)
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if not insp.has_table('metrics_events'):
+        op.create_table('metrics_events',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('domain', sa.String(length=64), nullable=False),
+            sa.Column('branch_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=32), nullable=False),
+            sa.Column('kind', sa.String(length=16), nullable=False),
+            sa.Column('amount_cents', sa.BigInteger(), nullable=False, server_default='0')
+        )
+        op.create_index('ix_metrics_events_ts', 'metrics_events', ['ts'])
+    if not insp.has_table('metrics_daily_rollups'):
+        op.create_table('metrics_daily_rollups',
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('domain', sa.String(length=64), primary_key=True),
+            sa.Column('branch_id', sa.Integer(), primary_key=True),
+            sa.Column('status', sa.String(length=32), primary_key=True),
+            sa.Column('created', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('transitioned', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('sum_cents', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+        )
+        op.create_index('ix_metrics_daily_rollups_domain_day', 'metrics_daily_rollups', ['domain', 'day'])
+        # Best-effort history: no transition log exists yet, so each existing row counts as
+        # created on the day of its updated_at in its current status.
+        day_expr = 'date(updated_at)' if bind.dialect.name == 'sqlite' else 'CAST(updated_at AS DATE)'
+        for table, domain, amount in SOURCES:
+            if not insp.has_table(table):
+                continue
+            sum_expr = f'COALESCE(SUM({amount}), 0)' if amount else '0'
+            op.execute(sa.text(
+                f"INSERT INTO metrics_daily_rollups (day, domain, branch_id, status, created, transitioned, sum_cents) "
+                f"SELECT {day_expr}, '{domain}', branch_id, status, COUNT(id), 0, {sum_expr} FROM {table} "
+                f"WHERE updated_at IS NOT NULL GROUP BY {day_expr}, branch_id, status"
+            ))
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('metrics_daily_rollups'):
+        op.drop_table('metrics_daily_rollups')
+    if insp.has_table('metrics_events'):
+        op.drop_table('metrics_events')
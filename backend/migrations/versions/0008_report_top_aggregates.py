@@ -0,0 +1,62 @@
+"""add report_top_aggregates leaderboard table
+
+Revision ID: 0008_report_top_aggregates
+Revises: 0007_metrics_daily_rollups
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0008_report_top_aggregates'
+down_revision = '0007_metrics_daily_rollups'
+branch_labels = None
+depends_on = None
+
+# (dimension, source table, key column, amount column or None, excluded status or None)
+SOURCES = (
+    ('customer', 'orders', 'customer_name', 'total_cents', 'CANCELLED'),
+    ('vendor', 'purchase_orders', 'vendor_name', 'total_cents', None),
+    ('product', 'print_jobs', 'product_id', None, None),
+)
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('report_top_aggregates'):
+        return
+    op.create_table('report_top_aggregates',
+        sa.Column('dimension', sa.String(length=16), primary_key=True),
+        sa.Column('period', sa.Date(), primary_key=True),
+        sa.Column('branch_id', sa.Integer(), primary_key=True),
+        sa.Column('key', sa.String(length=150), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('sum_cents', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    op.create_index('ix_report_top_aggregates_dim_period_branch', 'report_top_aggregates', ['dimension', 'period', 'branch_id'])
+    # Backfill: existing rows are booked in the month of their updated_at
+    if bind.dialect.name == 'sqlite':
+        period_expr = "date(updated_at, 'start of month')"
+        key_cast = 'CAST({col} AS TEXT)'
+    else:
+        period_expr = "CAST(date_trunc('month', updated_at) AS DATE)"
+        key_cast = 'CAST({col} AS VARCHAR)'
+    for dimension, table, key_col, amount, excluded in SOURCES:
+        if not insp.has_table(table):
+            continue
+        sum_expr = f'COALESCE(SUM({amount}), 0)' if amount else '0'
+        where = [f'{key_col} IS NOT NULL', 'updated_at IS NOT NULL']
+        if excluded:
+            where.append(f"status <> '{excluded}'")
+        key_expr = key_cast.format(col=key_col)
+        op.execute(sa.text(
+            f"INSERT INTO report_top_aggregates (dimension, period, branch_id, key, count, sum_cents) "
+            f"SELECT '{dimension}', {period_expr}, branch_id, {key_expr}, COUNT(id), {sum_expr} FROM {table} "
+            f"WHERE {' AND '.join(where)} GROUP BY {period_expr}, branch_id, {key_expr}"
+        ))
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('report_top_aggregates'):
+        op.drop_table('report_top_aggregates')
@@ -0,0 +1,54 @@
+"""add customer_sketches HyperLogLog table
+
+Revision ID: 0009_customer_sketches
+Revises: 0008_report_top_aggregates
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from collections import defaultdict
+from datetime import date
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+from app.utils.hll import HyperLogLog
+
+revision = '0009_customer_sketches'
+down_revision = '0008_report_top_aggregates'
+branch_labels = None
+depends_on = None
+
+SOURCES = ('orders', 'repair_tickets')
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('customer_sketches'):
+        return
+    table = op.create_table('customer_sketches',
+        sa.Column('branch_id', sa.Integer(), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('registers', sa.LargeBinary(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+    )
+    # Backfill: existing rows are sketched under the UTC day of their updated_at
+    day_expr = 'date(updated_at)' if bind.dialect.name == 'sqlite' else 'CAST(updated_at AS DATE)'
+    sketches = defaultdict(HyperLogLog)
+    for source in SOURCES:
+        if not insp.has_table(source):
+            continue
+        rows = bind.execute(sa.text(
+            f"SELECT DISTINCT branch_id, {day_expr}, lower(trim(customer_name)) FROM {source} "
+            f"WHERE customer_name IS NOT NULL AND updated_at IS NOT NULL"
+        ))
+        for branch_id, day, name in rows:
+            sketches[(branch_id, str(day))].add(name)
+    if sketches:
+        op.bulk_insert(table, [
+            {'branch_id': branch_id, 'day': date.fromisoformat(day[:10]), 'registers': sketch.to_bytes()}
+            for (branch_id, day), sketch in sketches.items()
+        ])
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('customer_sketches'):
+        op.drop_table('customer_sketches')
@@ -0,0 +1,49 @@
+"""add status_transitions history and status_duration_sketches
+
+Revision ID: 0010_status_transitions
+Revises: 0009_customer_sketches
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0010_status_transitions'
+down_revision = '0009_customer_sketches'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if not insp.has_table('status_transitions'):
+        op.create_table('status_transitions',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('entity', sa.String(length=64), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('branch_id', sa.Integer(), nullable=False),
+            sa.Column('from_status', sa.String(length=32), nullable=True),
+            sa.Column('to_status', sa.String(length=32), nullable=False),
+            sa.Column('ts', sa.DateTime(timezone=True), nullable=False),
+            sa.Column('duration_seconds', sa.Float(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True)
+        )
+        op.create_index('ix_status_transitions_entity_id_ts', 'status_transitions', ['entity', 'entity_id', 'ts'])
+    if not insp.has_table('status_duration_sketches'):
+        op.create_table('status_duration_sketches',
+            sa.Column('day', sa.Date(), primary_key=True),
+            sa.Column('domain', sa.String(length=64), primary_key=True),
+            sa.Column('branch_id', sa.Integer(), primary_key=True),
+            sa.Column('status', sa.String(length=32), primary_key=True),
+            sa.Column('sketch', sa.LargeBinary(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP'))
+        )
+        op.create_index('ix_status_duration_sketches_domain_day', 'status_duration_sketches', ['domain', 'day'])
+    # No backfill: entry times of existing rows are unknown, so history starts at upgrade time
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('status_duration_sketches'):
+        op.drop_table('status_duration_sketches')
+    if insp.has_table('status_transitions'):
+        op.drop_table('status_transitions')
@@ -0,0 +1,29 @@
+"""add replica_heartbeat for read-replica lag checks
+
+Revision ID: 0011_replica_heartbeat
+Revises: 0010_status_transitions
+Create Date: 2026-10-18
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0011_replica_heartbeat'
+down_revision = '0010_status_transitions'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if not insp.has_table('replica_heartbeat'):
+        op.create_table('replica_heartbeat',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('ts', sa.DateTime(timezone=True), nullable=False)
+        )
+    # No seed row: the first write after upgrade stamps it (replicas read as fresh until then)
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('replica_heartbeat'):
+        op.drop_table('replica_heartbeat')
@@ -0,0 +1,30 @@
+"""index token_revocations.revoked_at for blocklist refreshes
+
+Revision ID: 0012_token_revocations_revoked_at
+Revises: 0011_replica_heartbeat
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+from sqlalchemy import inspect
+
+revision = '0012_token_revocations_revoked_at'
+down_revision = '0011_replica_heartbeat'
+branch_labels = None
+depends_on = None
+
+INDEX = 'ix_token_revocations_revoked_at'
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('token_revocations'):
+        if INDEX not in {ix['name'] for ix in insp.get_indexes('token_revocations')}:
+            op.create_index(INDEX, 'token_revocations', ['revoked_at'])
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    if insp.has_table('token_revocations'):
+        try:
+            op.drop_index(INDEX, table_name='token_revocations')
+        except Exception:
+            pass
@@ -0,0 +1,34 @@
+"""add customer_seen_on to orders and repair_tickets
+
+Revision ID: 0013_customer_seen_on
+Revises: 0012_token_revocations_revoked_at
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect
+
+revision = '0013_customer_seen_on'
+down_revision = '0012_token_revocations_revoked_at'
+branch_labels = None
+depends_on = None
+
+TABLES = ('orders', 'repair_tickets')
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    for name in TABLES:
+        if not insp.has_table(name) or 'customer_seen_on' in {c['name'] for c in insp.get_columns(name)}:
+            continue
+        op.add_column(name, sa.Column('customer_seen_on', sa.Date(), nullable=True))
+        # Best available approximation for existing rows: the day they were last written
+        table = sa.table(name, sa.column('customer_seen_on', sa.Date()), sa.column('updated_at', sa.DateTime(timezone=True)))
+        op.execute(table.update().values(customer_seen_on=sa.func.date(table.c.updated_at)))
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    for name in TABLES:
+        if insp.has_table(name) and 'customer_seen_on' in {c['name'] for c in insp.get_columns(name)}:
+            with op.batch_alter_table(name) as batch:
+                batch.drop_column('customer_seen_on')
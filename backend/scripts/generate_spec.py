@@ -20,25 +20,20 @@ Exit Codes:
   3 other error
 """
 from __future__ import annotations
-import argparse, json, hashlib, pathlib, sys
+import argparse, json, pathlib, sys
 
 # Allow running from repo root or backend/ directory
 ROOT = pathlib.Path(__file__).resolve().parents[2]
 TESTS_DIR = ROOT / 'backend' / 'tests'
 SNAPSHOT = TESTS_DIR / 'openapi_spec_hash.txt'
 
-try:
-    from app.openapi import build_openapi_spec  # type: ignore
-except ImportError:
-    # fallback if module path differs
-    from app.openapi_builder import build_openapi_spec  # type: ignore
+from app.openapi import build_openapi_spec, canonical_spec_bytes, spec_hash  # type: ignore
 
 
 def compute_spec_and_hash():
+    # Same bytes / hash that GET /openapi.json serves as its body / ETag
     spec = build_openapi_spec()
-    blob = json.dumps(spec, sort_keys=True, separators=(',', ':')).encode()
-    h = hashlib.sha256(blob).hexdigest()
-    return spec, h
+    return spec, spec_hash(canonical_spec_bytes(spec))
 
 
 def main(argv: list[str]) -> int:
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""Plan every list-route filter / sort combination on a seeded SQLite database and suggest indexes.
+
+Filters and sort keys are discovered by probing the list routes (see tools/index_advisor.py);
+each combination's page and count statements go through EXPLAIN QUERY PLAN. Full scans of filtered
+statements and whole-result temp B-tree sorts are flagged, candidate composite indexes are verified
+on the seeded database, and the ones the planner uses can be written as an Alembic revision.
+
+Usage:
+    python backend/scripts/index_advisor.py                      # findings + verified candidates
+    python backend/scripts/index_advisor.py --write-migration    # also write migrations/versions/NNNN_list_query_indexes.py
+    python backend/scripts/index_advisor.py --check              # exit 2 when a plan regressed vs the baseline
+    python backend/scripts/index_advisor.py --update-baseline    # rewrite tests/query_plan_baseline.json
+    python backend/scripts/index_advisor.py --json
+
+Exit Codes:
+  0 success / no regression in --check mode
+  2 regression in --check mode (a case has a finding the baseline does not)
+"""
+from __future__ import annotations
+import os, sys, argparse, json, pathlib, re
+
+# Allow running from repo root
+sys.path.append(os.path.abspath('backend'))
+
+from tools.index_advisor import (baseline_of, compare_baseline, findings_of, render_migration,  # type: ignore
+                                 seeded_advisor)
+
+BACKEND = pathlib.Path(__file__).resolve().parents[1]
+BASELINE = BACKEND / 'tests' / 'query_plan_baseline.json'
+VERSIONS = BACKEND / 'migrations' / 'versions'
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="List-query index advisor / plan regression check")
+    p.add_argument('--rows', type=int, default=None, help='Rows seeded per table (default: baseline value)')
+    p.add_argument('--seed', type=int, default=None, help='Random seed for synthetic rows (default: baseline value)')
+    p.add_argument('--max-per-table', type=int, default=3, help='Candidate indexes kept per table')
+    p.add_argument('--check', action='store_true', help='Compare findings with the baseline; exit 2 on regression')
+    p.add_argument('--update-baseline', action='store_true', help='Overwrite tests/query_plan_baseline.json')
+    p.add_argument('--write-migration', action='store_true', help='Write the candidate Alembic revision')
+    p.add_argument('--json', action='store_true', help='Print the full report as JSON')
+    return p.parse_args()
+
+
+def next_revision():
+    """(new revision id, current head) from migrations/versions."""
+    revisions, parents, numbers = set(), set(), [0]
+    for path in VERSIONS.glob('*.py'):
+        src = path.read_text()
+        rev = re.search(r"^revision = '([^']+)'", src, re.M)
+        down = re.search(r"^down_revision = '([^']+)'", src, re.M)
+        if rev:
+            revisions.add(rev.group(1))
+        if down:
+            parents.add(down.group(1))
+        if path.stem[:4].isdigit():
+            numbers.append(int(path.stem[:4]))
+    heads = sorted(revisions - parents)
+    if len(heads) != 1:
+        raise SystemExit(f'Expected one migration head, found {heads}')
+    return f'{max(numbers) + 1:04d}_list_query_indexes', heads[0]
+
+
+def print_report(report):
+    for route in report['routes']:
+        print(f"[ROUTE] {route['route']} table={route['table']} filters={route['filters']} sorts={route['sorts']}")
+    flagged = {k: findings_of(c) for k, c in report['cases'].items() if findings_of(c)}
+    for key, findings in flagged.items():
+        print(f"[FLAG] {key}: {'; '.join(findings)}")
+    for cand in report['candidates']:
+        print(f"[INDEX] {cand['name']} ON {cand['table']} ({', '.join(cand['columns'])}) "
+              f"resolves {len(cand['resolves'])} statement(s)")
+    print(f"[INFO] {len(report['cases'])} case(s), {len(flagged)} flagged, "
+          f"{len(report['candidates'])} candidate index(es), {len(report['residual'])} still flagged with them.")
+
+
+def main():
+    args = parse_args()
+    baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+    rows = args.rows or baseline.get('rows', 1000)
+    seed = args.seed if args.seed is not None else baseline.get('seed', 7)
+    propose = not args.check or args.write_migration
+    advisor = seeded_advisor(rows=rows, seed=seed)
+    report = advisor.run(propose=propose, max_per_table=args.max_per_table)
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+    if args.write_migration and report['candidates']:
+        revision, head = next_revision()
+        path = VERSIONS / f'{revision}.py'
+        path.write_text(render_migration(report['candidates'], revision, head))
+        print(f'[INFO] Wrote candidate migration {path}')
+
+    if args.update_baseline:
+        BASELINE.write_text(json.dumps(baseline_of(report, rows, seed), indent=2) + '\n')
+        print(f'[INFO] Updated plan baseline {BASELINE}')
+
+    if args.check:
+        diff = compare_baseline(report, baseline)
+        for key, findings in diff['improved'].items():
+            print(f"[IMPROVED] {key}: {'; '.join(findings)} (run --update-baseline to record)")
+        for key, findings in diff['regressed'].items():
+            print(f"[REGRESSED] {key}: {'; '.join(findings)}", file=sys.stderr)
+        if diff['regressed']:
+            return 2
+        print('[INFO] No plan regressions against the baseline.')
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+"""Verify and repair the `report_top_aggregates` leaderboard rows behind /reports/top.
+
+Each (dimension, branch, key)'s bookings summed over every month must equal the source table's
+current total for that key. Differences are booked in the current month.
+
+Usage:
+    python backend/scripts/rebuild_top.py            # report drift and book corrections
+    python backend/scripts/rebuild_top.py --check    # report drift only; exit 3 when drift is found
+    python backend/scripts/rebuild_top.py --json     # machine-readable drift report
+"""
+from __future__ import annotations
+import os, sys, argparse, json
+
+# Allow running from repo root
+sys.path.append(os.path.abspath('backend'))
+
+from app import create_app, get_db  # type: ignore
+from app.services.report_top import verify_top_aggregates
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Verify / repair the leaderboard aggregates")
+    p.add_argument('--check', action='store_true', help='Only report drift (no writes); exits 3 when drift exists')
+    p.add_argument('--json', action='store_true', help='Print the drift report as JSON')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = create_app({'LAZY_BLUEPRINTS': True})  # no requests served: skip importing the route modules
+    with app.app_context():
+        session = get_db()
+        drift = verify_top_aggregates(session, repair=not args.check)
+        if args.json:
+            print(json.dumps({'drift': drift, 'repaired': bool(drift) and not args.check}, indent=2))
+        elif not drift:
+            print('[INFO] report_top_aggregates matches source tables.')
+        else:
+            for d in drift:
+                print(f"[DRIFT] {d['dimension']} branch={d['branch_id']} key={d['key']} "
+                      f"expected={d['expected']} actual={d['actual']}")
+            print(f"[INFO] {len(drift)} drifted key(s); " + ('no changes written (--check).' if args.check else 'corrections booked in the current month.'))
+        if drift and args.check:
+            sys.exit(3)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+"""Fold the `metrics_events` journal into `metrics_daily_rollups`.
+
+The flush hook now upserts the daily rollups directly; run this once after upgrading to drain
+events journaled by earlier versions (readers count them correctly until then).
+
+Usage:
+    python backend/scripts/rollup_metrics.py                  # fold all pending events
+    python backend/scripts/rollup_metrics.py --batch-size 1000
+"""
+from __future__ import annotations
+import os, sys, argparse
+
+# Allow running from repo root
+sys.path.append(os.path.abspath('backend'))
+
+from app import create_app, get_db  # type: ignore
+from app.services.report_metrics import fold_metric_events
+
+
+def parse_args():
+    p = argparse.ArgumentParser(description="Fold metrics events into daily rollups")
+    p.add_argument('--batch-size', type=int, default=5000, help='Events folded per transaction')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    app = create_app({'LAZY_BLUEPRINTS': True})  # no requests served: skip importing the route modules
+    with app.app_context():
+        folded = fold_metric_events(get_db(), batch_size=args.batch_size)
+        print(f'[INFO] Folded {folded} metrics event(s) into daily rollups.')
+
+
+if __name__ == '__main__':
+    main()
@@ -134,7 +134,7 @@ def build_role_permission_map(session):
 
 def main():
     args = parse_args()
-    app = create_app()
+    app = create_app({'LAZY_BLUEPRINTS': True})  # no requests served: skip importing the route modules
     with app.app_context():
         session = get_db()
         try:
@@ -143,6 +143,7 @@ def main():
         except Exception:
             # Auto-create schema for bootstrap; in real env prefer alembic upgrade
             from app.models.authz import Base  # local import to avoid circular
+            app.extensions['blueprints'].load_all()  # import every route module's models before create_all
             engine = session.get_bind()
             Base.metadata.create_all(engine)
         finally:
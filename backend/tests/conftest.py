@@ -1,9 +1,10 @@
 import os, sys, pytest
+from contextlib import contextmanager
 # Ensure project root and backend directory are on path so 'app' can be imported
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app import create_app, get_db
 from app.models.authz import Base, Permission  # ensure Permission model referenced
@@ -16,10 +17,21 @@ import app.models.catalog_item  # noqa: F401
 import app.models.purchase_order  # noqa: F401
 import app.models.vendor  # noqa: F401
 import app.models.repair_ticket  # noqa: F401
+import app.models.token_revocation  # noqa: F401
+import app.models.metrics_status_count  # noqa: F401
+import app.models.metrics_rollup  # noqa: F401
+import app.models.report_top_aggregate  # noqa: F401
+import app.models.customer_sketch  # noqa: F401
+import app.models.status_transition  # noqa: F401
+import app.models.replica_heartbeat  # noqa: F401
 
 @pytest.fixture(scope='session', autouse=True)
 def app_instance():
     os.environ['DATABASE_URL'] = 'sqlite+pysqlite:///:memory:'
+    os.environ.setdefault('METRICS_ENABLED', 'true')
+    os.environ.setdefault('METRICS_TOKEN', 'test-scrape-token')
+    os.environ.setdefault('SLOW_QUERY_LOG', 'true')
+    os.environ.setdefault('SLOW_QUERY_EXPLAIN', 'true')
     app = create_app()
     # After app and blueprints are registered, ensure all tables exist
     with app.app_context():
@@ -30,3 +42,46 @@ def app_instance():
 @pytest.fixture()
 def client(app_instance):
     return app_instance.test_client()
+
+
+class QueryCounter:
+    """Collect SQL statements executed on the app engine while active."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._before)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._before)
+        return False
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture()
+def assert_max_queries(app_instance):
+    """Context manager factory failing the test when a block issues more than `limit` statements.
+
+    Usage:
+        with assert_max_queries(6):
+            client.get('/iam/roles', headers=headers)
+    """
+    @contextmanager
+    def _guard(limit: int):
+        with app_instance.app_context():
+            engine = get_db().get_bind()
+        with QueryCounter(engine) as qc:
+            yield qc
+        assert qc.count <= limit, (
+            f'Expected at most {limit} SQL statements, got {qc.count}:\n' + '\n'.join(qc.statements)
+        )
+    return _guard
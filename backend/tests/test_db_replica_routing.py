@@ -0,0 +1,180 @@
+import time
+from datetime import timedelta, timezone
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import create_engine, insert, delete
+
+import app as app_module
+from app import create_app
+from app.models.authz import Base
+from app.models.order import Order
+from app.models.replica_heartbeat import ReplicaHeartbeat
+from app.services.db_router import ReplicaRouter, LAST_WRITE_COOKIE, LAST_WRITE_HEADER
+
+BRANCH = 7311
+PERMS = ['SALES.READ', 'SALES.CREATE']
+
+
+@pytest.fixture()
+def replica_app(tmp_path):
+    """Primary plus two replica SQLite files; 'replication' is done by hand in each test."""
+    saved = app_module.db_engine, app_module.SessionLocal
+    urls = [f"sqlite:///{tmp_path / name}.db" for name in ('primary', 'replica0', 'replica1')]
+    engines = [create_engine(u) for u in urls]
+    for engine in engines:
+        Base.metadata.create_all(engine)
+    app = create_app({
+        'DATABASE_URL': urls[0], 'DATABASE_REPLICA_URLS': ','.join(urls[1:]),
+        'DB_REPLICA_CHECK_SECONDS': 0, 'DB_REPLICA_MAX_LAG_SECONDS': 5, 'DB_READ_YOUR_WRITES_SECONDS': 10,
+    })
+    try:
+        yield app, engines
+    finally:
+        app_module.SessionLocal.remove()
+        for replica in app.extensions['db_router'].replicas:
+            replica.engine.dispose()
+        app_module.db_engine.dispose()
+        for engine in engines:
+            engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def _headers(app):
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={
+            'perms': PERMS, 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+        })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _replicate(engines, heartbeat=None, lag=None):
+    """Give each replica its own marker order and a heartbeat `lag[i]` seconds behind `heartbeat`."""
+    for i, engine in enumerate(engines[1:]):
+        with engine.begin() as conn:
+            conn.execute(delete(Order.__table__))
+            conn.execute(insert(Order.__table__).values(customer_name=f'replica-{i}', branch_id=BRANCH, total_cents=0,
+                                                        status='draft', created_by=1))
+            conn.execute(delete(ReplicaHeartbeat.__table__))
+            if heartbeat is not None:
+                behind = (lag or [0, 0])[i]
+                conn.execute(insert(ReplicaHeartbeat.__table__).values(id=1, ts=heartbeat - timedelta(seconds=behind)))
+
+
+def _replicate_and_probe(app, engines, heartbeat=None, lag=None):
+    _replicate(engines, heartbeat, lag)
+    app.extensions['db_router'].probe()
+
+
+def _primary_heartbeat(engines):
+    with engines[0].connect() as conn:
+        ts = conn.execute(ReplicaHeartbeat.__table__.select()).one().ts
+    return ts.replace(tzinfo=timezone.utc)
+
+
+def _read(client, headers, **extra):
+    r = client.get('/sales/orders', headers={**headers, **extra})
+    assert r.status_code == 200
+    return r.headers['X-DB-Route'], [o['customer_name'] for o in r.get_json()['data']]
+
+
+def test_reads_round_robin_writes_and_recent_writers_use_primary(replica_app):
+    app, engines = replica_app
+    headers = _headers(app)
+    writer = app.test_client()
+    created = writer.post('/sales/orders', json={'customer_name': 'Primary Row', 'branch_id': BRANCH, 'total_cents': 5},
+                          headers=headers)
+    assert created.status_code == 201 and created.headers['X-DB-Route'] == 'primary'
+    stamp = created.headers[LAST_WRITE_HEADER]
+    assert abs(int(stamp) / 1000 - time.time()) < 5
+    assert LAST_WRITE_COOKIE in created.headers['Set-Cookie']
+    _replicate_and_probe(app, engines, _primary_heartbeat(engines))
+
+    # The writer's cookie pins its reads to the primary, which already has the new row
+    assert _read(writer, headers) == ('primary', ['Primary Row'])
+
+    reader = app.test_client()
+    routes = [_read(reader, headers) for _ in range(4)]
+    assert routes == [('replica-0', ['replica-0']), ('replica-1', ['replica-1'])] * 2
+    # An API client echoing the write stamp gets the same treatment as the cookie
+    assert _read(reader, headers, **{LAST_WRITE_HEADER: stamp})[0] == 'primary'
+    stale = str(int((time.time() - 60) * 1000))
+    assert _read(reader, headers, **{LAST_WRITE_HEADER: stale})[0].startswith('replica-')
+
+
+def test_lagging_replicas_fall_back_to_primary(replica_app):
+    app, engines = replica_app
+    headers = _headers(app)
+    client = app.test_client()
+    client.post('/sales/orders', json={'customer_name': 'Primary Row', 'branch_id': BRANCH}, headers=headers)
+    client.delete_cookie(LAST_WRITE_COOKIE)
+    beat = _primary_heartbeat(engines)
+
+    _replicate_and_probe(app, engines, beat, lag=[60, 0])
+    assert {_read(client, headers)[0] for _ in range(3)} == {'replica-1'}
+    router = app.extensions['db_router']
+    assert [r['healthy'] for r in router.stats()] == [False, True]
+    assert router.stats()[0]['lag_seconds'] == pytest.approx(60)
+
+    _replicate_and_probe(app, engines, beat, lag=[60, 60])
+    assert _read(client, headers) == ('primary', ['Primary Row'])
+    # A replica that has not received the first heartbeat yet is treated as lagging too
+    _replicate_and_probe(app, engines, None)
+    assert _read(client, headers)[0] == 'primary'
+
+
+def test_least_latency_prefers_fastest_healthy_replica(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'db{i}.db'}") for i in range(3)]
+    for engine in engines:
+        Base.metadata.create_all(engine)
+    router = ReplicaRouter(engines[0], engines[1:], strategy='least_latency', check_seconds=3600)
+    router.probe()
+    assert all(r['healthy'] for r in router.stats())
+    router.replicas[0].latency_ms, router.replicas[1].latency_ms = 9.0, 2.0
+    assert router.pick().name == 'replica-1'
+    router.replicas[1].healthy = False
+    assert router.pick().name == 'replica-0'
+    router.replicas[0].healthy = False
+    assert router.pick() is None
+    with pytest.raises(ValueError):
+        ReplicaRouter(engines[0], engines[1:], strategy='random')
+    for engine in engines:
+        engine.dispose()
+
+
+def test_only_requests_that_wrote_pin_to_primary(replica_app):
+    app, engines = replica_app
+
+    @app.route('/_test/noop', methods=['POST'])
+    def noop():
+        from app import get_db
+        get_db().execute(Order.__table__.select()).all()  # reads only
+        return {'ok': True}
+
+    client = app.test_client()
+    r = client.post('/_test/noop')
+    assert r.status_code == 200 and LAST_WRITE_HEADER not in r.headers and 'Set-Cookie' not in r.headers
+
+
+def test_background_probe_keeps_requests_off_the_probe_path(tmp_path):
+    engines = [create_engine(f"sqlite:///{tmp_path / f'db{i}.db'}") for i in range(2)]
+    for engine in engines:
+        Base.metadata.create_all(engine)
+    router = ReplicaRouter(engines[0], engines[1:], check_seconds=0.05)
+    probes = []
+    real_probe = router.probe
+    router.probe = lambda: (probes.append(1), real_probe())
+    assert router.pick() is None and not probes  # unknown replicas are not used, and pick() never probes
+    router.start()
+    try:
+        deadline = time.time() + 5
+        while len(probes) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        assert len(probes) >= 2 and router.pick().name == 'replica-0'
+    finally:
+        router.stop()
+    settled = len(probes)
+    time.sleep(0.15)
+    assert len(probes) == settled
+    for engine in engines:
+        engine.dispose()
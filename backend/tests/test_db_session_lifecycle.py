@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import app as app_module
+from app import create_app, get_db
+from app.models.vendor import Vendor
+from app.utils.db_pool import engine_options, CheckoutTracker
+
+POOL_CONFIG = {
+    'DB_POOL_SIZE': 3, 'DB_MAX_OVERFLOW': 2, 'DB_POOL_TIMEOUT': 7,
+    'DB_POOL_RECYCLE': 600, 'DB_POOL_PRE_PING': True,
+}
+
+
+@pytest.fixture()
+def pooled_app(tmp_path):
+    """App on a file-backed SQLite database (QueuePool); restores the shared test engine afterwards."""
+    saved = app_module.db_engine, app_module.SessionLocal
+    app = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'lifecycle.db'}", **POOL_CONFIG})
+    try:
+        yield app
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_engine_options_configure_queue_pool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", **engine_options(POOL_CONFIG))
+    pool = engine.pool
+    assert pool.size() == 3
+    assert pool._max_overflow == 2 and pool._timeout == 7 and pool._recycle == 600 and pool._pre_ping
+    tracker = CheckoutTracker()
+    tracker.install(engine)
+    conns = [engine.connect() for _ in range(2)]
+    assert len(tracker.held_by_current_thread()) == 2
+    for c in conns:
+        c.close()
+    assert tracker.held_by_current_thread() == []
+    engine.dispose()
+
+
+def test_teardown_returns_session_to_pool(pooled_app, caplog):
+    assert app_module.db_engine.pool.size() == 3
+    with pooled_app.app_context():
+        get_db().execute(text('SELECT 1'))
+        assert app_module.SessionLocal.registry.has()
+        assert app_module.db_engine.pool.checkedout() == 1
+    assert not app_module.SessionLocal.registry.has()
+    assert app_module.db_engine.pool.checkedout() == 0
+    assert pooled_app.test_client().get('/healthz').status_code == 200
+    assert 'still checked out' not in caplog.text
+
+
+def test_teardown_logs_leaked_connections_and_discarded_changes(pooled_app, caplog):
+    caplog.set_level(logging.WARNING)
+    with pooled_app.app_context():
+        leaked = app_module.db_engine.connect()
+        get_db().add(Vendor(name='Never committed', branch_id=1))
+    assert 'discarding uncommitted changes' in caplog.text
+    assert '1 connection(s) still checked out after teardown (app context)' in caplog.text
+    leaked.close()
+    caplog.clear()
+    # Reported once, not again on the next clean context
+    with pooled_app.app_context():
+        get_db().execute(text('SELECT 1'))
+    assert 'still checked out' not in caplog.text
+
+
+def test_request_keeps_session_owned_by_enclosing_scope(pooled_app, caplog):
+    caplog.set_level(logging.WARNING)
+    session = get_db()
+    session.execute(text('SELECT 1'))
+    assert pooled_app.test_client().get('/healthz').status_code == 200
+    assert app_module.SessionLocal.registry.has() and get_db() is session
+    assert 'still checked out' not in caplog.text
@@ -0,0 +1,71 @@
+from sqlalchemy import event
+from app import get_db
+from app.models.audit import AuditLog
+from app.models.authz import RolePermission, UserRole
+from tests.test_utils_seed import ensure_permissions, ensure_user, ensure_role
+from tests.test_lifecycle_helpers import jwt_headers
+
+
+def _capture_statements(engine):
+    stmts = []
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        stmts.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    return stmts, lambda: event.remove(engine, 'before_cursor_execute', before)
+
+
+def test_replace_role_permissions_writes_only_the_diff(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        perms = ensure_permissions(['ADMIN.ROLE.MANAGE', 'ACC.READ', 'ACC.PAY', 'ACC.APPROVE', 'ACC.EXPORT'])
+        admin = ensure_user('iam_sets_admin@example.com')
+        headers = jwt_headers(admin.id, ['ADMIN.ROLE.MANAGE'])
+        role = ensure_role('SetDiffRole', ['ACC.READ', 'ACC.PAY'])
+        resp = client.put(f'/iam/roles/{role.id}/permissions', json={'permissions': ['ACC.READ', 'ACC.APPROVE', 'ACC.EXPORT']}, headers=headers)
+        assert resp.status_code == 200, resp.get_json()
+        body = resp.get_json()
+        assert body['added'] == ['ACC.APPROVE', 'ACC.EXPORT']
+        assert body['removed'] == ['ACC.PAY']
+        audit = get_db().query(AuditLog).filter(AuditLog.action=='ROLE.PERM.REPLACE', AuditLog.entity_id==str(role.id)).order_by(AuditLog.id.desc()).first()
+        assert audit.meta['added'] == ['ACC.APPROVE', 'ACC.EXPORT'] and audit.meta['removed'] == ['ACC.PAY']
+        # Re-applying the same set is a no-op: no DELETE/INSERT on role_permissions
+        engine = get_db().get_bind()
+        stmts, stop = _capture_statements(engine)
+        try:
+            again = client.put(f'/iam/roles/{role.id}/permissions', json={'permissions': ['ACC.READ', 'ACC.APPROVE', 'ACC.EXPORT']}, headers=headers)
+        finally:
+            stop()
+        assert again.status_code == 200
+        assert again.get_json()['added'] == [] and again.get_json()['removed'] == []
+        writes = [s for s in stmts if 'role_permissions' in s and (s.startswith('DELETE') or s.startswith('INSERT'))]
+        assert writes == []
+        current = {rp.permission_id for rp in get_db().query(RolePermission).filter_by(role_id=role.id)}
+        assert current == {perms[c].id for c in ['ACC.READ', 'ACC.APPROVE', 'ACC.EXPORT']}
+
+
+def test_set_user_roles_single_bulk_insert(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(['ADMIN.USER.MANAGE'])
+        admin = ensure_user('iam_sets_user_admin@example.com')
+        target = ensure_user('iam_sets_target@example.com')
+        headers = jwt_headers(admin.id, ['ADMIN.USER.MANAGE'])
+        roles = [ensure_role(f'SetBulkRole{i}') for i in range(4)]
+        session = get_db()
+        session.add(UserRole(user_id=target.id, role_id=roles[0].id)); session.commit()
+        engine = session.get_bind()
+        stmts, stop = _capture_statements(engine)
+        try:
+            resp = client.put(f'/iam/users/{target.id}/roles', json={'role_ids': [r.id for r in roles[1:]]}, headers=headers)
+        finally:
+            stop()
+        assert resp.status_code == 200, resp.get_json()
+        body = resp.get_json()
+        assert body['added'] == sorted(r.id for r in roles[1:])
+        assert body['removed'] == [roles[0].id]
+        inserts = [s for s in stmts if s.startswith('INSERT INTO user_roles')]
+        deletes = [s for s in stmts if s.startswith('DELETE FROM user_roles')]
+        assert len(inserts) == 1 and len(deletes) == 1
+        current = {ur.role_id for ur in session.query(UserRole).filter_by(user_id=target.id)}
+        assert current == {r.id for r in roles[1:]}
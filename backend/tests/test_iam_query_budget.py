@@ -0,0 +1,52 @@
+"""N+1 guards: IAM list/HEAD endpoints must issue a constant number of statements."""
+from app import get_db
+from app.models.authz import GroupRole
+from tests.test_utils_seed import ensure_permissions, ensure_user, ensure_role, ensure_group
+from tests.test_lifecycle_helpers import jwt_headers
+
+PERMS = ['ADMIN.ROLE.MANAGE', 'ADMIN.GROUP.MANAGE', 'INV.READ', 'CAT.READ']
+# count + page + one SELECT ... IN per eager-loaded hop, plus one possible token blocklist refresh
+LIST_BUDGET = 5
+
+
+def _seed(app_instance):
+    ensure_permissions(PERMS)
+    admin = ensure_user('iam_budget@example.com')
+    roles = [ensure_role(f'BudgetRole{i}', ['INV.READ', 'CAT.READ']) for i in range(12)]
+    session = get_db()
+    for i in range(12):
+        g = ensure_group(f'BudgetGroup{i}', roles[i], [1])
+        if not session.query(GroupRole).filter_by(group_id=g.id, role_id=roles[(i + 1) % 12].id).one_or_none():
+            session.add(GroupRole(group_id=g.id, role_id=roles[(i + 1) % 12].id))
+    session.commit()
+    return jwt_headers(admin.id, PERMS)
+
+
+def test_roles_listing_query_budget(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        headers = _seed(app_instance)
+        get_db().expunge_all()  # force a cold identity map so lazy loads would show up
+        with assert_max_queries(LIST_BUDGET):
+            resp = client.get('/iam/roles?limit=200', headers=headers)
+        assert resp.status_code == 200
+        budget_roles = [r for r in resp.get_json()['data'] if r['name'].startswith('BudgetRole')]
+        assert len(budget_roles) == 12 and all(sorted(r['permissions']) == ['CAT.READ', 'INV.READ'] for r in budget_roles)
+        get_db().expunge_all()
+        with assert_max_queries(LIST_BUDGET):
+            assert client.head('/iam/roles?limit=200', headers=headers).status_code == 200
+
+
+def test_groups_listing_query_budget(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        headers = _seed(app_instance)
+        get_db().expunge_all()
+        with assert_max_queries(LIST_BUDGET):
+            resp = client.get('/iam/groups?limit=200', headers=headers)
+        assert resp.status_code == 200
+        budget_groups = [g for g in resp.get_json()['data'] if g['name'].startswith('BudgetGroup')]
+        assert len(budget_groups) == 12 and all(len(g['roles']) == 2 for g in budget_groups)
+        get_db().expunge_all()
+        with assert_max_queries(LIST_BUDGET):
+            assert client.head('/iam/groups?limit=200', headers=headers).status_code == 200
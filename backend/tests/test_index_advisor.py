@@ -0,0 +1,65 @@
+import json
+import pathlib
+
+import pytest
+
+import app as app_module
+from tools.index_advisor import (candidate_columns, compare_baseline, findings_of, plan_findings,
+                                 render_migration, seeded_advisor)
+
+BASELINE = json.loads((pathlib.Path(__file__).parent / 'query_plan_baseline.json').read_text())
+
+PAGE_SQL = ("SELECT orders.id AS orders_id \nFROM orders \nWHERE orders.branch_id IN (?) AND orders.status = ? "
+            "AND lower(orders.customer_name) LIKE lower(?) ORDER BY orders.updated_at DESC, orders.id ASC\n LIMIT ? OFFSET ?")
+
+
+@pytest.fixture()
+def advisor():
+    saved = app_module.db_engine, app_module.SessionLocal
+    adv = seeded_advisor(rows=BASELINE['rows'], seed=BASELINE['seed'])
+    try:
+        yield adv
+    finally:
+        adv.close()
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_candidate_columns_and_findings():
+    # equality filters (branch scope first), then the sort key and tie-breaker; LIKE is not indexable
+    assert candidate_columns(PAGE_SQL, 'orders') == ('branch_id', 'status', 'updated_at', 'id')
+    assert plan_findings(PAGE_SQL, ['SCAN orders', 'USE TEMP B-TREE FOR ORDER BY']) == \
+        ['SCAN orders', 'USE TEMP B-TREE FOR ORDER BY']
+    # unfiltered scans stop at LIMIT; a partial sort of ties is accepted
+    assert plan_findings('SELECT id FROM orders ORDER BY id LIMIT ?', ['SCAN orders']) == []
+    assert plan_findings(PAGE_SQL, ['SEARCH orders USING INDEX ix (branch_id=?)',
+                                    'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY']) == []
+
+
+def test_list_query_plans_do_not_regress(advisor):
+    report = advisor.run(propose=False)
+    orders = next(r for r in report['routes'] if r['route'] == 'GET /sales/orders')
+    assert orders['filters'] == {'customer_name': 'like', 'status': 'eq'}
+    assert {'status', 'updated_at', 'total_cents'} <= set(orders['sorts'])
+    assert 'GET /sales/orders?status=?&sort=-updated_at' in report['cases']
+    # count statements are never sorted
+    assert not any('count: USE TEMP B-TREE FOR ORDER BY' in findings_of(c) for c in report['cases'].values())
+    diff = compare_baseline(report, BASELINE)
+    assert not diff['regressed'], (
+        'List query plans regressed (python backend/scripts/index_advisor.py --check for details; '
+        f'--update-baseline if intended): {diff["regressed"]}')
+
+
+def test_candidates_are_verified_and_rendered_as_migration(advisor):
+    report = advisor.run(only=['/sales/orders'])
+    by_columns = {tuple(c['columns']): c for c in report['candidates']}
+    assert ('branch_id', 'updated_at', 'id') in by_columns
+    assert all(c['resolves'] and c['table'] == 'orders' for c in report['candidates'])
+    assert 'GET /sales/orders?sort=updated_at [page]' in by_columns[('branch_id', 'updated_at', 'id')]['resolves']
+    assert len(report['residual']) < sum(1 for c in report['cases'].values() if findings_of(c))
+
+    source = render_migration(report['candidates'], '0099_list_query_indexes', '0011_replica_heartbeat', '2026-10-18')
+    compile(source, 'migration.py', 'exec')
+    assert "down_revision = '0011_replica_heartbeat'" in source
+    assert "('ix_orders_branch_id_updated_at_id', 'orders', ['branch_id', 'updated_at', 'id'])" in source
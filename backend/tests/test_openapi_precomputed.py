@@ -0,0 +1,68 @@
+import gzip
+import pathlib
+
+import pytest
+
+import app.openapi as openapi_module
+from app.utils.compression import negotiate
+
+SNAPSHOT = (pathlib.Path(__file__).parent / 'openapi_spec_hash.txt').read_text().strip()
+
+
+@pytest.fixture()
+def fresh_spec(monkeypatch):
+    calls = []
+    real = openapi_module.build_openapi_spec
+
+    def counting():
+        calls.append(1)
+        return real()
+
+    monkeypatch.setattr(openapi_module, 'build_openapi_spec', counting)
+    openapi_module.precomputed_spec.cache_clear()
+    yield calls
+    openapi_module.precomputed_spec.cache_clear()
+
+
+def test_negotiate_accept_encoding():
+    assert negotiate(None, ['br', 'gzip']) is None
+    assert negotiate('gzip, deflate', ['br', 'gzip']) == 'gzip'
+    assert negotiate('gzip;q=0.5, br', ['br', 'gzip']) == 'br'
+    assert negotiate('br;q=0, *;q=0.1', ['br', 'gzip']) == 'gzip'
+    assert negotiate('identity', ['gzip']) is None
+    assert negotiate('gzip;q=0', ['gzip']) is None
+
+
+def test_spec_built_once_and_etag_is_snapshot_hash(client, fresh_spec):
+    first = client.get('/openapi.json')
+    second = client.get('/openapi.json')
+    assert len(fresh_spec) == 1
+    assert first.status_code == second.status_code == 200
+    assert first.get_etag() == (SNAPSHOT, False)
+    assert first.data == openapi_module.canonical_spec_bytes()
+    assert first.headers['Vary'] == 'Accept-Encoding' and 'Content-Encoding' not in first.headers
+    assert first.get_json()['openapi'].startswith('3.')
+
+
+def test_compressed_variant_and_conditional_get(client, fresh_spec):
+    r = client.get('/openapi.json', headers={'Accept-Encoding': 'gzip'})
+    assert r.headers['Content-Encoding'] == 'gzip'
+    assert r.get_etag() == (f'{SNAPSHOT}-gzip', False)
+    assert int(r.headers['Content-Length']) < len(openapi_module.canonical_spec_bytes())
+    assert gzip.decompress(r.data) == openapi_module.canonical_spec_bytes()
+
+    # Any variant of the current hash revalidates, whichever encoding is negotiated now
+    for inm in (f'"{SNAPSHOT}"', f'W/"{SNAPSHOT}-gzip"', '"stale", "' + SNAPSHOT + '"', '*'):
+        cond = client.get('/openapi.json', headers={'If-None-Match': inm, 'Accept-Encoding': 'gzip'})
+        assert cond.status_code == 304 and cond.data == b''
+        assert cond.get_etag() == (f'{SNAPSHOT}-gzip', False)
+    assert client.get('/openapi.json', headers={'If-None-Match': '"stale"'}).status_code == 200
+    head = client.head('/openapi.json', headers={'Accept-Encoding': 'gzip'})
+    assert head.status_code == 200 and head.data == b'' and head.headers['Content-Encoding'] == 'gzip'
+
+
+def test_brotli_variant_when_available(client, fresh_spec):
+    brotli = pytest.importorskip('brotli')
+    r = client.get('/openapi.json', headers={'Accept-Encoding': 'gzip, br'})
+    assert r.headers['Content-Encoding'] == 'br'
+    assert brotli.decompress(r.data) == openapi_module.canonical_spec_bytes()
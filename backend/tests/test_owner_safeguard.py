@@ -0,0 +1,82 @@
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from werkzeug.exceptions import BadRequest
+from app.models.authz import Base, User, Role, Group, GroupRole, UserGroup, UserRole
+from app.services.policy import count_owner_users, assert_owner_remains
+from tests.test_utils_seed import ensure_permissions, ensure_user, ensure_role
+from tests.test_lifecycle_helpers import jwt_headers
+
+
+@pytest.fixture()
+def owner_session():
+    """Isolated DB: A owns directly, B owns via group G, C is a plain member of G2."""
+    engine = create_engine('sqlite+pysqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    owner = Role(name='Owner', is_system=True, description_i18n={})
+    other = Role(name='Clerk', is_system=False, description_i18n={})
+    users = [User(name=n, email=f'{n}@owner.test', password_hash='x') for n in 'ABC']
+    g, g2 = Group(name='G', description_i18n={}), Group(name='G2', description_i18n={})
+    session.add_all([owner, other, g, g2, *users]); session.flush()
+    a, b, c = users
+    session.add_all([
+        UserRole(user_id=a.id, role_id=owner.id),
+        GroupRole(group_id=g.id, role_id=owner.id),
+        GroupRole(group_id=g2.id, role_id=other.id),
+        UserGroup(user_id=b.id, group_id=g.id),
+        UserGroup(user_id=c.id, group_id=g2.id),
+    ])
+    session.commit()
+    yield session, {'owner': owner, 'g': g, 'g2': g2, 'a': a, 'b': b, 'c': c}
+    session.close()
+
+
+def test_owner_count_single_statement(owner_session):
+    session, ctx = owner_session
+    stmts = []
+    engine = session.get_bind()
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        stmts.append(statement)
+    event.listen(engine, 'before_cursor_execute', before)
+    try:
+        assert count_owner_users(session) == 2
+    finally:
+        event.remove(engine, 'before_cursor_execute', before)
+    assert len(stmts) == 1 and 'UNION' in stmts[0]
+    assert count_owner_users(session, exclude_direct_user_id=ctx['a'].id) == 1
+    assert count_owner_users(session, exclude_group_id=ctx['g'].id) == 1
+    assert count_owner_users(session, membership_override=(ctx['b'].id, [])) == 1
+    assert count_owner_users(session, membership_override=(ctx['b'].id, [ctx['g'].id])) == 2
+    assert count_owner_users(session, exclude_role_id=ctx['owner'].id) == 0
+
+
+def test_assert_owner_remains_blocks_last_owner(owner_session):
+    session, ctx = owner_session
+    # Removing one path leaves the other owner
+    assert_owner_remains(session, exclude_group_id=ctx['g'].id)
+    # Removing the Owner role itself removes every owner
+    with pytest.raises(BadRequest):
+        assert_owner_remains(session, exclude_role_id=ctx['owner'].id)
+    # Drop A's direct grant, then G becomes the last Owner path
+    session.query(UserRole).filter_by(user_id=ctx['a'].id).delete(); session.commit()
+    with pytest.raises(BadRequest):
+        assert_owner_remains(session, exclude_group_id=ctx['g'].id)
+    with pytest.raises(BadRequest):
+        assert_owner_remains(session, membership_override=(ctx['b'].id, [ctx['g2'].id]))
+    # Unrelated group changes never trip the guard
+    assert_owner_remains(session, exclude_group_id=ctx['g2'].id)
+
+
+def test_delete_role_endpoint(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(['ADMIN.ROLE.MANAGE'])
+        admin = ensure_user('role_delete_admin@example.com')
+        headers = jwt_headers(admin.id, ['ADMIN.ROLE.MANAGE'])
+        role = ensure_role('DisposableRole')
+        resp = client.delete(f'/iam/roles/{role.id}', headers=headers)
+        assert resp.status_code == 200 and resp.get_json()['status'] == 'deleted'
+        assert client.delete(f'/iam/roles/{role.id}', headers=headers).status_code == 404
@@ -0,0 +1,76 @@
+import time
+import threading
+import pytest
+from sqlalchemy import create_engine, event, select, func, literal, text
+from app.services.parallel_query import execute_fanout, QueryTimeout
+from tests.test_utils_seed import ensure_permissions, ensure_user
+from tests.test_lifecycle_helpers import jwt_headers
+
+
+@pytest.fixture()
+def file_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'fanout.db'}", connect_args={'check_same_thread': False})
+
+    @event.listens_for(engine, 'connect')
+    def _fns(dbapi_conn, record):
+        dbapi_conn.create_function('sleep_ms', 1, lambda ms: time.sleep(ms / 1000) or ms)
+        dbapi_conn.create_function('thread_id', 0, threading.get_ident)
+    yield engine
+    engine.dispose()
+
+
+def test_fanout_runs_on_pool_threads_and_keeps_input_order(file_engine):
+    stmts = [select(literal(i), func.sleep_ms(30 - i * 5), func.thread_id()) for i in range(4)]
+    results = execute_fanout(file_engine, stmts, max_workers=4, timeout=5, serial=False)
+    assert [rows[0][0] for rows in results] == [0, 1, 2, 3]
+    assert threading.get_ident() not in {rows[0][2] for rows in results}
+    # Default mode on SQLite is serial, in the calling thread
+    serial = execute_fanout(file_engine, stmts, max_workers=4)
+    assert [rows[0][0] for rows in serial] == [0, 1, 2, 3]
+    assert {rows[0][2] for rows in serial} == {threading.get_ident()}
+
+
+def test_fanout_timeout_and_errors(file_engine):
+    slow = [select(func.sleep_ms(5)), select(func.sleep_ms(400))]
+    with pytest.raises(QueryTimeout):
+        execute_fanout(file_engine, slow, max_workers=2, timeout=0.1, serial=False)
+    with pytest.raises(Exception):
+        execute_fanout(file_engine, [select(func.sleep_ms(1)), text('SELECT * FROM missing_table')], max_workers=2, timeout=5, serial=False)
+
+
+def test_source_scan_matches_read_model(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(['RPT.READ'])
+        u = ensure_user('fanout_consistency@example.com')
+        headers = jwt_headers(u.id, ['RPT.READ'])
+        url = '/reports/metrics?include_financial=true&limit=500'
+        from_model = client.get(url, headers=headers).get_json()['data']
+        app_instance.config['REPORTS_METRICS_READ_MODEL'] = False
+        try:
+            app_instance.extensions['report_cache'].clear()
+            from_source = client.get(url, headers=headers).get_json()['data']
+        finally:
+            app_instance.config['REPORTS_METRICS_READ_MODEL'] = True
+            app_instance.extensions['report_cache'].clear()
+        assert from_source == from_model
+
+
+def test_timeout_applies_per_query_and_pool_is_shared(file_engine, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from app.services import parallel_query
+    pool = parallel_query._get_executor(2)
+    # Created once and never replaced, whatever size later callers ask for
+    assert parallel_query._get_executor(7) is pool
+    # One worker: each statement queues behind the previous one, but only its own run time counts
+    single = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(parallel_query, '_executor', single)
+    try:
+        stmts = [select(literal(i), func.sleep_ms(150)) for i in range(3)]
+        results = execute_fanout(file_engine, stmts, max_workers=1, timeout=0.3, serial=False)
+        assert [rows[0][0] for rows in results] == [0, 1, 2]
+        with pytest.raises(QueryTimeout):
+            execute_fanout(file_engine, [select(func.sleep_ms(5)), select(func.sleep_ms(500))], max_workers=1,
+                           timeout=0.2, serial=False)
+    finally:
+        single.shutdown(wait=True)
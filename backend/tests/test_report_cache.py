@@ -0,0 +1,171 @@
+import threading
+import time
+import pytest
+from app.services.report_cache import ReportCache
+from tests.test_utils_seed import ensure_permissions, ensure_user
+from tests.test_lifecycle_helpers import jwt_headers
+
+
+def test_hits_version_invalidation_and_lru():
+    cache = ReportCache(ttl_seconds=60, stale_seconds=0, max_entries=2)
+    calls = []
+
+    def compute(v):
+        calls.append(v)
+        return v
+    assert cache.get_or_compute('a', lambda: compute(1)) == 1
+    assert cache.get_or_compute('a', lambda: compute(2)) == 1
+    # Local write bumped the data version -> recompute
+    assert cache.get_or_compute('a', lambda: compute(3), version=1) == 3
+    cache.get_or_compute('b', lambda: compute(4), version=1)
+    cache.get_or_compute('c', lambda: compute(5), version=1)
+    assert cache.get_or_compute('a', lambda: compute(6), version=1) == 6  # evicted
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 5, 2)
+    assert calls == [1, 3, 4, 5, 6]
+
+
+def test_stale_served_immediately_and_revalidated_in_background():
+    cache = ReportCache(ttl_seconds=0.01, stale_seconds=60)
+    cache.get_or_compute('k', lambda: 'old')
+    time.sleep(0.02)
+    started, release = threading.Event(), threading.Event()
+    caller = threading.current_thread()
+    ran_on = []
+
+    def slow():
+        ran_on.append(threading.current_thread())
+        started.set()
+        release.wait(5)
+        return 'new'
+    # The first request past the TTL does not wait for the recomputation either
+    assert cache.get_or_compute('k', slow) == 'old'
+    started.wait(5)
+    assert ran_on and ran_on[0] is not caller
+    assert cache.get_or_compute('k', lambda: pytest.fail('must not compute')) == 'old'
+    release.set()
+    while cache.stats()['inflight']:
+        time.sleep(0.005)
+    assert cache.get_or_compute('k', lambda: 'unused') == 'new'
+    stats = cache.stats()
+    assert stats['stale'] == 2 and stats['revalidations'] == 1 and stats['misses'] == 1
+
+
+def test_failed_revalidation_keeps_serving_stale():
+    cache = ReportCache(ttl_seconds=0.01, stale_seconds=60)
+    cache.get_or_compute('k', lambda: 'old')
+    time.sleep(0.02)
+
+    def boom():
+        raise RuntimeError('db down')
+    assert cache.get_or_compute('k', boom) == 'old'
+    while cache.stats()['inflight']:
+        time.sleep(0.005)
+    assert cache.get_or_compute('k', lambda: 'new') == 'old'  # still servable; revalidating again
+    assert cache.stats()['errors'] == 1
+
+
+def test_stale_entry_from_older_version_is_not_served():
+    cache = ReportCache(ttl_seconds=60, stale_seconds=60)
+    cache.get_or_compute('k', lambda: 'v0', version=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return 'v1'
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', slow, version=1)))
+    leader.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(cache.get_or_compute('k', lambda: 'x', version=1)))
+    waiter.start()
+    while cache.stats()['coalesced'] < 1:
+        time.sleep(0.005)
+    release.set(); leader.join(5); waiter.join(5)
+    assert results == ['v1', 'v1'] and cache.stats()['stale'] == 0
+
+
+def test_data_version_bumps_on_commit_not_flush(app_instance):
+    from app import get_db
+    from app.models.order import Order
+    from app.services.report_metrics import data_version
+    with app_instance.app_context():
+        session = get_db()
+        user = ensure_user('report_version@example.com')
+        start = data_version()
+        session.add(Order(customer_name='Version', branch_id=1, total_cents=1, created_by=user.id))
+        session.flush()
+        assert data_version() == start
+        session.rollback()
+        assert data_version() == start
+        session.add(Order(customer_name='Version', branch_id=1, total_cents=1, created_by=user.id))
+        session.flush()
+        session.commit()
+        assert data_version() == start + 1
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    cache = ReportCache(ttl_seconds=60)
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return 42
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(cache.get_or_compute('x', compute))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while cache.stats()['coalesced'] < 7:
+        time.sleep(0.005)
+    gate.set()
+    for t in threads:
+        t.join(5)
+    assert out == [42] * 8 and len(calls) == 1
+    stats = cache.stats()
+    assert stats['misses'] == 1 and stats['coalesced'] == 7
+
+
+def test_leader_errors_propagate_and_are_not_cached():
+    cache = ReportCache(ttl_seconds=60)
+
+    def boom():
+        raise RuntimeError('db down')
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute('e', boom)
+    assert cache.get_or_compute('e', lambda: 'ok') == 'ok'
+    assert cache.stats()['errors'] == 1
+
+
+def test_metrics_endpoint_uses_cache_and_sees_local_writes(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        perms = ['RPT.READ', 'SALES.CREATE']
+        ensure_permissions(perms)
+        u = ensure_user('report_cache@example.com')
+        headers = jwt_headers(u.id, perms)
+        url = '/reports/metrics?include_financial=true&limit=200'
+        before = client.get('/reports/cache/stats', headers=headers).get_json()
+        first = client.get(url, headers=headers).get_json()['data']
+        assert client.get(url, headers=headers).get_json()['data'] == first
+        after = client.get('/reports/cache/stats', headers=headers).get_json()
+        assert after['hits'] >= before['hits'] + 1
+        client.post('/sales/orders', json={'customer_name': 'Cache', 'branch_id': 1, 'total_cents': 9}, headers=headers)
+        fresh = client.get(url, headers=headers).get_json()['data']
+        count = lambda rows: sum(r['count'] for r in rows if r['domain'] == 'Order')
+        assert count(fresh) == count(first) + 1
+
+
+def test_background_revalidation_runs_in_app_context(app_instance):
+    from flask import current_app
+    cache = ReportCache(ttl_seconds=0.01, stale_seconds=60)
+    with app_instance.app_context():
+        cache.get_or_compute('k', lambda: 'old')
+        time.sleep(0.02)
+        assert cache.get_or_compute('k', lambda: current_app.config['REPORTS_CACHE_MAX_ENTRIES']) == 'old'
+    while cache.stats()['inflight']:
+        time.sleep(0.005)
+    assert cache.get_or_compute('k', lambda: 'unused') == app_instance.config['REPORTS_CACHE_MAX_ENTRIES']
+    assert cache.stats()['errors'] == 0
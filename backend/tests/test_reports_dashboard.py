@@ -0,0 +1,92 @@
+import json
+
+from flask_jwt_extended import create_access_token
+from app import get_db
+from app.models.order import Order
+from app.models.print_job import PrintJob
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCH = 7310
+
+
+def _headers(user_id, perms=('RPT.READ', 'SALES.READ')):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': list(perms), 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+WIDGETS = [
+    {'id': 'counts', 'type': 'metrics'},
+    {'id': 'money', 'type': 'metrics', 'include_financial': True, 'group_by': 'branch'},
+    {'id': 'pivot', 'type': 'pivot'},
+    {'id': 'top3', 'type': 'top', 'dimension': 'customer', 'n': 3},
+    {'id': 'top1', 'type': 'top', 'dimension': 'customer', 'n': 1},
+    {'id': 'recent', 'type': 'list', 'domain': 'Order', 'limit': 2},
+    {'id': 'recent_new', 'type': 'list', 'domain': 'Order', 'status': 'NEW', 'limit': 5},
+    {'id': 'latest', 'type': 'list', 'domain': 'Order', 'limit': 1},
+    {'id': 'waits', 'type': 'durations', 'domain': 'PrintJob'},
+    {'id': 'customers', 'type': 'distinct_customers'},
+]
+
+
+def test_dashboard_shares_scans_and_matches_single_endpoints(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        ensure_permissions(['RPT.READ', 'SALES.READ'])
+        u = ensure_user('dashboard@example.com')
+        headers = _headers(u.id)
+        session.add_all([Order(branch_id=BRANCH, customer_name=name, total_cents=cents, created_by=u.id)
+                         for name, cents in [('Ann', 300), ('Ben', 200), ('Cid', 100), ('Ann', 50)]])
+        session.add(PrintJob(branch_id=BRANCH, created_by=u.id))
+        session.commit()
+
+        # metrics + pivot share one read-model scan, both top widgets and the two unfiltered lists share theirs
+        # (6 scans, plus the periodic token blocklist refresh)
+        with assert_max_queries(7):
+            resp = client.post('/reports/dashboard', json={'widgets': WIDGETS}, headers=headers)
+        assert resp.status_code == 200, resp.get_json()
+        body = resp.get_json()
+        assert body['scans'] == 6
+        widgets = {w['id']: w['data'] for w in body['widgets']}
+        assert [w['id'] for w in body['widgets']] == [w['id'] for w in WIDGETS]
+
+        assert widgets['counts'] == client.get('/reports/metrics', headers=headers).get_json()['data']
+        assert all('sum_cents' not in r for r in widgets['counts'])
+        money = client.get('/reports/metrics?include_financial=true&group_by=branch', headers=headers).get_json()['data']
+        assert widgets['money'] == money
+        assert widgets['pivot'] == client.get('/reports/metrics/pivot', headers=headers).get_json()['data']
+        assert [r['key'] for r in widgets['top3']] == ['Ann', 'Ben', 'Cid']
+        assert widgets['top1'] == widgets['top3'][:1]
+        assert len(widgets['recent']) == 2 and widgets['latest'] == widgets['recent'][:1]
+        assert len(widgets['recent_new']) == 4
+        assert widgets['customers']['value'] == 3 and widgets['customers']['mode'] == 'approx'
+        assert isinstance(widgets['waits'], list)
+
+        # Same widgets via GET: same combined ETag, and conditional requests revalidate
+        qs = {'widgets': json.dumps(WIDGETS)}
+        got = client.get('/reports/dashboard', query_string=qs, headers=headers)
+        assert got.headers['ETag'] == resp.headers['ETag']
+        assert client.get('/reports/dashboard', query_string=qs,
+                          headers={**headers, 'If-None-Match': got.headers['ETag']}).status_code == 304
+        session.add(Order(branch_id=BRANCH, customer_name='Dee', total_cents=1, created_by=u.id))
+        session.commit()
+        assert client.get('/reports/dashboard', query_string=qs, headers=headers).headers['ETag'] != got.headers['ETag']
+
+
+def test_dashboard_validation_and_list_permissions(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        u = ensure_user('dashboard_limited@example.com')
+        headers = _headers(u.id, perms=('RPT.READ',))
+
+        def post(widgets):
+            return client.post('/reports/dashboard', json={'widgets': widgets}, headers=headers)
+        assert post([]).status_code == 400
+        bad = post([{'id': 'x', 'type': 'top', 'dimension': 'planet'}])
+        assert bad.status_code == 400 and 'widget x' in bad.get_json()['error']['detail']
+        assert post([{'type': 'metrics'}, {'id': '0', 'type': 'pivot'}]).status_code == 400
+        assert post([{'type': 'list', 'domain': 'Order'}]).status_code == 403
+        assert post([{'type': 'metrics'}] * 26).status_code == 400
+        assert client.get('/reports/dashboard?widgets=nope', headers=headers).status_code == 400
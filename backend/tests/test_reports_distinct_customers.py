@@ -0,0 +1,127 @@
+from datetime import datetime, timezone
+from flask_jwt_extended import create_access_token
+from app import get_db
+from app.models.order import Order
+from app.models.repair_ticket import RepairTicket
+from app.models.customer_sketch import CustomerSketch
+from app.services.customer_sketches import normalize_customer
+from app.utils.hll import HyperLogLog
+from app.utils.upsert import insert_missing
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCH = 7308
+
+
+def _headers(user_id):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_hll_estimate_within_error_bound_and_merge():
+    a, b = HyperLogLog(), HyperLogLog()
+    a.update(f'customer-{i}' for i in range(0, 6000))
+    b.update(f'customer-{i}' for i in range(4000, 10000))
+    bound = 3 * a.relative_error
+    assert abs(len(a) - 6000) / 6000 < bound
+    merged = HyperLogLog.from_bytes(a.to_bytes()).merge(b)
+    assert abs(len(merged) - 10000) / 10000 < bound
+    # Re-adding known items never changes registers
+    assert not any(a.add(f'customer-{i}') for i in range(100))
+    small = HyperLogLog()
+    small.update(['x', 'y', 'z', 'x'])
+    assert len(small) == 3
+
+
+def test_metrics_distinct_customers_approx_and_exact(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        ensure_permissions(['RPT.READ'])
+        u = ensure_user('distinct_customers@example.com')
+        headers = _headers(u.id)
+        session.add_all([Order(branch_id=BRANCH, customer_name=name, total_cents=10, created_by=u.id)
+                         for name in ['Alice', 'alice ', 'Bob', 'Carol']])
+        session.add(RepairTicket(branch_id=BRANCH, customer_name='Dave', device_type='Printer',
+                                 issue_summary='Jam', created_by=u.id))
+        session.add(RepairTicket(branch_id=BRANCH, customer_name='BOB', device_type='Printer',
+                                 issue_summary='Jam', created_by=u.id))
+        session.add(Order(branch_id=BRANCH + 1, customer_name='Other branch', total_cents=10, created_by=u.id))
+        session.commit()
+        assert session.query(CustomerSketch).filter_by(branch_id=BRANCH).count() == 1
+
+        resp = client.get('/reports/metrics?distinct=approx', headers=headers)
+        assert resp.status_code == 200
+        approx = resp.get_json()['distinct_customers']
+        assert approx['mode'] == 'approx' and approx['value'] == 4
+        assert 0 < approx['relative_error'] < 0.05
+        exact = client.get('/reports/metrics?distinct=exact', headers=headers).get_json()['distinct_customers']
+        assert exact['mode'] == 'exact' and exact['value'] == 4 and exact['relative_error'] == 0.0
+        assert exact['start'] == approx['start'] and exact['end'] == approx['end']
+
+        # A renamed customer is added to today's sketch; the ETag moves with it
+        etag = resp.headers['ETag']
+        ticket = session.query(RepairTicket).filter_by(branch_id=BRANCH, customer_name='Dave').one()
+        ticket.customer_name = 'Erin'
+        session.commit()
+        resp = client.get('/reports/metrics?distinct=approx', headers=headers)
+        assert resp.get_json()['distinct_customers']['value'] == 5
+        assert resp.headers['ETag'] != etag
+        assert client.get('/reports/metrics?distinct=approx', headers={**headers, 'If-None-Match': resp.headers['ETag']}).status_code == 304
+
+        # Windows without sketches, plain requests and bad modes
+        old = client.get('/reports/metrics?distinct=approx&start_date=2020-01-01&end_date=2020-01-31', headers=headers)
+        assert old.get_json()['distinct_customers']['value'] == 0
+        assert 'distinct_customers' not in client.get('/reports/metrics', headers=headers).get_json()
+        assert client.get('/reports/metrics?distinct=fuzzy', headers=headers).status_code == 400
+
+
+def test_exact_and_approx_count_the_same_write_days(app_instance):
+    """A later status change moves updated_at but not the day the customer was recorded."""
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import update
+    from app.services.customer_sketches import distinct_customers
+    branch = BRANCH + 50
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('distinct_days@example.com')
+        orders = [Order(branch_id=branch, customer_name=name, total_cents=10, created_by=u.id) for name in ('Ann', 'Ben', 'Cy')]
+        session.add_all(orders)
+        session.commit()
+        today = datetime.now(timezone.utc).date()
+        assert {o.customer_seen_on for o in orders} == {today}
+        # Re-date yesterday's writes: rows and sketch alike
+        yesterday = today - timedelta(days=1)
+        session.execute(update(Order).where(Order.branch_id == branch).values(customer_seen_on=yesterday))
+        session.execute(update(CustomerSketch).where(CustomerSketch.branch_id == branch).values(day=yesterday))
+        session.commit()
+        orders[0].status = Order.STATUS_APPROVED
+        session.commit()
+        for exact in (False, True):
+            assert distinct_customers(session, [branch], yesterday, yesterday, exact=exact)['value'] == 3
+            assert distinct_customers(session, [branch], today, today, exact=exact)['value'] == 0
+        orders[1].customer_name = 'Bea'
+        session.commit()
+        assert orders[1].customer_seen_on == today
+        for exact in (False, True):
+            assert distinct_customers(session, [branch], today, today, exact=exact)['value'] == 1
+
+
+def test_first_write_of_a_day_merges_into_a_row_created_concurrently(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('distinct_race@example.com')
+        branch = BRANCH + 50
+        today = datetime.now(timezone.utc).date()
+        # Another writer created today's row between our flush and our read-modify-write
+        theirs = HyperLogLog()
+        theirs.add(normalize_customer('Other Writer'))
+        insert_missing(session.connection(), CustomerSketch.__table__, ('branch_id', 'day'),
+                       [{'branch_id': branch, 'day': today, 'registers': theirs.to_bytes()}])
+        insert_missing(session.connection(), CustomerSketch.__table__, ('branch_id', 'day'),
+                       [{'branch_id': branch, 'day': today, 'registers': HyperLogLog().to_bytes()}])
+        session.add(Order(branch_id=branch, customer_name='Race Winner', total_cents=1, created_by=u.id))
+        session.commit()
+        row = session.get(CustomerSketch, (branch, today))
+        assert len(HyperLogLog.from_bytes(row.registers)) == 2
@@ -0,0 +1,121 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+from flask_jwt_extended import create_access_token
+from app import get_db
+from app.models.print_job import PrintJob
+from app.models.status_transition import StatusDurationSketch, StatusTransition
+from app.services.status_history import record_created, record_transition
+from app.utils.quantiles import QuantileSketch
+from app.utils.upsert import insert_missing
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCH = 7309
+PERMS = ['PRINT.READ', 'PRINT.START', 'PRINT.COMPLETE', 'RPT.READ']
+
+
+def _headers(user_id):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': PERMS, 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def test_quantile_sketch_relative_accuracy_merge_and_roundtrip():
+    rng = random.Random(39)
+    values = [rng.lognormvariate(6, 2) for _ in range(5000)]
+    a, b = QuantileSketch(), QuantileSketch()
+    a.update(values[:2500])
+    b.update(values[2500:])
+    merged = QuantileSketch.from_bytes(a.to_bytes()).merge(b)
+    assert merged.count == 5000
+    for q in (0.5, 0.9, 0.99):
+        exact = _exact_quantile(values, q)
+        assert abs(merged.quantile(q) - exact) / exact <= 0.0101
+    assert QuantileSketch().quantile(0.5) is None
+    z = QuantileSketch()
+    z.update([0, 0, 5])
+    assert z.quantile(0.5) == 0.0
+
+
+def test_transition_handlers_append_history(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(PERMS)
+        u = ensure_user('durations_history@example.com')
+        headers = _headers(u.id)
+        jid = client.post('/print/jobs', json={'branch_id': BRANCH}, headers=headers).get_json()['id']
+        assert client.post(f'/print/jobs/{jid}/start', headers=headers).status_code == 200
+        assert client.post(f'/print/jobs/{jid}/complete', headers=headers).status_code == 200
+        assert client.post(f'/print/jobs/{jid}/complete', headers=headers).status_code == 400
+        history = get_db().query(StatusTransition).filter_by(entity='PrintJob', entity_id=jid).order_by(StatusTransition.id).all()
+        assert [(h.from_status, h.to_status) for h in history] == [
+            (None, 'QUEUED'), ('QUEUED', 'STARTED'), ('STARTED', 'COMPLETED')]
+        assert history[0].duration_seconds is None
+        assert all(h.duration_seconds >= 0 for h in history[1:])
+        assert {h.user_id for h in history} == {u.id}
+
+
+def test_durations_percentiles_per_status(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        u = ensure_user('durations_report@example.com')
+        headers = _headers(u.id)
+        base = datetime.now(timezone.utc) - timedelta(days=1)
+        queued = []
+        for i in range(1, 101):
+            job = PrintJob(branch_id=BRANCH, created_by=u.id)
+            session.add(job)
+            record_created(session, job, u.id, at=base)
+            record_transition(session, job, PrintJob.STATUS_STARTED, u.id, at=base + timedelta(minutes=i))
+            job.status = PrintJob.STATUS_STARTED
+            queued.append(i * 60.0)
+        session.commit()
+
+        resp = client.get('/reports/durations?domain=PrintJob', headers=headers)
+        assert resp.status_code == 200, resp.get_json()
+        rows = {r['status']: r for r in resp.get_json()['data']}
+        q = rows['QUEUED']
+        assert q['count'] >= 100
+        # Only the deterministic jobs have minute-scale waits; the handler test adds near-zero ones
+        for label, frac in (('p90', 0.9), ('p99', 0.99)):
+            exact = _exact_quantile(queued, frac)
+            assert abs(q[f'{label}_seconds'] - exact) / exact <= 0.05
+        assert 'p50_seconds' in q and 'branch_id' not in q
+
+        by_branch = client.get('/reports/durations?domain=PrintJob&group_by=branch', headers=headers).get_json()['data']
+        assert {r['branch_id'] for r in by_branch} == {BRANCH}
+        assert client.get('/reports/durations?start_date=2020-01-01&end_date=2020-01-31', headers=headers).get_json()['data'] == []
+        etag = resp.headers['ETag']
+        assert client.get('/reports/durations?domain=PrintJob', headers={**headers, 'If-None-Match': etag}).status_code == 304
+        assert client.get('/reports/durations?domain=Vendor', headers=headers).status_code == 400
+
+
+def test_transition_merges_into_sketch_row_created_concurrently(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('durations_race@example.com')
+        branch = BRANCH + 50
+        job = PrintJob(branch_id=branch, created_by=u.id)
+        session.add(job)
+        session.flush()
+        record_created(session, job, u.id, at=datetime.now(timezone.utc) - timedelta(seconds=30))
+        session.commit()
+        now = datetime.now(timezone.utc)
+        # Another transition of the same day created the row after ours found none
+        theirs = QuantileSketch()
+        theirs.add(5.0)
+        insert_missing(session.connection(), StatusDurationSketch.__table__, ('day', 'domain', 'branch_id', 'status'),
+                       [{'day': now.date(), 'domain': 'PrintJob', 'branch_id': branch, 'status': job.status,
+                         'sketch': theirs.to_bytes()}])
+        record_transition(session, job, 'STARTED', u.id, at=now)
+        job.status = 'STARTED'
+        session.commit()
+        row = session.get(StatusDurationSketch, (now.date(), 'PrintJob', branch, 'QUEUED'))
+        assert QuantileSketch.from_bytes(row.sketch).count == 2
@@ -0,0 +1,61 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app, get_db
+from app.models.order import Order
+from app.models.purchase_order import PurchaseOrder
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCHES = (7304, 7305, 7306)
+
+
+def _headers(user_id):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': list(BRANCHES)
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_group_by_branch_and_region_share_one_computation(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        ensure_permissions(['RPT.READ'])
+        u = ensure_user('group_by_branch@example.com')
+        headers = _headers(u.id)
+        session.add_all([
+            Order(branch_id=7304, customer_name='GB1', total_cents=10, created_by=u.id),
+            Order(branch_id=7304, customer_name='GB2', total_cents=20, created_by=u.id),
+            Order(branch_id=7305, customer_name='GB3', total_cents=5, created_by=u.id),
+            Order(branch_id=7306, customer_name='GB4', total_cents=1, created_by=u.id),
+            PurchaseOrder(branch_id=7305, vendor_name='GBV', total_cents=70, created_by=u.id),
+        ])
+        session.commit()
+        app_instance.config['REPORTS_BRANCH_REGIONS'] = {'east': [7304, 7305]}
+        try:
+            by_branch = client.get('/reports/metrics?group_by=branch&include_financial=true', headers=headers).get_json()['data']
+            orders = [r for r in by_branch if r['domain'] == 'Order']
+            assert [(r['branch_id'], r['count'], r['sum_cents']) for r in orders] == [(7304, 2, 30), (7305, 1, 5), (7306, 1, 1)]
+            # Region and total views are rolled up from the cached per-branch rows: no metric queries
+            with assert_max_queries(1) as qc:
+                by_region = client.get('/reports/metrics?group_by=region&include_financial=true', headers=headers).get_json()['data']
+                total = client.get('/reports/metrics?include_financial=true', headers=headers).get_json()['data']
+            assert not any('metrics_status_counts' in st for st in qc.statements)
+            regions = {(r['domain'], r['region']): r for r in by_region}
+            assert regions[('Order', 'east')]['count'] == 3 and regions[('Order', 'east')]['sum_cents'] == 35
+            assert regions[('Order', None)]['count'] == 1
+            assert regions[('PurchaseOrder', 'east')]['sum_cents'] == 70
+            assert [r for r in total if r['domain'] == 'Order'] == [
+                {'domain': 'Order', 'status': 'NEW', 'count': 4, 'sum_cents': 36}]
+            head = client.head('/reports/metrics?group_by=branch', headers=headers)
+            assert head.status_code == 200 and head.headers.get('ETag')
+        finally:
+            app_instance.config['REPORTS_BRANCH_REGIONS'] = {}
+        assert client.get('/reports/metrics?group_by=region', headers=headers).status_code == 400
+        assert client.get('/reports/metrics?group_by=status', headers=headers).status_code == 400
+
+
+def test_malformed_branch_regions_fail_with_a_named_config_error(monkeypatch):
+    for raw in ('{"east": [7304,', '["east"]', '{"east": ["7304"]}'):
+        monkeypatch.setenv('REPORTS_BRANCH_REGIONS', raw)
+        with pytest.raises(ValueError, match='REPORTS_BRANCH_REGIONS'):
+            create_app({'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False})
@@ -0,0 +1,115 @@
+from sqlalchemy import select, update, text
+from app import get_db
+from app.models.order import Order
+from app.models.accounting_transaction import AccountingTransaction
+from app.models.metrics_status_count import MetricsStatusCount
+from app.services.report_metrics import verify_status_counts
+from tests.test_utils_seed import ensure_permissions, ensure_user
+from tests.test_lifecycle_helpers import jwt_headers
+
+BRANCH = 7301
+
+
+def _counts(session, domain):
+    m = MetricsStatusCount
+    rows = session.execute(
+        select(m.status, m.count, m.sum_cents).where(m.domain==domain, m.branch_id==BRANCH)
+    ).all()
+    return {s: (c, sc) for s, c, sc in rows if c}
+
+
+def test_flush_hooks_track_inserts_status_amount_and_deletes(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('read_model_orm@example.com')
+        a = Order(branch_id=BRANCH, customer_name='RM A', total_cents=100, created_by=u.id)
+        b = Order(branch_id=BRANCH, customer_name='RM B', total_cents=40, created_by=u.id)
+        session.add_all([a, b]); session.commit()
+        assert _counts(session, 'Order') == {'NEW': (2, 140)}
+        a.status = Order.STATUS_APPROVED
+        b.total_cents = 60
+        session.commit()
+        assert _counts(session, 'Order') == {'NEW': (1, 60), 'APPROVED': (1, 100)}
+        session.delete(b); session.commit()
+        assert _counts(session, 'Order') == {'APPROVED': (1, 100)}
+        # Rolled back flushes leave no trace
+        session.add(Order(branch_id=BRANCH, customer_name='RM C', total_cents=5, created_by=u.id))
+        session.flush(); session.rollback()
+        assert _counts(session, 'Order') == {'APPROVED': (1, 100)}
+        # Bulk ORM statements recompute the keys they touched
+        session.execute(update(Order).where(Order.branch_id==BRANCH).values(status=Order.STATUS_CANCELLED))
+        session.commit()
+        assert _counts(session, 'Order') == {'CANCELLED': (1, 100)}
+        assert verify_status_counts(session) == []
+
+
+def test_expired_rows_and_bulk_statements_recompute_only_touched_keys(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('read_model_keys@example.com')
+        branch = BRANCH + 60
+        a = Order(branch_id=branch, customer_name='RK A', total_cents=10, created_by=u.id)
+        b = Order(branch_id=branch, customer_name='RK B', total_cents=20, created_by=u.id)
+        session.add_all([a, b]); session.commit()
+        # Modified / deleted without ever loading the old values: read by the before_flush hook
+        session.expire_all()
+        a.status = Order.STATUS_APPROVED
+        session.commit()
+        session.expire_all()
+        session.delete(b); session.commit()
+        m = MetricsStatusCount
+        counts = lambda br: {st: (c, sc) for st, c, sc in session.execute(
+            select(m.status, m.count, m.sum_cents).where(m.domain=='Order', m.branch_id==br)).all() if c}
+        assert counts(branch) == {'APPROVED': (1, 10)}
+        # Drift planted in another branch survives a bulk statement elsewhere: no whole-domain rebuild
+        session.execute(text(
+            "INSERT INTO orders (branch_id, customer_name, total_cents, status, created_by) VALUES (:b, 'raw', 5, 'NEW', :u)"
+        ), {'b': branch + 1, 'u': u.id})
+        session.commit()
+        session.execute(update(Order).where(Order.branch_id==branch).values(status=Order.STATUS_FULFILLED, total_cents=11))
+        session.commit()
+        assert counts(branch) == {'FULFILLED': (1, 11)}
+        drift = verify_status_counts(session)
+        assert [(d['branch_id'], d['status']) for d in drift] == [(branch + 1, 'NEW')]
+        verify_status_counts(session, repair=True)
+        assert verify_status_counts(session) == []
+
+
+def test_verify_detects_and_repairs_drift(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        u = ensure_user('read_model_drift@example.com')
+        session.add(AccountingTransaction(branch_id=BRANCH, description='RM', amount_cents=70, created_by=u.id))
+        session.commit()
+        # Raw SQL bypasses every ORM hook
+        session.execute(text(
+            "INSERT INTO accounting_transactions (branch_id, description, amount_cents, status, created_by) "
+            "VALUES (:b, 'raw', 30, 'NEW', :u)"
+        ), {'b': BRANCH, 'u': u.id})
+        session.commit()
+        drift = verify_status_counts(session)
+        assert drift == [{'domain': 'AccountingTransaction', 'branch_id': BRANCH, 'status': 'NEW',
+                          'expected': (2, 100), 'actual': (1, 70)}]
+        verify_status_counts(session, repair=True)
+        assert _counts(session, 'AccountingTransaction') == {'NEW': (2, 100)}
+        assert verify_status_counts(session) == []
+
+
+def test_metrics_endpoint_reads_model_not_source_tables(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        perms = ['RPT.READ', 'SALES.CREATE', 'SALES.APPROVE']
+        ensure_permissions(perms)
+        u = ensure_user('read_model_api@example.com')
+        headers = jwt_headers(u.id, perms)
+        oid = client.post('/sales/orders', json={'customer_name': 'RM API', 'branch_id': 1, 'total_cents': 25}, headers=headers).get_json()['id']
+        before = client.get('/reports/metrics?include_financial=true&limit=200', headers=headers).get_json()['data']
+        assert client.post(f'/sales/orders/{oid}/approve', headers=headers).status_code == 200
+        with assert_max_queries(2) as qc:
+            after = client.get('/reports/metrics?include_financial=true&limit=200', headers=headers).get_json()['data']
+        assert not any('FROM orders' in s for s in qc.statements)
+
+        def order(rows, status):
+            return next((r for r in rows if r['domain'] == 'Order' and r['status'] == status), {'count': 0, 'sum_cents': 0})
+        assert order(after, 'APPROVED')['count'] == order(before, 'APPROVED')['count'] + 1
+        assert order(after, 'NEW')['sum_cents'] == order(before, 'NEW')['sum_cents'] - 25
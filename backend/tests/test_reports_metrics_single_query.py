@@ -0,0 +1,29 @@
+from flask import Flask
+from tests.test_utils_seed import ensure_permissions, ensure_user
+from tests.test_lifecycle_helpers import jwt_headers
+
+PERMS = ['RPT.READ', 'SALES.CREATE', 'ACC.UPDATE']
+
+
+def test_metrics_compiled_into_one_statement(app_instance: Flask, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(PERMS)
+        u = ensure_user('metrics_single_query@example.com')
+        headers = jwt_headers(u.id, PERMS)
+        client.post('/sales/orders', json={'customer_name': 'One Query', 'branch_id': 1, 'total_cents': 40}, headers=headers)
+        client.post('/accounting/transactions', json={'description': 'Fee', 'branch_id': 1, 'amount_cents': 15}, headers=headers)
+        # one UNION ALL statement (+ a possible token blocklist refresh)
+        with assert_max_queries(2) as qc:
+            resp = client.get('/reports/metrics?include_financial=true&limit=200', headers=headers)
+        assert resp.status_code == 200
+        assert sum('UNION ALL' in s for s in qc.statements) == 1
+        rows = resp.get_json()['data']
+        assert rows == sorted(rows, key=lambda m: (m['domain'], m['status']))
+        order_new = next(r for r in rows if r['domain'] == 'Order' and r['status'] == 'NEW')
+        assert order_new['count'] >= 1 and order_new['sum_cents'] >= 40
+        # Non-financial domains never carry sum_cents
+        assert all('sum_cents' not in r for r in rows if r['domain'] in ('PrintJob', 'RepairTicket', 'CatalogItem', 'Vendor'))
+        assert resp.headers.get('Last-Modified')
+        with assert_max_queries(2):
+            assert client.get('/reports/metrics/pivot', headers=headers).status_code == 200
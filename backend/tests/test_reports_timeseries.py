@@ -0,0 +1,120 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import DateTime, create_engine, select, literal, text
+from app import get_db
+from app.models.order import Order
+from app.utils.timebuckets import truncate_expr, floor_bucket, parse_bucket_value, bucket_count, bucket_range
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCH = 7303
+
+
+def _headers(user_id, branch_ids=(BRANCH,)):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': list(branch_ids)
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_sqlite_truncation_matches_python_floor(app_instance):
+    with app_instance.app_context():
+        session = get_db()
+        samples = [datetime(2026, 3, 1, 23, 59, 59), datetime(2026, 3, 2, 0, 0, 0),
+                   datetime(2026, 3, 4, 13, 30, 5), datetime(2026, 3, 8, 6, 0, 0)]
+        for bucket in ('hour', 'day', 'week'):
+            for dt in samples:
+                val = session.execute(select(truncate_expr(literal(dt.strftime('%Y-%m-%d %H:%M:%S')), bucket, 'sqlite'))).scalar_one()
+                assert parse_bucket_value(val) == floor_bucket(dt, bucket), (bucket, dt)
+
+
+def test_postgres_truncation_is_utc_whatever_the_session_time_zone():
+    url = os.getenv('POSTGRES_TEST_URL')
+    if not url:
+        pytest.skip('POSTGRES_TEST_URL not set')
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SET TIME ZONE 'America/New_York'"))
+            for dt in (datetime(2026, 3, 2, 3, 30, tzinfo=timezone.utc), datetime(2026, 3, 1, 23, 59, 59, tzinfo=timezone.utc)):
+                for bucket in ('hour', 'day', 'week'):
+                    val = conn.execute(select(truncate_expr(literal(dt, DateTime(timezone=True)), bucket, 'postgresql'))).scalar_one()
+                    assert parse_bucket_value(val) == floor_bucket(dt, bucket), (bucket, dt)
+    finally:
+        engine.dispose()
+
+
+def test_timeseries_dense_zero_filled_and_cached(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        ensure_permissions(['RPT.READ'])
+        u = ensure_user('timeseries@example.com')
+        base = datetime(2026, 3, 2, 9, 15)  # Monday
+        session.add_all([
+            Order(branch_id=BRANCH, customer_name='TS1', total_cents=10, created_by=u.id, updated_at=base),
+            Order(branch_id=BRANCH, customer_name='TS2', total_cents=20, created_by=u.id, updated_at=base + timedelta(minutes=20)),
+            Order(branch_id=BRANCH, customer_name='TS3', total_cents=5, created_by=u.id, updated_at=base + timedelta(days=2)),
+            Order(branch_id=BRANCH + 1, customer_name='TS4', total_cents=7, created_by=u.id, updated_at=base),
+        ])
+        session.commit()
+        headers = _headers(u.id, (BRANCH, BRANCH + 1))
+        resp = client.get('/reports/metrics/timeseries?domain=Order&bucket=day&start_date=2026-03-01&end_date=2026-03-05&include_financial=true', headers=headers)
+        assert resp.status_code == 200
+        body = resp.get_json()['data'][0]
+        assert body['buckets'][0] == '2026-03-01T00:00:00Z' and len(body['buckets']) == 5
+        series = {s['branch_id']: s for s in body['series']}
+        assert series[BRANCH]['counts'] == [0, 2, 0, 1, 0]
+        assert series[BRANCH]['sum_cents'] == [0, 30, 0, 5, 0]
+        assert series[BRANCH + 1]['counts'] == [0, 1, 0, 0, 0]
+        etag = resp.headers['ETag']
+        assert resp.headers.get('Last-Modified')
+        again = client.get('/reports/metrics/timeseries?domain=Order&bucket=day&start_date=2026-03-01&end_date=2026-03-05&include_financial=true',
+                           headers={**headers, 'If-None-Match': etag})
+        assert again.status_code == 304
+
+        hourly = client.get('/reports/metrics/timeseries?domain=Order&bucket=hour&start_date=2026-03-02T08:00:00&end_date=2026-03-02T11:00:00',
+                            headers=_headers(u.id)).get_json()['data'][0]
+        assert hourly['series'] == [{'branch_id': BRANCH, 'counts': [0, 2, 0, 0]}]
+        weekly = client.get('/reports/metrics/timeseries?domain=Order&bucket=week&start_date=2026-02-25&end_date=2026-03-10',
+                            headers=_headers(u.id)).get_json()['data'][0]
+        assert weekly['buckets'] == ['2026-02-23T00:00:00Z', '2026-03-02T00:00:00Z', '2026-03-09T00:00:00Z']
+        assert weekly['series'][0]['counts'] == [0, 3, 0]
+        head = client.head('/reports/metrics/timeseries?domain=Order&bucket=week&start_date=2026-02-25&end_date=2026-03-10', headers=_headers(u.id))
+        assert head.status_code == 200 and head.data == b'' and head.headers.get('ETag')
+
+
+def test_timeseries_validation(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        u = ensure_user('timeseries_bad@example.com')
+        headers = _headers(u.id)
+        assert client.get('/reports/metrics/timeseries?domain=Nope', headers=headers).status_code == 400
+        assert client.get('/reports/metrics/timeseries?domain=Order&bucket=minute', headers=headers).status_code == 400
+        assert client.get('/reports/metrics/timeseries?domain=Order&start_date=2026-03-05&end_date=2026-03-01', headers=headers).status_code == 400
+        assert client.get('/reports/metrics/timeseries?domain=Order&bucket=hour&start_date=2020-01-01&end_date=2026-01-01', headers=headers).status_code == 400
+        # Defaults: last 30 days, zero-filled for the caller's branch
+        body = client.get('/reports/metrics/timeseries?domain=PrintJob', headers=headers).get_json()['data'][0]
+        assert len(body['buckets']) == 30 and body['series'][0]['branch_id'] == BRANCH
+
+
+def test_wide_window_rejected_before_buckets_are_built(app_instance, monkeypatch):
+    start, end = datetime(2026, 3, 1, 23, 30), datetime(2026, 3, 9, 0, 15)
+    for bucket in ('hour', 'day', 'week'):
+        assert bucket_count(start, end, bucket) == len(bucket_range(start, end, bucket))
+    assert bucket_count(end, start, 'day') == 0
+
+    import app.routes.reports as reports_module
+
+    def refuse(*args):
+        raise AssertionError('bucket_range called for an oversized window')
+
+    monkeypatch.setattr(reports_module, 'bucket_range', refuse)
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        headers = _headers(ensure_user('timeseries_wide@example.com').id)
+        r = client.get('/reports/metrics/timeseries?domain=Order&bucket=hour&start_date=0001-01-01&end_date=9999-01-01',
+                       headers=headers)
+        assert r.status_code == 400 and 'buckets' in r.get_json()['error']['detail']
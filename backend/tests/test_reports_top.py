@@ -0,0 +1,139 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy import delete, text, update
+from app import get_db
+from app.models.order import Order
+from app.models.purchase_order import PurchaseOrder
+from app.models.print_job import PrintJob
+from app.models.product import Product
+from app.services.report_top import verify_top_aggregates
+from tests.test_utils_seed import ensure_permissions, ensure_user
+
+BRANCH = 7307
+
+
+def _headers(user_id):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _top(client, headers, qs):
+    resp = client.get(f'/reports/top?{qs}', headers=headers)
+    assert resp.status_code == 200, resp.get_json()
+    return resp.get_json()['data']
+
+
+def test_top_customers_follow_writes_cancellations_and_edits(app_instance, assert_max_queries):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        ensure_permissions(['RPT.READ'])
+        u = ensure_user('top_customers@example.com')
+        headers = _headers(u.id)
+        orders = [Order(branch_id=BRANCH, customer_name=name, total_cents=cents, created_by=u.id)
+                  for name, cents in [('Alice', 100), ('Bob', 50), ('Alice', 30), ('Carol', 200)]]
+        session.add_all(orders)
+        session.add(Order(branch_id=BRANCH + 1, customer_name='Zed', total_cents=9999, created_by=u.id))
+        session.commit()
+        assert [(r['key'], r['sum_cents']) for r in _top(client, headers, 'dimension=customer')] == [
+            ('Carol', 200), ('Alice', 130), ('Bob', 50)]
+        orders[3].status = Order.STATUS_CANCELLED
+        orders[1].total_cents = 500
+        session.commit()
+        with assert_max_queries(2):
+            top = _top(client, headers, 'dimension=customer&n=2')
+        assert top == [{'rank': 1, 'key': 'Bob', 'count': 1, 'sum_cents': 500},
+                       {'rank': 2, 'key': 'Alice', 'count': 2, 'sum_cents': 130}]
+        by_count = _top(client, headers, 'dimension=customer&metric=count')
+        assert by_count[0]['key'] == 'Alice'
+        # Earlier months hold nothing
+        assert _top(client, headers, 'dimension=customer&start_date=2020-01-01&end_date=2020-12-31') == []
+
+
+def test_top_vendors_and_products(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        u = ensure_user('top_vendors@example.com')
+        headers = _headers(u.id)
+        p1 = Product(name='Top Gear', sku='TOP-GEAR-1', branch_id=BRANCH, created_by=u.id)
+        p2 = Product(name='Top Bolt', sku='TOP-BOLT-1', branch_id=BRANCH, created_by=u.id)
+        session.add_all([p1, p2]); session.flush()
+        session.add_all([
+            PurchaseOrder(branch_id=BRANCH, vendor_name='Acme', total_cents=300, created_by=u.id),
+            PurchaseOrder(branch_id=BRANCH, vendor_name='Globex', total_cents=900, created_by=u.id),
+            PrintJob(branch_id=BRANCH, product_id=p1.id, created_by=u.id),
+            PrintJob(branch_id=BRANCH, product_id=p2.id, created_by=u.id),
+            PrintJob(branch_id=BRANCH, product_id=p2.id, created_by=u.id),
+            PrintJob(branch_id=BRANCH, product_id=None, created_by=u.id),
+        ])
+        session.commit()
+        assert [r['key'] for r in _top(client, headers, 'dimension=vendor')] == ['Globex', 'Acme']
+        products = _top(client, headers, 'dimension=product')
+        assert [(r['label'], r['count']) for r in products] == [('Top Bolt', 2), ('Top Gear', 1)]
+        assert 'sum_cents' not in products[0]
+        assert client.get('/reports/top?dimension=product&metric=sum_cents', headers=headers).status_code == 400
+        assert client.get('/reports/top?dimension=store', headers=headers).status_code == 400
+        assert client.get('/reports/top?dimension=vendor&n=0', headers=headers).status_code == 400
+
+
+def test_top_falls_back_to_live_query_without_aggregates(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        u = ensure_user('top_live@example.com')
+        branch = BRANCH + 40
+        token = create_access_token(identity=str(u.id), additional_claims={
+            'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': [branch]})
+        headers = {'Authorization': f'Bearer {token}'}
+        session.add_all([Order(branch_id=branch, customer_name=name, total_cents=cents, created_by=u.id)
+                         for name, cents in [('Live A', 10), ('Live B', 40), ('Live A', 20), ('Live C', 5)]])
+        session.add(Order(branch_id=branch, customer_name='Live X', total_cents=999, created_by=u.id,
+                          status=Order.STATUS_CANCELLED))
+        session.commit()
+        from_aggregates = _top(client, headers, 'dimension=customer')
+        app_instance.config['REPORTS_TOP_AGGREGATES'] = False
+        try:
+            live = _top(client, headers, 'dimension=customer')
+            assert live == from_aggregates
+            assert [(r['key'], r['sum_cents']) for r in live] == [('Live B', 40), ('Live A', 30), ('Live C', 5)]
+            assert _top(client, headers, 'dimension=customer&metric=count&n=1') == [
+                {'rank': 1, 'key': 'Live A', 'count': 2, 'sum_cents': 30}]
+            assert _top(client, headers, 'dimension=customer&start_date=2020-01-01&end_date=2020-12-31') == []
+        finally:
+            app_instance.config['REPORTS_TOP_AGGREGATES'] = True
+
+
+def test_bulk_statements_and_drift_repair(app_instance):
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        session = get_db()
+        u = ensure_user('top_bulk@example.com')
+        branch = BRANCH + 50
+        token = create_access_token(identity=str(u.id), additional_claims={
+            'perms': ['RPT.READ'], 'roles': [], 'groups': [], 'branch_ids': [branch]})
+        headers = {'Authorization': f'Bearer {token}'}
+        session.add_all([Order(branch_id=branch, customer_name=f'Bulk{i % 3}', total_cents=100, created_by=u.id)
+                         for i in range(6)])
+        session.commit()
+        assert [(r['key'], r['sum_cents']) for r in _top(client, headers, 'dimension=customer')] == [
+            ('Bulk0', 200), ('Bulk1', 200), ('Bulk2', 200)]
+        session.execute(update(Order).where(Order.branch_id==branch, Order.customer_name=='Bulk0')
+                        .values(status=Order.STATUS_CANCELLED))
+        session.execute(delete(Order).where(Order.branch_id==branch, Order.customer_name=='Bulk1'))
+        session.execute(update(Order).where(Order.branch_id==branch, Order.customer_name=='Bulk2')
+                        .values(total_cents=50))
+        session.commit()
+        assert _top(client, headers, 'dimension=customer') == [{'rank': 1, 'key': 'Bulk2', 'count': 2, 'sum_cents': 100}]
+        assert [d for d in verify_top_aggregates(session) if d['branch_id'] == branch] == []
+
+        # Raw SQL is not observed: verify reports it and repair books the difference this month
+        session.execute(text('UPDATE orders SET total_cents = 75 WHERE branch_id = :b'), {'b': branch})
+        session.commit()
+        drift = verify_top_aggregates(session, repair=True)
+        assert [(d['key'], d['expected'], d['actual']) for d in drift if d['branch_id'] == branch] == [
+            ('Bulk2', (2, 150), (2, 100))]
+        assert [d for d in verify_top_aggregates(session) if d['branch_id'] == branch] == []
+        app_instance.extensions['report_cache'].clear()
+        assert _top(client, headers, 'dimension=customer')[0]['sum_cents'] == 150
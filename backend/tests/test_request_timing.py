@@ -0,0 +1,86 @@
+import logging
+import re
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+import app as app_module
+from app import create_app
+from app.models.authz import Base
+from app.utils import request_timing
+
+BRANCH = 7312
+PERMS = ['SALES.READ', 'SALES.CREATE']
+
+
+@pytest.fixture()
+def timed_app(tmp_path):
+    saved = app_module.db_engine, app_module.SessionLocal
+    app = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'timing.db'}", 'REQUEST_TIMING': True})
+    Base.metadata.create_all(app_module.db_engine)
+    try:
+        yield app
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def _headers(app):
+    with app.app_context():
+        token = create_access_token(identity='1', additional_claims={
+            'perms': PERMS, 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+        })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _server_timing(response):
+    out = {}
+    for part in response.headers['Server-Timing'].split(', '):
+        m = re.fullmatch(r'(\w+);dur=([\d.]+)(?:;desc="(\d+) \w+")?', part)
+        assert m, part
+        out[m.group(1)] = (float(m.group(2)), int(m.group(3)) if m.group(3) else None)
+    return out
+
+
+def test_list_reports_phases_and_statement_counts(timed_app, caplog):
+    caplog.set_level(logging.INFO, logger='app.request_timing')
+    client = timed_app.test_client()
+    headers = _headers(timed_app)
+    for name in ('Timing A', 'Timing B'):
+        assert client.post('/sales/orders', json={'customer_name': name, 'branch_id': BRANCH}, headers=headers).status_code == 201
+    statements = []
+    listener = lambda *a: statements.append(a[2])
+    event.listen(app_module.db_engine, 'after_cursor_execute', listener)
+    caplog.clear()
+    try:
+        r = client.get('/sales/orders?limit=1', headers=headers)
+    finally:
+        event.remove(app_module.db_engine, 'after_cursor_execute', listener)
+    assert r.status_code == 200
+    timing = _server_timing(r)
+    assert list(timing) == ['db', 'auth', 'count', 'fetch', 'serialize', 'total']
+    assert timing['db'][1] == len(statements)
+    assert timing['count'][1] == 1 and timing['fetch'][1] == 1 and timing['serialize'][1] == 0
+    assert timing['total'][0] >= timing['count'][0] + timing['fetch'][0]
+    record = next(rec for rec in caplog.records if rec.name == 'app.request_timing')
+    assert (record.method, record.path, record.status) == ('GET', '/sales/orders', 200)
+    assert record.db_queries == len(statements)
+    assert set(record.phases_ms) == {'auth', 'count', 'fetch', 'serialize'}
+
+
+def test_write_reports_commit_and_audit(timed_app):
+    r = timed_app.test_client().post('/sales/orders', json={'customer_name': 'Timing C', 'branch_id': BRANCH},
+                                     headers=_headers(timed_app))
+    assert r.status_code == 201
+    timing = _server_timing(r)
+    assert {'auth', 'commit', 'audit'} <= set(timing)
+    assert timing['commit'][1] >= 1  # the INSERT is flushed inside the commit
+    assert timing['audit'][1] >= 1
+
+
+def test_disabled_by_default_adds_nothing(client):
+    assert client.get('/healthz').headers.get('Server-Timing') is None
+    assert request_timing.timed('fetch') is request_timing._NOOP
+    assert not event.contains(app_module.db_engine, 'after_cursor_execute', request_timing._after_cursor_execute)
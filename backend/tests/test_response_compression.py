@@ -0,0 +1,121 @@
+import gzip
+import zlib
+
+import pytest
+from flask import Response
+
+import app as app_module
+from app import create_app
+from app.models.authz import Base
+from app.utils.compression import StreamCompressor, strip_encoding
+from app.utils.listing import handle_conditional, make_cached_list_response
+
+ROWS = [{'id': i, 'name': f'Product {i}', 'description_i18n': {'en': 'A long description ' * 4}} for i in range(1, 41)]
+
+
+@pytest.fixture()
+def compress_app():
+    saved = app_module.db_engine, app_module.SessionLocal
+    app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False,
+                      'COMPRESS_MIN_SIZE': 512})
+    Base.metadata.create_all(app_module.db_engine)
+
+    @app.route('/_test/list')
+    def big_list():
+        resp, etag = make_cached_list_response(ROWS, len(ROWS), 50, 0, None)
+        return handle_conditional(etag, None) or resp
+
+    @app.route('/_test/small')
+    def small():
+        return {'ok': True}
+
+    @app.route('/_test/png')
+    def png():
+        return Response(b'\x89PNG' + b'\x00' * 4096, mimetype='image/png')
+
+    @app.route('/_test/export.csv')
+    def export():
+        return Response((f'{r["id"]},{r["name"]}\n' for r in ROWS * 50), mimetype='text/csv')
+
+    try:
+        yield app
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_stream_compressor_and_variant_tags():
+    comp = StreamCompressor('gzip')
+    data = b''.join(comp.compress(c) for c in (b'a,b\n', b'c,d\n')) + comp.finish()
+    assert gzip.decompress(data) == b'a,b\nc,d\n'
+    assert strip_encoding('abc-gzip') == 'abc' and strip_encoding('abc-br') == 'abc' and strip_encoding('abc') == 'abc'
+
+
+def test_buffered_json_compressed_once_per_content(compress_app):
+    client = compress_app.test_client()
+    plain = client.get('/_test/list')
+    assert 'Content-Encoding' not in plain.headers and plain.headers['Vary'] == 'Accept-Encoding'
+    etag = plain.headers['ETag']
+
+    first = client.get('/_test/list', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/_test/list', headers={'Accept-Encoding': 'gzip'})
+    assert first.headers['Content-Encoding'] == 'gzip' and first.headers['Vary'] == 'Accept-Encoding'
+    assert gzip.decompress(first.data) == plain.data
+    assert int(first.headers['Content-Length']) == len(first.data) < len(plain.data)
+    assert first.get_etag() == (f'{etag}-gzip', False)
+    assert second.data == first.data
+    stats = compress_app.extensions['compression'].cache.stats()
+    assert stats['misses'] == 1 and stats['hits'] == 1 and stats['entries'] == 1
+
+    head = client.head('/_test/list', headers={'Accept-Encoding': 'gzip'})
+    assert head.headers['Content-Encoding'] == 'gzip' and head.data == b''
+
+
+def test_conditional_get_accepts_variant_etag(compress_app):
+    client = compress_app.test_client()
+    etag = client.get('/_test/list').headers['ETag']
+    # identity tag (unquoted, as list endpoints emit it) and the gzip variant both revalidate
+    for inm in (etag, f'"{etag}-gzip"', f'"stale", W/"{etag}-gzip"'):
+        r = client.get('/_test/list', headers={'If-None-Match': inm, 'Accept-Encoding': 'gzip'})
+        assert r.status_code == 304 and r.data == b'' and 'Content-Encoding' not in r.headers
+    r = client.get('/_test/list', headers={'If-None-Match': f'"{etag}-gzip"', 'Accept-Encoding': 'gzip'})
+    assert r.get_etag() == (f'{etag}-gzip', False)
+    assert client.get('/_test/list', headers={'If-None-Match': '"stale-gzip"'}).status_code == 200
+
+
+def test_thresholds_and_opt_outs(compress_app):
+    client = compress_app.test_client()
+    small = client.get('/_test/small', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers and small.headers['Vary'] == 'Accept-Encoding'
+    png = client.get('/_test/png', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in png.headers and 'Vary' not in png.headers
+    refused = client.get('/_test/list', headers={'Accept-Encoding': 'gzip;q=0, identity'})
+    assert 'Content-Encoding' not in refused.headers
+    # /openapi.json negotiates its own precompressed variants; the middleware leaves it alone
+    spec = client.get('/openapi.json', headers={'Accept-Encoding': 'gzip'})
+    assert spec.headers['Content-Encoding'] == 'gzip' and spec.headers['Vary'] == 'Accept-Encoding'
+    gzip.decompress(spec.data)
+
+
+def test_streamed_export_is_compressed_incrementally(compress_app):
+    client = compress_app.test_client()
+    expected = ''.join(f'{r["id"]},{r["name"]}\n' for r in ROWS * 50).encode()
+    r = client.get('/_test/export.csv', headers={'Accept-Encoding': 'gzip'}, buffered=False)
+    assert r.is_streamed and r.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in r.headers
+    chunks = list(r.response)
+    r.close()
+    assert len(b''.join(chunks)) < len(expected)
+    assert zlib.decompress(b''.join(chunks), 31) == expected
+
+
+def test_compression_can_be_disabled():
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False,
+                          'COMPRESS_ENABLED': False})
+        assert 'compression' not in app.extensions
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
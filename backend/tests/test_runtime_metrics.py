@@ -0,0 +1,111 @@
+import re
+import threading
+
+import pytest
+
+from flask_jwt_extended import create_access_token
+
+import app as app_module
+from app import create_app
+from app.utils.prom import Registry
+
+BRANCH = 7313
+PERMS = ['SALES.CREATE', 'SALES.APPROVE']
+
+
+def _headers(user_id):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': PERMS, 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _sample(text, name, **labels):
+    want = ','.join(f'{k}="{v}"' for k, v in labels.items())
+    m = re.search(rf'^{re.escape(name)}\{{{re.escape(want)}\}} (\S+)$', text, re.M)
+    return float(m.group(1)) if m else 0.0
+
+
+def test_sharded_counters_and_histograms_merge_threads():
+    registry = Registry()
+    hits = registry.counter('hits_total', 'Hits', ('kind',))
+    latency = registry.histogram('latency_seconds', 'Latency', (), buckets=(0.1, 1.0))
+    assert registry.counter('hits_total', 'again', ('kind',)) is hits
+
+    def work():
+        for _ in range(1000):
+            hits.inc(('a',))
+        latency.observe((), 0.1)
+        latency.observe((), 5.0)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    hits.inc(('quote"d\n',), 2)
+    text = registry.render()
+    # Finished threads were folded into the retired shard; nothing lost
+    assert 'hits_total{kind="a"} 4000' in text
+    assert 'hits_total{kind="quote\\"d\\n"} 2' in text
+    assert 'latency_seconds_bucket{le="0.1"} 4' in text
+    assert 'latency_seconds_bucket{le="1.0"} 4' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 8' in text
+    assert 'latency_seconds_sum 20.4' in text and 'latency_seconds_count 8' in text
+    assert '# TYPE latency_seconds histogram' in text
+    assert len(hits._shards) <= 1  # only this (live) thread keeps a shard
+
+
+def test_metrics_endpoint_routes_audit_and_transitions(app_instance, client):
+    scrape = {'Authorization': f"Bearer {app_instance.config['METRICS_TOKEN']}"}
+    before = client.get('/metrics', headers=scrape).get_data(as_text=True)
+    with app_instance.app_context():
+        headers = _headers(1)
+    created = client.post('/sales/orders', json={'customer_name': 'Metrics', 'branch_id': BRANCH}, headers=headers)
+    assert created.status_code == 201
+    order_id = created.get_json()['id']
+    assert client.post(f'/sales/orders/{order_id}/approve', headers=headers).status_code == 200
+    assert client.get('/no/such/path').status_code == 404
+    r = client.get('/metrics', headers=scrape)
+    assert r.status_code == 200 and r.content_type.startswith('text/plain; version=0.0.4')
+    text = r.get_data(as_text=True)
+
+    def delta(name, **labels):
+        return _sample(text, name, **labels) - _sample(before, name, **labels)
+
+    route = dict(blueprint='sales', route='/sales/orders/<int:order_id>/approve', method='POST')
+    assert delta('http_requests_total', **route, status='200') == 1
+    assert delta('http_request_duration_seconds_count', **route) == 1
+    assert delta('http_request_duration_seconds_bucket', **route, le='+Inf') == 1
+    assert delta('http_requests_total', blueprint='', route='unmatched', method='GET', status='404') == 1
+    assert delta('audit_writes_total', action='ORDER.CREATE') == 1
+    assert delta('audit_writes_total', action='ORDER.APPROVE') >= 1
+    assert delta('fsm_transitions_total', entity='Order', from_status='', to_status='NEW') == 1
+    assert delta('fsm_transitions_total', entity='Order', from_status='NEW', to_status='APPROVED') == 1
+    # The shared in-memory test database uses a StaticPool, which has no pool gauges
+    assert '# TYPE db_pool_checked_out gauge' in text and 'db_pool_checked_out{' not in text
+
+
+def test_metrics_token_and_pool_gauges(tmp_path):
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        with pytest.raises(ValueError, match='METRICS_TOKEN'):
+            create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'anon.db'}", 'METRICS_ENABLED': True, 'METRICS_TOKEN': ''})
+        app_module.db_engine.dispose()
+        off = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'off.db'}", 'METRICS_ENABLED': False})
+        assert off.test_client().get('/metrics').status_code == 404
+        app_module.db_engine.dispose()
+        app = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'metrics.db'}", 'DB_POOL_SIZE': 3,
+                          'METRICS_ENABLED': True, 'METRICS_TOKEN': 'scrape-secret'})
+        client = app.test_client()
+        denied = client.get('/metrics')
+        assert denied.status_code == 401 and denied.get_json()['error']['status'] == 401
+        assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+        with app_module.db_engine.connect():
+            text = client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).get_data(as_text=True)
+        assert 'db_pool_size{engine="primary"} 3' in text
+        assert 'db_pool_checked_out{engine="primary"} 1' in text
+        assert 'db_pool_overflow{engine="primary"} 0' in text
+        app_module.db_engine.dispose()
+    finally:
+        app_module.db_engine, app_module.SessionLocal = saved
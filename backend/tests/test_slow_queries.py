@@ -0,0 +1,125 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import text
+
+import app as app_module
+from app import create_app, get_db
+from app.models.authz import Base
+from app.services.slow_queries import SlowQueryRecorder, normalize_sql, param_shape
+
+BRANCH = 7314
+PERMS = ['SALES.READ', 'SALES.CREATE', 'ADMIN.SETTINGS.MANAGE']
+
+
+def _headers(user_id=1):
+    token = create_access_token(identity=str(user_id), additional_claims={
+        'perms': PERMS, 'roles': [], 'groups': [], 'branch_ids': [BRANCH]
+    })
+    return {'Authorization': f'Bearer {token}'}
+
+
+def test_normalize_sql_and_param_shapes():
+    sql = "SELECT  *\n FROM orders WHERE name = 'O''Brien' AND id IN (?, ?, ?) AND total > 10 AND t1.x = :p LIMIT ?"
+    assert normalize_sql(sql) == 'SELECT * FROM orders WHERE name = ? AND id IN (?...) AND total > ? AND t1.x = ? LIMIT ?'
+    assert normalize_sql('SELECT x::int FROM t WHERE a = $1') == 'SELECT x::int FROM t WHERE a = ?'
+    assert param_shape(('a', 1, None)) == '(str, int, NoneType)'
+    assert param_shape({'name': 'a', 'n': 2}) == '{name: str, n: int}'
+    assert param_shape([(1,), (2,)], executemany=True) == '(int) x2'
+
+
+def test_eviction_drops_least_total_time():
+    recorder = SlowQueryRecorder(threshold_ms=0, max_entries=2, explain=False)
+    for sql, ms in (('SELECT a FROM x', 5.0), ('SELECT b FROM x', 50.0), ('SELECT c FROM x', 20.0)):
+        recorder.record(None, None, sql, (), False, ms)
+    assert [e['sql'] for e in recorder.top('total_ms')] == ['SELECT b FROM x', 'SELECT c FROM x']
+    recorder.record(None, None, 'SELECT d FROM x', (), False, 1.0)
+    assert [e['sql'] for e in recorder.top('total_ms')] == ['SELECT b FROM x', 'SELECT d FROM x']
+    with pytest.raises(ValueError):
+        recorder.top('sql')
+
+
+@pytest.fixture()
+def memory_app():
+    """Own in-memory (StaticPool) app recording every statement; restores the shared test engine."""
+    saved = app_module.db_engine, app_module.SessionLocal
+    app = create_app({'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': True,
+                      'SLOW_QUERY_EXPLAIN': True, 'SLOW_QUERY_THRESHOLD_MS': 0})
+    Base.metadata.create_all(app_module.db_engine)
+    try:
+        yield app
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_slow_list_query_is_recorded_with_route_and_plan(memory_app):
+    client = memory_app.test_client()
+    with memory_app.app_context():
+        headers = _headers()
+        denied = create_access_token(identity='1', additional_claims={
+            'perms': ['SALES.READ'], 'roles': [], 'groups': [], 'branch_ids': [BRANCH]})
+    assert client.post('/sales/orders', json={'customer_name': 'Slow Sam', 'branch_id': BRANCH, 'total_cents': 9},
+                       headers=headers).status_code == 201
+    for _ in range(2):
+        r = client.get('/sales/orders?customer_name=Slow&sort=-total_cents', headers=headers)
+        assert r.status_code == 200
+    body = client.get('/iam/diagnostics/slow-queries?sort=count&limit=200', headers=headers).get_json()
+    assert body['enabled'] is True and body['threshold_ms'] == 0
+    page = next(e for e in body['data'] if 'ORDER BY orders.total_cents DESC' in e['sql'] and 'LIMIT' in e['sql'])
+    assert 'LIKE lower(?)' in page['sql'] and 'Slow' not in page['sql']
+    assert page['count'] == 2 and page['routes'] == {'GET /sales/orders': 2}
+    assert page['param_shapes'][0].startswith('(int, str')
+    assert page['avg_ms'] <= page['max_ms'] <= page['total_ms']
+    # In-memory SQLite (StaticPool): the plan is taken on the shared connection once it is checked in
+    assert page['plan'] and any('orders' in line for line in page['plan'])
+    assert page['plan_error'] is None and page['plan_captured_at'].endswith('Z')
+    insert = next(e for e in body['data'] if e['sql'].startswith('INSERT INTO orders'))
+    assert insert['routes'] == {'POST /sales/orders': 1}
+
+    assert client.get('/iam/diagnostics/slow-queries?sort=sql', headers=headers).status_code == 400
+    assert client.get('/iam/diagnostics/slow-queries', headers={'Authorization': f'Bearer {denied}'}).status_code == 403
+
+
+def test_pooled_engine_captures_plan_in_background(tmp_path):
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        app = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'slow.db'}", 'SLOW_QUERY_LOG': True,
+                          'SLOW_QUERY_EXPLAIN': True, 'SLOW_QUERY_THRESHOLD_MS': 0})
+        Base.metadata.create_all(app_module.db_engine)
+        recorder = app.extensions['slow_queries']
+        recorder.clear()
+        with app.app_context():
+            get_db().execute(text('SELECT id FROM orders WHERE branch_id = :b ORDER BY total_cents'), {'b': BRANCH}).all()
+        recorder.wait_for_plans()
+        entry = next(e for e in recorder.top() if e['sql'] == 'SELECT id FROM orders WHERE branch_id = ? ORDER BY total_cents')
+        assert entry['routes'] == {'background': 1}
+        assert entry['plan'] and entry['plan_error'] is None
+        assert any('USE TEMP B-TREE FOR ORDER BY' in line for line in entry['plan'])
+        recorder.close()
+        assert recorder._executor._shutdown
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        off = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'off.db'}", 'SLOW_QUERY_LOG': False})
+        assert off.extensions['slow_queries'] is None
+        app_module.db_engine.dispose()
+    finally:
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_static_pool_plan_waits_for_checkin():
+    from sqlalchemy import create_engine
+    from sqlalchemy.pool import StaticPool
+    engine = create_engine('sqlite://', poolclass=StaticPool)
+    recorder = SlowQueryRecorder(threshold_ms=0)
+    recorder.install(engine)
+    try:
+        with engine.connect() as conn:
+            result = conn.execute(text('SELECT 1 AS one UNION ALL SELECT 2'))
+            assert recorder.top()[0]['plan'] is None  # cursor still open: nothing run on the connection yet
+            assert result.scalars().all() == [1, 2]
+        entry = recorder.top()[0]
+        assert entry['plan'] and entry['plan_error'] is None
+    finally:
+        recorder.close()
+        engine.dispose()
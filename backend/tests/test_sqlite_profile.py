@@ -0,0 +1,179 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine, insert, select, func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+import app as app_module
+from app import create_app
+from app.models.authz import Base
+from app.models.order import Order
+from app.utils.sqlite_profile import SqliteProfile, WriterQueue, applies_to
+
+
+@pytest.fixture()
+def profiled_engine(tmp_path):
+    profile = SqliteProfile(busy_timeout_ms=2000, cache_size_kb=8192, mmap_size=1 << 20, write_lock=True)
+    engine = create_engine(f"sqlite:///{tmp_path / 'edge.db'}", pool_size=10)
+    profile.install(engine)
+    Base.metadata.create_all(engine)
+    yield profile, engine
+    engine.dispose()
+
+
+def test_connect_applies_pragmas(profiled_engine):
+    _, engine = profiled_engine
+    with engine.connect() as conn:
+        pragma = lambda name: conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 2000
+        assert pragma('cache_size') == -8192
+        assert pragma('mmap_size') == 1 << 20
+        assert pragma('temp_store') == 2  # MEMORY
+    assert applies_to(engine)
+    assert not applies_to(create_engine('sqlite://'))
+    with pytest.raises(ValueError):
+        SqliteProfile(synchronous='SOMETIMES')
+
+
+def test_writer_queue_is_fifo_and_releasable_from_any_thread():
+    queue = WriterQueue()
+    assert queue.acquire()
+    assert not queue.acquire(blocking=False)
+    assert not queue.acquire(timeout=0.01) and queue.waiting == 0
+    order = []
+
+    def waiter(n):
+        queue.acquire()
+        order.append(n)
+        queue.release()
+
+    threads = []
+    for n in range(4):
+        threads.append(threading.Thread(target=waiter, args=(n,)))
+        threads[-1].start()
+        while queue.waiting < n + 1:
+            time.sleep(0.001)
+    threading.Thread(target=queue.release).start()  # released by a thread that never acquired it
+    for t in threads:
+        t.join(5)
+    assert order == [0, 1, 2, 3]
+    with pytest.raises(RuntimeError):
+        queue.release()
+
+
+def test_concurrent_writers_queue_instead_of_failing(profiled_engine):
+    profile, engine = profiled_engine
+    errors = []
+
+    def writer(n):
+        for i in range(10):
+            try:
+                with Session(engine) as s:
+                    s.add(Order(customer_name=f'edge {n}-{i}', branch_id=1, total_cents=i, created_by=1))
+                    s.flush()
+                    time.sleep(0.002)  # handler work while holding SQLite's write lock
+                    s.commit()
+            except Exception as e:  # pragma: no cover - surfaced by the assertion below
+                errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    with Session(engine) as s:
+        assert s.execute(select(func.count(Order.id))).scalar() == 60
+    stats = profile.stats()
+    assert stats['write_locks'] >= 60 and stats['write_lock_waits'] > 0
+    assert stats['write_lock_timeouts'] == 0 and stats['write_lock_waiting'] == 0
+    # Rolled-back writes and connections returned mid-transaction hand the lock back too
+    with Session(engine) as s:
+        s.add(Order(customer_name='rolled back', branch_id=1, created_by=1))
+        s.flush()
+        s.rollback()
+    conn = engine.connect()
+    conn.exec_driver_sql("UPDATE orders SET total_cents = 0 WHERE id = 1")
+    conn.close()
+    assert profile.write_lock.acquire(blocking=False)
+    profile.write_lock.release()
+
+
+def test_writer_lock_released_at_commit_and_timeout_fails(profiled_engine):
+    profile, engine = profiled_engine
+    profile.busy_timeout_ms = 50
+    with engine.connect() as conn:
+        conn.execute(insert(Order).values(customer_name='held', branch_id=1, created_by=1))
+        assert not profile.write_lock.acquire(blocking=False)
+        conn.commit()
+        # Handed back by the commit itself, not when the connection is next used or returned
+        assert profile.write_lock.acquire(blocking=False)
+        profile.write_lock.release()
+        conn.exec_driver_sql("UPDATE orders SET total_cents = 1 WHERE customer_name = 'held'")
+        conn.rollback()
+        assert profile.write_lock.acquire(blocking=False)
+        profile.write_lock.release()
+    assert profile.write_lock.acquire()  # another writer of this process holds it
+    try:
+        with Session(engine) as s:
+            s.add(Order(customer_name='blocked', branch_id=1, created_by=1))
+            with pytest.raises(OperationalError, match='database is locked'):
+                s.flush()
+    finally:
+        profile.write_lock.release()
+    assert profile.stats()['write_lock_timeouts'] == 1
+    with Session(engine) as s:
+        assert s.execute(select(func.count(Order.id)).where(Order.customer_name == 'blocked')).scalar() == 0
+
+
+def test_maintenance_runs_once_per_interval(profiled_engine):
+    profile, engine = profiled_engine
+    with Session(engine) as s:
+        s.add(Order(customer_name='wal', branch_id=1, created_by=1))
+        s.commit()
+    assert profile.maybe_maintain() is False  # interval not yet elapsed
+    profile._next_maintenance = 0
+    assert profile.maybe_maintain() is True
+    assert profile.stats()['maintenance_runs'] == 1
+    assert profile.stats()['last_checkpoint']['busy'] == 0
+    assert profile.maybe_maintain() is False
+    profile.maintenance_seconds = 0
+    profile._next_maintenance = 0
+    assert profile.maybe_maintain() is False
+
+
+def test_maintenance_runs_on_background_thread(tmp_path):
+    profile = SqliteProfile(maintenance_seconds=0.05)
+    engine = create_engine(f"sqlite:///{tmp_path / 'maint.db'}")
+    profile.install(engine)
+    try:
+        profile.start()
+        deadline = time.monotonic() + 5
+        while profile.stats()['maintenance_runs'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert profile.stats()['maintenance_runs'] >= 1
+    finally:
+        profile.stop()
+        engine.dispose()
+
+
+def test_create_app_profiles_file_databases_only(tmp_path):
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        app = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'app.db'}"})
+        assert isinstance(app.extensions['sqlite_profile'], SqliteProfile)
+        assert app.extensions['sqlite_profile'].serialize_writes is False  # writer queue is opt-in
+        app.extensions['sqlite_profile'].stop()
+        with app_module.db_engine.connect() as conn:
+            assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+        app_module.db_engine.dispose()
+        off = create_app({'DATABASE_URL': f"sqlite:///{tmp_path / 'plain.db'}", 'SQLITE_PROFILE': False})
+        assert off.extensions['sqlite_profile'] is None
+        app_module.db_engine.dispose()
+    finally:
+        app_module.db_engine, app_module.SessionLocal = saved
+    assert saved[0] is not None and not applies_to(saved[0])
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+import app as app_module
+from app import create_app
+
+BACKEND = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# `import app` is mostly Flask + SQLAlchemy; generous headroom for slow CI runners
+IMPORT_BUDGET_MS = float(os.getenv('APP_IMPORT_BUDGET_MS', '1500'))
+DEFERRED = ('app.routes', 'app.models', 'app.openapi', 'app.services', 'dotenv')
+
+
+def _import_profile():
+    code = 'import sys, json, app; print(json.dumps(sorted(sys.modules)))'
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND, capture_output=True, text=True, check=True)
+    cumulative_us = next(int(line.split('|')[1]) for line in out.stderr.splitlines()
+                         if line.startswith('import time:') and line.split('|')[2].strip() == 'app')
+    return cumulative_us / 1000.0, json.loads(out.stdout)
+
+
+def test_import_app_within_budget_and_side_effect_free():
+    elapsed_ms, modules = _import_profile()
+    assert elapsed_ms <= IMPORT_BUDGET_MS, f'import app took {elapsed_ms:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)'
+    eager = [m for m in modules if m.startswith(DEFERRED)]
+    assert not eager, f'imported by `import app` but should be deferred: {eager}'
+
+
+def test_lazy_blueprints_register_before_first_request():
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False,
+                          'LAZY_BLUEPRINTS': True, 'BLUEPRINTS_PRELOAD': 'iam'})
+        blueprints = app.extensions['blueprints']
+        assert blueprints.loaded == ['iam'] and 'sales' in blueprints.pending
+        assert not any(r.rule.startswith('/sales') for r in app.url_map.iter_rules())
+        client = app.test_client()
+        # The first request registers everything before dispatch; the URL map is fixed from then on
+        assert client.get('/healthz').status_code == 200
+        assert not blueprints.pending
+        assert {'purchase_orders', 'vendors', 'reports'} <= set(blueprints.loaded)
+        assert client.get('/sales/orders').status_code == 401  # route exists (auth required), not 404
+        assert client.get('/nope').status_code == 404
+        blueprints.load_all()  # no-op once loaded
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
+
+
+def test_eager_registration_by_default():
+    saved = app_module.db_engine, app_module.SessionLocal
+    try:
+        app = create_app({'TESTING': True, 'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False})
+        assert not app.extensions['blueprints'].pending
+        assert {'iam', 'sales', 'reports', 'vendors'} <= set(app.blueprints)
+    finally:
+        app_module.SessionLocal.remove()
+        app_module.db_engine.dispose()
+        app_module.db_engine, app_module.SessionLocal = saved
@@ -0,0 +1,179 @@
+from app.utils.bloom import BloomFilter
+from app.models.audit import AuditLog
+from app import get_db
+from tests.test_utils_seed import ensure_permissions, ensure_user
+from tests.test_lifecycle_helpers import jwt_headers
+
+
+def test_bloom_filter_membership():
+    bf = BloomFilter.for_capacity(1000, error_rate=0.01)
+    items = [f'jti-{i}' for i in range(500)]
+    bf.update(items)
+    assert all(i in bf for i in items)
+    false_hits = sum(1 for i in range(5000) if f'other-{i}' in bf)
+    # 1% target rate with headroom; guards against sizing regressions
+    assert false_hits < 150
+
+
+def test_logout_revokes_current_token_only(app_instance):
+    with app_instance.app_context():
+        _logout_flow(app_instance.test_client())
+
+
+def _logout_flow(client):
+    ensure_permissions(['SALES.READ'])
+    u = ensure_user('revoke_self@example.com')
+    headers = jwt_headers(u.id, ['SALES.READ'])
+    other = jwt_headers(u.id, ['SALES.READ'])
+    assert client.get('/sales/orders', headers=headers).status_code == 200
+    resp = client.post('/iam/auth/logout', headers=headers)
+    assert resp.status_code == 200 and resp.get_json()['status'] == 'revoked'
+    denied = client.get('/sales/orders', headers=headers)
+    assert denied.status_code == 401
+    # A second token for the same user stays valid
+    assert client.get('/sales/orders', headers=other).status_code == 200
+
+
+def test_admin_revokes_all_user_tokens(app_instance):
+    with app_instance.app_context():
+        _revoke_all_flow(app_instance.test_client())
+
+
+def _revoke_all_flow(client):
+    ensure_permissions(['SALES.READ', 'ADMIN.USER.MANAGE'])
+    admin = ensure_user('revoke_admin@example.com')
+    target = ensure_user('revoke_target@example.com')
+    admin_headers = jwt_headers(admin.id, ['ADMIN.USER.MANAGE'])
+    t1 = jwt_headers(target.id, ['SALES.READ'])
+    t2 = jwt_headers(target.id, ['SALES.READ'])
+    assert client.post('/iam/users/999999/tokens/revoke', headers=admin_headers).status_code == 404
+    resp = client.post(f'/iam/users/{target.id}/tokens/revoke', headers=admin_headers)
+    assert resp.status_code == 200
+    assert client.get('/sales/orders', headers=t1).status_code == 401
+    assert client.get('/sales/orders', headers=t2).status_code == 401
+    # Admin token unaffected
+    assert client.post('/iam/tokens/revoke', json={}, headers=admin_headers).status_code == 400
+    audit = get_db().query(AuditLog).filter(AuditLog.action=='TOKEN.REVOKE_ALL', AuditLog.entity_id==str(target.id)).first()
+    assert audit is not None
+
+
+def test_revocation_visible_after_incremental_refresh(app_instance):
+    """Rows written by another worker reach this process through refresh()."""
+    from flask_jwt_extended import decode_token
+    from app.services.token_blocklist import TokenBlocklist
+    with app_instance.app_context():
+        ensure_permissions(['SALES.READ'])
+        u = ensure_user('revoke_remote@example.com')
+        headers = jwt_headers(u.id, ['SALES.READ'])
+        token = headers['Authorization'].split()[1]
+        payload = decode_token(token)
+        remote = TokenBlocklist(refresh_seconds=3600)
+        local = app_instance.extensions['token_blocklist']
+        remote.revoke_token(payload['jti'], user_id=u.id)
+        assert remote.is_revoked(payload)
+        local.refresh()
+        assert local.is_revoked(payload)
+
+
+def test_revoke_all_spares_tokens_issued_later_in_same_second(app_instance):
+    from datetime import timezone
+    from flask_jwt_extended import decode_token
+    from app.services.token_blocklist import ISSUED_AT_MS_CLAIM
+    blocklist = app_instance.extensions['token_blocklist']
+    with app_instance.app_context():
+        u = ensure_user('revoke_same_second@example.com')
+        revoked_at = blocklist.revoke_user(u.id).revoked_at
+        cutoff = (revoked_at if revoked_at.tzinfo else revoked_at.replace(tzinfo=timezone.utc)).timestamp()
+        second = int(cutoff)
+        before = {'sub': str(u.id), 'iat': second, ISSUED_AT_MS_CLAIM: int(cutoff * 1000) - 1}
+        after = {'sub': str(u.id), 'iat': second, ISSUED_AT_MS_CLAIM: int(cutoff * 1000) + 1}
+        assert blocklist.is_revoked(before)
+        assert not blocklist.is_revoked(after)
+        # Tokens minted before the claim existed keep the conservative whole-second rule
+        assert blocklist.is_revoked({'sub': str(u.id), 'iat': second})
+        assert not blocklist.is_revoked({'sub': str(u.id), 'iat': second + 1})
+        headers = jwt_headers(u.id, [])
+        assert decode_token(headers['Authorization'].split()[1])[ISSUED_AT_MS_CLAIM] >= int(cutoff * 1000)
+
+
+def test_refresh_picks_up_rows_committed_out_of_id_order(app_instance):
+    """A row with a lower id that becomes visible after a higher one is still applied."""
+    from datetime import datetime, timedelta, timezone
+    from app.models.token_revocation import TokenRevocation
+    from app.services.token_blocklist import TokenBlocklist
+    with app_instance.app_context():
+        session = get_db()
+        local = TokenBlocklist(refresh_seconds=3600, full_reload_seconds=3600)
+        now = datetime.now(timezone.utc)
+        session.add(TokenRevocation(jti='ooo-late', revoked_at=now, expires_at=now + timedelta(hours=1)))
+        session.commit()
+        local.refresh()
+        # Simulates a transaction that took its id earlier but committed later
+        session.add(TokenRevocation(jti='ooo-early', revoked_at=now - timedelta(seconds=5), expires_at=now + timedelta(hours=1)))
+        session.commit()
+        local.refresh()
+        assert local.is_revoked({'jti': 'ooo-early'})
+        # Beyond the overlap window only the periodic full reload catches it
+        session.add(TokenRevocation(jti='ooo-stale', revoked_at=now - timedelta(hours=2), expires_at=now + timedelta(hours=1)))
+        session.commit()
+        local.refresh()
+        assert not local.is_revoked({'jti': 'ooo-stale'})
+        local.full_reload_seconds = 0
+        local.refresh()
+        assert local.is_revoked({'jti': 'ooo-stale'}) and local.is_revoked({'jti': 'ooo-late'})
+
+
+def test_admin_revoke_sets_expiry(app_instance):
+    from datetime import datetime, timezone
+    from app.models.token_revocation import TokenRevocation
+    with app_instance.app_context():
+        client = app_instance.test_client()
+        ensure_permissions(['ADMIN.USER.MANAGE'])
+        admin = ensure_user('revoke_exp_admin@example.com')
+        headers = jwt_headers(admin.id, ['ADMIN.USER.MANAGE'])
+        assert client.post('/iam/tokens/revoke', json={'jti': 'exp-bad', 'exp': 'soon'}, headers=headers).status_code == 400
+        exp = int(datetime.now(timezone.utc).timestamp()) + 120
+        assert client.post('/iam/tokens/revoke', json={'jti': 'exp-given', 'exp': exp}, headers=headers).status_code == 200
+        assert client.post('/iam/tokens/revoke', json={'jti': 'exp-default'}, headers=headers).status_code == 200
+        session = get_db()
+        given = session.query(TokenRevocation).filter_by(jti='exp-given').one()
+        default = session.query(TokenRevocation).filter_by(jti='exp-default').one()
+        to_epoch = lambda dt: (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+        assert int(to_epoch(given.expires_at)) == exp
+        lifetime = app_instance.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds()
+        assert default.expires_at is not None
+        assert abs(to_epoch(default.expires_at) - (datetime.now(timezone.utc).timestamp() + lifetime)) < 60
+
+
+def test_refresh_reads_primary_engine_once_per_interval_and_prunes_old_cutoffs(tmp_path):
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import create_engine, insert
+    from app.models.token_revocation import TokenRevocation
+    from app.services.token_blocklist import TokenBlocklist, token_lifetime_seconds
+    engine = create_engine(f"sqlite:///{tmp_path / 'revocations.db'}")
+    try:
+        TokenRevocation.__table__.create(engine)
+        now = datetime.now(timezone.utc)
+        with engine.begin() as conn:
+            conn.execute(insert(TokenRevocation.__table__), [
+                {'jti': 'primary-jti', 'user_id': 40, 'revoked_at': now, 'expires_at': now + timedelta(hours=1), 'revoked_by': 0},
+                {'jti': None, 'user_id': 41, 'revoked_at': now - timedelta(minutes=5), 'expires_at': None, 'revoked_by': 0},
+                {'jti': None, 'user_id': 42, 'revoked_at': now - timedelta(days=2), 'expires_at': None, 'revoked_by': 0},
+            ])
+        blocklist = TokenBlocklist(refresh_seconds=3600, engine=engine, token_lifetime_seconds=3600)
+        # No app context needed: the rows come from the engine, not the request session
+        assert blocklist.is_revoked({'jti': 'primary-jti'})
+        assert blocklist.stats()['users'] == 1  # user 42's cutoff predates every live token
+        assert blocklist.refresh(force=False) == 0  # fresh: a caller that queued behind the lock does not re-query
+        blocklist._last_refresh -= 7200
+        with blocklist._lock:
+            # Another thread is refreshing an existing snapshot: answer from it without waiting
+            assert blocklist.refresh(force=False) == 0
+        blocklist._user_cutoffs[43] = (now - timedelta(days=3)).timestamp()
+        blocklist._compact()
+        assert 43 not in blocklist._user_cutoffs and 41 in blocklist._user_cutoffs
+        assert token_lifetime_seconds({'JWT_ACCESS_TOKEN_EXPIRES': timedelta(minutes=15),
+                                       'JWT_REFRESH_TOKEN_EXPIRES': timedelta(days=30)}) == 30 * 86400
+        assert token_lifetime_seconds({'JWT_ACCESS_TOKEN_EXPIRES': False, 'JWT_REFRESH_TOKEN_EXPIRES': 60}) is None
+    finally:
+        engine.dispose()
@@ -0,0 +1,4 @@
+"""Development tooling built on the app (index advisor, plan checks).
+
+Imported by `scripts/` and the tests, never by the running application.
+"""
@@ -0,0 +1,490 @@
+from __future__ import annotations
+"""Index advisor and plan-regression checker for the list endpoints.
+
+The filterable / sortable columns live inside each list route (`filter_specs`, the `allowed` sort
+maps, ad-hoc `request.args` filters), so they are discovered by probing rather than restated:
+
+  1. every table is seeded with deterministic synthetic rows (one scoped branch out of
+     `branches`) and ANALYZEd, so SQLite plans against realistic statistics,
+  2. list routes are the argument-free GET rules that also have an explicit HEAD handler; each is
+     requested through the test client with a token carrying its `require_permissions` codes,
+  3. `?<column>=`, `?min_<column>=` / `?max_<column>=` and `?sort=<column>` probes whose request
+     succeeds and changes the captured page statement are the route's filters and sort keys,
+  4. every filter, every sort key (both directions) and every filter x sort pair is requested; the
+     page and count statements touching the route's table are run through EXPLAIN QUERY PLAN.
+
+A plan line is a finding when it is a full table SCAN of a filtered statement or a
+`USE TEMP B-TREE FOR ORDER BY` (whole result sorted before LIMIT). A temp B-tree for the
+"RIGHT PART" of an ORDER BY only sorts ties of an index-ordered prefix and is accepted.
+
+Candidate indexes are built per finding as (equality columns, branch_id first) + ORDER BY columns,
+e.g. (branch_id, status, id) or (branch_id, updated_at, id). Candidates are created on the seeded
+database and kept only when the re-planned statements use them; `render_migration` turns the kept
+ones into an idempotent Alembic revision. `compare_baseline` reports cases whose findings grew.
+"""
+import random
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from flask import Flask
+from flask_jwt_extended import create_access_token
+from sqlalchemy import (JSON, BigInteger, Boolean, Date, DateTime, Float, Integer, LargeBinary, Numeric, String,
+                        Text, event, text)
+from sqlalchemy.engine import Engine
+
+from app.models.authz import Base
+from app.services.slow_queries import format_plan
+
+SCOPE_BRANCH = 1
+_BASE_TS = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+_FROM = re.compile(r'\b(?:FROM|JOIN) (\w+)')
+_PREDICATE = re.compile(r'(lower\()?\b(\w+)\.(\w+)\)? (=|IN|LIKE|>=|<=|<|>) ')
+_ORDER_BY = re.compile(r'\bORDER BY (.+?)(?: LIMIT\b|$)')
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+_SEARCH_INDEX = re.compile(r'^(?:SEARCH|SCAN) (?:TABLE )?\w+ USING (?:COVERING )?INDEX (\w+)')
+_FULL_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+# --- seeding ----------------------------------------------------------------------------------
+
+def _unique_columns(table) -> set:
+    cols = {c.name for c in table.columns if c.unique or (c.primary_key and len(table.primary_key.columns) > 1)}
+    for cons in table.constraints:
+        if type(cons).__name__ == 'UniqueConstraint':
+            cols.update(c.name for c in cons.columns)
+    for ix in table.indexes:
+        if ix.unique:
+            cols.update(c.name for c in ix.columns)
+    return cols
+
+
+def _statuses(table) -> Optional[Sequence[str]]:
+    for mapper in Base.registry.mappers:
+        if mapper.local_table is table:
+            return getattr(mapper.class_, 'ALL_STATUSES', None)
+    return None
+
+
+def _seed_value(rng: random.Random, table, column, i: int, rows: int, branches: int, unique: bool):
+    kind = column.type
+    if column.name == 'branch_id':
+        return i + 1 if unique else (i % branches) + 1
+    if isinstance(kind, Boolean):
+        return i % 2 == 0
+    if isinstance(kind, (Integer, BigInteger)):
+        return i + 1 if unique else rng.randint(1, rows)
+    if isinstance(kind, (Float, Numeric)):
+        return round(rng.random() * 1000, 2)
+    if isinstance(kind, DateTime):
+        if unique:
+            return _BASE_TS - timedelta(minutes=i)
+        return _BASE_TS - timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+    if isinstance(kind, Date):
+        return (_BASE_TS - timedelta(days=i if unique else rng.randint(0, 365))).date()
+    if isinstance(kind, JSON):
+        return {}
+    if isinstance(kind, LargeBinary):
+        return b''
+    if isinstance(kind, (String, Text)):
+        statuses = _statuses(table) if column.name == 'status' else None
+        if statuses and not unique:
+            return rng.choice(statuses)
+        # low-cardinality values (names, categories) unless the column must be unique
+        return f'{column.name}-{i}' if unique else f'{column.name}-{rng.randint(0, 49)}'
+    return None
+
+
+def seed_tables(engine: Engine, rows: int = 1000, branches: int = 4, seed: int = 7) -> None:
+    """Insert `rows` deterministic rows into every mapped table, then ANALYZE."""
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            unique = _unique_columns(table)
+            columns = [c for c in table.columns
+                       if not (c.primary_key and len(table.primary_key.columns) == 1 and isinstance(c.type, Integer))]
+            batch = [{c.name: _seed_value(rng, table, c, i, rows, branches, c.name in unique) for c in columns}
+                     for i in range(rows)]
+            conn.execute(table.insert(), batch)
+        conn.exec_driver_sql('ANALYZE')
+
+
+# --- plans ------------------------------------------------------------------------------------
+
+def _flat(statement: str) -> str:
+    return ' '.join(statement.split())
+
+
+def _tables_of(statement: str) -> List[str]:
+    known = Base.metadata.tables
+    return [t for t in _FROM.findall(statement) if t in known]
+
+
+def _label(statement: str) -> str:
+    upper = _flat(statement).upper()
+    if upper.startswith('SELECT COUNT('):
+        return 'count'
+    return 'page' if ' LIMIT ' in upper else 'query'
+
+
+def plan_findings(statement: str, details: Iterable[str]) -> List[str]:
+    """Flag full scans of filtered statements and whole-result temp B-tree sorts."""
+    filtered = ' WHERE ' in _flat(statement).upper()
+    known = Base.metadata.tables
+    out = []
+    for detail in details:
+        scan = _SCAN.match(detail)
+        if scan and filtered and scan.group(1) in known:
+            out.append(f'SCAN {scan.group(1)}')
+        elif detail.startswith(_FULL_SORT):
+            out.append(_FULL_SORT)
+    return out
+
+
+def explain(engine: Engine, statement: str, parameters) -> List[Tuple[int, int, int, str]]:
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ()).all()]
+
+
+def _predicates(statement: str, table: str) -> List[Tuple[str, str]]:
+    statement = _flat(statement)
+    where = statement.upper().find(' WHERE ')
+    if where < 0:
+        return []
+    return [(col, 'like' if op == 'LIKE' else 'eq' if op in ('=', 'IN') else 'range')
+            for _lower, tbl, col, op in _PREDICATE.findall(statement[where:]) if tbl == table]
+
+
+def _order_by(statement: str, table: str) -> List[Tuple[str, bool]]:
+    m = _ORDER_BY.search(_flat(statement))
+    if not m:
+        return []
+    out = []
+    for term in m.group(1).split(','):
+        parts = term.strip().split()
+        if parts and parts[0].startswith(f'{table}.'):
+            out.append((parts[0].split('.', 1)[1], len(parts) > 1 and parts[1].upper() == 'DESC'))
+    return out
+
+
+def candidate_columns(statement: str, table: str) -> Tuple[str, ...]:
+    """Equality columns (branch_id first) followed by the ORDER BY columns, all ascending.
+
+    Direction is not encoded: SQLite walks an index backwards for an all-DESC ORDER BY, and a
+    DESC sort key with the ascending id tie-breaker (`?sort=-updated_at`) only leaves a partial
+    sort of ties ("RIGHT PART OF ORDER BY"), so one index serves both directions of a sort key.
+    """
+    eq = sorted({col for col, kind in _predicates(statement, table) if kind == 'eq'},
+                key=lambda c: (c != 'branch_id', c))
+    return tuple(eq) + tuple(col for col, _desc in _order_by(statement, table) if col not in eq)
+
+
+def index_name(table: str, columns: Sequence[str]) -> str:
+    return f"ix_{table}_{'_'.join(columns)}"
+
+
+# --- advisor ----------------------------------------------------------------------------------
+
+class IndexAdvisor:
+    """Probe list routes of `app` (bound to a seeded SQLite `engine`) and plan their queries."""
+
+    def __init__(self, app: Flask, engine: Engine):
+        if engine.dialect.name != 'sqlite':
+            raise ValueError('The index advisor plans against SQLite (EXPLAIN QUERY PLAN)')
+        self.app = app
+        self.engine = engine
+        self.client = app.test_client()
+        self._captured: Optional[List[Tuple[str, Any]]] = None
+        event.listen(engine, 'before_cursor_execute', self._capture)
+
+    def close(self) -> None:
+        event.remove(self.engine, 'before_cursor_execute', self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        if self._captured is not None and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self._captured.append((statement, parameters))
+
+    def _request(self, path: str, headers, params: Dict[str, Any]):
+        self._captured = []
+        try:
+            resp = self.client.get(path, query_string=params, headers=headers)
+        finally:
+            captured, self._captured = self._captured, None
+        return resp.status_code, captured
+
+    def list_routes(self) -> List[Tuple[str, Tuple[str, ...]]]:
+        """(path, required permission codes) for argument-free GET rules with a HEAD handler."""
+        rules = list(self.app.url_map.iter_rules())
+        head_paths = {r.rule for r in rules if 'HEAD' in r.methods and 'GET' not in r.methods}
+        out = []
+        for rule in rules:
+            if 'GET' in rule.methods and not rule.arguments and rule.rule in head_paths:
+                view = self.app.view_functions[rule.endpoint]
+                out.append((rule.rule, tuple(getattr(view, 'required_permissions', ()))))
+        return sorted(out)
+
+    def _headers(self, perms: Sequence[str]) -> Dict[str, str]:
+        with self.app.app_context():
+            token = create_access_token(identity='1', additional_claims={
+                'perms': list(perms), 'roles': [], 'groups': [], 'branch_ids': [SCOPE_BRANCH]})
+        return {'Authorization': f'Bearer {token}'}
+
+    def _samples(self, table) -> Dict[str, Any]:
+        where = ' WHERE branch_id = :b' if 'branch_id' in table.c else ''
+        with self.engine.connect() as conn:
+            row = conn.execute(text(f'SELECT * FROM {table.name}{where} ORDER BY id LIMIT 1' if 'id' in table.c
+                                    else f'SELECT * FROM {table.name}{where} LIMIT 1'), {'b': SCOPE_BRANCH}).mappings().first()
+        samples: Dict[str, Any] = {}
+        for col in table.columns:
+            value = row[col.name] if row else None
+            if isinstance(col.type, (Integer, BigInteger, String, Text)) and value is not None:
+                samples[col.name] = value
+        return samples
+
+    def discover(self, only: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Route, table, filters (param -> eq / like / range) and sort keys of every list route."""
+        routes = []
+        for path, perms in self.list_routes():
+            if only is not None and path not in only:
+                continue
+            headers = self._headers(perms)
+            status, base = self._request(path, headers, {})
+            page = next((s for s, _p in base if _label(s) == 'page'), None)
+            if status != 200 or page is None or not _tables_of(page):
+                continue
+            table = Base.metadata.tables[_tables_of(page)[0]]
+            base_preds = _predicates(page, table.name)
+            filters: Dict[str, str] = {}
+            sorts: List[str] = []
+            samples = self._samples(table)
+            for col, value in samples.items():
+                probes = [(col, value)]
+                if isinstance(table.c[col].type, (Integer, BigInteger)) and col != 'id':
+                    probes += [(f'min_{col}', value), (f'max_{col}', value)]
+                for param, sample in probes:
+                    got = self._page_statement(path, headers, {param: sample})
+                    if got is None:
+                        continue
+                    added = [p for p in _predicates(got, table.name) if p not in base_preds]
+                    if added:
+                        filters[param] = added[0][1]
+            for col in table.columns.keys():
+                got = self._page_statement(path, headers, {'sort': col})
+                if got is not None and got != page:
+                    sorts.append(col)
+            routes.append({'route': f'GET {path}', 'path': path, 'table': table.name, 'permissions': list(perms),
+                           'filters': filters, 'sorts': sorts, 'samples': samples})
+        return routes
+
+    def _page_statement(self, path: str, headers, params) -> Optional[str]:
+        status, captured = self._request(path, headers, params)
+        if status != 200:
+            return None
+        return next((s for s, _p in captured if _label(s) == 'page'), None)
+
+    @staticmethod
+    def cases(route: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        """(case key, query params): baseline, each filter, each sort key both ways, filter x sort."""
+        samples = route['samples']
+
+        def sample(param):
+            return samples[param.split('_', 1)[1] if param not in samples else param]
+
+        filters = [{p: sample(p)} for p in route['filters']]
+        sorts = [{'sort': s} for s in route['sorts']] + [{'sort': f'-{s}'} for s in route['sorts']]
+        combos = [{}] + filters + sorts + [{**f, **s} for f in filters for s in sorts]
+        out = []
+        for params in combos:
+            shown = {k: (v if k == 'sort' else '?') for k, v in params.items()}
+            key = route['route'] + (f'?{urlencode(shown, safe="?-")}' if shown else '')
+            out.append((key, params))
+        return out
+
+    def plan_route(self, route: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        headers = self._headers(route['permissions'])
+        results = {}
+        for key, params in self.cases(route):
+            status, captured = self._request(route['path'], headers, params)
+            statements = {}
+            for statement, parameters in captured:
+                if route['table'] not in _tables_of(statement):
+                    continue
+                label = _label(statement)
+                if label in statements:
+                    continue
+                rows = explain(self.engine, statement, parameters)
+                details = [str(r[3]) for r in rows]
+                statements[label] = {
+                    'sql': statement,
+                    'plan': format_plan('sqlite', rows),
+                    'findings': plan_findings(statement, details),
+                    'indexes': sorted({m.group(1) for m in map(_SEARCH_INDEX.match, details) if m}),
+                }
+            results[key] = {'status': status, 'table': route['table'], 'statements': statements}
+        return results
+
+    def plan_all(self, routes: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        results: Dict[str, Dict[str, Any]] = {}
+        for route in routes:
+            results.update(self.plan_route(route))
+        return results
+
+    def propose(self, results: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """One candidate per distinct column list for flagged statements.
+
+        A column list that is a prefix of another candidate, or of an existing index, is dropped:
+        the longer index serves the same equality lookups.
+        """
+        wanted = set()
+        for case in results.values():
+            for stmt in case['statements'].values():
+                cols = candidate_columns(stmt['sql'], case['table']) if stmt['findings'] else ()
+                if cols:
+                    wanted.add((case['table'], cols))
+        existing = {(t.name, tuple(c.name for c in ix.columns)) for t in Base.metadata.tables.values()
+                    for ix in t.indexes}
+        out = []
+        for table, cols in sorted(wanted):
+            if any(t == table and c != cols and c[:len(cols)] == cols for t, c in wanted | existing):
+                continue
+            out.append({'name': index_name(table, cols), 'table': table, 'columns': list(cols)})
+        return out
+
+    def _create(self, candidates: Iterable[Dict[str, Any]], drop: Iterable[Dict[str, Any]] = ()) -> None:
+        with self.engine.begin() as conn:
+            for cand in drop:
+                conn.exec_driver_sql(f"DROP INDEX IF EXISTS {cand['name']}")
+            for cand in candidates:
+                conn.exec_driver_sql(f"CREATE INDEX IF NOT EXISTS {cand['name']} ON {cand['table']} "
+                                     f"({', '.join(cand['columns'])})")
+            conn.exec_driver_sql('ANALYZE')
+
+    @staticmethod
+    def _resolved(candidates, before, after) -> Dict[str, List[str]]:
+        """Candidate name -> flagged statements whose findings shrank while using that index."""
+        out: Dict[str, List[str]] = {c['name']: [] for c in candidates}
+        for key, case in after.items():
+            for label, stmt in case['statements'].items():
+                old = before[key]['statements'].get(label, {}).get('findings', [])
+                if len(stmt['findings']) >= len(old):
+                    continue
+                for name in stmt['indexes']:
+                    if name in out:
+                        out[name].append(f'{key} [{label}]')
+        return out
+
+    def verify(self, candidates: List[Dict[str, Any]], routes: List[Dict[str, Any]],
+               before: Dict[str, Dict[str, Any]], max_per_table: int = 3):
+        """Create every candidate on the seeded database and re-plan; per table keep the (at most
+        `max_per_table`) candidates that resolve the most flagged statements, then re-plan again."""
+        self._create(candidates)
+        resolved = self._resolved(candidates, before, self.plan_all(routes))
+        ranked = sorted((c for c in candidates if resolved[c['name']]),
+                        key=lambda c: (-len(resolved[c['name']]), len(c['columns']), c['name']))
+        kept, per_table = [], {}
+        for cand in ranked:
+            if per_table.get(cand['table'], 0) < max_per_table:
+                per_table[cand['table']] = per_table.get(cand['table'], 0) + 1
+                kept.append(cand)
+        self._create((), drop=[c for c in candidates if c not in kept])
+        after = self.plan_all(routes)
+        final = self._resolved(kept, before, after)
+        kept = sorted(({**c, 'resolves': final[c['name']]} for c in kept), key=lambda c: c['name'])
+        return kept, after
+
+    def run(self, propose: bool = True, max_per_table: int = 3, only: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        routes = self.discover(only)
+        before = self.plan_all(routes)
+        report: Dict[str, Any] = {
+            'routes': [{k: v for k, v in r.items() if k not in ('path', 'samples')} for r in routes],
+            'cases': before,
+            'candidates': [],
+            'residual': {},
+        }
+        if propose:
+            kept, after = self.verify(self.propose(before), routes, before, max_per_table)
+            report['candidates'] = kept
+            report['residual'] = {k: findings_of(c) for k, c in after.items() if findings_of(c)}
+        return report
+
+
+def seeded_advisor(rows: int = 1000, seed: int = 7) -> IndexAdvisor:
+    """Advisor over a fresh in-memory app database seeded by `seed_tables`.
+
+    `create_app` rebinds the module-level engine / session factory; callers that need the previous
+    ones (tests) save and restore `app.db_engine` / `app.SessionLocal` around this call.
+    """
+    import app as app_module
+    from app import create_app
+    flask_app = create_app({'DATABASE_URL': 'sqlite+pysqlite:///:memory:', 'SLOW_QUERY_LOG': False})
+    flask_app.extensions['blueprints'].load_all()  # every list route (and its models) must be registered
+    Base.metadata.create_all(app_module.db_engine)
+    seed_tables(app_module.db_engine, rows=rows, seed=seed)
+    return IndexAdvisor(flask_app, app_module.db_engine)
+
+
+def findings_of(case: Dict[str, Any]) -> List[str]:
+    return sorted(f'{label}: {f}' for label, stmt in case['statements'].items() for f in stmt['findings'])
+
+
+def baseline_of(report: Dict[str, Any], rows: int, seed: int) -> Dict[str, Any]:
+    return {'rows': rows, 'seed': seed,
+            'cases': {key: findings_of(case) for key, case in sorted(report['cases'].items())}}
+
+
+def compare_baseline(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Dict[str, List[str]]]:
+    """Per case: findings not in the baseline ('regressed') and baseline findings now gone ('improved')."""
+    known = baseline.get('cases', {})
+    out: Dict[str, Dict[str, List[str]]] = {'regressed': {}, 'improved': {}}
+    for key, case in report['cases'].items():
+        current, expected = set(findings_of(case)), set(known.get(key, []))
+        if current - expected:
+            out['regressed'][key] = sorted(current - expected)
+        if expected - current:
+            out['improved'][key] = sorted(expected - current)
+    return out
+
+
+def render_migration(candidates: List[Dict[str, Any]], revision: str, down_revision: str,
+                     create_date: Optional[str] = None) -> str:
+    """Idempotent Alembic revision creating (and dropping on downgrade) the candidate indexes."""
+    create_date = create_date or datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    lines = ',\n'.join(f"    ({c['name']!r}, {c['table']!r}, {c['columns']!r})" for c in candidates)
+    return f'''"""add composite list-query indexes (generated by scripts/index_advisor.py)
+
+Revision ID: {revision}
+Revises: {down_revision}
+Create Date: {create_date}
+"""
+from __future__ import annotations
+from alembic import op
+from sqlalchemy import inspect
+
+revision = {revision!r}
+down_revision = {down_revision!r}
+branch_labels = None
+depends_on = None
+
+# (index name, table, columns): equality filters first, then the list sort key and id tie-breaker
+INDEXES = [
+{lines}
+]
+
+def upgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    for name, table, columns in INDEXES:
+        if insp.has_table(table) and name not in {{ix['name'] for ix in insp.get_indexes(table)}}:
+            op.create_index(name, table, columns)
+
+def downgrade():
+    bind = op.get_bind(); insp = inspect(bind)
+    for name, table, _columns in reversed(INDEXES):
+        if insp.has_table(table) and name in {{ix['name'] for ix in insp.get_indexes(table)}}:
+            op.drop_index(name, table_name=table)
+'''
+
+
+__all__ = ['IndexAdvisor', 'seeded_advisor', 'seed_tables', 'plan_findings', 'candidate_columns', 'findings_of', 'baseline_of',
+           'compare_baseline', 'render_migration', 'index_name', 'SCOPE_BRANCH']